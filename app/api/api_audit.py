@@ -1,36 +1,49 @@
 # app/api/api_audit.py - API para auditoría usando modelo Control (tabla "control")
 from fastapi import APIRouter, Depends, Request, Query, HTTPException
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, func, String  # Para combine fecha + hora si necesitas
+from sqlalchemy import desc
 from typing import Optional, List, Dict, Any
 from datetime import date, datetime
 from app.database import get_db
+from app.database_async import get_async_db
 from app.models import Control, Usuario  # CORREGIDO: Usa Control y Usuario
-from app.services.Control_service import ControlService  # CORREGIDO: Renombra a ControlService (ver notas)
+from app.services.Control_service import ControlService, normalizar_detalles, parsear_filtro_detalle  # CORREGIDO: Renombra a ControlService (ver notas)
 from app.auth.api_permisos import require_auditor  # Solo rol=4
 from app.schemas.esquema_control import ControlLogResponse, ControlStatsResponse, ControlSearchRequest, EsquemaControl  # CORREGIDO: Renombra esquemas
 from app.utils.log_utils import log_action  # Logging meta
+from app.utils.paginacion import CONTEO_EXACTO, MODOS_CONTEO, PATRON_CONTEO
+from app.services.busqueda_auditoria import ORDENES
 from app.auth.dependencies import get_current_active_user
 
 
 router = APIRouter(prefix="/audit", tags=["Auditoría"])
 
 # AGREGADO: Helper para paginación y formateo (combina fecha + hora)
-def paginate_and_format(items: List[Any], total: int, page: int, size: int) -> Dict[str, Any]:
+def paginate_and_format(
+    items: List[Any],
+    total: Optional[int],
+    page: Optional[int],
+    size: int,
+    next_cursor: Optional[str] = None,
+    total_estimado: bool = False,
+) -> Dict[str, Any]:
     formatted_items = []
     for item in items:
-        # Combina fecha (Date) + hora (String) a datetime para display
-        try:
-            fecha_str = f"{item.fecha} {item.hora}" if item.fecha and item.hora else str(item.fecha)
-            fecha_completa = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S").isoformat() if item.hora else str(item.fecha)
-        except:
-            fecha_completa = str(item.fecha)
+        # fecha_hora (timestamptz) si existe; si no, combina fecha (Date) + hora (String)
+        if item.fecha_hora is not None:
+            fecha_completa = item.fecha_hora.isoformat()
+        else:
+            try:
+                fecha_str = f"{item.fecha} {item.hora}" if item.fecha and item.hora else str(item.fecha)
+                fecha_completa = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S").isoformat() if item.hora else str(item.fecha)
+            except:
+                fecha_completa = str(item.fecha)
         formatted = {
             "id": item.id,
             "realizado": item.realizado,  # Acción (e.g., "borrar_persona")
             "tabla_afectada": item.tabla_afectada,  # Entidad (e.g., "personas")
             "registro_id": item.registro_id,  # Entidad ID
-            "detalles": item.detalles,  # Text/JSON
+            "detalles": normalizar_detalles(item.detalles),  # JSONB -> dict
             "fecha_completa": fecha_completa,
             "fecha": str(item.fecha),  # Solo fecha para filtros
             "hora": item.hora,
@@ -43,13 +56,15 @@ def paginate_and_format(items: List[Any], total: int, page: int, size: int) -> D
             }
         }
         formatted_items.append(formatted)
-    pages = (total + size - 1) // size
+    pages = (total + size - 1) // size if total is not None else None
     return {
         "items": formatted_items,
         "total": total,
         "page": page,
         "size": size,
-        "pages": pages
+        "pages": pages,
+        "next_cursor": next_cursor,
+        "total_estimado": total_estimado,
     }
 
 @router.get("/", response_model=List[EsquemaControl])  # CORREGIDO: Usa Control
@@ -71,7 +86,7 @@ async def get_controls(
         query = query.filter(Control.realizado == realizado)
     if usuario_id:
         query = query.filter(Control.usuario_id == usuario_id)
-    query = query.order_by(desc(Control.fecha), desc(func.cast(Control.hora, String)))  # Orden fecha + hora DESC
+    query = query.order_by(desc(Control.fecha_hora), desc(Control.id))  # Orden fecha_hora DESC (idx_control_fecha_hora)
 
     total = query.count()
     controls = query.offset((page - 1) * size).limit(size).all()
@@ -86,12 +101,18 @@ async def get_control_logs(
     fecha_hasta: Optional[date] = Query(None),
     realizado: Optional[str] = Query(None),  # CORREGIDO: Acción → realizado
     tabla_afectada: Optional[str] = Query(None),
+    detalle: Optional[List[str]] = Query(
+        None,
+        description="Filtro clave=valor sobre detalles, repetible; claves anidadas con punto "
+                    "(p. ej. detalle=codigo=000123&detalle=usuario_info.rol_id=2)",
+    ),
     page: int = Query(1, ge=1),
     size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor de la respuesta anterior (ignora page)"),
+    conteo: str = Query(CONTEO_EXACTO, pattern=PATRON_CONTEO, description="exacto | estimado | ninguno"),
     current_user: Usuario = Depends(require_auditor),
-    db: Session = Depends(get_db)
+    adb=Depends(get_async_db)
 ):
-    control_service = ControlService(db)  # CORREGIDO: Usa ControlService
     filters = {
         'usuario_id': usuario_id,
         'usuario_username': usuario_username,
@@ -100,9 +121,28 @@ async def get_control_logs(
         'realizado': realizado,  
         'tabla_afectada': tabla_afectada
     }
+    if detalle:
+        try:
+            filters['detalles'] = [parsear_filtro_detalle(d) for d in detalle]
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
     skip = (page - 1) * size
-    logs, total = control_service.get_control_logs(filters, skip=skip, limit=size)
-    return paginate_and_format(logs, total, page, size)  # Usa helper para formato
+
+    def _consultar(db: Session) -> Dict[str, Any]:
+        pagina = ControlService(db).get_control_logs_pagina(
+            filters, limit=size, skip=skip, cursor=cursor, conteo=conteo
+        )
+        # Formatea dentro de la sesión (item.usuario)
+        return paginate_and_format(
+            pagina.items,
+            pagina.total,
+            None if cursor else page,
+            size,
+            next_cursor=pagina.next_cursor,
+            total_estimado=pagina.total_estimado,
+        )
+
+    response_data = await adb.run_sync(_consultar)
 
     # Logging meta (ajustado)
     await log_action(
@@ -110,10 +150,10 @@ async def get_control_logs(
         tabla_afectada="control",
         detalles={"filtros": filters, "page": page, "size": size},
         request=request,
-        db=db,
+        db=adb,
         current_user=current_user
     )
-    return ControlLogResponse(**response_data)  # Si usas Pydantic; o direct return
+    return response_data
 
 @router.get("/stats", response_model=ControlStatsResponse)
 async def get_stats(
@@ -121,16 +161,17 @@ async def get_stats(
     fecha_desde: Optional[date] = Query(None),
     fecha_hasta: Optional[date] = Query(None),
     current_user: Usuario = Depends(require_auditor),
-    db: Session = Depends(get_db)
+    adb=Depends(get_async_db)
 ):
-    control_service = ControlService(db)
-    stats = control_service.get_control_stats(fecha_desde, fecha_hasta)  # CORREGIDO: Stats por realizado/tabla_afectada
+    stats = await adb.run_sync(
+        lambda db: ControlService(db).get_control_stats(fecha_desde, fecha_hasta)  # CORREGIDO: Stats por realizado/tabla_afectada
+    )
     await log_action(
         accion="consultar_stats_control",
         tabla_afectada="control",
         detalles={"fecha_desde": str(fecha_desde) if fecha_desde else None, "fecha_hasta": str(fecha_hasta) if fecha_hasta else None},
         request=request,
-        db=db,
+        db=adb,
         current_user=current_user
     )
     return ControlStatsResponse(**stats)
@@ -140,17 +181,43 @@ async def search_logs(
     request: Request,
     req: ControlSearchRequest,  # CORREGIDO: Renombra
     current_user: Usuario = Depends(require_auditor),
-    db: Session = Depends(get_db)
+    adb=Depends(get_async_db)
 ):
-    control_service = ControlService(db)
-    logs, total = control_service.search_logs(req.search_term, req.skip, req.limit)  # Búsqueda en realizado, detalles, username
-    formatted_logs = paginate_and_format(logs, total, 1, req.limit)["items"]  # Formato
+    if req.conteo not in MODOS_CONTEO:
+        raise HTTPException(status_code=422, detail=f"conteo debe ser uno de {', '.join(MODOS_CONTEO)}")
+    if req.orden not in ORDENES:
+        raise HTTPException(status_code=422, detail=f"orden debe ser uno de {', '.join(ORDENES)}")
+
+    def _buscar(db: Session):
+        # Búsqueda en realizado, detalles, username
+        pagina = ControlService(db).search_logs_pagina(
+            req.search_term,
+            limit=req.limit,
+            skip=req.skip,
+            cursor=req.cursor,
+            conteo=req.conteo,
+            fecha_desde=req.fecha_desde,
+            fecha_hasta=req.fecha_hasta,
+            orden=req.orden,
+        )
+        formatted_logs = paginate_and_format(pagina.items, pagina.total, 1, req.limit)["items"]  # Formato
+        if pagina.puntajes:
+            for log in formatted_logs:
+                log["puntaje"] = pagina.puntajes.get(log["id"])
+        return pagina, formatted_logs
+
+    pagina, formatted_logs = await adb.run_sync(_buscar)
     await log_action(
         accion="buscar_logs_control",
         tabla_afectada="control",
         detalles={"search_term": req.search_term, "skip": req.skip, "limit": req.limit},
         request=request,
-        db=db,
+        db=adb,
         current_user=current_user
     )
-    return {"results": formatted_logs, "total": total}
+    return {
+        "results": formatted_logs,
+        "total": pagina.total,
+        "next_cursor": pagina.next_cursor,
+        "total_estimado": pagina.total_estimado,
+    }
@@ -6,7 +6,8 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 from app.database import get_db
 from app.auth import jwt_handler, get_current_active_user
-from app.services.usuario_service import UsuarioService
+from app.auth.password_hasher import password_hasher
+from app.services.usuario_service import UsuarioService, invalidar_principal
 from app.services.persona_service import PersonaService
 from app.schemas import Token, UsuarioLogin, UsuarioResponse
 from app.schemas.esquema_usuario import PerfilResponse, SolicitudRecuperacionPassword, ResetPasswordRequest
@@ -34,13 +35,18 @@ async def login_for_access_token(
     db: Session = Depends(get_db)
 ):
     usuario_service = UsuarioService(db)
-    user = usuario_service.authenticate_user(form_data.username, form_data.password)
-    if not user:
+    user = usuario_service.get_by_username(form_data.username)
+    valida, nuevo_hash = False, None
+    if user:
+        # bcrypt corre en el pool de hilos, no en el event loop
+        valida, nuevo_hash = await password_hasher.verificar(form_data.password, user.hashed_password)
+    if not user or not valida:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales incorrectas",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    user = usuario_service.registrar_acceso(user, nuevo_hash)
 
     # CAMBIO: Definir duración de 4 días
     access_token_expires = timedelta(days=4)
@@ -92,8 +98,9 @@ async def login_json(
             detail="Usuario no existe"
         )
 
-    # Verificar contraseña
-    if not usuario_service.verify_password(login_data.password, user.hashed_password):
+    # Verificar contraseña (en el pool de hilos de bcrypt)
+    valida, nuevo_hash = await password_hasher.verificar(login_data.password, user.hashed_password)
+    if not valida:
         raise HTTPException(
             status_code=401,
             detail="Contraseña incorrecta"
@@ -106,9 +113,8 @@ async def login_json(
             detail="Cuenta desactivada"
         )
 
-    # Actualizar último acceso
-    user.ultimo_acceso = datetime.now()
-    db.commit()
+    # Actualizar último acceso (y el hash si cambió el costo de bcrypt)
+    usuario_service.registrar_acceso(user, nuevo_hash)
 
     # Generar token (4 días)
     access_token_expires = timedelta(days=4)
@@ -183,7 +189,8 @@ async def solicitar_recuperacion_password(
 async def test_email(
     request: Request,
     email: str,
-    current_user = Depends(get_current_active_user)  # Requiere auth para test
+    current_user = Depends(get_current_active_user),  # Requiere auth para test
+    db: Session = Depends(get_db)
 ):
     try:
         result = await email_service.send_test_email(email)
@@ -193,7 +200,7 @@ async def test_email(
                 tabla_afectada="auth",
                 detalles={"email": email},
                 request=request,
-                db=Depends(get_db),
+                db=db,
                 current_user=current_user
             )
             return {"message": "Email de prueba enviado exitosamente", "email": email}
@@ -256,10 +263,11 @@ async def reset_password(
         if not payload:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token inválido o expirado. Solicita uno nuevo.")
 
-        new_hashed = usuario_service.get_password_hash(reset_data.nueva_password)
+        new_hashed = await password_hasher.hash(reset_data.nueva_password)
         user.hashed_password = new_hashed
         user.fecha_actualizacion = datetime.now()
         db.commit()
+        invalidar_principal(user.id)
 
         await log_action(
             accion="reset_password_exitoso",
@@ -341,7 +349,8 @@ async def get_current_user_info_main(
 @router.post("/refresh", response_model=Token, summary="Renovar token")
 async def refresh_token(
     request: Request,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: dict = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
 ):
     # CAMBIO: Definir duración de 4 días también en el refresh
     access_token_expires = timedelta(days=4)
@@ -358,7 +367,7 @@ async def refresh_token(
         tabla_afectada="auth",
         detalles={"user_id": current_user["id"], "ip": request.client.host},
         request=request,
-        db=Depends(get_db),
+        db=db,
         current_user=current_user
     )
 
@@ -371,14 +380,15 @@ async def refresh_token(
 @router.post("/logout", summary="Cerrar sesión")
 async def logout(
     request: Request,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: dict = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
 ):
     await log_action(
         accion="logout_exitoso",
         tabla_afectada="auth",
         detalles={"user_id": current_user["id"], "ip": request.client.host},
         request=request,
-        db=Depends(get_db),
+        db=db,
         current_user=current_user
     )
     return {"message": "Sesión cerrada exitosamente"}
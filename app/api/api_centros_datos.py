@@ -1,5 +1,6 @@
 # app/api/api_centros_datos.py
 from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import Optional
 from app.database import get_db
@@ -11,6 +12,9 @@ from app.schemas import (
 from app.schemas.esquema_control import EsquemaControl,ControlLogResponse,ControlSearchRequest,ControlStatsResponse
 from app.auth.api_permisos import require_operator_or_above,require_admin  # Asume ADMIN para CRUD, OPERADOR para GET
 from app.utils.log_utils import log_action  # Agregado
+from app.services.catalogo_cache import catalogo_cache
+from app.utils.condicional import PeticionCondicional, peticion_condicional, ultima_de, version_pagina
+from app.utils.respuestas import respuesta_json
 
 router = APIRouter(prefix="/centros-datos", tags=["centros-datos"])
 
@@ -32,6 +36,7 @@ async def create_centro_datos(
         db.add(cd)
         db.commit()
         db.refresh(cd)
+        catalogo_cache.invalidar()
 
         # Logging
         await log_action(
@@ -44,6 +49,9 @@ async def create_centro_datos(
             current_user=current_user
         )
         return cd
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Ya existe un centro de datos con este código o nombre")
     except Exception as exc:
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error creando centro de datos: {exc}")
@@ -55,7 +63,8 @@ async def list_centros_datos(
     size: int = Query(10, ge=1, le=1000),
     ciudad: Optional[str] = Query(None),
     current_user = Depends(require_operator_or_above),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    cond: PeticionCondicional = Depends(peticion_condicional),
 ):
     q = db.query(CentroDatos)
     if ciudad:
@@ -63,9 +72,13 @@ async def list_centros_datos(
 
     try:
         total = q.count()
+        items = q.order_by(CentroDatos.nombre.asc()).offset((page - 1) * size).limit(size).all() if total else []
+        version = version_pagina(items, ("fecha_creacion", "fecha_actualizacion"))
+        respuesta_304 = cond.evaluar("centros-datos", [ciudad, page, size, total, version])
+        if respuesta_304:
+            return respuesta_304
         if total == 0:
             return CentroDatosListResponse(items=[], total=0, page=page, size=size, pages=0)
-        items = q.order_by(CentroDatos.nombre.asc()).offset((page - 1) * size).limit(size).all()
         pages = (total + size - 1) // size
         response = CentroDatosListResponse(items=items, total=total, page=page, size=size, pages=pages)
         # Logging
@@ -77,7 +90,7 @@ async def list_centros_datos(
             db=db,
             current_user=current_user
         )
-        return response
+        return respuesta_json(response, cond)
     except Exception as exc:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error listando centros de datos: {exc}")
 
@@ -86,9 +99,16 @@ async def get_centro_datos(
     request: Request,
     cd_id: int,
     current_user = Depends(require_operator_or_above),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    cond: PeticionCondicional = Depends(peticion_condicional),
 ):
     cd = _get_cd_or_404(db, cd_id)
+    respuesta_304 = cond.evaluar(
+        "centro-datos", [cd_id, cd.fecha_creacion, cd.fecha_actualizacion],
+        ultima_de(cd.fecha_creacion, cd.fecha_actualizacion),
+    )
+    if respuesta_304:
+        return respuesta_304
     await log_action(
         accion="consultar_centro_datos",
         tabla_afectada="centros_datos",
@@ -115,6 +135,7 @@ async def update_centro_datos(
             setattr(cd, k, v)
         db.commit()
         db.refresh(cd)
+        catalogo_cache.invalidar()
 
         # Logging
         await log_action(
@@ -143,6 +164,7 @@ async def delete_centro_datos(
     try:
         db.delete(cd)
         db.commit()
+        catalogo_cache.invalidar()
 
         # Logging
         await log_action(
@@ -0,0 +1,133 @@
+# app/api/api_diagnostico.py - Endpoints internos de diagnóstico (solo ADMIN)
+import asyncio
+
+from fastapi import APIRouter, Depends
+
+from app.auth.api_permisos import require_admin
+from app.auth.password_hasher import password_hasher
+from app.auth.principal_cache import principal_cache
+from app.services.catalogo_cache import catalogo_cache
+from app.services.autocompletar_personas import indice_personas
+from app.services.foto_store import foto_store
+from app.utils.pdf_generator import pdf_cache
+from app.database import engine, get_pool_status
+from app.database_async import get_async_pool_status
+from app.services.estado_compartido import estado_compartido
+from app.services.limitador import limitador
+from app.services.particiones_control import es_particionada, listar_particiones
+from app.utils.audit_writer import audit_writer
+from app.utils.paginacion import cache_conteos
+from app.workers import mantenimiento_auditoria
+
+router = APIRouter(prefix="/diagnostico", tags=["Diagnóstico"])
+
+
+@router.get("/pool", summary="Estado del pool de conexiones")
+async def estado_pool(current_user=Depends(require_admin)):
+    """
+    Conexiones en uso (checked_out), overflow activo y tiempos de espera
+    acumulados para obtener una conexión del pool. `async` describe el
+    pool de las lecturas asíncronas (o "hilos" si no hay driver async).
+    """
+    return {**get_pool_status(), "async": get_async_pool_status()}
+
+
+@router.get("/auditoria", summary="Estado del escritor de auditoría")
+async def estado_auditoria(current_user=Depends(require_admin)):
+    """
+    Registros pendientes en la cola, lotes escritos y registros descartados
+    por backpressure.
+    """
+    return audit_writer.estadisticas()
+
+
+@router.get("/password-hasher", summary="Estado del pool de bcrypt")
+async def estado_password_hasher(current_user=Depends(require_admin)):
+    """
+    Operaciones bcrypt en curso, rechazadas por saturación (503),
+    rehashes por cambio de costo y tiempo de hash (promedio y máximo).
+    """
+    return password_hasher.estadisticas()
+
+
+@router.get("/principal-cache", summary="Estado de la caché de usuarios autenticados")
+async def estado_principal_cache(current_user=Depends(require_admin)):
+    """
+    Hits/misses de la caché de principal (usuario + rol) e invalidaciones.
+    """
+    return principal_cache.estadisticas()
+
+
+@router.get("/catalogos", summary="Estado de la caché de catálogos")
+async def estado_catalogos(current_user=Depends(require_admin)):
+    """
+    Recargas, edad del snapshot y tamaño de cada catálogo en memoria.
+    """
+    return catalogo_cache.estadisticas()
+
+
+@router.get("/estado-compartido", summary="Backend de estado compartido entre workers")
+async def estado_compartido_workers(current_user=Depends(require_admin)):
+    """
+    Backend en uso ("memoria" por proceso o "redis"), claves o clientes
+    conectados y errores de Redis acumulados en este worker.
+    """
+    return await asyncio.to_thread(estado_compartido.estadisticas)
+
+
+@router.get("/rate-limit", summary="Estado del limitador de tasa")
+async def estado_rate_limit(current_user=Depends(require_admin)):
+    """
+    Reglas activas, claves en memoria (IPs/usuarios con actividad reciente),
+    claves purgadas por inactividad y requests rechazados en este worker.
+    """
+    return limitador.estadisticas()
+
+
+@router.get("/autocompletar", summary="Estado del índice de autocompletado de personas")
+async def estado_autocompletar(current_user=Depends(require_admin)):
+    """
+    Personas indexadas, claves de nombre, recargas y edad del índice de prefijos.
+    """
+    return indice_personas.estadisticas()
+
+
+@router.get("/fotos", summary="Estado de la caché de fotos")
+async def estado_fotos(current_user=Depends(require_admin)):
+    """
+    Archivos indexados, memoria usada por el LRU de fotos y hits/misses.
+    """
+    return foto_store.estadisticas()
+
+
+@router.get("/pdf-cache", summary="Estado de la caché de constancias PDF")
+async def estado_pdf_cache(current_user=Depends(require_admin)):
+    """
+    Constancias en caché, memoria usada y hits/misses de download-pdf.
+    """
+    return pdf_cache.estadisticas()
+
+
+@router.get("/conteos", summary="Estado de la caché de conteos de listados")
+async def estado_conteos(current_user=Depends(require_admin)):
+    """
+    Conteos cacheados para los listados con conteo=estimado y sus hits/misses.
+    """
+    return cache_conteos.estadisticas()
+
+
+@router.get("/particiones-control", summary="Particiones de la tabla de auditoría")
+async def estado_particiones_control(current_user=Depends(require_admin)):
+    """
+    Particiones mensuales de control (rango y filas estimadas) y resultado
+    de la última corrida de creación/retención.
+    """
+    def _listar():
+        with engine.connect() as conn:
+            if not es_particionada(conn):
+                return {"particionada": False, "particiones": []}
+            return {"particionada": True, "particiones": listar_particiones(conn)}
+
+    datos = await asyncio.to_thread(_listar)
+    datos["mantenimiento"] = mantenimiento_auditoria.estadisticas()
+    return datos
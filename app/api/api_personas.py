@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status, File, UploadFile, Form, Request
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
+import asyncio
+import json
+import logging
 import shutil
 import os
 from pathlib import Path
 from sqlalchemy import func, asc
 from sqlalchemy.exc import IntegrityError
 from app.database import get_db
+from app.database_async import get_async_db
 from app.models import Persona
 from app.schemas import (
     PersonaUpdate,
@@ -14,9 +19,15 @@ from app.schemas import (
     PersonaListResponse,
 )
 from app.services.visita_service import VisitaService
+from app.services.busqueda_personas import BusquedaPersonas
+from app.services.autocompletar_personas import indice_personas
 from app.auth.api_permisos import require_operator_or_above, require_supervisor_or_above
 from app.utils.log_utils import log_action
+from app.utils.paginacion import CONTEO_EXACTO, PATRON_CONTEO, contar, decodificar_cursor, paginar_keyset
+from app.utils.condicional import PeticionCondicional, peticion_condicional, ultima_de, version_pagina
+from app.utils.respuestas import respuesta_json
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/personas", tags=["personas"])
 
@@ -82,6 +93,7 @@ async def create_persona(
         db.add(persona)
         db.commit()
         db.refresh(persona)
+        indice_personas.actualizar(persona)
 
         # Logging
         payload_detalles = {
@@ -129,51 +141,201 @@ async def list_personas(
     nombre: Optional[str] = Query(None),
     apellido: Optional[str] = Query(None),
     documento: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, max_length=200, description="Búsqueda por nombre, cédula, email o empresa (ordenada por relevancia)"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la respuesta anterior (ignora page)"),
+    conteo: str = Query(CONTEO_EXACTO, pattern=PATRON_CONTEO, description="exacto | estimado | ninguno"),
     current_user = Depends(require_operator_or_above),
-    db: Session = Depends(get_db)
+    adb=Depends(get_async_db),
+    cond: PeticionCondicional = Depends(peticion_condicional),
 ):
-    """Listar personas con paginación y filtros"""
-    q = db.query(Persona)
-    if nombre:
-        q = q.filter(Persona.nombre.ilike(f"%{nombre}%"))
-    if apellido:
-        q = q.filter(Persona.apellido.ilike(f"%{apellido}%"))
-    if documento:
-        q = q.filter(Persona.documento_identidad.ilike(f"%{documento}%"))
+    """
+    Listar personas con paginación (por página o cursor sobre id) y filtros.
+    Con `q` se ordena por relevancia y se pagina solo por página.
+    Responde 304 si el If-None-Match coincide con la versión vigente.
+    """
+    if q and q.strip():
+        return await _buscar_personas_q(request, q, page, size, conteo, current_user, adb, cond)
+
+    filtros = {"nombre": nombre, "apellido": apellido, "documento": documento}
+    pagina = None if cursor else page
+
+    def _consultar(db: Session):
+        query = db.query(Persona)
+        if nombre:
+            query = query.filter(Persona.nombre.ilike(f"%{nombre}%"))
+        if apellido:
+            query = query.filter(Persona.apellido.ilike(f"%{apellido}%"))
+        if documento:
+            query = query.filter(Persona.documento_identidad.ilike(f"%{documento}%"))
+
+        total, total_estimado = contar(db, query, conteo, Persona.__table__.fullname, filtros)
+        if total == 0 and not total_estimado:
+            if cursor:
+                # Sin filas no se pagina, pero un cursor inválido sigue siendo un 400
+                decodificar_cursor("personas", cursor, 1)
+            items, next_cursor = [], None
+        else:
+            items, next_cursor = paginar_keyset(
+                query, "personas", (Persona.id,), size, cursor=cursor, skip=(page - 1) * size, descendente=False
+            )
+        version = version_pagina(items, ("fecha_creacion", "fecha_actualizacion"))
+        respuesta_304 = cond.evaluar("personas", [filtros, page, size, cursor, conteo, total, total_estimado, version])
+        if respuesta_304:
+            return respuesta_304
+        if total == 0 and not total_estimado:
+            return PersonaListResponse(items=[], total=0, page=pagina, size=size, pages=0)
+        return PersonaListResponse(
+            items=items,
+            total=total,
+            page=pagina,
+            size=size,
+            pages=(total + size - 1) // size if total is not None else None,
+            next_cursor=next_cursor,
+            total_estimado=total_estimado,
+        )
 
     try:
-        total = q.count()
-        if total == 0:
-            return PersonaListResponse(items=[], total=0, page=page, size=size, pages=0)
-        items = q.offset((page - 1) * size).limit(size).all()
-        response = PersonaListResponse(
-            items=items, total=total, page=page, size=size, pages=(total + size - 1) // size
-        )
+        response = await adb.run_sync(_consultar)
+        if isinstance(response, Response) or (response.total == 0 and not response.total_estimado):
+            return response
         # Logging
-        filtros_detalles = {"nombre": nombre, "apellido": apellido, "documento": documento, "page": page, "size": size}
+        filtros_detalles = {**filtros, "page": pagina, "size": size}
         await log_action(
             accion="consultar_lista_personas",
             tabla_afectada="personas",
             detalles=filtros_detalles,
             request=request,
-            db=db,
+            db=adb,
             current_user=current_user
         )
-        return response
+        return respuesta_json(response, cond)
+    except HTTPException:
+        raise
     except Exception as exc:
         print(f"[ERROR] Listando personas: {str(exc)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error listando personas: {exc}")
 
 
+async def _buscar_personas_q(request: Request, q: str, page: int, size: int, conteo: str, current_user, adb, cond=None):
+    """Rama de list_personas para la búsqueda `q` (app.services.busqueda_personas)."""
+
+    def _buscar(db: Session):
+        resultado = BusquedaPersonas(db).buscar(q, limit=size, skip=(page - 1) * size, conteo=conteo)
+        total = resultado.total
+        if cond is not None:
+            # El orden por relevancia queda en los ids de la página
+            version = version_pagina(resultado.items, ("fecha_creacion", "fecha_actualizacion"))
+            respuesta_304 = cond.evaluar(
+                "personas-q", [q.strip(), page, size, conteo, total, resultado.total_estimado, version]
+            )
+            if respuesta_304:
+                return respuesta_304
+        return PersonaListResponse(
+            items=resultado.items,
+            total=total,
+            page=page,
+            size=size,
+            pages=(total + size - 1) // size if total is not None else None,
+            total_estimado=resultado.total_estimado,
+        )
+
+    try:
+        response = await adb.run_sync(_buscar)
+        if isinstance(response, Response):
+            return response
+        await log_action(
+            accion="buscar_personas",
+            tabla_afectada="personas",
+            detalles={"q": q, "page": page, "size": size},
+            request=request,
+            db=adb,
+            current_user=current_user
+        )
+        return respuesta_json(response, cond)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error buscando personas")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error buscando personas")
+
+
+# Filas por bloque escrito en la exportación NDJSON
+CEDULAS_LOTE = 2000
+# Máximo de filas que se materializan en una respuesta JSON; más allá, NDJSON
+CEDULAS_JSON_MAX = 5000
+
+
+def _cedulas_ndjson(bind, limit: int):
+    """
+    Genera la exportación línea a línea sin materializar la consulta
+    (yield_per usa un cursor del lado del servidor en PostgreSQL).
+
+    Usa su propia sesión sobre `bind`: la del request pertenece a get_db y
+    el streaming puede seguir después de que la dependencia la cierre.
+    """
+    with Session(bind=bind) as db:
+        filas = (
+            db.query(Persona.id, Persona.documento_identidad, Persona.nombre, Persona.apellido)
+            .order_by(Persona.documento_identidad)
+            .limit(limit)
+            .yield_per(CEDULAS_LOTE)
+        )
+        bloque = []
+        for r in filas:
+            bloque.append(json.dumps(
+                {"id": r.id, "documento_identidad": r.documento_identidad, "nombre": r.nombre, "apellido": r.apellido},
+                ensure_ascii=False,
+            ))
+            if len(bloque) >= CEDULAS_LOTE:
+                yield ("\n".join(bloque) + "\n").encode("utf-8")
+                bloque = []
+        if bloque:
+            yield ("\n".join(bloque) + "\n").encode("utf-8")
+
+
+@router.get("/autocompletar")
+def autocompletar_personas(
+    prefijo: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user = Depends(require_operator_or_above),
+):
+    """
+    Personas cuya cédula o nombre/apellido empiezan por el prefijo (índice en memoria).
+    Síncrono: la primera llamada carga el índice y corre en el threadpool.
+    """
+    return indice_personas.buscar(db, prefijo, limit)
+
+
 @router.get("/cedulas")
 async def listar_cedulas(
     request: Request,
     db: Session = Depends(get_db),
     current_user = Depends(require_operator_or_above),
-    limit: int = Query(5000, ge=1, le=5000000)
+    limit: int = Query(5000, ge=1, le=5000000),
+    formato: str = Query("json", pattern="^(json|ndjson)$", description="ndjson: exportación en streaming, una persona por línea"),
 ):
-    """Listar todas las cédulas de personas"""
+    """
+    Listar cédulas de personas. Para autocompletar usar /personas/autocompletar;
+    el listado completo debe pedirse con formato=ndjson.
+    """
     try:
+        if formato == "json" and limit > CEDULAS_JSON_MAX:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"limit máximo en formato json: {CEDULAS_JSON_MAX}; para más filas usar formato=ndjson",
+            )
+        if formato == "ndjson":
+            await log_action(
+                accion="exportar_cedulas_personas",
+                tabla_afectada="personas",
+                detalles={"limit": limit, "formato": formato},
+                request=request,
+                db=db,
+                current_user=current_user
+            )
+            return StreamingResponse(_cedulas_ndjson(db.get_bind(), limit), media_type="application/x-ndjson")
+
         rows = db.query(Persona.id, Persona.documento_identidad, Persona.nombre, Persona.apellido).order_by(Persona.documento_identidad).limit(limit).all()
         response = [{"id": r.id, "documento_identidad": r.documento_identidad, "nombre": r.nombre, "apellido": r.apellido} for r in rows]
         
@@ -186,6 +348,8 @@ async def listar_cedulas(
             current_user=current_user
         )
         return response
+    except HTTPException:
+        raise
     except Exception as exc:
         print(f"[ERROR] Listando cédulas: {str(exc)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error listando cédulas: {exc}")
@@ -204,14 +368,8 @@ async def buscar_personas_por_cedula(
         q_digits = "".join(ch for ch in q if ch.isdigit())
         if not q_digits:
             return []
-        rows = (
-            db.query(Persona.id, Persona.documento_identidad, Persona.nombre, Persona.apellido)
-            .filter(Persona.documento_identidad.ilike(f"{q_digits}%"))
-            .order_by(Persona.documento_identidad)
-            .limit(size)
-            .all()
-        )
-        response = [{"id": r.id, "documento_identidad": r.documento_identidad, "nombre": r.nombre, "apellido": r.apellido} for r in rows]
+        # La carga del índice es bloqueante: fuera del event loop
+        response = await asyncio.to_thread(indice_personas.buscar, db, q_digits, size)
         
         await log_action(
             accion="buscar_personas_cedula",
@@ -255,20 +413,37 @@ async def get_persona(
     request: Request,
     persona_id: int,
     current_user = Depends(require_operator_or_above),
-    db: Session = Depends(get_db)
+    adb=Depends(get_async_db),
+    cond: PeticionCondicional = Depends(peticion_condicional),
 ):
-    """Obtener los detalles de una persona por ID"""
+    """Obtener los detalles de una persona por ID (acepta If-None-Match / If-Modified-Since)"""
+
+    def _consultar(db: Session):
+        fechas = (
+            db.query(Persona.fecha_creacion, Persona.fecha_actualizacion)
+            .filter(Persona.id == persona_id)
+            .first()
+        )
+        if not fechas:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Persona no encontrada")
+        respuesta_304 = cond.evaluar("persona", [persona_id, *fechas], ultima_de(*fechas))
+        if respuesta_304:
+            return respuesta_304
+        return PersonaResponse.model_validate(_get_persona_or_404(db, persona_id))
+
+    persona = await adb.run_sync(_consultar)
+    if isinstance(persona, Response):
+        return persona
     try:
-        persona = _get_persona_or_404(db, persona_id)
         await log_action(
             accion="consultar_persona",
             tabla_afectada="personas",
             registro_id=persona_id,
             request=request,
-            db=db,
+            db=adb,
             current_user=current_user
         )
-        return persona
+        return respuesta_json(persona, cond)
     except Exception as exc:
         print(f"[ERROR] Obteniendo persona: {str(exc)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error obteniendo persona: {exc}")
@@ -348,6 +523,7 @@ async def update_persona(
 
         db.commit()
         db.refresh(persona)
+        indice_personas.actualizar(persona)
 
         # Logging
         payload_detalles = {
@@ -408,6 +584,7 @@ async def delete_persona(
         
         db.delete(persona)
         db.commit()
+        indice_personas.quitar(persona_id)
 
         # Logging
         await log_action(
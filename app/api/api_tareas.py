@@ -0,0 +1,74 @@
+# app/api/api_tareas.py - Consulta y reintento de tareas post-commit (PDF, Telegram, Email)
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.auth.api_permisos import require_operator_or_above, require_supervisor_or_above
+from app.database import get_db
+from app.schemas.esquema_tarea import TareaResponse, TareaListResponse
+from app.services.tarea_service import TareaService, ESTADO_FALLIDA
+from app.workers import pool_tareas
+
+router = APIRouter(prefix="/tareas", tags=["Tareas"])
+
+
+@router.get("/", response_model=TareaListResponse, summary="Listar tareas en cola")
+async def listar_tareas(
+    estado: Optional[str] = Query(None, description="pendiente, en_proceso, completada o fallida"),
+    tipo: Optional[str] = Query(None, description="generar_pdf, telegram o email"),
+    visita_id: Optional[int] = Query(None),
+    page: int = Query(1, ge=1),
+    size: int = Query(20, ge=1, le=100),
+    current_user=Depends(require_operator_or_above),
+    db: Session = Depends(get_db),
+):
+    filters = {"estado": estado, "tipo": tipo, "visita_id": visita_id}
+    tareas, total = TareaService(db).listar(filters, skip=(page - 1) * size, limit=size)
+    return TareaListResponse(
+        items=tareas,
+        total=total,
+        page=page,
+        size=size,
+        pages=(total + size - 1) // size,
+    )
+
+
+@router.get("/resumen", summary="Conteo de tareas por estado")
+async def resumen_tareas(
+    current_user=Depends(require_operator_or_above),
+    db: Session = Depends(get_db),
+):
+    return {"estados": TareaService(db).resumen(), "workers_activos": pool_tareas.activo}
+
+
+@router.get("/{tarea_id}", response_model=TareaResponse, summary="Obtener tarea")
+async def obtener_tarea(
+    tarea_id: int,
+    current_user=Depends(require_operator_or_above),
+    db: Session = Depends(get_db),
+):
+    tarea = TareaService(db).get(tarea_id)
+    if not tarea:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tarea no encontrada")
+    return tarea
+
+
+@router.post("/{tarea_id}/reintentar", response_model=TareaResponse, summary="Reintentar tarea fallida")
+async def reintentar_tarea(
+    tarea_id: int,
+    current_user=Depends(require_supervisor_or_above),
+    db: Session = Depends(get_db),
+):
+    service = TareaService(db)
+    tarea = service.get(tarea_id)
+    if not tarea:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tarea no encontrada")
+    if tarea.estado != ESTADO_FALLIDA:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Solo se pueden reintentar tareas fallidas",
+        )
+    tarea = service.reintentar(tarea_id)
+    pool_tareas.notificar()
+    return tarea
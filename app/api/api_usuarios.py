@@ -3,8 +3,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Form, UploadFile, File
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.services.usuario_service import UsuarioService
+from app.services.usuario_service import UsuarioService, invalidar_principal
 from app.auth.api_permisos import require_supervisor_or_above, require_role,require_operator_or_above
+from app.auth.password_hasher import password_hasher
 from app.models import Usuario, Visita, RolUsuario
 from app.schemas.esquema_usuario import UsuarioResponse, UsuarioListResponse, UsuarioUpdate, UsuarioCreate
 from sqlalchemy.exc import IntegrityError
@@ -405,7 +406,7 @@ async def update_user(
         
         if password is not None:
             print(f"Actualizando password")
-            hashed = usuario_service.get_password_hash(password)
+            hashed = await password_hasher.hash(password)
             update_dict["hashed_password"] = hashed
         
         print(f"Update dict: {update_dict}")
@@ -421,6 +422,7 @@ async def update_user(
         
         db.commit()
         db.refresh(existing_user)
+        invalidar_principal(existing_user.id)
         
         print(f"✓ Usuario actualizado exitosamente")
         
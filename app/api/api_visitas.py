@@ -6,7 +6,8 @@ from typing import Optional, List, Annotated
 from app.services.visita_service import VisitaService
 from app.services.persona_service import PersonaService
 from app.database import get_db
-from app.models import Visita, EstadoVisita, TipoActividad, Persona, CentroDatos, Area,CentroAreaVisita
+from app.database_async import get_async_db
+from app.models import Visita, Persona, CentroDatos, Area,CentroAreaVisita
 from sqlalchemy.sql import func
 from app.schemas import (
     VisitaCreate,
@@ -18,68 +19,34 @@ from app.schemas import (
     VisitaSalida,
     VisitaTipoActividad,
 )
+import asyncio
+import logging
 import shutil
-import os
 import json
-import base64
 from pathlib import Path
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 import io
-from app.utils.pdf_generator import generar_pdf_visita
-from app.utils.telegram import enviar_notificacion_telegram, enviar_email_a_telegram
+from app.utils.pdf_generator import generar_pdf_visita, pdf_cache
+from app.utils.telegram import enviar_email_a_telegram
 from datetime import datetime, date
 import random
 from app.auth.api_permisos import require_operator_or_above, require_admin
 from app.utils.log_utils import log_action  # Agregado
+from app.utils.metricas import Cronometro, medir_etapa
+from app.utils.paginacion import CONTEO_EXACTO, PATRON_CONTEO, contar, paginar_keyset
+from app.utils.condicional import PeticionCondicional, peticion_condicional, ultima_de, version_pagina
+from app.utils.respuestas import respuesta_json
+from app.services.foto_store import foto_store
+from app.services.tarea_service import TareaService
+from app.workers import pool_tareas
+from app.workers.exportacion import ItemExportacion, generar_zip, progreso_exportaciones
+from app.services.catalogo_cache import catalogo_cache
+from app.config import settings
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/visitas", tags=["visitas"])
 
-def obtener_imagen_persona_base64(foto_nombre: str) -> str:
-    """
-    Busca la imagen en la carpeta del frontend y la retorna en Base64.
-    """
-    if not foto_nombre:
-        return None
-
-    # Limpiamos el nombre (ej: "foto.png" en lugar de "rutas/foto.png")
-    filename = os.path.basename(foto_nombre)
-
-    # ✅ LISTA DE RUTAS DONDE BUSCAR LA FOTO
-    # La primera es la ruta específica que me indicaste
-    base_dirs = [
-        # Ruta prioritaria (Frontend)
-        Path("html/mi-app/src/img/personas"),
-        
-        # Rutas de respaldo (por si mueves carpetas en el futuro)
-        Path("app/files/images/personas"),
-        Path("static/images/personas"),
-    ]
-
-    foto_path = None
-    
-    # Recorremos las rutas hasta encontrar el archivo
-    for directory in base_dirs:
-        # .resolve() convierte la ruta relativa en absoluta para evitar errores
-        possible_path = (directory / filename).resolve()
-        
-        if possible_path.exists():
-            foto_path = possible_path
-            break
-    
-    # Si encontramos la foto, la convertimos a Base64
-    if foto_path:
-        try:
-            with open(foto_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-                print(f"✅ Imagen encontrada: {foto_path}")
-                return encoded_string
-        except Exception as e:
-            print(f"⚠️ Error leyendo archivo de imagen: {e}")
-            return None
-    else:
-        print(f"⚠️ Imagen no encontrada en: {[str(p) for p in base_dirs]}")
-        return None
-
 def _codigo_9d() -> str:
     return str(random.randint(0, 999_999_999)).zfill(9)
 
@@ -101,15 +68,136 @@ def _ensure_fk_visita(
 ):
     if persona_id is not None and not db.query(Persona.id).filter(Persona.id == persona_id).first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Persona no encontrada")
-    if centro_datos_id is not None and not db.query(CentroDatos.id).filter(CentroDatos.id == centro_datos_id).first():
+    # Catálogos: verificación en memoria (catalogo_cache)
+    if centro_datos_id is not None and not catalogo_cache.existe(db, "centros", centro_datos_id):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Centro de datos no encontrado")
-    if estado_id is not None and not db.query(EstadoVisita.id_estado).filter(EstadoVisita.id_estado == estado_id).first():
+    if estado_id is not None and not catalogo_cache.existe(db, "estados", estado_id):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Estado de visita no encontrado")
-    if tipo_actividad_id is not None and not db.query(TipoActividad.id_tipo_actividad).filter(TipoActividad.id_tipo_actividad == tipo_actividad_id).first():
+    if tipo_actividad_id is not None and not catalogo_cache.existe(db, "tipos_actividad", tipo_actividad_id):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tipo de actividad no encontrada")
-    if area_id is not None and not db.query(Area.id).filter(Area.id == area_id).first():
+    if area_id is not None and not catalogo_cache.existe(db, "areas", area_id):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Área no encontrada")
 
+def _respuesta_catalogo(request: Request, db: Session, recurso: str, datos) -> Response:
+    """
+    Respuesta JSON de un catálogo con ETag y Cache-Control;
+    304 sin cuerpo si el cliente ya tiene la versión vigente (If-None-Match).
+    """
+    etag = catalogo_cache.etag(db, recurso)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.catalogo_http_max_age}",
+    }
+    if etag in [e.strip() for e in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(content=datos, headers=headers)
+
+def _ids_lista(valor) -> List[int]:
+    """Normaliza una columna JSON de IDs (areas_ids / centros_datos_ids) a lista."""
+    if not valor or not isinstance(valor, list):
+        return []
+    ids = []
+    for i in valor:
+        try:
+            ids.append(int(i))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+def _resolver_nombres_areas_centros(db: Session, visitas: List[Visita]) -> None:
+    """
+    Rellena areas_nombres / centros_nombres de todas las visitas con UNA
+    consulta por tabla (en vez de dos consultas por visita).
+    Los nombres conservan el orden de los IDs guardados en la visita.
+    """
+    area_ids = set()
+    centro_ids = set()
+    for v in visitas:
+        area_ids.update(_ids_lista(getattr(v, "areas_ids", None)))
+        centro_ids.update(_ids_lista(getattr(v, "centros_datos_ids", None)))
+
+    areas_map = {}
+    centros_map = {}
+    try:
+        if area_ids:
+            areas_map = dict(db.query(Area.id, Area.nombre).filter(Area.id.in_(area_ids)).all())
+        if centro_ids:
+            centros_map = dict(db.query(CentroDatos.id, CentroDatos.nombre).filter(CentroDatos.id.in_(centro_ids)).all())
+    except Exception:
+        logger.warning("Error resolviendo nombres de áreas/centros", exc_info=True)
+
+    for v in visitas:
+        v.areas_nombres = [areas_map[i] for i in _ids_lista(getattr(v, "areas_ids", None)) if i in areas_map]
+        v.centros_nombres = [centros_map[i] for i in _ids_lista(getattr(v, "centros_datos_ids", None)) if i in centros_map]
+
+def _clave_pdf_visita(db: Session, visita: Visita) -> tuple:
+    """
+    Clave de la constancia en pdf_cache: cambia si cambia la visita, la
+    persona (datos o archivo de foto) o los catálogos (nombres de centros/áreas).
+    """
+    persona = visita.persona
+    return (
+        visita.id,
+        visita.fecha_actualizacion or visita.fecha_creacion,
+        persona.fecha_actualizacion if persona else None,
+        foto_store.version(persona.foto) if persona else None,
+        catalogo_cache.obtener(db).firma,
+    )
+
+def _datos_pdf_visita(db: Session, visita: Visita) -> dict:
+    """
+    Diccionario para generar_pdf_visita a partir de una visita con
+    persona, centro, actividad y estado cargados.
+    """
+    _resolver_nombres_areas_centros(db, [visita])
+    datos = _armar_datos_pdf(visita)
+    # Foto: versión reducida (índice + caché en memoria)
+    datos['foto_bytes'] = foto_store.obtener_para_pdf(datos['foto_nombre'])
+    return datos
+
+def _armar_datos_pdf(visita: Visita) -> dict:
+    """
+    Datos de la constancia sin la foto (solo 'foto_nombre') y sin consultas:
+    requiere _resolver_nombres_areas_centros aplicado a la visita.
+    """
+    persona = visita.persona
+    centro = visita.centro_datos
+
+    # Áreas (IDs en JSON; si no hay, la relación directa)
+    areas_nombres = visita.areas_nombres
+    if not areas_nombres and visita.area:
+        areas_nombres = [visita.area.nombre]
+
+    # Fecha estable: la misma que entra en la clave de pdf_cache
+    fecha_registro = visita.fecha_actualizacion or visita.fecha_creacion
+
+    return {
+        'codigo_visita': visita.codigo_visita,
+        'fecha_registro': fecha_registro.strftime('%d/%m/%Y %H:%M:%S') if fecha_registro else None,
+        'fecha_programada': visita.fecha_programada.strftime('%d/%m/%Y %H:%M') if visita.fecha_programada else 'N/A',
+        'estado': visita.estado.nombre_estado if visita.estado else 'N/A',
+
+        # Datos Persona
+        'persona_nombre': f"{persona.nombre} {persona.apellido}",
+        'persona_cedula': persona.documento_identidad,
+        'persona_email': persona.email,
+        'persona_empresa': persona.empresa,
+        'persona_cargo': persona.cargo or 'N/A',
+        'foto_nombre': persona.foto or None,
+
+        # Datos Centro
+        'centro_nombre': centro.nombre,
+        'centro_ciudad': centro.ciudad,
+
+        # Detalles
+        'tipo_actividad': visita.actividad.nombre_actividad if visita.actividad else 'N/A',
+        'descripcion_actividad': visita.descripcion_actividad,
+        'areas_nombres': areas_nombres,
+        'autorizado_por': visita.autorizado_por or 'N/A',
+        'equipos_ingresados': visita.equipos_ingresados or 'N/A',
+        'observaciones': visita.observaciones or 'N/A',
+    }
+
 def _get_visita_or_404(db: Session, visita_id: int) -> Visita:
     v = (
         db.query(Visita)
@@ -131,75 +219,65 @@ def _get_visita_or_404(db: Session, visita_id: int) -> Visita:
 
 @router.get("/centros-datos", response_model=List[dict])
 async def listar_centros_datos(
+    request: Request,
     db: Session = Depends(get_db),
     current_user=Depends(require_operator_or_above)
 ):
     """Listar todos los centros de datos activos"""
-    centros = db.query(CentroDatos).filter(CentroDatos.activo == True).all()
-    return [{"id": c.id, "nombre": c.nombre} for c in centros]
+    return _respuesta_catalogo(request, db, "centros", catalogo_cache.centros_activos(db))
 
 @router.get("/tipo_actividad")
-async def obtener_tipo(db: Session = Depends(get_db)):
-    tipos = db.query(TipoActividad).all()
-    return [{"id_tipo_actividad": t.id_tipo_actividad, "nombre_actividad": t.nombre_actividad} for t in tipos]
+async def obtener_tipo(request: Request, db: Session = Depends(get_db)):
+    return _respuesta_catalogo(request, db, "tipos_actividad", catalogo_cache.tipos_actividad(db))
 
 @router.get("/{visita_id}", response_model=VisitaResponse)
-def get_visita(visita_id: int, db: Session = Depends(get_db)):
-    """Obtener una visita específica con toda su información"""
-    visita = db.query(Visita).filter(Visita.id == visita_id).first()
-    if not visita:
-        raise HTTPException(404, "Visita no encontrada")
-    
-    # ✅ ARREGLO: Validar que las listas JSON no estén vacías
-    
-    # 🔧 Procesar ÁREAS
-    if hasattr(visita, 'areas_ids') and visita.areas_ids and isinstance(visita.areas_ids, list) and len(visita.areas_ids) > 0:
-        try:
-            areas = db.query(Area).filter(Area.id.in_(visita.areas_ids)).all()
-            visita.areas_nombres = [area.nombre for area in areas]
-        except Exception as e:
-            print(f"⚠️ Error procesando áreas: {e}")
-            visita.areas_nombres = []
-    else:
-        visita.areas_nombres = []
-    
-    # 🔧 Procesar CENTROS
-    if hasattr(visita, 'centros_datos_ids') and visita.centros_datos_ids and isinstance(visita.centros_datos_ids, list) and len(visita.centros_datos_ids) > 0:
-        try:
-            centros = db.query(CentroDatos).filter(CentroDatos.id.in_(visita.centros_datos_ids)).all()
-            visita.centros_nombres = [centro.nombre for centro in centros]
-        except Exception as e:
-            print(f"⚠️ Error procesando centros: {e}")
-            visita.centros_nombres = []
-    else:
-        visita.centros_nombres = []
-    
-    return visita
-
-@router.get("/", response_model=VisitaListResponse, summary="Listar visitas")
-async def list_visitas(
-    request: Request,
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=1000),
-    search: Optional[str] = Query(None),  # nombre o cédula
-    persona_id: Optional[int] = Query(None),
-    centro_datos_id: Optional[int] = Query(None),
-    area_id: Optional[int] = Query(None),
-    estado_id: Optional[int] = Query(None, description="Filtrar por estado"),
-    tipo_actividad_id: Optional[int] = Query(None, description="Filtrar por tipo actividad"),
-    fecha_desde: Optional[date] = Query(None),
-    fecha_hasta: Optional[date] = Query(None),
-    current_user = Depends(require_operator_or_above),
-    db: Session = Depends(get_db),
+async def get_visita(
+    visita_id: int,
+    adb=Depends(get_async_db),
+    cond: PeticionCondicional = Depends(peticion_condicional),
 ):
-    """
-    Listar visitas con filtros.
+    """Obtener una visita específica con toda su información (acepta If-None-Match / If-Modified-Since)"""
 
-    Búsqueda (search):
-    - Si es numérico (>=3 dígitos) => documento_identidad (cédula) que empieza por esos dígitos.
-    - Si no => nombre de la persona que contenga el texto.
-    """
+    def _consultar(db: Session):
+        # Validador con una consulta de fechas; la visita completa solo se carga si cambió
+        fechas = (
+            db.query(Visita.fecha_creacion, Visita.fecha_actualizacion, Persona.fecha_actualizacion)
+            .outerjoin(Persona, Persona.id == Visita.persona_id)
+            .filter(Visita.id == visita_id)
+            .first()
+        )
+        if not fechas:
+            raise HTTPException(404, "Visita no encontrada")
+        respuesta_304 = cond.evaluar(
+            "visita",
+            [visita_id, *fechas, catalogo_cache.obtener(db).firma],
+            ultima_de(*fechas),
+        )
+        if respuesta_304:
+            return respuesta_304
+
+        visita = db.query(Visita).filter(Visita.id == visita_id).first()
+
+        _resolver_nombres_areas_centros(db, [visita])
 
+        # Se serializa aquí: las relaciones perezosas necesitan la sesión
+        return respuesta_json(VisitaResponse.model_validate(visita), cond)
+
+    return await adb.run_sync(_consultar)
+
+def _query_visitas_filtradas(
+    db: Session,
+    *,
+    search: Optional[str] = None,
+    persona_id: Optional[int] = None,
+    centro_datos_id: Optional[int] = None,
+    area_id: Optional[int] = None,
+    estado_id: Optional[int] = None,
+    tipo_actividad_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+):
+    """Query de visitas con los filtros de list_visitas (compartida con la exportación)."""
     query = db.query(Visita).options(
         joinedload(Visita.persona),
         joinedload(Visita.centro_datos),
@@ -238,49 +316,40 @@ async def list_visitas(
         fecha_hasta_dt = datetime.combine(fecha_hasta, datetime.max.time())
         query = query.filter(Visita.fecha_programada <= fecha_hasta_dt)
 
-    # Conteo y paginación
-    total = query.count()
-    visitas = (
-        query.order_by(Visita.fecha_programada.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    return query
 
-    # Procesar nombres de áreas/centros (arrays JSON)
-    for v in visitas:
-        if (
-            hasattr(v, "areas_ids")
-            and v.areas_ids
-            and isinstance(v.areas_ids, list)
-            and len(v.areas_ids) > 0
-        ):
-            try:
-                areas = db.query(Area).filter(Area.id.in_(v.areas_ids)).all()
-                v.areas_nombres = [a.nombre for a in areas]
-            except Exception as e:
-                print(f"⚠️ Error procesando áreas: {e}")
-                v.areas_nombres = []
-        else:
-            v.areas_nombres = []
-
-        if (
-            hasattr(v, "centros_datos_ids")
-            and v.centros_datos_ids
-            and isinstance(v.centros_datos_ids, list)
-            and len(v.centros_datos_ids) > 0
-        ):
-            try:
-                centros = db.query(CentroDatos).filter(CentroDatos.id.in_(v.centros_datos_ids)).all()
-                v.centros_nombres = [c.nombre for c in centros]
-            except Exception as e:
-                print(f"⚠️ Error procesando centros: {e}")
-                v.centros_nombres = []
-        else:
-            v.centros_nombres = []
-
-    pages = (total + limit - 1) // limit
-    current_page = (skip // limit) + 1
+@router.get("/", response_model=VisitaListResponse, summary="Listar visitas")
+async def list_visitas(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    search: Optional[str] = Query(None),  # nombre o cédula
+    persona_id: Optional[int] = Query(None),
+    centro_datos_id: Optional[int] = Query(None),
+    area_id: Optional[int] = Query(None),
+    estado_id: Optional[int] = Query(None, description="Filtrar por estado"),
+    tipo_actividad_id: Optional[int] = Query(None, description="Filtrar por tipo actividad"),
+    fecha_desde: Optional[date] = Query(None),
+    fecha_hasta: Optional[date] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor de la respuesta anterior (ignora skip)"),
+    conteo: str = Query(CONTEO_EXACTO, pattern=PATRON_CONTEO, description="exacto | estimado | ninguno"),
+    current_user = Depends(require_operator_or_above),
+    adb=Depends(get_async_db),
+    cond: PeticionCondicional = Depends(peticion_condicional),
+):
+    """
+    Listar visitas con filtros.
+
+    Búsqueda (search):
+    - Si es numérico (>=3 dígitos) => documento_identidad (cédula) que empieza por esos dígitos.
+    - Si no => nombre de la persona que contenga el texto.
+
+    Paginación: orden (fecha_programada, id) DESC. Para páginas profundas usar
+    `cursor` con el next_cursor de la respuesta anterior en lugar de `skip`.
+
+    Responde 304 si el If-None-Match coincide: el ETag cubre filtros,
+    paginación, el total y la versión de la página (visitas y sus personas).
+    """
 
     filtros_detalles = {
         "search": search,
@@ -291,26 +360,73 @@ async def list_visitas(
         "tipo_actividad_id": tipo_actividad_id,
         "fecha_desde": str(fecha_desde) if fecha_desde else None,
         "fecha_hasta": str(fecha_hasta) if fecha_hasta else None,
-        "page": current_page,
-        "total": total,
     }
 
+    def _consultar(db: Session):
+        query = _query_visitas_filtradas(
+            db,
+            search=search,
+            persona_id=persona_id,
+            centro_datos_id=centro_datos_id,
+            area_id=area_id,
+            estado_id=estado_id,
+            tipo_actividad_id=tipo_actividad_id,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+        )
+
+        # Conteo (opcional) y paginación keyset
+        total, total_estimado = contar(db, query, conteo, Visita.__table__.fullname, filtros_detalles)
+        visitas, next_cursor = paginar_keyset(
+            query,
+            "visitas",
+            (Visita.fecha_programada, Visita.id),
+            limit,
+            cursor=cursor,
+            skip=skip,
+        )
+
+        # El ETag sale de la página cargada: sin consultas extra
+        version = version_pagina(
+            visitas, ("fecha_creacion", "fecha_actualizacion"), relaciones=("persona", "centro_datos")
+        )
+        respuesta_304 = cond.evaluar(
+            "visitas",
+            [filtros_detalles, skip, limit, cursor, conteo, total, total_estimado, version,
+             catalogo_cache.obtener(db).firma],
+        )
+        if respuesta_304:
+            return respuesta_304
+
+        # Procesar nombres de áreas/centros (arrays JSON) en lote
+        _resolver_nombres_areas_centros(db, visitas)
+
+        return VisitaListResponse(
+            items=visitas,
+            total=total,
+            page=None if cursor else (skip // limit) + 1,
+            size=limit,
+            pages=(total + limit - 1) // limit if total is not None else None,
+            next_cursor=next_cursor,
+            total_estimado=total_estimado,
+        )
+
+    resultado = await adb.run_sync(_consultar)
+    if isinstance(resultado, Response):
+        return resultado
+
+    filtros_detalles.update({"page": resultado.page, "total": resultado.total})
+
     await log_action(
         accion="consultar_visitas",
         tabla_afectada="visitas",
         detalles=filtros_detalles,
-        db=db,
+        db=adb,
         request=request,
         current_user=current_user,
     )
 
-    return VisitaListResponse(
-        items=visitas,
-        total=total,
-        page=current_page,
-        size=limit,
-        pages=pages,
-    )
+    return respuesta_json(resultado, cond)
 
 @router.get("/persona/{persona_id}/historial", response_model=List[VisitaResponse])
 async def get_historial_persona(
@@ -328,35 +444,7 @@ async def get_historial_persona(
         joinedload(Visita.area)
     ).all()
     
-    # ✅ ARREGLO: Validar ANTES de usar .in_()
-    for v in visitas:
-        # Procesar ÁREAS
-        if (hasattr(v, 'areas_ids') and 
-            v.areas_ids and 
-            isinstance(v.areas_ids, list) and 
-            len(v.areas_ids) > 0):
-            try:
-                areas = db.query(Area).filter(Area.id.in_(v.areas_ids)).all()
-                v.areas_nombres = [a.nombre for a in areas]
-            except Exception as e:
-                print(f"⚠️ Error procesando áreas: {e}")
-                v.areas_nombres = []
-        else:
-            v.areas_nombres = []
-        
-        # Procesar CENTROS
-        if (hasattr(v, 'centros_datos_ids') and 
-            v.centros_datos_ids and 
-            isinstance(v.centros_datos_ids, list) and 
-            len(v.centros_datos_ids) > 0):
-            try:
-                centros = db.query(CentroDatos).filter(CentroDatos.id.in_(v.centros_datos_ids)).all()
-                v.centros_nombres = [c.nombre for c in centros]
-            except Exception as e:
-                print(f"⚠️ Error procesando centros: {e}")
-                v.centros_nombres = []
-        else:
-            v.centros_nombres = []
+    _resolver_nombres_areas_centros(db, visitas)
     
     await log_action(
         accion="consultar_historial_visitas_persona",
@@ -370,9 +458,10 @@ async def get_historial_persona(
     return visitas
 
 @router.get("/areas/{centro_datos_id}", response_model=List[dict])
-async def obtener_areas_por_centro(centro_datos_id: int, db: Session = Depends(get_db)):
-    areas = db.query(Area).filter(Area.id_centro_datos == centro_datos_id).all()
-    return [{"id": a.id, "nombre": a.nombre} for a in areas]
+async def obtener_areas_por_centro(request: Request, centro_datos_id: int, db: Session = Depends(get_db)):
+    return _respuesta_catalogo(
+        request, db, f"areas-{centro_datos_id}", catalogo_cache.areas_por_centro(db, centro_datos_id)
+    )
 
 
 
@@ -386,7 +475,9 @@ async def crear_visita(
     current_user=Depends(require_operator_or_above),
     db: Session = Depends(get_db),
 ):
-    """Crear nueva visita con foto actualizada, PDF y notificaciones"""
+    """Crear nueva visita con foto actualizada; PDF y notificaciones quedan en cola"""
+    # Pasos en /metrics: stage_duration_seconds{stage="crear_visita.*"}
+    cronometro = Cronometro("crear_visita")
     
     persona_id = payload.persona_id
     centro_datos_id = payload.centro_datos_id
@@ -408,13 +499,14 @@ async def crear_visita(
     persona = db.query(Persona).filter(Persona.id == persona_id).first()
     if not persona: raise HTTPException(404, "Persona no encontrada")
     
-    centro_datos = db.query(CentroDatos).filter(CentroDatos.id == centro_datos_id).first()
+    centro_datos = catalogo_cache.centro(db, centro_datos_id)
     if not centro_datos: raise HTTPException(404, "Centro no encontrado")
+    cronometro.marcar("validacion")
 
     # =======================================================================
     # 📸 PASO NUEVO: PROCESAR Y GUARDAR LA FOTO SUBIDA (SI EXISTE)
     # =======================================================================
-    foto_base64 = None
+    foto_path_nueva = None
     
     if foto:
         try:
@@ -434,25 +526,17 @@ async def crear_visita(
             
             print(f"✅ Nueva foto guardada: {file_path}")
             
-            # 4. Actualizar BD
+            # 4. Actualizar BD (se confirma en el mismo commit que la visita)
             persona.foto = nuevo_nombre
             db.add(persona)
-            db.commit()
-            db.refresh(persona)
-            
-            # 5. Leer bytes para el PDF (inmediato)
-            with open(file_path, "rb") as f:
-                foto_bytes = f.read()
-                foto_base64 = base64.b64encode(foto_bytes).decode('utf-8')
+            foto_path_nueva = str(file_path.resolve())
+            foto_store.registrar(nuevo_nombre, file_path)
                 
         except Exception as e:
             print(f"⚠️ Error guardando nueva foto: {e}")
-            # Si falla, intentamos seguir sin foto nueva
-            foto_base64 = None
-            
-    # Si no se subió foto nueva, intentamos cargar la que ya tenía
-    if not foto_base64 and persona.foto:
-        foto_base64 = obtener_imagen_persona_base64(persona.foto)
+            # Si falla, seguimos con la foto que ya tenía
+            foto_path_nueva = None
+    cronometro.marcar("foto")
 
     # =======================================================================
     # FIN PROCESO FOTO - CONTINUA CREACIÓN DE VISITA
@@ -460,16 +544,10 @@ async def crear_visita(
 
     codigo_visita = _generar_codigo_9d_unico(db)
     
-    # Obtener objetos relacionados
-    areas = db.query(Area).filter(Area.id.in_(areas_ids_list)).all() if areas_ids_list else []
-    
-    tipo_actividad = None
-    if payload.tipo_actividad_id:
-        tipo_actividad = db.query(TipoActividad).filter(TipoActividad.id_tipo_actividad == payload.tipo_actividad_id).first()
-        
-    estado = None
-    if payload.estado_id:
-        estado = db.query(EstadoVisita).filter(EstadoVisita.id_estado == payload.estado_id).first()
+    # Nombres de catálogos (en memoria, catalogo_cache)
+    areas_nombres = catalogo_cache.nombres_areas(db, _ids_lista(areas_ids_list))
+    tipo_actividad_nombre = catalogo_cache.nombre_tipo_actividad(db, payload.tipo_actividad_id)
+    estado_nombre = catalogo_cache.nombre_estado(db, payload.estado_id)
 
     visita = Visita(
         codigo_visita=codigo_visita,
@@ -492,10 +570,8 @@ async def crear_visita(
     
     db.add(visita)
     db.flush()
-    db.commit()
-    db.refresh(visita)
     
-    # ✅ PREPARAR DATOS PARA PDF (Con la foto ya procesada)
+    # ✅ PREPARAR DATOS PARA PDF (la foto la carga el worker desde disco)
     visita_pdf_data = {
         'id': visita.id,
         'codigo_visita': visita.codigo_visita,
@@ -505,16 +581,15 @@ async def crear_visita(
         'persona_email': persona.email,
         'persona_empresa': persona.empresa,
         'persona_cargo': persona.cargo or 'N/A',
-        'foto_data': foto_base64,  # <--- Aquí va la foto (nueva o vieja)
         'centro_id': centro_datos_id,
-        'centro_nombre': centro_datos.nombre,
-        'centro_direccion': centro_datos.direccion,
-        'centro_ciudad': centro_datos.ciudad,
-        'centro_codigo': centro_datos.codigo,
-        'tipo_actividad': tipo_actividad.nombre_actividad if tipo_actividad else 'N/A',
+        'centro_nombre': centro_datos["nombre"],
+        'centro_direccion': centro_datos["direccion"],
+        'centro_ciudad': centro_datos["ciudad"],
+        'centro_codigo': centro_datos["codigo"],
+        'tipo_actividad': tipo_actividad_nombre or 'N/A',
         'descripcion_actividad': visita.descripcion_actividad,
-        'areas_nombres': [area.nombre for area in areas],
-        'estado': estado.nombre_estado if estado else 'N/A',
+        'areas_nombres': areas_nombres,
+        'estado': estado_nombre or 'N/A',
         'autorizado_por': visita.autorizado_por or 'N/A',
         'motivo_autorizacion': visita.motivo_autorizacion or 'N/A',
         'equipos_ingresados': visita.equipos_ingresados or 'N/A',
@@ -523,52 +598,25 @@ async def crear_visita(
         'fecha_programada': visita.fecha_programada.strftime('%d/%m/%Y %H:%M') if visita.fecha_programada else 'N/A',
     }
     
-    # 📄 Generar PDF
-    pdf_bytes = None
-    try:
-        pdf_bytes = generar_pdf_visita(visita_pdf_data)
-        print(f"✅ PDF generado: {len(pdf_bytes)} bytes")
-    except Exception as pdf_error:
-        print(f"⚠️ Error generando PDF: {pdf_error}")
-
-    # 💬 Enviar a Telegram
-    try:
-        persona_nombre = f"{persona.nombre} {persona.apellido}"
-        await enviar_notificacion_telegram(
-            visita_data=visita_pdf_data,
-            persona_nombre=persona_nombre,
-            pdf_bytes=pdf_bytes
-        )
-    except Exception as e:
-        print(f"⚠️ Error Telegram: {e}")
-
-    # 📧 Email (lógica existente)
-    try:
-        from app.services.email_service import EmailService
-        email_service = EmailService()
-        if persona.email:
-            cuerpo_email = f"""
-            Estimado/a {persona.nombre} {persona.apellido},
-            ✅ Visita registrada: {visita.codigo_visita}
-            Centro: {centro_datos.nombre}
-            Fecha: {visita_pdf_data['fecha_programada']}
-            """
-            await email_service.send_email(
-                email=persona.email,
-                subject=f"Constancia Visita - {visita.codigo_visita}",
-                body=cuerpo_email,
-                attachment_bytes=pdf_bytes,
-                attachment_name=f"constancia_{visita.codigo_visita}.pdf"
-            )
-    except Exception as e:
-        print(f"⚠️ Error Email: {e}")
+    # 📄💬📧 PDF, Telegram y Email: se encolan en la misma transacción que la
+    # visita y los procesa el pool de workers (app.workers.tareas)
+    TareaService(db).encolar(
+        "generar_pdf",
+        {"visita": visita_pdf_data, "foto": persona.foto, "foto_path": foto_path_nueva},
+        visita_id=visita.id,
+    )
+    db.commit()
+    db.refresh(visita)
+    pool_tareas.notificar()
+    cronometro.marcar("insercion")
 
     # Log
     await log_action(
         "crear_visita", "visitas", registro_id=visita.id,
-        detalles={"codigo": visita.codigo_visita, "con_foto": bool(foto_base64)},
+        detalles={"codigo": visita.codigo_visita, "con_foto": bool(persona.foto)},
         request=request, db=db, current_user=current_user
     )
+    cronometro.marcar("auditoria")
     
     return visita
 
@@ -684,16 +732,16 @@ async def get_centro_datos(
     current_user=Depends(require_operator_or_above),
     db: Session = Depends(get_db)
 ):
-    centro = db.query(CentroDatos).filter(CentroDatos.id == centro_id).first()
+    centro = catalogo_cache.centro(db, centro_id)
     if not centro:
         raise HTTPException(status_code=404, detail="Centro no encontrado")
     
     return {
-        "id": centro.id,
-        "nombre": centro.nombre,
-        "codigo": centro.codigo,
-        "direccion": centro.direccion,
-        "ciudad": centro.ciudad
+        "id": centro["id"],
+        "nombre": centro["nombre"],
+        "codigo": centro["codigo"],
+        "direccion": centro["direccion"],
+        "ciudad": centro["ciudad"]
     }
 
 
@@ -758,73 +806,25 @@ async def download_pdf_visita(
         if not visita:
             raise HTTPException(status_code=404, detail="Visita no encontrada")
 
-        persona = visita.persona
-        centro = visita.centro_datos
-
-        # ---------------------------------------------------------
-        # PASO 2: Procesar la FOTO
-        # ---------------------------------------------------------
-        foto_base64 = None
-        if persona and persona.foto:
-            # Llama a la función que busca y codifica la imagen
-            foto_base64 = obtener_imagen_persona_base64(persona.foto)
-
-        # ---------------------------------------------------------
-        # PASO 3: Procesar Áreas (Manejo de JSON de IDs - Asumido)
-        # ---------------------------------------------------------
-        areas_nombres = []
-        # Asumo que visita.areas_ids es una lista de IDs (JSON o similar)
-        if hasattr(visita, 'areas_ids') and visita.areas_ids and isinstance(visita.areas_ids, list):
-            areas_db = db.query(Area).filter(Area.id.in_(visita.areas_ids)).all()
-            areas_nombres = [a.nombre for a in areas_db]
-        # O si la relación es directa
-        elif hasattr(visita, 'area') and visita.area: 
-             areas_nombres = [visita.area.nombre]
-
-
         # ---------------------------------------------------------
-        # PASO 4: Preparar Diccionario para el Generador PDF
+        # PASO 2: PDF desde la caché o render (fuera del event loop)
         # ---------------------------------------------------------
-        visita_pdf_data = {
-            # ... otros datos
-            'codigo_visita': visita.codigo_visita,
-            'fecha_programada': visita.fecha_programada.strftime('%d/%m/%Y %H:%M') if visita.fecha_programada else 'N/A',
-            'estado': visita.estado.nombre_estado if visita.estado else 'N/A',
-            
-            # Datos Persona
-            'persona_nombre': f"{persona.nombre} {persona.apellido}",
-            'persona_cedula': persona.documento_identidad,
-            'persona_email': persona.email,
-            'persona_empresa': persona.empresa,
-            'persona_cargo': persona.cargo or 'N/A',
-            'foto_data': foto_base64,  # <--- FOTO EN BASE64
-            
-            # Datos Centro
-            'centro_nombre': centro.nombre,
-            'centro_ciudad': centro.ciudad,
-            
-            # Detalles
-            'tipo_actividad': visita.actividad.nombre_actividad if visita.actividad else 'N/A',
-            'descripcion_actividad': visita.descripcion_actividad,
-            'areas_nombres': areas_nombres,
-            'autorizado_por': visita.autorizado_por or 'N/A',
-            'equipos_ingresados': visita.equipos_ingresados or 'N/A',
-            'observaciones': visita.observaciones or 'N/A',
-        }
+        clave = _clave_pdf_visita(db, visita)
+        pdf_bytes = pdf_cache.buscar(clave)
+        if pdf_bytes is None:
+            visita_pdf_data = _datos_pdf_visita(db, visita)
+            with medir_etapa("pdf"):
+                pdf_bytes = await asyncio.to_thread(generar_pdf_visita, visita_pdf_data)
+            pdf_cache.guardar(clave, pdf_bytes)
         
         # ---------------------------------------------------------
-        # PASO 5: Generar Bytes del PDF
-        # ---------------------------------------------------------
-        pdf_bytes = generar_pdf_visita(visita_pdf_data)
-        
-        # ---------------------------------------------------------
-        # PASO 6 & 7: Log y Retorno
+        # PASO 3: Log y Retorno
         # ---------------------------------------------------------
         await log_action(
             accion="descargar_pdf_visita",
             tabla_afectada="visitas",
             registro_id=visita_id,
-            detalles={"codigo": visita.codigo_visita, "tiene_foto": bool(foto_base64)},
+            detalles={"codigo": visita.codigo_visita, "tiene_foto": bool(visita.persona and visita.persona.foto)},
             request=request,
             db=db,
             current_user=current_user
@@ -844,4 +844,102 @@ async def download_pdf_visita(
         print(f"❌ Error crítico generando PDF: {e}")
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error generando PDF: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error generando PDF: {str(e)}")
+
+@router.get("/export/pdf", summary="Exportar constancias PDF (ZIP)")
+async def exportar_pdfs_visitas(
+    request: Request,
+    search: Optional[str] = Query(None),
+    persona_id: Optional[int] = Query(None),
+    centro_datos_id: Optional[int] = Query(None),
+    area_id: Optional[int] = Query(None),
+    estado_id: Optional[int] = Query(None),
+    tipo_actividad_id: Optional[int] = Query(None),
+    fecha_desde: Optional[date] = Query(None),
+    fecha_hasta: Optional[date] = Query(None),
+    current_user = Depends(require_operator_or_above),
+    db: Session = Depends(get_db),
+):
+    """
+    Descarga en un ZIP las constancias de todas las visitas que cumplen los
+    mismos filtros de GET /visitas/. Los PDFs se generan en paralelo en un
+    pool de procesos y el ZIP se envía a medida que se generan.
+
+    El header X-Export-Id permite consultar el avance en
+    GET /visitas/export/{export_id}/progreso.
+    """
+    query = _query_visitas_filtradas(
+        db,
+        search=search,
+        persona_id=persona_id,
+        centro_datos_id=centro_datos_id,
+        area_id=area_id,
+        estado_id=estado_id,
+        tipo_actividad_id=tipo_actividad_id,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+    )
+    visitas = (
+        query.order_by(Visita.fecha_programada.asc(), Visita.id.asc())
+        .limit(settings.export_max_visitas + 1)
+        .all()
+    )
+    if len(visitas) > settings.export_max_visitas:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"La exportación supera el máximo de {settings.export_max_visitas} visitas; acote los filtros",
+        )
+
+    # Todo lo que necesita la BD se resuelve antes de empezar a enviar el ZIP
+    _resolver_nombres_areas_centros(db, visitas)
+    items = [
+        ItemExportacion(
+            clave=_clave_pdf_visita(db, v),
+            nombre_archivo=f"constancia_{v.codigo_visita}.pdf",
+            datos=_armar_datos_pdf(v),
+        )
+        for v in visitas
+    ]
+    progreso = progreso_exportaciones.crear(usuario_id=current_user.id, total=len(items))
+
+    await log_action(
+        accion="exportar_pdf_visitas",
+        tabla_afectada="visitas",
+        detalles={
+            "export_id": progreso.id,
+            "total": len(items),
+            "search": search,
+            "persona_id": persona_id,
+            "centro_datos_id": centro_datos_id,
+            "area_id": area_id,
+            "estado_id": estado_id,
+            "tipo_actividad_id": tipo_actividad_id,
+            "fecha_desde": str(fecha_desde) if fecha_desde else None,
+            "fecha_hasta": str(fecha_hasta) if fecha_hasta else None,
+        },
+        request=request,
+        db=db,
+        current_user=current_user,
+    )
+
+    filename = f"constancias_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        generar_zip(items, progreso),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Export-Id": progreso.id,
+        },
+    )
+
+
+@router.get("/export/{export_id}/progreso", summary="Progreso de una exportación de PDFs")
+async def progreso_exportacion(
+    export_id: str,
+    current_user = Depends(require_operator_or_above),
+):
+    progreso = progreso_exportaciones.get(export_id)
+    # Solo quien la inició (o un administrador) puede consultarla
+    if not progreso or (progreso.usuario_id != current_user.id and current_user.rol_id != 1):
+        raise HTTPException(status_code=404, detail="Exportación no encontrada")
+    return progreso.to_dict()
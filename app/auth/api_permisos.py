@@ -1,7 +1,7 @@
 # app/auth/api_permisos.py (corregido y expandido)
 from fastapi import HTTPException, status, Depends
 from app.auth import get_current_active_user
-from app.services.usuario_service import UsuarioService  # Para obtener usuario completo
+from app.auth.dependencies import cargar_principal
 from app.database import get_db
 from sqlalchemy.orm import Session
 from fastapi import Request  # Para IP en logs
@@ -13,15 +13,17 @@ def require_role(required_role_id: int):
     Dependencia: Verifica si el usuario actual tiene rol_id <= required_role_id (jerarquía: bajo ID = alto privilegio).
     Ej: require_role(2) permite ADMIN(1) y SUPERVISOR(2); required_role_id es el máximo ID permitido.
     """
-    def dependency(current_user: dict = Depends(get_current_active_user), db: Session = Depends(get_db)):
-        usuario_service = UsuarioService(db)
-        user = usuario_service.get(current_user["id"])
+    def dependency(request: Request, current_user: dict = Depends(get_current_active_user), db: Session = Depends(get_db)):
+        # get_current_user ya resolvió el principal en esta request; no se recarga
+        user = getattr(request.state, "principal", None)
+        if user is None or user.id != current_user["id"]:
+            user = cargar_principal(db, current_user["id"])
         if not user or user.rol_id > required_role_id:  # > required = privilegio bajo (e.g., 3 > 2 = denegar)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Rol insuficiente. Requiere rol_id <= {required_role_id} (actual: {user.rol.nombre_rol if user else 'Ninguno'})."
+                detail=f"Rol insuficiente. Requiere rol_id <= {required_role_id} (actual: {user.rol.nombre_rol if user and user.rol else 'Ninguno'})."
             )
-        return user  # Retorna usuario completo para uso en endpoint
+        return user  # Principal (id, username, rol_id, rol.id_rol...) para uso en endpoint
     return dependency
 
 # Roles específicos (corregidos)
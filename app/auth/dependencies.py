@@ -4,25 +4,41 @@ Proporciona funciones de dependencia para verificar autenticación y autorizaci
 """
 
 from typing import Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth.jwt_handler import jwt_handler
 from app.schemas.esquema_usuario import TokenData
 from app.services.usuario_service import UsuarioService
+from app.auth.principal_cache import Principal, principal_cache
 
 # Esquema de seguridad HTTP Bearer
 security = HTTPBearer()
 
+def cargar_principal(db: Session, user_id: int) -> Optional[Principal]:
+    """
+    Obtiene el principal del usuario desde la caché o, si no está, desde la
+    base de datos (usuario + rol en una consulta).
+    """
+    def cargar() -> Optional[Principal]:
+        user = UsuarioService(db).get(user_id)
+        return Principal.desde_usuario(user) if user else None
+
+    return principal_cache.obtener(user_id, cargar)
+
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> dict:
     """
     Dependencia para obtener el usuario actual autenticado.
+    El principal queda en request.state.principal para que require_role
+    no vuelva a cargar el usuario.
     
     Args:
+        request: Request actual
         credentials: Credenciales de autorización HTTP
         db: Sesión de base de datos
         
@@ -44,26 +60,14 @@ def get_current_user(
         if token_data is None:
             raise credentials_exception
         
-        # Obtener el usuario de la base de datos (con rol cargado)
-        usuario_service = UsuarioService(db)
-        user = usuario_service.get(token_data.user_id)
+        # Obtener el usuario (caché con TTL; si no, BD con rol cargado)
+        principal = cargar_principal(db, token_data.user_id)
 
-        if user is None or not user.activo:
+        if principal is None or not principal.activo:
             raise credentials_exception
 
-        # Rol como string (nombre_rol del modelo) y ID (id_rol)
-        rol_value = user.rol.nombre_rol if user.rol else 'N/A'
-        rol_id = user.rol.id_rol if user.rol else None
-
-        return {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "nombre_completo": f"{user.nombre} {user.apellidos}",  # Separados en modelo
-            "rol": rol_value,  # String para comparaciones
-            "rol_id": rol_id,  # Int para refresh
-            "activo": user.activo
-        }
+        request.state.principal = principal
+        return principal.to_dict()
 
     except Exception:
         raise credentials_exception
@@ -160,21 +164,15 @@ def get_optional_current_user(
         if token_data is None:
             return None
             
-        usuario_service = UsuarioService(db)
-        user = usuario_service.get(token_data.user_id)
+        principal = cargar_principal(db, token_data.user_id)
         
-        if user is None or not user.activo:
+        if principal is None or not principal.activo:
             return None
         
-        rol_value = user.rol.nombre_rol if user.rol else 'N/A'
-        
-        return {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "nombre_completo": f"{user.nombre} {user.apellidos}",
-            "rol": rol_value,  # String del modelo
-        }
+        datos = principal.to_dict()
+        datos.pop("rol_id")
+        datos.pop("activo")
+        return datos
         
     except Exception:
         return None
@@ -58,16 +58,17 @@ class JWTHandler:
     def create_token_for_user(self, user_id: int, username: str, rol: Union[RolUsuario, int], expires_delta: Optional[timedelta] = None) -> str:
         """Crea un token de acceso para un usuario específico con duración opcional."""
         if isinstance(rol, RolUsuario):
-            rol_id = rol.id_rol
+            rol_id, nombre_rol = rol.id_rol, rol.nombre_rol
         elif isinstance(rol, int):
-            rol_id = rol
+            # Renovación: solo se conoce el id del rol del usuario autenticado
+            rol_id, nombre_rol = rol, None
         else:
             raise ValueError("rol debe ser objeto RolUsuario o int (id_rol)")
         
         data = {
             "sub": username,
             "user_id": user_id,
-            "rol": {"id_rol": rol.id_rol, "nombre_rol": rol.nombre_rol}
+            "rol": {"id_rol": rol_id, "nombre_rol": nombre_rol}
             # Nota: Quitamos el campo "exp" de aquí porque create_access_token lo agrega
         }
         
@@ -0,0 +1,104 @@
+# app/auth/password_hasher.py - Hash/verificación bcrypt fuera del event loop
+"""
+bcrypt consume ~250 ms de CPU por verificación. Ejecutarlo dentro de un
+endpoint async detiene todas las demás requests, así que las operaciones
+se envían a un pool de hilos acotado (bcrypt libera el GIL mientras calcula).
+
+- settings.password_hash_workers: hilos del pool (concurrencia máxima).
+- settings.password_hash_max_pendientes: operaciones en curso + en espera;
+  al superarlo se responde 503 en lugar de encolar sin límite.
+- settings.bcrypt_rounds: costo de bcrypt. Si cambia, verificar() devuelve
+  el hash regenerado con el costo nuevo para guardarlo (rehash transparente).
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.services.usuario_service import pwd_context
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_pendientes: int):
+        self.workers = workers
+        self.max_pendientes = max_pendientes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self.operaciones = 0
+        self.rechazadas = 0
+        self.rehashes = 0
+        self.tiempo_total = 0.0
+        self.tiempo_max = 0.0
+
+    async def verificar(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verifica la contraseña. Retorna (valida, nuevo_hash); nuevo_hash
+        viene con valor cuando el hash guardado usa un costo distinto al
+        configurado y debe reemplazarse.
+        """
+        valida, nuevo_hash = await self._ejecutar(pwd_context.verify_and_update, plain_password, hashed_password)
+        if nuevo_hash:
+            with self._lock:
+                self.rehashes += 1
+        return valida, nuevo_hash
+
+    async def hash(self, password: str) -> str:
+        return await self._ejecutar(pwd_context.hash, password)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pendientes": self.max_pendientes,
+                "pendientes": self._pendientes,
+                "operaciones": self.operaciones,
+                "rechazadas": self.rechazadas,
+                "rehashes": self.rehashes,
+                "bcrypt_rounds": settings.bcrypt_rounds,
+                "hash_ms_promedio": round(self.tiempo_total / self.operaciones * 1000, 2) if self.operaciones else 0.0,
+                "hash_ms_max": round(self.tiempo_max * 1000, 2),
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    async def _ejecutar(self, funcion, *args):
+        with self._lock:
+            if self._pendientes >= self.max_pendientes:
+                self.rechazadas += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Servicio de autenticación ocupado, intente nuevamente",
+                    headers={"Retry-After": "1"},
+                )
+            self._pendientes += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._medir, funcion, args)
+        finally:
+            with self._lock:
+                self._pendientes -= 1
+
+    def _medir(self, funcion, args):
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args)
+        finally:
+            duracion = time.perf_counter() - inicio
+            with self._lock:
+                self.operaciones += 1
+                self.tiempo_total += duracion
+                self.tiempo_max = max(self.tiempo_max, duracion)
+
+
+# Instancia global
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pendientes=settings.password_hash_max_pendientes,
+)
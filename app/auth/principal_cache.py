@@ -0,0 +1,159 @@
+# app/auth/principal_cache.py - Caché en memoria del usuario autenticado
+"""
+get_current_user resolvía el usuario (usuario + rol) en cada request y
+require_role lo volvía a cargar. Ahora se guarda una copia inmutable
+(Principal) por user_id durante settings.principal_cache_ttl segundos.
+
+UsuarioService.update_user, deactivate_user y reset_password (y los
+endpoints que modifican usuarios directamente) invalidan la entrada, de modo
+que un cambio de rol o una desactivación se aplican en la siguiente request.
+Con varios workers la invalidación avanza una VersionCompartida y los demás
+vacían su caché al notarlo (settings.estado_version_intervalo).
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class RolPrincipal:
+    id_rol: int
+    nombre_rol: str
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Datos del usuario autenticado que usan las dependencias y endpoints
+    (id, rol_id, rol.id_rol, username...). No es un objeto ORM: se puede
+    compartir entre requests y sesiones sin lazy loads.
+    """
+    id: int
+    username: str
+    email: Optional[str]
+    nombre: str
+    apellidos: Optional[str]
+    rol_id: Optional[int]
+    activo: bool
+    rol: Optional[RolPrincipal] = None
+
+    @classmethod
+    def desde_usuario(cls, user) -> "Principal":
+        rol = RolPrincipal(user.rol.id_rol, user.rol.nombre_rol) if user.rol else None
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            nombre=user.nombre,
+            apellidos=user.apellidos,
+            rol_id=user.rol_id,
+            activo=bool(user.activo),
+            rol=rol,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Formato que retorna get_current_user."""
+        return {
+            "id": self.id,
+            "username": self.username,
+            "email": self.email,
+            "nombre_completo": f"{self.nombre} {self.apellidos}",
+            "rol": self.rol.nombre_rol if self.rol else 'N/A',
+            "rol_id": self.rol.id_rol if self.rol else None,
+            "activo": self.activo,
+        }
+
+
+class PrincipalCache:
+    def __init__(self, ttl: float, max_entradas: int):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._datos: Dict[int, Tuple[float, Principal]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidaciones = 0
+        self._version = None  # VersionCompartida, creada en el primer uso
+        self._version_vista = 0
+
+    def _compartida(self):
+        if self._version is None:
+            # Import diferido: app.services importa usuario_service, que importa este módulo
+            from app.services.estado_compartido import VersionCompartida
+            self._version = VersionCompartida("principales")
+        return self._version
+
+    def _sincronizar(self) -> None:
+        """Vacía la caché si otro worker invalidó algún usuario."""
+        version = self._compartida().actual()
+        if version != self._version_vista:
+            with self._lock:
+                self._datos.clear()
+                self._version_vista = version
+
+    def obtener(self, user_id: int, cargar: Callable[[], Optional[Principal]]) -> Optional[Principal]:
+        """
+        Retorna el principal en caché o lo carga con cargar() (None si el
+        usuario no existe; ese resultado no se guarda).
+        """
+        self._sincronizar()
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(user_id)
+            if entrada and entrada[0] > ahora:
+                self.hits += 1
+                return entrada[1]
+            self.misses += 1
+
+        principal = cargar()
+        if principal is not None and self.ttl > 0:
+            with self._lock:
+                if len(self._datos) >= self.max_entradas:
+                    self._purgar(ahora)
+                self._datos[user_id] = (ahora + self.ttl, principal)
+        return principal
+
+    def invalidar(self, user_id: Optional[int] = None) -> None:
+        """Elimina la entrada de un usuario (o todas si user_id es None)."""
+        with self._lock:
+            if user_id is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(user_id, None)
+            self.invalidaciones += 1
+        anterior = self._version_vista
+        version = self._compartida().avanzar()
+        # Si hubo invalidaciones de otros workers sin ver, _sincronizar vaciará todo
+        if version == anterior + 1:
+            self._version_vista = version
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "ttl": self.ttl,
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / consultas, 4) if consultas else 0.0,
+                "invalidaciones": self.invalidaciones,
+            }
+
+    def _purgar(self, ahora: float) -> None:
+        # Primero las vencidas; si no alcanza, las más antiguas (orden de inserción)
+        for user_id in [k for k, (vence, _) in self._datos.items() if vence <= ahora]:
+            del self._datos[user_id]
+        while len(self._datos) >= self.max_entradas:
+            del self._datos[next(iter(self._datos))]
+
+
+# Instancia global
+principal_cache = PrincipalCache(
+    ttl=settings.principal_cache_ttl,
+    max_entradas=settings.principal_cache_max,
+)
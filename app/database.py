@@ -3,23 +3,109 @@ Configuración de la base de datos SQLAlchemy.
 Maneja la conexión y sesiones de base de datos.
 """
 
-from sqlalchemy import create_engine, text
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, exc, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, QueuePool
 from app.config import settings
 
 SCHEMA = "sistema_gestiones"
 
-# Crear el motor SIN pool de conexiones (igual que el test que funcionó)
-engine = create_engine(
-    settings.database_url,
-    poolclass=NullPool,
-    connect_args={
-        "options": f"-c search_path={SCHEMA},public"
-    },
-    echo=False  # Cambiar a True si quieres ver los queries
-)
+
+class EstadisticasPool:
+    """
+    Acumula el tiempo que las peticiones esperan por una conexión del pool.
+    QueuePool no expone este dato, por eso se mide en _do_get.
+
+    La espera incluye el connect() cuando el pool abre una conexión nueva
+    (arranque, overflow o después de pool_recycle), no solo la cola.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.esperas = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.timeouts = 0
+
+    def registrar_espera(self, segundos: float, timeout: bool = False):
+        with self._lock:
+            self.esperas += 1
+            self.espera_total += segundos
+            if segundos > self.espera_maxima:
+                self.espera_maxima = segundos
+            if timeout:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            promedio = self.espera_total / self.esperas if self.esperas else 0.0
+            return {
+                "checkouts": self.esperas,
+                "espera_total_ms": round(self.espera_total * 1000, 3),
+                "espera_promedio_ms": round(promedio * 1000, 3),
+                "espera_maxima_ms": round(self.espera_maxima * 1000, 3),
+                "timeouts": self.timeouts,
+            }
+
+
+pool_stats = EstadisticasPool()
+
+
+class QueuePoolMedido(QueuePool):
+    """
+    QueuePool que registra el tiempo de espera de cada checkout. Solo
+    sqlalchemy.exc.TimeoutError cuenta como timeout; un error al conectar
+    se propaga sin registrarse.
+    """
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.registrar_espera(time.perf_counter() - inicio, timeout=True)
+            raise
+        pool_stats.registrar_espera(time.perf_counter() - inicio)
+        return conexion
+
+
+def _build_engine():
+    """
+    Crea el motor según settings.database_pool_mode.
+    - "queue": pool real con tamaño/overflow/recycle/pre-ping configurables.
+    - "null": una conexión nueva por sesión (solo como opt-in explícito).
+    """
+    connect_args = {}
+    if settings.database_url.startswith("postgresql"):
+        connect_args["options"] = f"-c search_path={SCHEMA},public"
+
+    if settings.database_pool_mode.lower() == "null":
+        return create_engine(
+            settings.database_url,
+            poolclass=NullPool,
+            connect_args=connect_args,
+            echo=settings.database_echo,
+        )
+
+    return create_engine(
+        settings.database_url,
+        poolclass=QueuePoolMedido,
+        pool_size=settings.database_pool_size,
+        max_overflow=settings.database_max_overflow,
+        pool_timeout=settings.database_pool_timeout,
+        pool_recycle=settings.database_pool_recycle,
+        pool_pre_ping=settings.database_pool_pre_ping,
+        connect_args=connect_args,
+        echo=settings.database_echo,
+    )
+
+
+engine = _build_engine()
 
 # Crear la sesión de base de datos
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -37,6 +123,28 @@ def get_db():
     finally:
         db.close()
 
+def get_pool_status() -> Dict[str, Any]:
+    """
+    Estado actual del pool de conexiones (para el endpoint de diagnóstico).
+    """
+    pool = engine.pool
+    estado: Dict[str, Any] = {
+        "modo": settings.database_pool_mode.lower(),
+        "clase": type(pool).__name__,
+    }
+    if isinstance(pool, QueuePool):
+        estado.update({
+            "pool_size": pool.size(),
+            "max_overflow": settings.database_max_overflow,
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "pool_recycle": settings.database_pool_recycle,
+            "pre_ping": settings.database_pool_pre_ping,
+        })
+    estado["espera"] = pool_stats.snapshot()
+    return estado
+
 def create_tables():
     """
     Crea todas las tablas en la base de datos.
@@ -0,0 +1,178 @@
+"""
+Acceso asíncrono a la base de datos para los endpoints de lectura más usados
+(visitas, personas, auditoría).
+
+Los handlers `async def` que usaban la Session de get_db ejecutaban las
+consultas psycopg2 directamente en el event loop y bloqueaban el worker.
+get_async_db entrega una sesión con la misma interfaz `run_sync`:
+
+- AsyncSession sobre asyncpg (PostgreSQL): la consulta espera en el loop
+  sin bloquearlo; `run_sync(fn)` ejecuta fn(session) con la API ORM
+  síncrona de siempre (contar, paginar_keyset, ControlService...).
+- SesionEnHilo: sin driver async instalado (o DATABASE_ASYNC_HABILITADO=false)
+  fn se ejecuta en un hilo con una Session de SessionLocal.
+
+Las filas se convierten a esquemas Pydantic dentro de `run_sync`: fuera de
+él una carga perezosa de relaciones no puede hacer IO.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Optional, TypeVar
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SCHEMA, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DRIVERS_ASYNC = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql+asyncpg": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def url_async(url: str) -> Optional[str]:
+    """URL equivalente con driver async; None si el dialecto no tiene uno conocido."""
+    esquema, separador, resto = url.partition("://")
+    driver = _DRIVERS_ASYNC.get(esquema)
+    if not separador or driver is None:
+        return None
+    return f"{driver}://{resto}"
+
+
+class SesionEnHilo:
+    """Respaldo sin driver async: `run_sync` en un hilo con una Session síncrona."""
+
+    def __init__(self, fabrica: Callable[[], Session] = SessionLocal):
+        self._fabrica = fabrica
+        self._sesion: Optional[Session] = None
+
+    def _ejecutar(self, fn: Callable[..., T], args, kwargs) -> T:
+        if self._sesion is None:
+            self._sesion = self._fabrica()
+        return fn(self._sesion, *args, **kwargs)
+
+    async def run_sync(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        return await asyncio.to_thread(self._ejecutar, fn, args, kwargs)
+
+    async def close(self) -> None:
+        if self._sesion is not None:
+            await asyncio.to_thread(self._sesion.close)
+            self._sesion = None
+
+
+class SesionDirecta:
+    """Envuelve una Session ya abierta (pruebas): `run_sync` se ejecuta en línea."""
+
+    def __init__(self, sesion: Session):
+        self.sesion = sesion
+
+    async def run_sync(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        return fn(self.sesion, *args, **kwargs)
+
+    async def close(self) -> None:
+        pass
+
+
+# Motor async perezoso: se crea en la primera petición (None = no disponible)
+_engine_async = None
+_sesiones_async = None
+_inicializado = False
+_lock = threading.Lock()
+
+
+def _crear_engine_async():
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    url = url_async(settings.database_url)
+    if url is None:
+        logger.info("Sin driver async para %s; lecturas en hilos", settings.database_url.split("://")[0])
+        return None, None
+
+    kwargs: Dict[str, Any] = {"echo": settings.database_echo}
+    if url.startswith("postgresql"):
+        kwargs.update(
+            pool_size=settings.database_async_pool_size,
+            max_overflow=settings.database_async_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            pool_recycle=settings.database_pool_recycle,
+            pool_pre_ping=settings.database_pool_pre_ping,
+            # asyncpg no acepta "options": el search_path va como server_settings
+            connect_args={"server_settings": {"search_path": f"{SCHEMA},public"}},
+        )
+    try:
+        engine = create_async_engine(url, **kwargs)
+    except ImportError as exc:  # pragma: no cover - asyncpg / aiosqlite son opcionales
+        logger.warning("Driver async no disponible (%s); lecturas en hilos", exc)
+        return None, None
+    # expire_on_commit=False: tras el commit de log_action los objetos siguen legibles
+    return engine, async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+
+
+def get_async_engine():
+    """Motor async (creado una sola vez); None si está deshabilitado o sin driver."""
+    global _engine_async, _sesiones_async, _inicializado
+    if not _inicializado:
+        with _lock:
+            if not _inicializado:
+                if settings.database_async_habilitado:
+                    _engine_async, _sesiones_async = _crear_engine_async()
+                _inicializado = True
+    return _engine_async
+
+
+async def get_async_db() -> AsyncIterator[Any]:
+    """
+    Dependencia para las lecturas asíncronas: AsyncSession o, sin driver
+    async, una SesionEnHilo. Ambas exponen `await db.run_sync(fn, ...)`.
+    """
+    if get_async_engine() is None:
+        sesion = SesionEnHilo()
+        try:
+            yield sesion
+        finally:
+            await sesion.close()
+        return
+
+    async with _sesiones_async() as sesion:
+        yield sesion
+
+
+async def cerrar_engine_async() -> None:
+    """Cierra las conexiones del pool async (shutdown de la app)."""
+    global _engine_async, _sesiones_async, _inicializado
+    with _lock:
+        engine, _engine_async, _sesiones_async = _engine_async, None, None
+        _inicializado = False
+    if engine is not None:
+        await engine.dispose()
+
+
+def get_async_pool_status() -> Dict[str, Any]:
+    """Estado del pool async (para el endpoint de diagnóstico)."""
+    if not _inicializado:
+        return {"estado": "sin_iniciar", "habilitado": settings.database_async_habilitado}
+    if _engine_async is None:
+        return {"estado": "hilos", "habilitado": settings.database_async_habilitado}
+    pool = _engine_async.pool
+    estado: Dict[str, Any] = {
+        "estado": "async",
+        "driver": _engine_async.dialect.driver,
+        "clase": type(pool).__name__,
+    }
+    if hasattr(pool, "checkedout"):
+        estado.update({
+            "pool_size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    return estado
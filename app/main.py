@@ -5,11 +5,14 @@ Aplicación principal FastAPI para el sistema de gestión de accesos.
 Punto de entrada de la API REST.
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
 import structlog
 
-from fastapi import FastAPI, HTTPException, Request, status
+import hmac
+
+from fastapi import FastAPI, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
@@ -19,9 +22,25 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
-from app.api import api_auth, api_centros_datos, api_personas, api_visitas, api_usuarios, api_audit
+from app.api import api_auth, api_centros_datos, api_personas, api_visitas, api_usuarios, api_audit, api_diagnostico, api_tareas
 from app.config import settings
 from app.database import create_tables
+from app.database_async import cerrar_engine_async
+from app.workers import pool_tareas, mantenimiento_auditoria
+from app.workers.exportacion import cerrar_pool_exportacion
+from app.utils.audit_writer import audit_writer
+from app.auth.password_hasher import password_hasher
+from app.middleware.compresion import CompresionMiddleware
+from app.middleware.metricas import MetricasMiddleware
+from app.middleware.security import (
+    ErrorHandlingMiddleware,
+    RateLimitMiddleware,
+    RequestLoggingMiddleware,
+    SecurityHeadersMiddleware,
+)
+from app.services.estado_compartido import estado_compartido
+from app.utils.respuestas import RespuestaJSON
+from app.utils import metricas
 
 # Logging estructurado
 structlog.configure(
@@ -44,8 +63,8 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address)
+# Rate limiting: contadores en el estado compartido (Redis con varios workers)
+limiter = Limiter(key_func=get_remote_address, storage_uri=estado_compartido.storage_uri)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -53,8 +72,20 @@ async def lifespan(app: FastAPI):
     logger.info("Iniciando aplicación de gestión de accesos")
     create_tables()
     logger.info("Tablas de base de datos creadas/verificadas")
+    pool_tareas.start()
+    if settings.audit_buffer_enabled:
+        audit_writer.start()
+    # Particiones futuras y retención de la tabla control
+    mantenimiento_auditoria.start()
     yield
     # Shutdown
+    await mantenimiento_auditoria.stop()
+    await pool_tareas.stop()
+    # Escribe la auditoría pendiente antes de salir
+    await asyncio.to_thread(audit_writer.stop)
+    password_hasher.shutdown()
+    cerrar_pool_exportacion()
+    await cerrar_engine_async()
     logger.info("Cerrando aplicación de gestión de accesos")
 
 # ✅ PRIMERO: Crea la app
@@ -77,19 +108,34 @@ API REST para la gestión de accesos de visitantes a centros de datos.
     docs_url="/docs",
     redoc_url="/redoc",
     lifespan=lifespan,
+    # orjson / model_dump_json en lugar de json.dumps
+    default_response_class=RespuestaJSON,
 )
 
 # Rate limit handler
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-# CORS
+# Middlewares ASGI puros de app.middleware.security. add_middleware apila el
+# último agregado por fuera: el orden de ejecución es Métricas -> Compresión
+# -> Trusted hosts -> CORS -> headers de seguridad -> logging -> errores -> rate limit.
+# Así un 429 o un 500 también lleva CORS, headers de seguridad y queda en el log.
+# El rate limit es opcional (RATE_LIMIT_HABILITADO, desactivado por defecto).
+if settings.rate_limit_habilitado:
+    app.add_middleware(RateLimitMiddleware)
+app.add_middleware(ErrorHandlingMiddleware)
+app.add_middleware(RequestLoggingMiddleware)
+app.add_middleware(SecurityHeadersMiddleware)
+
+# CORS (CORSMiddleware de Starlette ya es ASGI puro y responde los preflight;
+# CORSCustomMiddleware queda para despliegues que necesiten rechazar orígenes con 403)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins,
     allow_credentials=True,
     allow_methods=settings.allowed_methods,
     allow_headers=settings.allowed_headers,
+    expose_headers=["Content-Disposition", "X-Export-Id"],
 )
 
 # Trusted hosts
@@ -98,6 +144,21 @@ app.add_middleware(
     allowed_hosts=["*"],
 )
 
+# Compresión (agregado al final: es el middleware más externo y comprime la respuesta final)
+if settings.compresion_habilitada:
+    app.add_middleware(
+        CompresionMiddleware,
+        minimo=settings.compresion_minimo,
+        nivel_gzip=settings.compresion_nivel_gzip,
+        nivel_brotli=settings.compresion_nivel_brotli,
+        brotli_habilitado=settings.compresion_brotli,
+    )
+
+# Métricas: por fuera de todo, la latencia incluye la pila completa de middlewares
+if settings.metricas_habilitadas:
+    metricas.instrumentar_engines()
+    app.add_middleware(MetricasMiddleware)
+
 # ✅ SEGUNDO: Monta carpetas de imágenes usando las rutas del .env
 print("\n" + "="*70)
 print("🖼️  MONTANDO CARPETAS DE IMÁGENES")
@@ -143,6 +204,17 @@ async def root():
         "openapi": "/api/v1/openapi.json",
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Métricas en formato de texto de Prometheus (ver app.utils.metricas)."""
+    if not settings.metricas_habilitadas:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if settings.metricas_token:
+        esperado = f"Bearer {settings.metricas_token}"
+        if not hmac.compare_digest(request.headers.get("authorization", ""), esperado):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de métricas inválido")
+    return Response(metricas.registro.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/health", summary="Estado de salud de la API")
 async def health_check():
     return {
@@ -158,6 +230,8 @@ app.include_router(api_centros_datos.router, prefix="/api/v1")
 app.include_router(api_visitas.router, prefix="/api/v1")
 app.include_router(api_usuarios.router, prefix="/api/v1")
 app.include_router(api_audit.router, prefix="/api/v1")
+app.include_router(api_diagnostico.router, prefix="/api/v1")
+app.include_router(api_tareas.router, prefix="/api/v1")
 
 # Handlers de error globales
 @app.exception_handler(HTTPException)
@@ -0,0 +1,185 @@
+"""
+Compresión de respuestas (brotli o gzip) como middleware ASGI.
+
+Se comprime solo si:
+- el cliente lo acepta (Accept-Encoding; br tiene prioridad si el paquete
+  brotli está instalado),
+- la respuesta no trae Content-Encoding y su tipo es comprimible (JSON,
+  texto, NDJSON...; no imágenes, PDF ni ZIP),
+- el cuerpo alcanza `minimo` bytes. Para respuestas en streaming se decide
+  con el primer bloque y se comprime bloque a bloque.
+
+Un ETag fuerte se vuelve débil (W/) al comprimir: el cuerpo ya no es
+idéntico byte a byte al que lo generó (RFC 9110 §8.8.1).
+
+A diferencia de GZipMiddleware de Starlette, no envuelve la respuesta en
+BaseHTTPMiddleware y agrega brotli.
+"""
+
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli es opcional
+    brotli = None
+
+TIPOS_COMPRIMIBLES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/",
+    "image/svg+xml",
+)
+
+
+def elegir_codificacion(accept_encoding: str, brotli_habilitado: bool = True) -> Optional[str]:
+    """"br", "gzip" o None según Accept-Encoding (respeta q=0)."""
+    aceptadas = {}
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                calidad = float(parametros.strip()[2:])
+            except ValueError:
+                calidad = 0.0
+        if nombre:
+            aceptadas[nombre] = calidad
+    if brotli_habilitado and brotli is not None and aceptadas.get("br", 0) > 0:
+        return "br"
+    if aceptadas.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def etag_debil(etag: str) -> str:
+    """El mismo ETag como validador débil (sin cambios si ya lo es)."""
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class _Compresor:
+    def __init__(self, codificacion: str, nivel_gzip: int, nivel_brotli: int):
+        if codificacion == "br":
+            self._br = brotli.Compressor(quality=nivel_brotli)
+            self._gz = None
+        else:
+            self._br = None
+            # wbits 16+MAX_WBITS: formato gzip (cabecera y CRC)
+            self._gz = zlib.compressobj(nivel_gzip, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def comprimir(self, datos: bytes) -> bytes:
+        if self._br is not None:
+            return self._br.process(datos)
+        return self._gz.compress(datos)
+
+    def vaciar(self) -> bytes:
+        # Z_SYNC_FLUSH / flush(): el cliente puede descomprimir lo recibido hasta ahora
+        if self._br is not None:
+            return self._br.flush()
+        return self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def terminar(self) -> bytes:
+        if self._br is not None:
+            return self._br.finish()
+        return self._gz.flush()
+
+
+class CompresionMiddleware:
+    """Middleware ASGI de compresión configurable."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimo: int = 1024,
+        nivel_gzip: int = 6,
+        nivel_brotli: int = 4,
+        brotli_habilitado: bool = True,
+    ):
+        self.app = app
+        self.minimo = minimo
+        self.nivel_gzip = nivel_gzip
+        self.nivel_brotli = nivel_brotli
+        self.brotli_habilitado = brotli_habilitado
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacion = elegir_codificacion(
+            Headers(scope=scope).get("accept-encoding", ""), self.brotli_habilitado
+        )
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+        await _RespuestaComprimida(self, codificacion, send).ejecutar(scope, receive)
+
+
+class _RespuestaComprimida:
+    """Estado de una respuesta: retiene el inicio hasta ver el primer bloque del cuerpo."""
+
+    def __init__(self, config: CompresionMiddleware, codificacion: str, send: Send):
+        self.config = config
+        self.codificacion = codificacion
+        self.send = send
+        self.inicio: Optional[Message] = None
+        self.compresor: Optional[_Compresor] = None
+        self.pasar = False  # sin comprimir
+
+    async def ejecutar(self, scope: Scope, receive: Receive) -> None:
+        await self.config.app(scope, receive, self.enviar)
+
+    async def enviar(self, mensaje: Message) -> None:
+        if mensaje["type"] == "http.response.start":
+            self.inicio = mensaje
+            headers = Headers(raw=mensaje["headers"])
+            tipo = headers.get("content-type", "")
+            self.pasar = (
+                mensaje["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not tipo.startswith(TIPOS_COMPRIMIBLES)
+            )
+            if self.pasar:
+                await self.send(mensaje)
+            return
+
+        if mensaje["type"] != "http.response.body" or self.pasar:
+            await self.send(mensaje)
+            return
+
+        cuerpo = mensaje.get("body", b"")
+        mas = mensaje.get("more_body", False)
+
+        if self.compresor is None:
+            if not mas and len(cuerpo) < self.config.minimo:
+                # Respuesta completa y pequeña: comprimir no compensa
+                self.pasar = True
+                MutableHeaders(raw=self.inicio["headers"]).add_vary_header("Accept-Encoding")
+                await self.send(self.inicio)
+                await self.send(mensaje)
+                return
+            self.compresor = _Compresor(self.codificacion, self.config.nivel_gzip, self.config.nivel_brotli)
+            headers = MutableHeaders(raw=self.inicio["headers"])
+            headers["Content-Encoding"] = self.codificacion
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                headers["ETag"] = etag_debil(headers["etag"])
+            if "content-length" in headers:
+                del headers["content-length"]
+            if not mas:
+                comprimido = self.compresor.comprimir(cuerpo) + self.compresor.terminar()
+                headers["Content-Length"] = str(len(comprimido))
+                await self.send(self.inicio)
+                await self.send({"type": "http.response.body", "body": comprimido})
+                return
+            await self.send(self.inicio)
+
+        if mas:
+            datos = self.compresor.comprimir(cuerpo) + self.compresor.vaciar()
+        else:
+            datos = self.compresor.comprimir(cuerpo) + self.compresor.terminar()
+        await self.send({"type": "http.response.body", "body": datos, "more_body": mas})
@@ -0,0 +1,58 @@
+"""
+Medición de cada request HTTP como middleware ASGI.
+
+Registra en app.utils.metricas la latencia por ruta y, con los eventos de
+SQLAlchemy, las consultas y el tiempo de BD del request. La ruta es la
+plantilla que resolvió el router (scope["route"].path), así los ids no
+multiplican las series; lo que no corresponde a una ruta queda como
+"montaje" (el prefijo de StaticFiles) o "sin_ruta" (404).
+"""
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils import metricas
+
+
+def plantilla_ruta(scope: Scope) -> str:
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    if "endpoint" in scope and scope.get("root_path"):
+        return scope["root_path"]
+    return "sin_ruta"
+
+
+class MetricasMiddleware:
+    """Abre la medición del request y la registra al terminar la respuesta."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status_code = 500
+
+        async def enviar(mensaje: Message) -> None:
+            nonlocal status_code
+            if mensaje["type"] == "http.response.start":
+                status_code = mensaje["status"]
+            await send(mensaje)
+
+        with metricas.medir_peticion() as medicion:
+            try:
+                await self.app(scope, receive, enviar)
+            except Exception:
+                metricas.errores_http.incrementar(scope["method"], plantilla_ruta(scope))
+                raise
+            finally:
+                metodo = scope["method"]
+                ruta = plantilla_ruta(scope)
+                metricas.latencia_http.observar(time.perf_counter() - inicio, metodo, ruta, str(status_code))
+                metricas.consultas_http.observar(medicion.consultas, metodo, ruta)
+                metricas.tiempo_db_http.observar(medicion.tiempo_db, metodo, ruta)
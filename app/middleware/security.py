@@ -1,20 +1,73 @@
 """
 Middleware de seguridad personalizado.
 Proporciona funcionalidades adicionales de seguridad para la API.
+
+Todos son middlewares ASGI puros (no BaseHTTPMiddleware): no crean una
+tarea ni envuelven el cuerpo en un stream por request, y las respuestas en
+streaming pasan bloque a bloque. Las cabeceras fijas se precalculan como
+tuplas de bytes y se agregan al mensaje http.response.start.
 """
 
-from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import math
 import time
 import structlog
-from typing import Dict, Any
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from app.auth.jwt_handler import jwt_handler
+from app.services.limitador import Limitador, Regla, limitador as limitador_global, reglas_por_defecto
 
 logger = structlog.get_logger()
 
+# Token -> (usuario, vence): el JWT se verifica una vez por minuto, no en cada request
+_TOKENS_MAX = 10000
+_TOKENS_TTL = 60.0
+_tokens: Dict[str, tuple] = {}
+
+
+def usuario_de_autorizacion(autorizacion: Optional[str]) -> Optional[str]:
+    """user_id del JWT "Bearer" (clave de las reglas por usuario); None si no hay token válido."""
+    if not autorizacion or not autorizacion.startswith("Bearer "):
+        return None
+    token = autorizacion[7:]
+    ahora = time.monotonic()
+    entrada = _tokens.get(token)
+    if entrada is not None and entrada[1] > ahora:
+        return entrada[0]
+    datos = jwt_handler.verify_token(token)
+    usuario = str(datos.user_id) if datos else None
+    if len(_tokens) >= _TOKENS_MAX:
+        _tokens.clear()
+    _tokens[token] = (usuario, ahora + _TOKENS_TTL)
+    return usuario
+
+
+def limpiar_tokens() -> None:
+    """Vacía la caché de tokens verificados (pruebas)."""
+    _tokens.clear()
+
+
+def codificar_cabeceras(cabeceras: Dict[str, str]) -> Tuple[Tuple[bytes, bytes], ...]:
+    """Cabeceras como tuplas (nombre en minúsculas, valor) en latin-1, listas para ASGI."""
+    return tuple((nombre.lower().encode("latin-1"), valor.encode("latin-1")) for nombre, valor in cabeceras.items())
+
+
+def cabecera(scope: Scope, nombre: bytes) -> Optional[str]:
+    """Valor de una cabecera del request (nombre en minúsculas) sin construir un Request."""
+    for clave, valor in scope["headers"]:
+        if clave == nombre:
+            return valor.decode("latin-1")
+    return None
+
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+def agregar_cabeceras(mensaje: Message, extra: Iterable[Tuple[bytes, bytes]], nombres: frozenset) -> None:
+    """Reemplaza en http.response.start las cabeceras `nombres` por las de `extra`."""
+    mensaje["headers"] = [h for h in mensaje.get("headers", ()) if h[0] not in nombres] + list(extra)
+
+
+class SecurityHeadersMiddleware:
     """
     Middleware para agregar headers de seguridad HTTP.
     
@@ -22,7 +75,7 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
     """
     
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
         self.security_headers = {
             "X-Content-Type-Options": "nosniff",
             "X-Frame-Options": "DENY",
@@ -31,240 +84,257 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
             "Referrer-Policy": "strict-origin-when-cross-origin",
             "Permissions-Policy": "geolocation=(), microphone=(), camera=()"
         }
+        self._cabeceras = codificar_cabeceras(self.security_headers)
+        self._nombres = frozenset(nombre for nombre, _ in self._cabeceras)
     
-    async def dispatch(self, request: Request, call_next):
-        """
-        Procesa la request y agrega headers de seguridad.
-        
-        Args:
-            request: Request HTTP
-            call_next: Función para procesar la request
-            
-        Returns:
-            Response con headers de seguridad
-        """
-        response = await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Agregar headers de seguridad
-        for header, value in self.security_headers.items():
-            response.headers[header] = value
+        async def enviar(mensaje: Message) -> None:
+            if mensaje["type"] == "http.response.start":
+                agregar_cabeceras(mensaje, self._cabeceras, self._nombres)
+            await send(mensaje)
         
-        return response
+        await self.app(scope, receive, enviar)
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+class RequestLoggingMiddleware:
     """
     Middleware para logging de requests HTTP.
     
-    Registra información detallada de todas las requests.
+    Registra información detallada de todas las requests. El log se emite al
+    terminar el cuerpo de la respuesta (o al fallar la aplicación) y
+    X-Process-Time es el tiempo hasta el inicio de la respuesta.
     """
     
+    _CABECERAS = {b"user-agent": "user_agent", b"content-type": "content_type", b"content-length": "content_length"}
+    
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
     
-    async def dispatch(self, request: Request, call_next):
-        """
-        Procesa la request y registra información de logging.
-        
-        Args:
-            request: Request HTTP
-            call_next: Función para procesar la request
-            
-        Returns:
-            Response procesada
-        """
-        start_time = time.time()
-        
-        # Información de la request
-        request_info = {
-            "method": request.method,
-            "url": str(request.url),
-            "path": request.url.path,
-            "query_params": dict(request.query_params),
-            "client_ip": request.client.host if request.client else None,
-            "user_agent": request.headers.get("user-agent"),
-            "content_type": request.headers.get("content-type"),
-            "content_length": request.headers.get("content-length")
-        }
-        
-        # Procesar la request
-        response = await call_next(request)
-        
-        # Calcular tiempo de procesamiento
-        process_time = time.time() - start_time
-        
-        # Información de la response
-        response_info = {
-            "status_code": response.status_code,
-            "process_time": round(process_time, 4)
+    def _request_info(self, scope: Scope) -> Dict[str, object]:
+        cabeceras = {"user_agent": None, "content_type": None, "content_length": None}
+        host = ""
+        for clave, valor in scope["headers"]:
+            if clave == b"host":
+                host = valor.decode("latin-1")
+            elif clave in self._CABECERAS:
+                cabeceras[self._CABECERAS[clave]] = valor.decode("latin-1")
+        path = scope["path"]
+        query = scope.get("query_string", b"").decode("latin-1")
+        url = f"{scope.get('scheme', 'http')}://{host}{scope.get('root_path', '')}{path}"
+        client = scope.get("client")
+        return {
+            "method": scope["method"],
+            "url": f"{url}?{query}" if query else url,
+            "path": path,
+            "query_params": dict(parse_qsl(query, keep_blank_values=True)),
+            "client_ip": client[0] if client else None,
+            **cabeceras,
         }
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Log de la request
-        log_data = {**request_info, **response_info}
+        start_time = time.perf_counter()
+        status_code = 500
+        registrado = False
         
-        if response.status_code >= 400:
-            logger.warning("HTTP Request", **log_data)
-        else:
-            logger.info("HTTP Request", **log_data)
+        def registrar() -> None:
+            nonlocal registrado
+            registrado = True
+            log_data = {
+                **self._request_info(scope),
+                "status_code": status_code,
+                "process_time": round(time.perf_counter() - start_time, 4),
+            }
+            if status_code >= 400:
+                logger.warning("HTTP Request", **log_data)
+            else:
+                logger.info("HTTP Request", **log_data)
         
-        # Agregar header de tiempo de procesamiento
-        response.headers["X-Process-Time"] = str(process_time)
+        async def enviar(mensaje: Message) -> None:
+            nonlocal status_code
+            if mensaje["type"] == "http.response.start":
+                status_code = mensaje["status"]
+                process_time = time.perf_counter() - start_time
+                mensaje["headers"] = list(mensaje.get("headers", ())) + [
+                    (b"x-process-time", str(process_time).encode("latin-1"))
+                ]
+            await send(mensaje)
+            if mensaje["type"] == "http.response.body" and not mensaje.get("more_body", False):
+                registrar()
         
-        return response
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            if not registrado:
+                registrar()
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware:
     """
-    Middleware básico de rate limiting.
+    Middleware de rate limiting.
     
-    Implementa rate limiting simple basado en IP.
+    Ventana deslizante de memoria constante por clave (app.services.limitador)
+    con reglas por ruta y por usuario: login por IP, lecturas por usuario del
+    JWT y un límite general por IP. Con ESTADO_BACKEND=redis el límite es el
+    mismo con varios workers.
     """
     
-    def __init__(self, app: ASGIApp, requests_per_minute: int = 60):
-        super().__init__(app)
-        self.requests_per_minute = requests_per_minute
-        self.requests: Dict[str, list] = {}
+    def __init__(self, app: ASGIApp, requests_per_minute: Optional[int] = None, limitador: Optional[Limitador] = None):
+        self.app = app
+        if limitador is None and requests_per_minute is not None:
+            reglas = [r for r in reglas_por_defecto() if r.nombre != "general"]
+            limitador = Limitador(reglas + [Regla("general", requests_per_minute, 60.0)])
+        self.limitador = limitador or limitador_global
     
-    async def dispatch(self, request: Request, call_next):
-        """
-        Procesa la request y aplica rate limiting.
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        Args:
-            request: Request HTTP
-            call_next: Función para procesar la request
-            
-        Returns:
-            Response procesada o error de rate limit
-        """
-        client_ip = request.client.host if request.client else "unknown"
-        current_time = time.time()
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        rechazo = await self.limitador.verificar(
+            scope["method"],
+            scope["path"],
+            client_ip,
+            usuario_de_autorizacion(cabecera(scope, b"authorization")),
+        )
         
-        # Limpiar requests antiguos
-        if client_ip in self.requests:
-            self.requests[client_ip] = [
-                req_time for req_time in self.requests[client_ip]
-                if current_time - req_time < 60  # Último minuto
-            ]
-        else:
-            self.requests[client_ip] = []
+        if rechazo is None:
+            await self.app(scope, receive, send)
+            return
         
-        # Verificar rate limit
-        if len(self.requests[client_ip]) >= self.requests_per_minute:
-            logger.warning(
-                "Rate limit exceeded",
-                client_ip=client_ip,
-                requests_count=len(self.requests[client_ip]),
-                limit=self.requests_per_minute
-            )
-            
-            return JSONResponse(
-                status_code=429,
-                content={
-                    "error": {
-                        "status_code": 429,
-                        "detail": "Rate limit exceeded. Too many requests.",
-                        "retry_after": 60
-                    }
-                },
-                headers={"Retry-After": "60"}
-            )
-        
-        # Registrar la request
-        self.requests[client_ip].append(current_time)
-        
-        # Procesar la request
-        response = await call_next(request)
+        retry_after = max(math.ceil(rechazo.reintentar_en), 1)
+        logger.warning(
+            "Rate limit exceeded",
+            client_ip=client_ip,
+            regla=rechazo.regla.nombre,
+            limit=rechazo.regla.limite,
+            window=rechazo.regla.ventana,
+        )
         
-        return response
+        response = JSONResponse(
+            status_code=429,
+            content={
+                "error": {
+                    "status_code": 429,
+                    "detail": "Rate limit exceeded. Too many requests.",
+                    "retry_after": retry_after
+                }
+            },
+            headers={"Retry-After": str(retry_after)}
+        )
+        await response(scope, receive, send)
 
 
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
+class ErrorHandlingMiddleware:
     """
     Middleware para manejo centralizado de errores.
     
-    Captura y formatea errores no manejados.
+    Captura y formatea errores no manejados. Si la respuesta ya empezó (p. ej.
+    un streaming que falla a mitad) no se puede reemplazar y el error se
+    propaga.
     """
     
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
     
-    async def dispatch(self, request: Request, call_next):
-        """
-        Procesa la request y maneja errores.
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        iniciada = False
+        
+        async def enviar(mensaje: Message) -> None:
+            nonlocal iniciada
+            if mensaje["type"] == "http.response.start":
+                iniciada = True
+            await send(mensaje)
         
-        Args:
-            request: Request HTTP
-            call_next: Función para procesar la request
-            
-        Returns:
-            Response procesada o error formateado
-        """
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, enviar)
         except Exception as exc:
+            if iniciada:
+                raise
             logger.error(
                 "Unhandled exception in middleware",
                 error=str(exc),
-                path=request.url.path,
-                method=request.method,
+                path=scope["path"],
+                method=scope["method"],
                 exc_info=True
             )
             
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=500,
                 content={
                     "error": {
                         "status_code": 500,
                         "detail": "Error interno del servidor",
-                        "path": request.url.path,
-                        "method": request.method
+                        "path": scope["path"],
+                        "method": scope["method"]
                     }
                 }
             )
+            await response(scope, receive, send)
 
 
-class CORSCustomMiddleware(BaseHTTPMiddleware):
+class CORSCustomMiddleware:
     """
     Middleware personalizado de CORS.
     
     Proporciona control granular de CORS.
     """
     
+    _NOMBRES = frozenset({
+        b"access-control-allow-origin",
+        b"access-control-allow-methods",
+        b"access-control-allow-headers",
+        b"access-control-allow-credentials",
+    })
+    
     def __init__(self, app: ASGIApp, allowed_origins: list = None):
-        super().__init__(app)
+        self.app = app
         self.allowed_origins = allowed_origins or ["*"]
+        self._permitidos = frozenset(self.allowed_origins)
+        self._cabeceras = codificar_cabeceras({
+            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type, Authorization",
+            "Access-Control-Allow-Credentials": "true",
+        })
+        self._sin_origen = ((b"access-control-allow-origin", b"*"),) + self._cabeceras
     
-    async def dispatch(self, request: Request, call_next):
-        """
-        Procesa la request y maneja CORS.
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        Args:
-            request: Request HTTP
-            call_next: Función para procesar la request
-            
-        Returns:
-            Response con headers CORS
-        """
-        origin = request.headers.get("origin")
+        origin = cabecera(scope, b"origin")
         
         # Verificar origen permitido
-        if origin and origin not in self.allowed_origins and "*" not in self.allowed_origins:
-            return JSONResponse(
+        if origin and origin not in self._permitidos and "*" not in self._permitidos:
+            response = JSONResponse(
                 status_code=403,
                 content={"error": "Origin not allowed"}
             )
+            await response(scope, receive, send)
+            return
         
-        response = await call_next(request)
-        
-        # Agregar headers CORS
         if origin:
-            response.headers["Access-Control-Allow-Origin"] = origin
+            extra = ((b"access-control-allow-origin", origin.encode("latin-1")),) + self._cabeceras
         else:
-            response.headers["Access-Control-Allow-Origin"] = "*"
+            extra = self._sin_origen
         
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-        response.headers["Access-Control-Allow-Credentials"] = "true"
+        async def enviar(mensaje: Message) -> None:
+            if mensaje["type"] == "http.response.start":
+                agregar_cabeceras(mensaje, extra, self._NOMBRES)
+            await send(mensaje)
         
-        return response
+        await self.app(scope, receive, enviar)
@@ -9,7 +9,9 @@ from .models import (
     RolUsuario,
     Area,
     Control,
-    CentroAreaVisita
+    ControlResumenDiario,
+    CentroAreaVisita,
+    TareaPendiente
 )
 
 __all__ = [
@@ -22,5 +24,7 @@ __all__ = [
     "RolUsuario",
     "Area",
     "Control",
-    "CentroAreaVisita"
+    "ControlResumenDiario",
+    "CentroAreaVisita",
+    "TareaPendiente"
 ]
@@ -3,6 +3,7 @@ from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 from sqlalchemy import Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 
 SCHEMA = "sistema_gestiones"
 
@@ -58,6 +59,7 @@ class CentroDatos(Base):
     observaciones = Column(Text, nullable=True)
     activo = Column(Boolean, default=True, nullable=False)
     fecha_creacion = Column(DateTime(timezone=True), server_default=func.now())
+    fecha_actualizacion = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
     
     # Relaciones
     visitas = relationship("Visita", back_populates="centro_datos", cascade="all, delete-orphan")
@@ -171,18 +173,67 @@ class Visita(Base):
 
 class Control(Base):
     __tablename__ = "control"
-    __table_args__ = {"schema": SCHEMA}
-    __table_args__ = (Index('idx_control_fecha_usuario', 'fecha', 'usuario_id'), {})
+    # En PostgreSQL la tabla está particionada por mes sobre fecha_hora
+    # (migración 0002, PK real (id, fecha_hora)); el ORM la identifica por id.
+    # Índices según los filtros/orden de la API de auditoría (migración 0001).
+    # El orden (fecha_hora DESC, id DESC) se sirve recorriendo el índice al revés.
+    __table_args__ = (
+        Index('idx_control_fecha_hora', 'fecha_hora', 'id'),
+        Index('idx_control_usuario_fecha_hora', 'usuario_id', 'fecha_hora', 'id'),
+        Index('idx_control_realizado_fecha_hora', 'realizado', 'fecha_hora'),
+        Index('idx_control_tabla_fecha_hora', 'tabla_afectada', 'fecha_hora'),
+        {"schema": SCHEMA},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     realizado = Column(String(100), nullable=False)
+    fecha_hora = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # fecha/hora se conservan para los clientes existentes; filtros y orden usan fecha_hora
     fecha = Column(Date, nullable=False, index=True)
     hora = Column(String(8), nullable=False)
     usuario_id = Column(Integer, ForeignKey(f"{SCHEMA}.usuario.id"), nullable=False, index=True)
-    detalles = Column(Text, nullable=True)
+    # JSONB en PostgreSQL (migración 0004, índice GIN idx_control_detalles); JSON en SQLite
+    detalles = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
     ip_address = Column(String(45), nullable=True)
     user_agent = Column(Text, nullable=True)
     tabla_afectada = Column(String(50), nullable=True)
     registro_id = Column(Integer, nullable=True)
     
     usuario = relationship("Usuario", back_populates="controles")
+
+# Conteos diarios de auditoría (migración 0005). Se acumulan en la misma
+# transacción que inserta en control; tabla_afectada NULL se guarda como ''.
+class ControlResumenDiario(Base):
+    __tablename__ = "control_resumen_diario"
+    __table_args__ = (
+        Index('idx_control_resumen_realizado', 'realizado', 'tabla_afectada'),
+        {"schema": SCHEMA},
+    )
+
+    fecha = Column(Date, primary_key=True)
+    realizado = Column(String(100), primary_key=True)
+    tabla_afectada = Column(String(50), primary_key=True, default="")
+    usuario_id = Column(Integer, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+# Cola de tareas post-commit (outbox): PDF, Telegram y email de visitas
+class TareaPendiente(Base):
+    __tablename__ = "tareas_pendientes"
+    __table_args__ = (
+        Index('idx_tareas_estado_proximo', 'estado', 'proximo_intento'),
+        {"schema": SCHEMA},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String(50), nullable=False)  # generar_pdf | telegram | email
+    estado = Column(String(20), nullable=False, default="pendiente")  # pendiente | en_proceso | completada | fallida
+    visita_id = Column(Integer, ForeignKey(f"{SCHEMA}.visitas.id", ondelete="SET NULL"), nullable=True, index=True)
+    payload = Column(JSON, nullable=False, default=dict)
+    resultado = Column(JSON, nullable=True)
+    intentos = Column(Integer, nullable=False, default=0)
+    max_intentos = Column(Integer, nullable=False, default=5)
+    proximo_intento = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    ultimo_error = Column(Text, nullable=True)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    fecha_actualizacion = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
+    fecha_completada = Column(DateTime(timezone=True), nullable=True)
@@ -1,15 +1,16 @@
 # app/schemas/esquema_control.py
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Optional, List
 from datetime import date, datetime
 
 class EsquemaControl(BaseModel):
     id: int
     realizado: str
+    fecha_hora: Optional[datetime] = None
     fecha: date
     hora: str
     usuario_id: int
-    detalles: Optional[str] = None
+    detalles: Optional[Any] = None  # JSONB (dict)
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
     tabla_afectada: Optional[str] = None
@@ -21,10 +22,12 @@ class EsquemaControl(BaseModel):
 
 class ControlLogResponse(BaseModel):
     items: List[dict]  # Formateados con fecha_completa, usuario dict
-    total: int
-    page: int
+    total: Optional[int] = None  # None con conteo=ninguno
+    page: Optional[int] = None  # None al paginar con cursor
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    total_estimado: bool = False
 
 class ControlStatsResponse(BaseModel):
     stats: List[dict]  # [{"realizado": str, "tabla_afectada": str, "count": int}]
@@ -33,3 +36,8 @@ class ControlSearchRequest(BaseModel):
     search_term: str
     skip: int = 0
     limit: int = 50
+    cursor: Optional[str] = None  # next_cursor de la respuesta anterior (ignora skip)
+    conteo: str = "exacto"  # exacto | estimado | ninguno
+    fecha_desde: Optional[date] = None  # acotan las particiones mensuales consultadas
+    fecha_hasta: Optional[date] = None
+    orden: str = "fecha"  # fecha (por cursor) | relevancia (por skip, incluye "puntaje")
@@ -38,7 +38,9 @@ class PersonaResponse(PersonaBase):
 
 class PersonaListResponse(BaseModel):
     items: List[PersonaResponse]
-    total: int
-    page: int
+    total: Optional[int] = None  # None con conteo=ninguno
+    page: Optional[int] = None  # None al paginar con cursor
     size: int
-    pages: int
\ No newline at end of file
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    total_estimado: bool = False
\ No newline at end of file
@@ -0,0 +1,28 @@
+# app/schemas/esquema_tarea.py
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+
+class TareaResponse(BaseModel):
+    id: int
+    tipo: str
+    estado: str
+    visita_id: Optional[int] = None
+    intentos: int
+    max_intentos: int
+    proximo_intento: Optional[datetime] = None
+    ultimo_error: Optional[str] = None
+    resultado: Optional[Dict[str, Any]] = None
+    fecha_creacion: Optional[datetime] = None
+    fecha_actualizacion: Optional[datetime] = None
+    fecha_completada: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class TareaListResponse(BaseModel):
+    items: List[TareaResponse]
+    total: int
+    page: int
+    size: int
+    pages: int
@@ -236,12 +236,14 @@ class VisitaResponse(BaseModel):
 
 
 class VisitaListResponse(BaseModel):
-    """Schema para lista paginada de visitas"""
+    """Schema para lista paginada de visitas (por página o por cursor)"""
     items: list[VisitaResponse]
-    total: int
-    page: int
+    total: Optional[int] = None  # None con conteo=ninguno
+    page: Optional[int] = None  # None al paginar con cursor
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # token para la página siguiente
+    total_estimado: bool = False
 
 
 class VisitaWithDetails(VisitaResponse):
@@ -1,9 +1,96 @@
 # app/services/control_service.py
-from sqlalchemy import and_, or_, func, desc, String
+from sqlalchemy import and_, or_, func, insert, cast
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session, joinedload
-from datetime import date, datetime
-from app.models import Control, Usuario
-from typing import Dict, Tuple, List, Any, Optional
+import json
+import re
+from datetime import date, datetime, time, timedelta
+from app.models import Control, ControlResumenDiario, Usuario
+from typing import TYPE_CHECKING, Dict, Tuple, List, Any, Optional
+from collections import Counter
+
+if TYPE_CHECKING:
+    from app.utils.paginacion import Pagina
+
+
+def normalizar_detalles(detalles: Any) -> Optional[Any]:
+    """
+    detalles es JSONB: los dict/list se guardan tal cual; un texto JSON se
+    decodifica y cualquier otro texto queda como {"texto": ...}.
+    """
+    if detalles is None or not isinstance(detalles, str):
+        return detalles
+    try:
+        return json.loads(detalles)
+    except ValueError:
+        return {"texto": detalles}
+
+
+_RUTA_DETALLE = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+
+def parsear_filtro_detalle(texto: str) -> Tuple[List[str], Any]:
+    """
+    "usuario_info.rol_id=2" -> (["usuario_info", "rol_id"], 2).
+
+    El valor se interpreta como número/booleano/null si es JSON válido de
+    ese tipo; si no, como texto. Lanza ValueError si el formato no es clave=valor.
+    """
+    clave, separador, valor_texto = texto.partition("=")
+    clave = clave.strip()
+    if not separador or not _RUTA_DETALLE.match(clave):
+        raise ValueError(f"Filtro de detalle inválido: {texto!r} (use clave=valor o a.b=valor)")
+    try:
+        valor = json.loads(valor_texto)
+        if isinstance(valor, (dict, list)):
+            valor = valor_texto
+    except ValueError:
+        valor = valor_texto
+    return clave.split("."), valor
+
+
+def filtro_detalle(ruta: List[str], valor: Any, dialecto: str):
+    """
+    Condición detalles.<ruta> = valor.
+
+    En PostgreSQL usa contención (detalles @> '{"a": {"b": valor}}'), que
+    resuelve el índice GIN idx_control_detalles. Un valor no textual también
+    se busca como texto ("2" además de 2), por registros antiguos.
+    En SQLite usa json_extract.
+    """
+    candidatos = [valor] if isinstance(valor, str) else [valor, json.dumps(valor)]
+    if dialecto == "postgresql":
+        condiciones = []
+        for candidato in candidatos:
+            documento = candidato
+            for clave in reversed(ruta):
+                documento = {clave: documento}
+            condiciones.append(Control.detalles.op("@>")(cast(json.dumps(documento), JSONB)))
+        return or_(*condiciones)
+    return func.json_extract(Control.detalles, "$." + ".".join(ruta)).in_(candidatos)
+
+
+def _fecha_hora_de(registro: Dict[str, Any]) -> datetime:
+    """fecha_hora de un registro que solo trae fecha/hora (o ninguna)."""
+    fecha = registro.get("fecha")
+    hora = registro.get("hora")
+    if fecha and hora:
+        return datetime.combine(fecha, time.fromisoformat(hora)).astimezone()
+    return datetime.now().astimezone()
+
+
+def _rango_fecha_hora(fecha_desde: Optional[date], fecha_hasta: Optional[date]):
+    """
+    Condiciones sobre fecha_hora equivalentes a fecha BETWEEN desde AND hasta
+    (días completos en la zona horaria del servidor, como fecha/hora).
+    """
+    condiciones = []
+    if fecha_desde:
+        condiciones.append(Control.fecha_hora >= datetime.combine(fecha_desde, time.min).astimezone())
+    if fecha_hasta:
+        siguiente = datetime.combine(fecha_hasta + timedelta(days=1), time.min).astimezone()
+        condiciones.append(Control.fecha_hora < siguiente)
+    return condiciones
 
 
 class ControlService:
@@ -16,40 +103,151 @@ class ControlService:
         usuario_id: int,
         tabla_afectada: Optional[str] = None,
         registro_id: Optional[int] = None,
-        detalles: Optional[str] = None,
+        detalles: Optional[Any] = None,
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None
     ) -> Control:
+        ahora = datetime.now().astimezone()
         control = Control(
             realizado=realizado,
-            fecha=date.today(),
-            hora=datetime.now().strftime("%H:%M:%S"),
+            fecha_hora=ahora,
+            fecha=ahora.date(),
+            hora=ahora.strftime("%H:%M:%S"),
             usuario_id=usuario_id,
             tabla_afectada=tabla_afectada,
             registro_id=registro_id,
-            detalles=detalles,
+            detalles=normalizar_detalles(detalles),
             ip_address=ip_address,
             user_agent=user_agent
         )
         self.db.add(control)
+        self._acumular_resumen([{
+            "fecha": control.fecha,
+            "realizado": realizado,
+            "tabla_afectada": tabla_afectada,
+            "usuario_id": usuario_id,
+        }])
         self.db.commit()
         self.db.refresh(control)
         return control
 
-    def get_control_logs(
-        self,
-        filters: Dict[str, Any],
-        skip: int = 0,
-        limit: int = 100
-    ) -> Tuple[List[Control], int]:
+    def bulk_create_control_logs(self, registros: List[Dict[str, Any]]) -> int:
+        """
+        Inserta varios logs en una sola sentencia INSERT multi-fila (con commit).
+        Cada registro trae las mismas claves que create_control_log más
+        fecha_hora, fecha y hora (capturadas al momento de la acción).
         """
-        Obtiene logs filtrados y paginados.
-        Soporta filtros:
+        if not registros:
+            return 0
+        # executemany exige las mismas columnas en todas las filas
+        for registro in registros:
+            if registro.get("fecha_hora") is None:
+                registro["fecha_hora"] = _fecha_hora_de(registro)
+            registro.setdefault("fecha", registro["fecha_hora"].date())
+            registro.setdefault("hora", registro["fecha_hora"].strftime("%H:%M:%S"))
+            registro["detalles"] = normalizar_detalles(registro.get("detalles"))
+        self.db.execute(insert(Control), registros)
+        self._acumular_resumen(registros)
+        self.db.commit()
+        return len(registros)
+
+    def _acumular_resumen(self, registros: List[Dict[str, Any]]) -> None:
+        """
+        Suma los registros a control_resumen_diario (sin commit: va en la
+        transacción del INSERT en control). Upsert por (fecha, realizado,
+        tabla_afectada, usuario_id), en orden de clave para que dos lotes
+        concurrentes no se bloqueen mutuamente.
+        """
+        conteos = Counter(
+            (r["fecha"], r["realizado"], r.get("tabla_afectada") or "", r["usuario_id"])
+            for r in registros
+        )
+        filas = [
+            {"fecha": f, "realizado": r, "tabla_afectada": t, "usuario_id": u, "total": n}
+            for (f, r, t, u), n in sorted(conteos.items())
+        ]
+        if filas:
+            self._upsert_resumen(filas, acumular=True)
+
+    def _upsert_resumen(self, filas: List[Dict[str, Any]], acumular: bool) -> None:
+        """
+        Escribe filas de control_resumen_diario con ON CONFLICT: suma el
+        total al existente (acumular) o lo reemplaza.
+        """
+        dialecto = self.db.get_bind().dialect.name
+        if dialecto == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as insert_upsert
+        elif dialecto == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as insert_upsert
+        else:
+            insert_upsert = None
+
+        if insert_upsert is not None:
+            stmt = insert_upsert(ControlResumenDiario).values(filas)
+            total = stmt.excluded.total
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["fecha", "realizado", "tabla_afectada", "usuario_id"],
+                set_={"total": ControlResumenDiario.total + total if acumular else total},
+            )
+            self.db.execute(stmt)
+            return
+
+        for fila in filas:
+            existente = self.db.get(
+                ControlResumenDiario,
+                (fila["fecha"], fila["realizado"], fila["tabla_afectada"], fila["usuario_id"]),
+            )
+            if existente:
+                existente.total = existente.total + fila["total"] if acumular else fila["total"]
+            else:
+                self.db.add(ControlResumenDiario(**fila))
+        self.db.flush()
+
+    def reconciliar_resumen(self, desde: date, hasta: date) -> int:
+        """
+        Recalcula el resumen de los días [desde, hasta] desde control (con
+        commit). Corrige desvíos, p. ej. filas insertadas por fuera de este
+        servicio. Retorna las filas de resumen escritas.
+
+        Reemplaza cada total con un upsert en lugar de borrar el rango: un
+        INSERT concurrente en control sigue sumando sobre filas que existen.
+        """
+        filas = (
+            self.db.query(
+                Control.fecha,
+                Control.realizado,
+                func.coalesce(Control.tabla_afectada, "").label("tabla_afectada"),
+                Control.usuario_id,
+                func.count(Control.id).label("total"),
+            )
+            .filter(*_rango_fecha_hora(desde, hasta))
+            .group_by(
+                Control.fecha,
+                Control.realizado,
+                func.coalesce(Control.tabla_afectada, ""),
+                Control.usuario_id,
+            )
+            .all()
+        )
+        if filas:
+            # En orden de clave, igual que _acumular_resumen
+            self._upsert_resumen([fila._asdict() for fila in sorted(filas)], acumular=False)
+        self.db.commit()
+        return len(filas)
+
+    # Orden de los listados de auditoría (la última columna desempata);
+    # lo sirve idx_control_fecha_hora / idx_control_usuario_fecha_hora
+    ORDEN_LOGS = (Control.fecha_hora, Control.id)
+
+    def _query_logs(self, filters: Dict[str, Any]):
+        """
+        Query de logs con filtros. Filtros soportados:
           - usuario_id (int)
           - usuario_username (str, búsqueda parcial)
           - fecha_desde / fecha_hasta (date)
           - realizado (str, búsqueda parcial)
           - tabla_afectada (str, búsqueda parcial)
+          - detalles (lista de (ruta, valor), ver parsear_filtro_detalle)
         """
         # Hacemos join con Usuario para poder filtrar por username
         query = (
@@ -83,68 +281,134 @@ class ControlService:
             like_value = f"%{tabla_afectada}%"
             query = query.filter(Control.tabla_afectada.ilike(like_value))
 
-        # Rango de fechas
-        if fecha_desde:
-            query = query.filter(Control.fecha >= fecha_desde)
-        if fecha_hasta:
-            query = query.filter(Control.fecha <= fecha_hasta)
+        # Filtros clave=valor sobre detalles (JSONB)
+        dialecto = self.db.get_bind().dialect.name
+        for ruta, valor in filters.get("detalles") or []:
+            query = query.filter(filtro_detalle(ruta, valor, dialecto))
+
+        # Rango de fechas sobre fecha_hora: usa los índices compuestos y, con
+        # control particionada por mes, solo recorre las particiones del rango
+        condiciones = _rango_fecha_hora(fecha_desde, fecha_hasta)
+        if condiciones:
+            query = query.filter(*condiciones)
+
+        return query
 
-        # Orden: Fecha DESC, luego hora DESC
-        query = query.order_by(
-            desc(Control.fecha),
-            desc(func.cast(Control.hora, String))
+    def get_control_logs_pagina(
+        self,
+        filters: Dict[str, Any],
+        limit: int = 100,
+        skip: int = 0,
+        cursor: Optional[str] = None,
+        conteo: str = "exacto",
+    ) -> "Pagina":
+        """
+        Logs filtrados, ordenados por (fecha_hora, id) DESC.
+
+        Con `cursor` (next_cursor de la página anterior) se pagina por keyset
+        y `skip` se ignora. `conteo` = exacto | estimado | ninguno.
+        """
+        # Import diferido: app.utils importa log_utils, que importa este módulo
+        from app.utils.paginacion import Pagina, contar, paginar_keyset
+
+        query = self._query_logs(filters)
+        total, estimado = contar(
+            self.db, query, conteo, Control.__table__.fullname, filters
+        )
+        logs, next_cursor = paginar_keyset(
+            query, "control", self.ORDEN_LOGS, limit, cursor=cursor, skip=skip
         )
+        return Pagina(logs, total, next_cursor, estimado)
 
-        total = query.count()
-        logs = query.offset(skip).limit(limit).all()
-        return logs, total
+    def get_control_logs(
+        self,
+        filters: Dict[str, Any],
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[Control], int]:
+        """
+        Obtiene logs filtrados y paginados por offset (ver get_control_logs_pagina).
+        """
+        pagina = self.get_control_logs_pagina(filters, limit=limit, skip=skip)
+        return pagina.items, pagina.total
 
     def get_control_stats(
         self,
         fecha_desde: Optional[date] = None,
         fecha_hasta: Optional[date] = None
     ) -> Dict[str, List[Dict[str, Any]]]:
-        query = self.db.query(
-            Control.realizado,
-            Control.tabla_afectada,
-            func.count(Control.id).label("count")
-        )
-        if fecha_desde:
-            query = query.filter(Control.fecha >= fecha_desde)
-        if fecha_hasta:
-            query = query.filter(Control.fecha <= fecha_hasta)
-        query = query.group_by(
-            Control.realizado,
-            Control.tabla_afectada
-        ).order_by(desc(func.count(Control.id)))
-        stats = [row._asdict() for row in query.all()]
+        """
+        Conteos por (realizado, tabla_afectada).
+
+        Los días anteriores a hoy salen de control_resumen_diario; el día de
+        hoy se cuenta en vivo sobre control (un rango pequeño de fecha_hora),
+        así el costo no crece con el historial.
+        """
+        hoy = date.today()
+        conteos: Counter = Counter()
+
+        if fecha_desde is None or fecha_desde < hoy:
+            resumen = self.db.query(
+                ControlResumenDiario.realizado,
+                ControlResumenDiario.tabla_afectada,
+                func.sum(ControlResumenDiario.total),
+            ).filter(ControlResumenDiario.fecha < hoy)
+            if fecha_desde:
+                resumen = resumen.filter(ControlResumenDiario.fecha >= fecha_desde)
+            if fecha_hasta:
+                resumen = resumen.filter(ControlResumenDiario.fecha <= fecha_hasta)
+            resumen = resumen.group_by(ControlResumenDiario.realizado, ControlResumenDiario.tabla_afectada)
+            for realizado, tabla, total in resumen.all():
+                conteos[(realizado, tabla or None)] += int(total or 0)
+
+        if (fecha_desde is None or fecha_desde <= hoy) and (fecha_hasta is None or fecha_hasta >= hoy):
+            en_vivo = (
+                self.db.query(Control.realizado, Control.tabla_afectada, func.count(Control.id))
+                .filter(*_rango_fecha_hora(hoy, hoy))
+                .group_by(Control.realizado, Control.tabla_afectada)
+            )
+            for realizado, tabla, total in en_vivo.all():
+                conteos[(realizado, tabla or None)] += total
+
+        stats = [
+            {"realizado": realizado, "tabla_afectada": tabla, "count": total}
+            for (realizado, tabla), total in conteos.most_common()
+        ]
         return {"stats": stats}
 
+    def search_logs_pagina(
+        self,
+        search_term: str,
+        limit: int = 100,
+        skip: int = 0,
+        cursor: Optional[str] = None,
+        conteo: str = "exacto",
+        fecha_desde: Optional[date] = None,
+        fecha_hasta: Optional[date] = None,
+        orden: str = "fecha",
+    ) -> "Pagina":
+        """
+        Búsqueda de texto (tsvector + pg_trgm en PostgreSQL, ILIKE sin la
+        columna busqueda); ver app.services.busqueda_auditoria.
+        """
+        from app.services.busqueda_auditoria import BusquedaAuditoria
+
+        return BusquedaAuditoria(self.db).buscar(
+            search_term,
+            limit=limit,
+            skip=skip,
+            cursor=cursor,
+            conteo=conteo,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+            orden=orden,
+        )
+
     def search_logs(
         self,
         search_term: str,
         skip: int = 0,
         limit: int = 100
     ) -> Tuple[List[Control], int]:
-        query = (
-            self.db.query(Control)
-            .options(joinedload(Control.usuario))
-            .join(Control.usuario)
-        )
-
-        if search_term:
-            search_like = f"%{search_term}%"
-            query = query.filter(
-                or_(
-                    Control.realizado.like(search_like),
-                    Control.detalles.like(search_like),
-                    Control.tabla_afectada.like(search_like),
-                    Usuario.username.like(search_like),
-                    Usuario.nombre.like(search_like),
-                )
-            )
-
-        query = query.order_by(desc(Control.fecha))
-        total = query.count()
-        logs = query.offset(skip).limit(limit).all()
-        return logs, total
+        pagina = self.search_logs_pagina(search_term, limit=limit, skip=skip)
+        return pagina.items, pagina.total
@@ -0,0 +1,179 @@
+"""
+Índice en memoria para el autocompletado de personas por cédula y nombre.
+
+Reemplaza la descarga completa de /personas/cedulas que hacía el frontend
+para autocompletar localmente. Dos arreglos ordenados de (clave, id):
+
+- cédulas tal cual están guardadas;
+- cada palabra de nombre y apellido, en minúsculas y sin acentos.
+
+Un prefijo se resuelve con bisect en O(log n) más los resultados leídos.
+Las escrituras de api_personas actualizan el índice (actualizar/quitar);
+además el índice vence cada settings.autocompletar_ttl segundos para
+recoger cambios de otros procesos.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Persona
+from app.services.busqueda_personas import terminos
+
+
+def _palabras(nombre: Optional[str], apellido: Optional[str]) -> List[str]:
+    return sorted(set(terminos(f"{nombre or ''} {apellido or ''}")))
+
+
+class IndicePrefijos:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._personas: Dict[int, Tuple[str, str, str]] = {}  # id -> (documento, nombre, apellido)
+        self._cedulas: List[Tuple[str, int]] = []
+        self._nombres: List[Tuple[str, int]] = []
+        self._cargado_en: Optional[float] = None
+        self._lock = threading.RLock()
+        self.cargas = 0
+
+    def _vigente(self) -> bool:
+        return self._cargado_en is not None and time.monotonic() - self._cargado_en < self.ttl
+
+    def asegurar(self, db: Session) -> None:
+        """Carga el índice si no existe o venció."""
+        if self._vigente():
+            return
+        with self._lock:
+            if not self._vigente():
+                self._cargar(db)
+
+    def _cargar(self, db: Session) -> None:
+        personas: Dict[int, Tuple[str, str, str]] = {}
+        cedulas: List[Tuple[str, int]] = []
+        nombres: List[Tuple[str, int]] = []
+        filas = (
+            db.query(Persona.id, Persona.documento_identidad, Persona.nombre, Persona.apellido)
+            .yield_per(5000)
+        )
+        for persona_id, documento, nombre, apellido in filas:
+            personas[persona_id] = (documento, nombre, apellido)
+            cedulas.append((documento, persona_id))
+            nombres.extend((palabra, persona_id) for palabra in _palabras(nombre, apellido))
+        cedulas.sort()
+        nombres.sort()
+        self._personas, self._cedulas, self._nombres = personas, cedulas, nombres
+        self._cargado_en = time.monotonic()
+        self.cargas += 1
+
+    # ------------------------------------------------------------------
+    # Actualización incremental (escrituras de api_personas)
+    # ------------------------------------------------------------------
+
+    def actualizar(self, persona: Persona) -> None:
+        """Agrega o reemplaza una persona; no-op si el índice no está cargado."""
+        with self._lock:
+            if self._cargado_en is None:
+                return
+            self._quitar(persona.id)
+            self._personas[persona.id] = (persona.documento_identidad, persona.nombre, persona.apellido)
+            insort(self._cedulas, (persona.documento_identidad, persona.id))
+            for palabra in _palabras(persona.nombre, persona.apellido):
+                insort(self._nombres, (palabra, persona.id))
+
+    def quitar(self, persona_id: int) -> None:
+        with self._lock:
+            if self._cargado_en is not None:
+                self._quitar(persona_id)
+
+    def _quitar(self, persona_id: int) -> None:
+        anterior = self._personas.pop(persona_id, None)
+        if anterior is None:
+            return
+        documento, nombre, apellido = anterior
+        self._borrar(self._cedulas, (documento, persona_id))
+        for palabra in _palabras(nombre, apellido):
+            self._borrar(self._nombres, (palabra, persona_id))
+
+    @staticmethod
+    def _borrar(arreglo: List[Tuple[str, int]], clave: Tuple[str, int]) -> None:
+        i = bisect_left(arreglo, clave)
+        if i < len(arreglo) and arreglo[i] == clave:
+            del arreglo[i]
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def buscar(self, db: Session, prefijo: str, limite: int = 10) -> List[Dict[str, Any]]:
+        """
+        Personas cuya cédula empieza por `prefijo` o, si tiene letras, cuyas
+        palabras de nombre/apellido empiezan por cada término del prefijo.
+        """
+        prefijo = (prefijo or "").strip()
+        if not prefijo:
+            return []
+        self.asegurar(db)
+
+        with self._lock:
+            if not any(ch.isalpha() for ch in prefijo):
+                ids = self._rango(self._cedulas, prefijo.replace(" ", ""), limite)
+            else:
+                tokens = terminos(prefijo)
+                # El término más largo acota más el rango; los demás se verifican por persona
+                resto = sorted(tokens, key=len)
+                principal = resto.pop()
+                ids = self._rango(
+                    self._nombres, principal, limite,
+                    lambda persona_id: self._coincide(persona_id, resto),
+                )
+            return [
+                {
+                    "id": persona_id,
+                    "documento_identidad": self._personas[persona_id][0],
+                    "nombre": self._personas[persona_id][1],
+                    "apellido": self._personas[persona_id][2],
+                }
+                for persona_id in ids
+            ]
+
+    def _coincide(self, persona_id: int, tokens: List[str]) -> bool:
+        _, nombre, apellido = self._personas[persona_id]
+        palabras = _palabras(nombre, apellido)
+        return all(any(p.startswith(t) for p in palabras) for t in tokens)
+
+    @staticmethod
+    def _rango(arreglo, prefijo: str, limite: int, filtro=None) -> List[int]:
+        ids: List[int] = []
+        vistos = set()
+        # Recorre por índice: un slice copiaría la cola del arreglo
+        for i in range(bisect_left(arreglo, (prefijo,)), len(arreglo)):
+            clave, persona_id = arreglo[i]
+            if not clave.startswith(prefijo) or len(ids) >= limite:
+                break
+            if persona_id in vistos or (filtro and not filtro(persona_id)):
+                continue
+            vistos.add(persona_id)
+            ids.append(persona_id)
+        return ids
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._personas, self._cedulas, self._nombres = {}, [], []
+            self._cargado_en = None
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "ttl": self.ttl,
+            "cargas": self.cargas,
+            "cargado": self._cargado_en is not None,
+            "edad_segundos": round(time.monotonic() - self._cargado_en, 1) if self._cargado_en else None,
+            "personas": len(self._personas),
+            "claves_nombre": len(self._nombres),
+        }
+
+
+# Instancia global
+indice_personas = IndicePrefijos(ttl=settings.autocompletar_ttl)
@@ -0,0 +1,148 @@
+"""
+Búsqueda de texto en la auditoría (tabla control) para /audit/search.
+
+PostgreSQL (migración 0003):
+- control.busqueda es un tsvector mantenido por trigger al insertar
+  (realizado con peso A, tabla_afectada B, detalles C) con índice GIN;
+- realizado, tabla_afectada, usuario.username y usuario.nombre tienen
+  índices GIN pg_trgm, así los ILIKE '%termino%' no recorren la tabla;
+- los usuarios que coinciden se resuelven antes en una consulta aparte
+  (trigram sobre usuario): el filtro sobre control queda solo con
+  predicados de control (`usuario_id IN (...)` OR ILIKE OR @@) y el
+  planificador puede combinarlos con BitmapOr;
+- orden "relevancia" usa ts_rank_cd.
+
+Sin la columna busqueda (SQLite en pruebas, o antes de la migración 0003)
+se usa la misma consulta con ILIKE sobre detalles en lugar del tsvector; el
+orden "relevancia" cae al orden por fecha.
+"""
+
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Text, cast, desc, func, literal_column, or_, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Session, contains_eager
+
+from app.models import Control, Usuario
+from app.services.Control_service import ControlService, _rango_fecha_hora
+from app.utils.paginacion import Pagina, contar, paginar_keyset
+
+# Debe coincidir con la configuración usada por el trigger de la migración 0003
+CONFIG_TS = "spanish"
+
+ORDEN_FECHA = "fecha"
+ORDEN_RELEVANCIA = "relevancia"
+ORDENES = (ORDEN_FECHA, ORDEN_RELEVANCIA)
+
+
+# ¿control.busqueda existe? (None = sin verificar). Una base creada solo con
+# create_tables() y sin `alembic upgrade` no tiene la columna ni el trigger.
+_tiene_tsvector: Optional[bool] = None
+
+
+def _columna_busqueda_disponible(db: Session) -> bool:
+    global _tiene_tsvector
+    if _tiene_tsvector is None:
+        if db.get_bind().dialect.name != "postgresql":
+            return False
+        esquema, _, tabla = Control.__table__.fullname.rpartition(".")
+        _tiene_tsvector = bool(db.execute(
+            text("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = coalesce(nullif(:esquema, ''), current_schema())
+                  AND table_name = :tabla AND column_name = 'busqueda'
+            """),
+            {"esquema": esquema, "tabla": tabla},
+        ).scalar())
+    return _tiene_tsvector
+
+
+class BusquedaAuditoria:
+    """Búsqueda paginada sobre control (tsvector + pg_trgm en PostgreSQL)."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _query_base(self, fecha_desde: Optional[date], fecha_hasta: Optional[date]):
+        # contains_eager reutiliza el JOIN (sin subconsulta envolvente del joinedload)
+        query = (
+            self.db.query(Control)
+            .join(Control.usuario)
+            .options(contains_eager(Control.usuario))
+        )
+        condiciones = _rango_fecha_hora(fecha_desde, fecha_hasta)
+        if condiciones:
+            query = query.filter(*condiciones)
+        return query
+
+    def _usuarios_coincidentes(self, like: str) -> List[int]:
+        """Ids de usuario cuyo username o nombre contienen el término (índices trigram)."""
+        filas = self.db.query(Usuario.id).filter(
+            or_(Usuario.username.ilike(like), Usuario.nombre.ilike(like))
+        ).all()
+        return [fila.id for fila in filas]
+
+    def _query_busqueda(self, termino: str, fecha_desde: Optional[date] = None, fecha_hasta: Optional[date] = None) -> Tuple:
+        """
+        (query, rank) de la búsqueda: rank es None si no hay término o la
+        base no tiene la columna busqueda.
+        """
+        query = self._query_base(fecha_desde, fecha_hasta)
+        if not termino:
+            return query, None
+
+        like = f"%{termino}%"
+        rank = None
+        condiciones = [
+            Control.realizado.ilike(like),
+            Control.tabla_afectada.ilike(like),
+        ]
+        usuarios = self._usuarios_coincidentes(like)
+        if usuarios:
+            condiciones.append(Control.usuario_id.in_(usuarios))
+        if _columna_busqueda_disponible(self.db):
+            tsquery = func.websearch_to_tsquery(CONFIG_TS, termino)
+            vector = literal_column(f"{Control.__table__.fullname}.busqueda", type_=TSVECTOR)
+            condiciones.append(vector.op("@@")(tsquery))
+            rank = func.ts_rank_cd(vector, tsquery)
+        else:
+            condiciones.append(cast(Control.detalles, Text).ilike(like))
+        return query.filter(or_(*condiciones)), rank
+
+    def buscar(
+        self,
+        termino: str,
+        limit: int = 100,
+        skip: int = 0,
+        cursor: Optional[str] = None,
+        conteo: str = "exacto",
+        fecha_desde: Optional[date] = None,
+        fecha_hasta: Optional[date] = None,
+        orden: str = ORDEN_FECHA,
+    ) -> Pagina:
+        """
+        Con orden "fecha" pagina por cursor (fecha_hora, id) DESC; con
+        "relevancia" ordena por puntaje y pagina por `skip`.
+        """
+        termino = (termino or "").strip()
+        query, rank = self._query_busqueda(termino, fecha_desde, fecha_hasta)
+        filtros = {"search_term": termino, "fecha_desde": fecha_desde, "fecha_hasta": fecha_hasta}
+        total, estimado = contar(self.db, query, conteo, Control.__table__.fullname, filtros)
+
+        if orden == ORDEN_RELEVANCIA and rank is not None:
+            filas = (
+                query.add_columns(rank.label("puntaje"))
+                .order_by(desc("puntaje"), Control.fecha_hora.desc(), Control.id.desc())
+                .offset(skip)
+                .limit(limit)
+                .all()
+            )
+            items = [control for control, _ in filas]
+            puntajes = {control.id: float(puntaje) for control, puntaje in filas}
+            return Pagina(items, total, None, estimado, puntajes)
+
+        items, next_cursor = paginar_keyset(
+            query, "control", ControlService.ORDEN_LOGS, limit, cursor=cursor, skip=skip
+        )
+        return Pagina(items, total, next_cursor, estimado)
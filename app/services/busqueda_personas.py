@@ -0,0 +1,151 @@
+"""
+Búsqueda de personas con un solo término (`q`) sobre nombre, apellido,
+cédula, email y empresa, sin distinguir acentos ni mayúsculas.
+
+PostgreSQL (migración 0006): la función inmutable persona_texto_busqueda()
+une los cinco campos en minúsculas y sin acentos (unaccent) y tiene un
+índice GIN pg_trgm por expresión, así los LIKE '%termino%' no recorren la
+tabla. Cada palabra del término debe aparecer (AND); el orden es por
+word_similarity más un bono si la cédula empieza por los dígitos buscados.
+
+SQLite (pruebas): la misma consulta, con persona_texto_busqueda() y
+persona_puntaje() registradas como funciones de la conexión (normalizar y
+puntaje de este módulo). El filtro, el orden y el LIMIT se resuelven en la
+base: solo se cargan las personas de la página.
+"""
+
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, desc, event, func, literal, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models import Persona
+from app.utils.paginacion import Pagina, contar
+
+SCHEMA = "sistema_gestiones"
+CAMPOS = ("nombre", "apellido", "documento_identidad", "email", "empresa")
+
+
+def normalizar(texto: Optional[str]) -> str:
+    """Minúsculas y sin acentos (equivalente a lower(unaccent(...)))."""
+    if not texto:
+        return ""
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c)
+    ).lower()
+
+
+def terminos(consulta: Optional[str]) -> List[str]:
+    """Palabras normalizadas de la consulta (separadas por espacios)."""
+    return [t for t in normalizar(consulta).split() if t]
+
+
+def _escapar_like(termino: str) -> str:
+    return re.sub(r"([\\%_])", r"\\\1", termino)
+
+
+def puntaje(persona_campos: Tuple[str, ...], tokens: List[str], digitos: str) -> Optional[float]:
+    """
+    Puntaje de una persona para el respaldo sin PostgreSQL; None si falta
+    algún término. Palabra exacta 3, inicio de palabra 2, subcadena 1.
+    """
+    texto = " ".join(normalizar(c) for c in persona_campos if c)
+    palabras = re.split(r"[\s@.]+", texto)
+    total = 0.0
+    for token in tokens:
+        if token not in texto:
+            return None
+        if token in palabras:
+            total += 3
+        elif any(p.startswith(token) for p in palabras):
+            total += 2
+        else:
+            total += 1
+    documento = persona_campos[CAMPOS.index("documento_identidad")] or ""
+    if digitos and documento.startswith(digitos):
+        total += 5
+    return total / len(tokens)
+
+
+def _texto_sqlite(*campos: Optional[str]) -> str:
+    return " ".join(normalizar(c) for c in campos if c)
+
+
+def _puntaje_sqlite(consulta: str, digitos: str, *campos: Optional[str]) -> Optional[float]:
+    return puntaje(campos, consulta.split(), digitos)
+
+
+@event.listens_for(Engine, "connect")
+def _registrar_funciones_sqlite(conexion_dbapi, _registro) -> None:
+    # Solo las conexiones sqlite3 (y el adaptador de aiosqlite) tienen create_function
+    if hasattr(conexion_dbapi, "create_function"):
+        conexion_dbapi.create_function("persona_texto_busqueda", len(CAMPOS), _texto_sqlite)
+        conexion_dbapi.create_function("persona_puntaje", len(CAMPOS) + 2, _puntaje_sqlite)
+
+
+# ¿Existe persona_texto_busqueda()? (None = sin verificar)
+_tiene_funcion: Optional[bool] = None
+
+
+def _funcion_busqueda_disponible(db: Session) -> bool:
+    global _tiene_funcion
+    if _tiene_funcion is None:
+        _tiene_funcion = bool(db.execute(
+            text("SELECT to_regprocedure(:firma) IS NOT NULL"),
+            {"firma": f"{SCHEMA}.persona_texto_busqueda(text, text, text, text, text)"},
+        ).scalar())
+    return _tiene_funcion
+
+
+class BusquedaPersonas:
+    """Búsqueda paginada (por `skip`) y ordenada por relevancia."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def buscar(self, consulta: str, limit: int = 10, skip: int = 0, conteo: str = "exacto") -> Pagina:
+        tokens = terminos(consulta)
+        if not tokens:
+            return Pagina([], 0 if conteo != "ninguno" else None, None)
+        digitos = "".join(ch for ch in consulta if ch.isdigit())
+        columnas = [getattr(Persona, c) for c in CAMPOS]
+        if self.db.get_bind().dialect.name != "postgresql":
+            texto = func.persona_texto_busqueda(*columnas)
+            rank = func.persona_puntaje(" ".join(tokens), digitos, *columnas)
+            return self._paginar(texto, rank, tokens, limit, skip, conteo)
+
+        if _funcion_busqueda_disponible(self.db):
+            texto = getattr(func, SCHEMA).persona_texto_busqueda(*columnas)
+        else:
+            # Sin la migración: sin índice ni unaccent, pero con el mismo resultado salvo acentos
+            texto = func.lower(func.concat_ws(" ", *columnas))
+        rank = func.word_similarity(literal(" ".join(tokens)), texto)
+        if digitos:
+            rank = rank + case(
+                (Persona.documento_identidad.like(f"{digitos}%"), 1.0), else_=0.0
+            )
+        return self._paginar(texto, rank, tokens, limit, skip, conteo)
+
+    def _paginar(self, texto, rank, tokens, limit, skip, conteo) -> Pagina:
+        """Filtra cada término sobre `texto` y pagina ordenando por `rank`."""
+        query = self.db.query(Persona)
+        for token in tokens:
+            query = query.filter(texto.like(f"%{_escapar_like(token)}%", escape="\\"))
+
+        total, estimado = contar(
+            self.db, query, conteo, Persona.__table__.fullname, {"q": " ".join(tokens)}
+        )
+
+        filas = (
+            query.add_columns(rank.label("puntaje"))
+            .order_by(desc("puntaje"), Persona.id)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+        items = [persona for persona, _ in filas]
+        puntajes = {persona.id: float(p) for persona, p in filas}
+        return Pagina(items, total, None, estimado, puntajes)
@@ -0,0 +1,173 @@
+"""
+Caché en memoria de los catálogos casi estáticos: estados de visita, tipos
+de actividad, roles, áreas y centros de datos.
+
+Se cargan una vez (5 consultas) y se sirven desde memoria. Las escrituras de
+api_centros_datos llaman a invalidar(), que avanza una VersionCompartida
+para que los demás workers descarten su snapshot; además el snapshot vence
+cada settings.catalogo_cache_ttl segundos para recoger la carga directa en
+la BD.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import Area, CentroDatos, EstadoVisita, RolUsuario, TipoActividad
+from app.services.estado_compartido import VersionCompartida
+
+
+@dataclass(frozen=True)
+class Catalogos:
+    estados: Dict[int, str]
+    tipos_actividad: Dict[int, str]
+    roles: Dict[int, str]
+    areas: Dict[int, Tuple[str, int]]  # id -> (nombre, id_centro_datos)
+    centros: Dict[int, Dict[str, Any]]  # id -> {id, nombre, codigo, direccion, ciudad, activo}
+    firma: str  # hash del contenido, base de los ETag
+    cargado_en: float
+    version: int = 0  # VersionCompartida al cargar
+
+
+class CatalogoCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._catalogos: Optional[Catalogos] = None
+        self._lock = threading.Lock()
+        self._version = VersionCompartida("catalogos")
+        self.cargas = 0
+
+    def _vigente(self, catalogos: Optional[Catalogos], version: int) -> bool:
+        return (
+            catalogos is not None
+            and catalogos.version == version
+            and time.monotonic() - catalogos.cargado_en < self.ttl
+        )
+
+    def obtener(self, db: Session) -> Catalogos:
+        """Retorna el snapshot vigente; lo (re)carga con db si no hay, venció u otro worker invalidó."""
+        catalogos = self._catalogos
+        version = self._version.actual()
+        if self._vigente(catalogos, version):
+            return catalogos
+        with self._lock:
+            catalogos = self._catalogos
+            if not self._vigente(catalogos, version):
+                catalogos = self._cargar(db, version)
+                self._catalogos = catalogos
+                self.cargas += 1
+            return catalogos
+
+    def invalidar(self) -> None:
+        self._catalogos = None
+        self._version.avanzar()
+
+    def etag(self, db: Session, recurso: str) -> str:
+        return f'"{recurso}-{self.obtener(db).firma}"'
+
+    # ------------------------------------------------------------------
+    # Consultas en memoria
+    # ------------------------------------------------------------------
+
+    def existe(self, db: Session, catalogo: str, id_: int) -> bool:
+        return id_ in getattr(self.obtener(db), catalogo)
+
+    def centros_activos(self, db: Session) -> List[Dict[str, Any]]:
+        return [
+            {"id": c["id"], "nombre": c["nombre"]}
+            for c in self.obtener(db).centros.values() if c["activo"]
+        ]
+
+    def centro(self, db: Session, centro_id: int) -> Optional[Dict[str, Any]]:
+        return self.obtener(db).centros.get(centro_id)
+
+    def tipos_actividad(self, db: Session) -> List[Dict[str, Any]]:
+        return [
+            {"id_tipo_actividad": i, "nombre_actividad": nombre}
+            for i, nombre in self.obtener(db).tipos_actividad.items()
+        ]
+
+    def areas_por_centro(self, db: Session, centro_datos_id: int) -> List[Dict[str, Any]]:
+        return [
+            {"id": i, "nombre": nombre}
+            for i, (nombre, id_centro) in self.obtener(db).areas.items()
+            if id_centro == centro_datos_id
+        ]
+
+    def nombres_areas(self, db: Session, area_ids: List[int]) -> List[str]:
+        areas = self.obtener(db).areas
+        return [areas[i][0] for i in area_ids if i in areas]
+
+    def nombre_estado(self, db: Session, estado_id: Optional[int]) -> Optional[str]:
+        return self.obtener(db).estados.get(estado_id) if estado_id is not None else None
+
+    def nombre_tipo_actividad(self, db: Session, tipo_id: Optional[int]) -> Optional[str]:
+        return self.obtener(db).tipos_actividad.get(tipo_id) if tipo_id is not None else None
+
+    def estadisticas(self) -> Dict[str, Any]:
+        catalogos = self._catalogos
+        return {
+            "ttl": self.ttl,
+            "cargas": self.cargas,
+            "cargado": catalogos is not None,
+            "edad_segundos": round(time.monotonic() - catalogos.cargado_en, 1) if catalogos else None,
+            "tamanos": {
+                "estados": len(catalogos.estados),
+                "tipos_actividad": len(catalogos.tipos_actividad),
+                "roles": len(catalogos.roles),
+                "areas": len(catalogos.areas),
+                "centros": len(catalogos.centros),
+            } if catalogos else {},
+        }
+
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _cargar(db: Session, version: int = 0) -> Catalogos:
+        estados = dict(db.query(EstadoVisita.id_estado, EstadoVisita.nombre_estado).order_by(EstadoVisita.id_estado).all())
+        tipos = dict(
+            db.query(TipoActividad.id_tipo_actividad, TipoActividad.nombre_actividad)
+            .order_by(TipoActividad.id_tipo_actividad).all()
+        )
+        roles = dict(db.query(RolUsuario.id_rol, RolUsuario.nombre_rol).order_by(RolUsuario.id_rol).all())
+        areas = {
+            a_id: (nombre, id_centro)
+            for a_id, nombre, id_centro in db.query(Area.id, Area.nombre, Area.id_centro_datos).order_by(Area.id).all()
+        }
+        centros = {
+            c.id: {
+                "id": c.id,
+                "nombre": c.nombre,
+                "codigo": c.codigo,
+                "direccion": c.direccion,
+                "ciudad": c.ciudad,
+                "activo": bool(c.activo),
+            }
+            for c in db.query(
+                CentroDatos.id, CentroDatos.nombre, CentroDatos.codigo,
+                CentroDatos.direccion, CentroDatos.ciudad, CentroDatos.activo,
+            ).order_by(CentroDatos.id).all()
+        }
+        contenido = json.dumps(
+            [estados, tipos, roles, areas, centros], sort_keys=True, default=str, ensure_ascii=False
+        )
+        return Catalogos(
+            estados=estados,
+            tipos_actividad=tipos,
+            roles=roles,
+            areas=areas,
+            centros=centros,
+            firma=hashlib.sha1(contenido.encode("utf-8")).hexdigest()[:16],
+            cargado_en=time.monotonic(),
+            version=version,
+        )
+
+
+# Instancia global
+catalogo_cache = CatalogoCache(ttl=settings.catalogo_cache_ttl)
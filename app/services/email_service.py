@@ -4,6 +4,7 @@ Compatible con FastMail y SMTP nativo.
 """
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
 from typing import List, Optional
+import asyncio
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -89,17 +90,24 @@ class EmailService:
             print(f"📎 PDF: {attachment_name}")
 
         try:
-            server = smtplib.SMTP(settings.mail_server, settings.mail_port)
-            if settings.mail_tls:
-                server.starttls()
-            server.login(settings.mail_username, settings.mail_password)
-            server.send_message(msg)
-            server.quit()
+            # smtplib es bloqueante: se ejecuta en un hilo para no frenar el event loop
+            await asyncio.to_thread(self._enviar_smtp, msg)
             print(f"✅ Email+PDF → {email}")
             return True
         except Exception as e:
             print(f"❌ SMTP error: {e}")
             return False
+
+    @staticmethod
+    def _enviar_smtp(msg: MIMEMultipart) -> None:
+        server = smtplib.SMTP(settings.mail_server, settings.mail_port, timeout=30)
+        try:
+            if settings.mail_tls:
+                server.starttls()
+            server.login(settings.mail_username, settings.mail_password)
+            server.send_message(msg)
+        finally:
+            server.quit()
     
     # Tus métodos existentes (sin cambios)
     async def send_password_reset_email(self, email: str, username: str, reset_token: str) -> bool:
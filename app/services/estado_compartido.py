@@ -0,0 +1,294 @@
+"""
+Estado compartido entre workers (gunicorn con varios procesos uvicorn).
+
+Los contadores de rate limiting, las versiones de las cachés locales y el
+progreso de las exportaciones no pueden vivir en un dict por proceso cuando
+hay varios workers. Dos implementaciones con la misma interfaz:
+
+- EstadoMemoria: dict con vencimiento, dentro del proceso (un solo worker,
+  pruebas, desarrollo).
+- EstadoRedis: el servicio redis de docker-compose (ESTADO_BACKEND=redis).
+
+Si Redis no está instalado o no responde al iniciar se usa EstadoMemoria
+(con un aviso en el log). Un error de Redis durante una operación no tumba
+la petición: el contador responde 0 (no limita) y las lecturas None.
+
+Las cachés locales (principal_cache, catalogo_cache) siguen en memoria de
+cada worker; VersionCompartida les avisa cuando otro worker invalidó.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+
+try:
+    import redis
+    import redis.asyncio as redis_async
+except ImportError:  # pragma: no cover - redis es opcional
+    redis = None
+    redis_async = None
+
+logger = logging.getLogger(__name__)
+
+
+class EstadoMemoria:
+    """Estado en memoria del proceso; las claves vencidas se purgan periódicamente."""
+
+    nombre = "memoria"
+    storage_uri = "memory://"
+
+    def __init__(self, intervalo_purga: float = 60.0):
+        self._datos: Dict[str, Tuple[Any, Optional[float]]] = {}  # clave -> (valor, vence)
+        self._lock = threading.Lock()
+        self._intervalo_purga = intervalo_purga
+        self._ultima_purga = time.monotonic()
+
+    def _vigente(self, clave: str, ahora: float) -> Optional[Tuple[Any, Optional[float]]]:
+        entrada = self._datos.get(clave)
+        if entrada is not None and entrada[1] is not None and entrada[1] <= ahora:
+            del self._datos[clave]
+            return None
+        return entrada
+
+    def _purgar(self, ahora: float) -> None:
+        if ahora - self._ultima_purga < self._intervalo_purga:
+            return
+        self._ultima_purga = ahora
+        for clave in [k for k, (_, vence) in self._datos.items() if vence is not None and vence <= ahora]:
+            del self._datos[clave]
+
+    def incrementar(self, clave: str, ttl: Optional[float] = None, cantidad: int = 1) -> int:
+        """Suma `cantidad` y retorna el nuevo valor; el TTL corre desde la creación de la clave."""
+        ahora = time.monotonic()
+        with self._lock:
+            self._purgar(ahora)
+            entrada = self._vigente(clave, ahora)
+            if entrada is None:
+                valor, vence = cantidad, (ahora + ttl if ttl else None)
+            else:
+                valor, vence = int(entrada[0]) + cantidad, entrada[1]
+            self._datos[clave] = (valor, vence)
+            return valor
+
+    async def incrementar_async(self, clave: str, ttl: Optional[float] = None, cantidad: int = 1) -> int:
+        return self.incrementar(clave, ttl, cantidad)
+
+    async def incrementar_con_previo_async(self, clave: str, previa: str, ttl: Optional[float] = None) -> Tuple[int, int]:
+        """Incrementa `clave` y retorna (su valor, valor de `previa`) (ventanas del limitador)."""
+        return self.incrementar(clave, ttl), int(self.obtener(previa) or 0)
+
+    async def obtener_async(self, clave: str) -> Optional[str]:
+        return self.obtener(clave)
+
+    def obtener(self, clave: str) -> Optional[str]:
+        with self._lock:
+            entrada = self._vigente(clave, time.monotonic())
+            return None if entrada is None else str(entrada[0])
+
+    def guardar(self, clave: str, valor: str, ttl: Optional[float] = None) -> None:
+        ahora = time.monotonic()
+        with self._lock:
+            self._purgar(ahora)
+            self._datos[clave] = (valor, ahora + ttl if ttl else None)
+
+    def borrar(self, clave: str) -> None:
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.nombre, "claves": len(self._datos)}
+
+
+class EstadoRedis:
+    """Estado en Redis; todas las claves llevan `prefijo`."""
+
+    nombre = "redis"
+
+    def __init__(self, url: str, prefijo: str = "gestion:", timeout: float = 0.5):
+        self.storage_uri = url
+        self.prefijo = prefijo
+        self._cliente = redis.Redis.from_url(
+            url, socket_timeout=timeout, socket_connect_timeout=timeout, decode_responses=True
+        )
+        # El cliente asyncio se crea en el loop del worker (primer uso)
+        self._url = url
+        self._timeout = timeout
+        self._cliente_async = None
+        self.errores = 0
+
+    def _clave(self, clave: str) -> str:
+        return self.prefijo + clave
+
+    def _error(self, operacion: str, exc: Exception) -> None:
+        self.errores += 1
+        logger.warning("Redis no disponible en %s: %s", operacion, exc)
+
+    def ping(self) -> bool:
+        return bool(self._cliente.ping())
+
+    def incrementar(self, clave: str, ttl: Optional[float] = None, cantidad: int = 1) -> int:
+        try:
+            pipe = self._cliente.pipeline()
+            pipe.incrby(self._clave(clave), cantidad)
+            if ttl:
+                pipe.expire(self._clave(clave), int(ttl), nx=True)
+            return int(pipe.execute()[0])
+        except redis.RedisError as exc:
+            self._error("incrementar", exc)
+            return 0
+
+    async def incrementar_async(self, clave: str, ttl: Optional[float] = None, cantidad: int = 1) -> int:
+        try:
+            pipe = self._async().pipeline()
+            pipe.incrby(self._clave(clave), cantidad)
+            if ttl:
+                pipe.expire(self._clave(clave), int(ttl), nx=True)
+            return int((await pipe.execute())[0])
+        except redis.RedisError as exc:
+            self._error("incrementar", exc)
+            return 0
+
+    def _async(self):
+        if self._cliente_async is None:
+            self._cliente_async = redis_async.Redis.from_url(
+                self._url, socket_timeout=self._timeout,
+                socket_connect_timeout=self._timeout, decode_responses=True,
+            )
+        return self._cliente_async
+
+    async def incrementar_con_previo_async(self, clave: str, previa: str, ttl: Optional[float] = None) -> Tuple[int, int]:
+        """INCR + EXPIRE de `clave` y GET de `previa` en un solo viaje; (0, 0) si Redis falla."""
+        try:
+            pipe = self._async().pipeline()
+            pipe.incr(self._clave(clave))
+            if ttl:
+                pipe.expire(self._clave(clave), int(ttl), nx=True)
+            pipe.get(self._clave(previa))
+            resultados = await pipe.execute()
+            return int(resultados[0]), int(resultados[-1] or 0)
+        except redis.RedisError as exc:
+            self._error("incrementar", exc)
+            return 0, 0
+
+    def obtener(self, clave: str) -> Optional[str]:
+        try:
+            return self._cliente.get(self._clave(clave))
+        except redis.RedisError as exc:
+            self._error("obtener", exc)
+            return None
+
+    async def obtener_async(self, clave: str) -> Optional[str]:
+        try:
+            return await self._async().get(self._clave(clave))
+        except redis.RedisError as exc:
+            self._error("obtener", exc)
+            return None
+
+    def guardar(self, clave: str, valor: str, ttl: Optional[float] = None) -> None:
+        try:
+            self._cliente.set(self._clave(clave), valor, ex=int(ttl) if ttl else None)
+        except redis.RedisError as exc:
+            self._error("guardar", exc)
+
+    def borrar(self, clave: str) -> None:
+        try:
+            self._cliente.delete(self._clave(clave))
+        except redis.RedisError as exc:
+            self._error("borrar", exc)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        datos: Dict[str, Any] = {"backend": self.nombre, "errores": self.errores}
+        try:
+            info = self._cliente.info(section="clients")
+            datos["clientes_conectados"] = info.get("connected_clients")
+        except redis.RedisError as exc:
+            datos["error"] = str(exc)
+        return datos
+
+
+def crear_estado():
+    """Backend según settings.estado_backend ("memoria" | "redis")."""
+    if settings.estado_backend.lower() != "redis":
+        return EstadoMemoria()
+    if redis is None:
+        logger.warning("ESTADO_BACKEND=redis sin el paquete redis instalado; se usa memoria por proceso")
+        return EstadoMemoria()
+    try:
+        estado = EstadoRedis(settings.redis_url)
+        estado.ping()
+        return estado
+    except Exception as exc:
+        logger.warning("Redis no disponible (%s); se usa memoria por proceso", exc)
+        return EstadoMemoria()
+
+
+class VersionCompartida:
+    """
+    Número de versión de una caché local. invalidar() en un worker la
+    avanza; los demás la releen como máximo cada `intervalo` segundos y
+    descartan su copia si cambió.
+
+    Dentro del event loop la relectura en Redis no bloquea: actual() retorna
+    el valor conocido y lanza una tarea con el cliente asyncio que lo
+    actualiza. Fuera del loop (hilos, scripts) se lee de forma síncrona.
+    """
+
+    def __init__(self, nombre: str, estado=None, intervalo: Optional[float] = None):
+        self.clave = f"version:{nombre}"
+        self._estado = estado
+        self.intervalo = settings.estado_version_intervalo if intervalo is None else intervalo
+        self._valor = 0
+        self._leida_en: Optional[float] = None
+        self._relectura: Optional[asyncio.Task] = None
+
+    @property
+    def estado(self):
+        return self._estado or estado_compartido
+
+    def actual(self) -> int:
+        ahora = time.monotonic()
+        if self._leida_en is not None and ahora - self._leida_en < self.intervalo:
+            return self._valor
+        estado = self.estado
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or estado.nombre == "memoria":
+            self._valor = int(estado.obtener(self.clave) or 0)
+            self._leida_en = ahora
+        elif self._relectura is None or self._relectura.done():
+            self._relectura = loop.create_task(self._releer(estado))
+        return self._valor
+
+    async def _releer(self, estado) -> None:
+        self._valor = int(await estado.obtener_async(self.clave) or 0)
+        self._leida_en = time.monotonic()
+
+    def avanzar(self) -> int:
+        self._valor = self.estado.incrementar(self.clave)
+        self._leida_en = time.monotonic()
+        return self._valor
+
+
+def guardar_json(clave: str, valor: Any, ttl: Optional[float] = None, estado=None) -> None:
+    (estado or estado_compartido).guardar(clave, json.dumps(valor, default=str), ttl)
+
+
+def obtener_json(clave: str, estado=None) -> Any:
+    valor = (estado or estado_compartido).obtener(clave)
+    return None if valor is None else json.loads(valor)
+
+
+# Instancia global
+estado_compartido = crear_estado()
@@ -0,0 +1,215 @@
+"""
+Almacén de fotos de personas para la generación de PDFs.
+
+- Indexa una vez los directorios de fotos (nombre de archivo -> ruta) en
+  lugar de probar resolve()/exists() en cada directorio por cada PDF.
+- Mantiene un LRU de bytes acotado por tamaño total (settings.fotos_cache_mb).
+- Recuerda por settings.fotos_ausentes_ttl segundos los nombres que no están
+  en disco, para no repetir la búsqueda en cada PDF de una persona sin foto.
+- Guarda versiones reducidas en JPEG (settings.fotos_pdf_lado_px) para que
+  ReportLab no tenga que decodificar imágenes de cámara de varios MB.
+
+Si Pillow no está instalado se usa la imagen original.
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+try:
+    from PIL import Image as PILImage, ImageOps
+except ImportError:  # pragma: no cover - Pillow es opcional
+    PILImage = None
+    ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+# Directorios donde buscar fotos de personas, en orden de prioridad
+DIRECTORIOS_FOTOS = [
+    Path(settings.upload_personas_path),  # Frontend (html/mi-app/src/img/personas)
+    Path("app/files/images/personas"),
+    Path("static/images/personas"),
+]
+
+
+class FotoStore:
+    def __init__(
+        self,
+        directorios: List[Path],
+        max_mb: float,
+        lado_pdf_px: int,
+        calidad_pdf: int = 85,
+        ttl_ausentes: float = 60.0,
+    ):
+        self.directorios = directorios
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.lado_pdf_px = lado_pdf_px
+        self.calidad_pdf = calidad_pdf
+        self._indice: Optional[Dict[str, Path]] = None
+        self.ttl_ausentes = ttl_ausentes
+        # nombre -> instante (monotonic) hasta el que se considera ausente
+        self._ausentes: Dict[str, float] = {}
+        # (nombre, variante) -> (mtime_ns, bytes); variante: "original" | "pdf"
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[int, bytes]]" = OrderedDict()
+        self._bytes_en_cache = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Índice de archivos
+    # ------------------------------------------------------------------
+
+    def reindexar(self) -> None:
+        indice: Dict[str, Path] = {}
+        # Se recorre en orden inverso para que el directorio prioritario gane
+        for directorio in reversed(self.directorios):
+            ruta = directorio.resolve()
+            if not ruta.is_dir():
+                continue
+            with os.scandir(ruta) as entradas:
+                for entrada in entradas:
+                    if entrada.is_file():
+                        indice[entrada.name] = Path(entrada.path)
+        with self._lock:
+            self._indice = indice
+            self._ausentes.clear()
+        logger.info(f"Índice de fotos: {len(indice)} archivos")
+
+    def registrar(self, nombre: str, ruta: Path) -> None:
+        """Agrega/actualiza una foto recién guardada y descarta sus versiones en caché."""
+        nombre = os.path.basename(nombre)
+        with self._lock:
+            if self._indice is not None:
+                self._indice[nombre] = Path(ruta).resolve()
+            self._ausentes.pop(nombre, None)
+            for variante in ("original", "pdf"):
+                self._quitar((nombre, variante))
+
+    def ruta(self, nombre: Optional[str]) -> Optional[Path]:
+        if not nombre:
+            return None
+        if self._indice is None:
+            self.reindexar()
+        nombre = os.path.basename(nombre)
+        ruta = self._indice.get(nombre)
+        if ruta is None:
+            ahora = time.monotonic()
+            with self._lock:
+                if self._ausentes.get(nombre, 0.0) > ahora:
+                    return None
+            # Archivo agregado por fuera de registrar(): se busca una vez en disco
+            for directorio in self.directorios:
+                posible = (directorio / nombre).resolve()
+                if posible.is_file():
+                    self.registrar(nombre, posible)
+                    return posible
+            with self._lock:
+                self._ausentes[nombre] = ahora + self.ttl_ausentes
+        return ruta
+
+    def version(self, nombre: Optional[str]) -> Optional[Tuple[str, int]]:
+        """(nombre, mtime) del archivo; cambia cuando la foto se reemplaza."""
+        ruta = self.ruta(nombre)
+        try:
+            return (ruta.name, ruta.stat().st_mtime_ns) if ruta else None
+        except OSError:
+            return None
+
+    # ------------------------------------------------------------------
+    # Lectura con caché
+    # ------------------------------------------------------------------
+
+    def obtener_bytes(self, nombre: Optional[str]) -> Optional[bytes]:
+        """Bytes originales de la foto (None si no existe)."""
+        return self._obtener(nombre, "original", lambda datos: datos)
+
+    def obtener_para_pdf(self, nombre: Optional[str]) -> Optional[bytes]:
+        """JPEG reducido al tamaño que ocupa la foto en la constancia."""
+        return self._obtener(nombre, "pdf", self._reducir)
+
+    def estadisticas(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "archivos_indexados": len(self._indice) if self._indice is not None else None,
+                "ausentes": len(self._ausentes),
+                "entradas": len(self._cache),
+                "mb_en_cache": round(self._bytes_en_cache / (1024 * 1024), 2),
+                "mb_max": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "pillow": PILImage is not None,
+            }
+
+    def _obtener(self, nombre: Optional[str], variante: str, transformar) -> Optional[bytes]:
+        ruta = self.ruta(nombre)
+        if ruta is None:
+            return None
+        try:
+            mtime = ruta.stat().st_mtime_ns
+        except OSError:
+            # Borrada o movida desde que se indexó
+            self.reindexar()
+            ruta = self.ruta(nombre)
+            if ruta is None:
+                return None
+            mtime = ruta.stat().st_mtime_ns
+
+        clave = (ruta.name, variante)
+        with self._lock:
+            entrada = self._cache.get(clave)
+            if entrada and entrada[0] == mtime:
+                self._cache.move_to_end(clave)
+                self.hits += 1
+                return entrada[1]
+            self.misses += 1
+
+        try:
+            datos = transformar(ruta.read_bytes())
+        except Exception as e:
+            logger.warning(f"Error leyendo foto {ruta}: {e}")
+            return None
+
+        with self._lock:
+            self._quitar(clave)
+            if len(datos) <= self.max_bytes:
+                self._cache[clave] = (mtime, datos)
+                self._bytes_en_cache += len(datos)
+                while self._bytes_en_cache > self.max_bytes:
+                    _, (_, viejo) = self._cache.popitem(last=False)
+                    self._bytes_en_cache -= len(viejo)
+        return datos
+
+    def _quitar(self, clave: Tuple[str, str]) -> None:
+        entrada = self._cache.pop(clave, None)
+        if entrada:
+            self._bytes_en_cache -= len(entrada[1])
+
+    def _reducir(self, datos: bytes) -> bytes:
+        if PILImage is None:
+            return datos
+        with PILImage.open(io.BytesIO(datos)) as imagen:
+            imagen = ImageOps.exif_transpose(imagen)
+            if imagen.mode != "RGB":
+                imagen = imagen.convert("RGB")
+            imagen.thumbnail((self.lado_pdf_px, self.lado_pdf_px))
+            salida = io.BytesIO()
+            imagen.save(salida, format="JPEG", quality=self.calidad_pdf, optimize=True)
+            return salida.getvalue()
+
+
+# Instancia global
+foto_store = FotoStore(
+    directorios=DIRECTORIOS_FOTOS,
+    max_mb=settings.fotos_cache_mb,
+    lado_pdf_px=settings.fotos_pdf_lado_px,
+    calidad_pdf=settings.fotos_pdf_calidad,
+    ttl_ausentes=settings.fotos_ausentes_ttl,
+)
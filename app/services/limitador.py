@@ -0,0 +1,268 @@
+"""
+Limitador de tasa por ventana deslizante aproximada (sliding window counter).
+
+Por clave se guardan solo dos contadores: el de la ventana fija actual y el
+de la anterior. La tasa estimada es
+
+    anterior * (1 - transcurrido / ventana) + actual
+
+así que cada verificación es O(1) y la memoria es constante por clave, en
+lugar de la lista de timestamps por IP del RateLimitMiddleware original.
+Las claves sin actividad durante dos ventanas se eliminan en una purga
+periódica (settings.rate_limit_purga segundos).
+
+Las reglas (Regla) se aplican por ruta y método, con clave por IP o por
+usuario autenticado (JWT). Un request debe pasar todas las reglas que le
+correspondan: p. ej. el login tiene un límite bajo por IP y las lecturas
+uno alto por usuario. Una regla de `respaldo` (el límite general por IP)
+solo cuenta los requests que ninguna regla por usuario contó, así varios
+usuarios detrás del mismo NAT no comparten un cupo por IP.
+
+Con ESTADO_BACKEND=redis los contadores viven en Redis (dos claves por
+ventana con vencimiento). El incremento y la lectura van en un solo
+pipeline, así que el request se cuenta antes de estimar; si resulta
+rechazado se descuenta. En ambos backends un request rechazado no consume
+cupo en ninguna regla: las que ya lo habían contado lo devuelven.
+"""
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.config import settings
+from app.services.estado_compartido import estado_compartido
+
+POR_IP = "ip"
+POR_USUARIO = "usuario"  # usuario del JWT; sin token válido se usa la IP
+
+# Carpetas estáticas montadas en app.main (fotos): fuera del límite general
+RUTAS_ESTATICAS = ("/imagenes/",)
+
+
+@dataclass(frozen=True)
+class Regla:
+    nombre: str
+    limite: int
+    ventana: float  # segundos
+    prefijo: str = "/"  # ruta
+    metodos: Optional[frozenset] = None  # None = todos
+    por: str = POR_IP
+    excluidos: Tuple[str, ...] = ()  # prefijos de ruta a los que no aplica
+    respaldo: bool = False  # solo si ninguna regla por usuario contó el request
+
+    def aplica(self, metodo: str, ruta: str) -> bool:
+        return (
+            ruta.startswith(self.prefijo)
+            and (self.metodos is None or metodo in self.metodos)
+            and not ruta.startswith(self.excluidos)
+        )
+
+    @classmethod
+    def desde_texto(cls, nombre: str, texto: str, **kwargs) -> "Regla":
+        """Regla a partir de "limite/segundos" (p. ej. "10/60")."""
+        limite, _, ventana = texto.partition("/")
+        return cls(nombre=nombre, limite=int(limite), ventana=float(ventana or 60), **kwargs)
+
+
+class Resultado(NamedTuple):
+    # NamedTuple: se crea uno por verificación, más barato que un dataclass congelado
+    permitido: bool
+    regla: Regla
+    restantes: int
+    reintentar_en: float  # segundos hasta que vuelva a haber cupo (0 si permitido)
+
+
+def _estimar(regla: Regla, anterior: int, actual: int, transcurrido: float) -> Resultado:
+    peso = 1.0 - transcurrido / regla.ventana
+    usado = anterior * peso + actual
+    if usado <= regla.limite:
+        return Resultado(True, regla, max(int(regla.limite - usado), 0), 0.0)
+    # Cupo cuando el peso de la ventana anterior baje lo suficiente (o al cambiar de ventana)
+    if anterior and actual <= regla.limite:
+        espera = (usado - regla.limite) / anterior * regla.ventana
+    else:
+        espera = regla.ventana - transcurrido
+    return Resultado(False, regla, 0, max(espera, 0.0))
+
+
+class VentanaDeslizante:
+    """Contadores en memoria del proceso: clave -> [indice_ventana, actual, anterior]."""
+
+    def __init__(self, intervalo_purga: float = 60.0):
+        self._tablas: Dict[str, Dict[str, List[int]]] = {}  # por regla (cada una con su ventana)
+        self._ventanas: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.intervalo_purga = intervalo_purga
+        self._ultima_purga: Optional[float] = None
+        self.purgadas = 0
+
+    def consumir(self, regla: Regla, clave: str, ahora: Optional[float] = None) -> Resultado:
+        """Cuenta un request si hay cupo; los rechazados no consumen."""
+        ahora = time.monotonic() if ahora is None else ahora
+        indice = int(ahora // regla.ventana)
+        transcurrido = ahora - indice * regla.ventana
+        with self._lock:
+            if self._ultima_purga is None:
+                self._ultima_purga = ahora
+            elif ahora - self._ultima_purga >= self.intervalo_purga:
+                self._purgar(ahora)
+            tabla = self._tablas.get(regla.nombre)
+            if tabla is None:
+                tabla = self._tablas[regla.nombre] = {}
+                self._ventanas[regla.nombre] = regla.ventana
+            entrada = tabla.get(clave)
+            if entrada is None:
+                entrada = tabla[clave] = [indice, 0, 0]
+            elif entrada[0] != indice:
+                entrada[2] = entrada[1] if entrada[0] == indice - 1 else 0
+                entrada[1] = 0
+                entrada[0] = indice
+            resultado = _estimar(regla, entrada[2], entrada[1] + 1, transcurrido)
+            if resultado.permitido:
+                entrada[1] += 1
+            return resultado
+
+    def devolver(self, regla: Regla, clave: str, ahora: float) -> None:
+        """Descuenta un request contado por consumir(regla, clave, ahora)."""
+        indice = int(ahora // regla.ventana)
+        with self._lock:
+            entrada = self._tablas.get(regla.nombre, {}).get(clave)
+            if entrada is not None and entrada[0] == indice and entrada[1] > 0:
+                entrada[1] -= 1
+
+    def _purgar(self, ahora: float) -> None:
+        # Sin requests en la ventana actual ni en la anterior: la clave no aporta nada
+        self._ultima_purga = ahora
+        for nombre, tabla in self._tablas.items():
+            minimo = int(ahora // self._ventanas[nombre]) - 1
+            inactivas = [clave for clave, entrada in tabla.items() if entrada[0] < minimo]
+            for clave in inactivas:
+                del tabla[clave]
+            self.purgadas += len(inactivas)
+
+    def claves(self) -> int:
+        with self._lock:
+            return sum(len(tabla) for tabla in self._tablas.values())
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._tablas.clear()
+            self._ventanas.clear()
+
+
+class Limitador:
+    """Aplica las reglas de un request sobre memoria local o el estado compartido."""
+
+    def __init__(self, reglas: Iterable[Regla], estado=None, intervalo_purga: Optional[float] = None):
+        self.reglas: Tuple[Regla, ...] = tuple(reglas)
+        self._estado = estado
+        self.local = VentanaDeslizante(
+            settings.rate_limit_purga if intervalo_purga is None else intervalo_purga
+        )
+        self.rechazados = 0
+
+    @property
+    def estado(self):
+        return self._estado or estado_compartido
+
+    def reglas_para(self, metodo: str, ruta: str) -> List[Regla]:
+        return [regla for regla in self.reglas if regla.aplica(metodo, ruta)]
+
+    async def verificar(self, metodo: str, ruta: str, ip: str, usuario: Optional[str] = None) -> Optional[Resultado]:
+        """
+        None si el request pasa todas sus reglas; si no, el Resultado de la
+        regla que lo rechazó (con reintentar_en para Retry-After).
+
+        Si una regla rechaza el request, las anteriores que ya lo contaron
+        lo descuentan: un cliente rechazado no consume cupo.
+        """
+        por_usuario = False
+        contados: List[Tuple[Regla, str, float]] = []
+        for regla in self.reglas:
+            if not regla.aplica(metodo, ruta) or (regla.respaldo and por_usuario):
+                continue
+            por_usuario = por_usuario or (regla.por == POR_USUARIO and usuario is not None)
+            clave = f"u:{usuario}" if regla.por == POR_USUARIO and usuario else ip
+            resultado, ahora = await self._consumir(regla, clave)
+            if not resultado.permitido:
+                for contado in contados:
+                    await self._devolver(*contado)
+                self.rechazados += 1
+                return resultado
+            if ahora is not None:
+                contados.append((regla, clave, ahora))
+        return None
+
+    async def _consumir(self, regla: Regla, clave: str) -> Tuple[Resultado, Optional[float]]:
+        """
+        Cuenta el request si hay cupo. Retorna el Resultado y el instante
+        con el que se contó (para _devolver), o None si no se contó.
+        """
+        estado = self.estado
+        if estado.nombre == "memoria":
+            ahora = time.monotonic()
+            resultado = self.local.consumir(regla, clave, ahora)
+            return resultado, ahora if resultado.permitido else None
+        ahora = time.time()
+        indice = int(ahora // regla.ventana)
+        base = f"rl:{regla.nombre}:{clave}:"
+        actual, anterior = await estado.incrementar_con_previo_async(
+            base + str(indice), base + str(indice - 1), ttl=math.ceil(regla.ventana * 2)
+        )
+        if actual == 0:
+            # Redis no respondió: no se limita
+            return Resultado(True, regla, regla.limite, 0.0), None
+        resultado = _estimar(regla, anterior, actual, ahora - indice * regla.ventana)
+        if not resultado.permitido:
+            # Igual que en memoria: el rechazado no cuenta (si no, alarga su propio bloqueo)
+            await estado.incrementar_async(base + str(indice), cantidad=-1)
+            return resultado, None
+        return resultado, ahora
+
+    async def _devolver(self, regla: Regla, clave: str, ahora: float) -> None:
+        estado = self.estado
+        if estado.nombre == "memoria":
+            self.local.devolver(regla, clave, ahora)
+            return
+        indice = int(ahora // regla.ventana)
+        await estado.incrementar_async(f"rl:{regla.nombre}:{clave}:{indice}", cantidad=-1)
+
+    def estadisticas(self) -> Dict[str, object]:
+        return {
+            "backend": self.estado.nombre,
+            "reglas": [
+                {"nombre": r.nombre, "limite": r.limite, "ventana": r.ventana, "prefijo": r.prefijo, "por": r.por}
+                for r in self.reglas
+            ],
+            "claves_locales": self.local.claves(),
+            "purgadas": self.local.purgadas,
+            "rechazados": self.rechazados,
+        }
+
+
+def reglas_por_defecto() -> List[Regla]:
+    """
+    Reglas de settings: login por IP, lecturas por usuario y un límite
+    general por IP para el resto (anónimos y escrituras), sin las carpetas
+    estáticas. Las reglas de respaldo van al final.
+    """
+    return [
+        Regla.desde_texto(
+            "login", settings.rate_limit_login,
+            prefijo="/api/v1/auth/login", metodos=frozenset({"POST"}),
+        ),
+        Regla.desde_texto(
+            "lecturas", settings.rate_limit_lecturas_usuario,
+            prefijo="/api/v1/", metodos=frozenset({"GET", "HEAD"}), por=POR_USUARIO,
+        ),
+        Regla(
+            "general", settings.rate_limit_requests, float(settings.rate_limit_window),
+            excluidos=RUTAS_ESTATICAS, respaldo=True,
+        ),
+    ]
+
+
+# Instancia global (RateLimitMiddleware, diagnóstico)
+limitador = Limitador(reglas_por_defecto())
@@ -0,0 +1,254 @@
+"""
+Particiones mensuales de la tabla control (auditoría) y política de retención.
+
+Desde la migración 0002, en PostgreSQL control es una tabla particionada por
+RANGE (fecha_hora) con una partición por mes (control_pAAAA_MM) y una
+partición default para filas fuera de rango. Este módulo:
+
+- crea por adelantado las particiones de los próximos meses;
+- separa (DETACH) las particiones más antiguas que la retención, las exporta
+  a CSV comprimido (COPY ... TO STDOUT -> gzip) y luego las elimina.
+
+Si la exportación falla, la partición queda separada pero no se elimina y se
+reintenta en la siguiente corrida. En bases sin particionar (SQLite, o antes
+de migrar) todas las operaciones son no-op.
+"""
+
+import gzip
+import logging
+import re
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = "sistema_gestiones"
+TABLA = "control"
+PARTICION_DEFAULT = "control_default"
+PATRON_PARTICION = re.compile(r"^control_p(\d{4})_(\d{2})$")
+
+# Evita que dos procesos (varios workers de gunicorn) hagan el mantenimiento a la vez
+LLAVE_LOCK = 73_100_013
+
+
+def inicio_mes(dia: date) -> date:
+    return dia.replace(day=1)
+
+
+def sumar_meses(mes: date, n: int) -> date:
+    total = mes.year * 12 + (mes.month - 1) + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nombre_particion(mes: date) -> str:
+    return f"control_p{mes:%Y_%m}"
+
+
+def rango_particion(nombre: str) -> Optional[tuple]:
+    """(desde, hasta) de una partición mensual según su nombre; None si no lo es."""
+    coincide = PATRON_PARTICION.match(nombre)
+    if not coincide:
+        return None
+    desde = date(int(coincide.group(1)), int(coincide.group(2)), 1)
+    return desde, sumar_meses(desde, 1)
+
+
+def es_particionada(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:tabla)"),
+        {"tabla": f"{SCHEMA}.{TABLA}"},
+    ).scalar()
+    return relkind == "p"
+
+
+def listar_particiones(conn: Connection) -> List[Dict[str, Any]]:
+    """Particiones adjuntas a control con su rango y filas estimadas."""
+    filas = conn.execute(
+        text("""
+            SELECT c.relname, c.reltuples::bigint
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:tabla)
+            ORDER BY c.relname
+        """),
+        {"tabla": f"{SCHEMA}.{TABLA}"},
+    ).all()
+    particiones = []
+    for nombre, filas_estimadas in filas:
+        rango = rango_particion(nombre)
+        particiones.append({
+            "nombre": nombre,
+            "desde": rango[0].isoformat() if rango else None,
+            "hasta": rango[1].isoformat() if rango else None,
+            "filas_estimadas": max(int(filas_estimadas), 0),
+        })
+    return particiones
+
+
+def _existe(conn: Connection, nombre: str) -> bool:
+    return conn.execute(
+        text("SELECT to_regclass(:nombre) IS NOT NULL"),
+        {"nombre": f"{SCHEMA}.{nombre}"},
+    ).scalar()
+
+
+def crear_particiones(conn: Connection, meses_adelante: int, hoy: Optional[date] = None) -> List[str]:
+    """
+    Crea las particiones del mes actual y de los `meses_adelante` siguientes.
+    Retorna los nombres creados (con commit por partición).
+    """
+    mes_actual = inicio_mes(hoy or date.today())
+    creadas = []
+    for i in range(meses_adelante + 1):
+        desde = sumar_meses(mes_actual, i)
+        nombre = nombre_particion(desde)
+        if _existe(conn, nombre):
+            continue
+        try:
+            conn.execute(text(
+                f"CREATE TABLE {SCHEMA}.{nombre} PARTITION OF {SCHEMA}.{TABLA} "
+                f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{sumar_meses(desde, 1).isoformat()}')"
+            ))
+            conn.commit()
+            creadas.append(nombre)
+        except Exception as e:
+            # Falla si la partición default ya tiene filas de ese mes
+            conn.rollback()
+            logger.error(f"No se pudo crear la partición {nombre}: {e}")
+    return creadas
+
+
+def particiones_vencidas(conn: Connection, meses_retencion: int, hoy: Optional[date] = None) -> List[str]:
+    """
+    Particiones cuyo mes completo es anterior a la ventana de retención. La
+    ventana incluye el mes en curso: con retención 2 el 2024-03-20 se
+    conservan febrero y marzo, y vencen enero y los meses anteriores.
+    """
+    limite = sumar_meses(inicio_mes(hoy or date.today()), 1 - meses_retencion)
+    vencidas = []
+    for particion in listar_particiones(conn):
+        rango = rango_particion(particion["nombre"])
+        if rango and rango[1] <= limite:
+            vencidas.append(particion["nombre"])
+    return vencidas
+
+
+def _separadas(conn: Connection) -> List[str]:
+    """Tablas control_pAAAA_MM que ya no son partición (separadas, pendientes de archivar)."""
+    filas = conn.execute(
+        text("""
+            SELECT c.relname
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = :schema AND c.relkind = 'r' AND NOT c.relispartition
+              AND c.relname LIKE 'control\\_p%'
+            ORDER BY c.relname
+        """),
+        {"schema": SCHEMA},
+    ).scalars().all()
+    return [nombre for nombre in filas if PATRON_PARTICION.match(nombre)]
+
+
+def archivar_particion(conn: Connection, nombre: str, directorio: Path) -> Path:
+    """
+    Exporta una tabla separada a <directorio>/<nombre>.csv.gz usando COPY.
+    Escribe primero a un temporal para no dejar archivos truncados.
+    """
+    directorio.mkdir(parents=True, exist_ok=True)
+    destino = directorio / f"{nombre}.csv.gz"
+    temporal = directorio / f"{nombre}.csv.gz.tmp"
+    cursor = conn.connection.cursor()
+    try:
+        with gzip.open(temporal, "wb") as salida:
+            cursor.copy_expert(
+                f"COPY {SCHEMA}.{nombre} TO STDOUT WITH (FORMAT csv, HEADER)", salida
+            )
+    finally:
+        cursor.close()
+    temporal.replace(destino)
+    return destino
+
+
+def aplicar_retencion(conn: Connection, meses_retencion: int, directorio: Path, hoy: Optional[date] = None) -> List[str]:
+    """
+    Separa las particiones vencidas, las exporta a CSV.gz y las elimina.
+    Retorna las rutas de los archivos generados.
+    """
+    if meses_retencion <= 0:
+        return []
+
+    for nombre in particiones_vencidas(conn, meses_retencion, hoy):
+        conn.execute(text(f"ALTER TABLE {SCHEMA}.{TABLA} DETACH PARTITION {SCHEMA}.{nombre}"))
+        conn.commit()
+        logger.info(f"Partición {nombre} separada de {TABLA}")
+
+    archivos = []
+    # Incluye las separadas en corridas anteriores cuya exportación falló
+    for nombre in _separadas(conn):
+        ruta = archivar_particion(conn, nombre, directorio)
+        conn.execute(text(f"DROP TABLE {SCHEMA}.{nombre}"))
+        conn.commit()
+        logger.info(f"Partición {nombre} archivada en {ruta}")
+        archivos.append(str(ruta))
+    return archivos
+
+
+def _directorio_archivo() -> Path:
+    ruta = Path(settings.control_archivo_path)
+    if not ruta.is_absolute():
+        ruta = Path(__file__).parent.parent.parent / ruta
+    return ruta
+
+
+def ejecutar_mantenimiento(
+    engine: Optional[Engine] = None,
+    resumen: Optional[Callable[[Connection], Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Crea particiones futuras, aplica la retención y, si se indica, corre
+    `resumen(conn)` (bloqueante).
+
+    Usa una conexión dedicada (no una Session) para que el advisory lock y
+    los commits intermedios queden en la misma conexión. `resumen` corre
+    dentro del mismo lock, también sin particiones.
+    """
+    if engine is None:
+        from app.database import engine
+
+    with engine.connect() as conn:
+        particionada = es_particionada(conn)
+        conn.rollback()
+        if not particionada and resumen is None:
+            return {"particionada": False}
+
+        bloquear = conn.dialect.name == "postgresql"
+        if bloquear:
+            adquirido = conn.execute(text("SELECT pg_try_advisory_lock(:llave)"), {"llave": LLAVE_LOCK}).scalar()
+            conn.commit()
+            if not adquirido:
+                return {"particionada": particionada, "omitido": "otro proceso ejecuta el mantenimiento"}
+
+        resultado: Dict[str, Any] = {"particionada": particionada}
+        try:
+            if particionada:
+                resultado["creadas"] = crear_particiones(conn, settings.control_particiones_adelante)
+                resultado["archivadas"] = aplicar_retencion(
+                    conn, settings.control_retencion_meses, _directorio_archivo()
+                )
+            if resumen is not None:
+                resultado["resumen"] = resumen(conn)
+        finally:
+            conn.rollback()
+            if bloquear:
+                conn.execute(text("SELECT pg_advisory_unlock(:llave)"), {"llave": LLAVE_LOCK})
+                conn.commit()
+
+    return resultado
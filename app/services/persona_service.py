@@ -54,18 +54,6 @@ class PersonaService(BaseService[Persona, PersonaCreate, PersonaUpdate]):
             )
         ).first()
     
-    def search_personas(self, search_term: str) -> List[Persona]:
-        """
-        Busca personas por nombre, apellido, documento o empresa.
-        
-        Args:
-            search_term: Término de búsqueda
-            
-        Returns:
-            Lista de personas encontradas
-        """
-        return self.search(search_term, ['nombre', 'apellido', 'documento_identidad', 'empresa'])
-    
     def get_personas_activas(self, skip: int = 0, limit: int = 100) -> List[Persona]:
         """
         Obtiene todas las personas activas.
@@ -0,0 +1,202 @@
+"""
+Servicio para la cola de tareas post-commit (tabla tareas_pendientes).
+Las tareas se insertan en la misma transacción que el registro que las origina
+y las procesa el pool de workers de app.workers.tareas.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import TareaPendiente
+
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_EN_PROCESO = "en_proceso"
+ESTADO_COMPLETADA = "completada"
+ESTADO_FALLIDA = "fallida"
+
+
+def _ahora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class TareaService:
+    """
+    Operaciones sobre la cola de tareas.
+
+    Los métodos que modifican tareas NO hacen commit salvo que se indique:
+    el llamador decide la transacción (p. ej. crear_visita encola y hace un
+    único commit junto con la visita).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def encolar(
+        self,
+        tipo: str,
+        payload: Dict[str, Any],
+        visita_id: Optional[int] = None,
+        max_intentos: Optional[int] = None,
+    ) -> TareaPendiente:
+        """
+        Agrega una tarea a la sesión actual (sin commit).
+        """
+        tarea = TareaPendiente(
+            tipo=tipo,
+            estado=ESTADO_PENDIENTE,
+            visita_id=visita_id,
+            payload=payload,
+            intentos=0,
+            max_intentos=max_intentos or settings.outbox_max_intentos,
+            proximo_intento=_ahora(),
+        )
+        self.db.add(tarea)
+        return tarea
+
+    def reclamar(self) -> Optional[TareaPendiente]:
+        """
+        Toma la siguiente tarea lista y la marca "en_proceso" (con commit).
+
+        Usa SELECT ... FOR UPDATE SKIP LOCKED para que varios workers no
+        tomen la misma fila. Una tarea "en_proceso" cuyo lease venció
+        (worker caído) vuelve a ser elegible mientras le queden intentos;
+        si ya los agotó se marca "fallida".
+        """
+        ahora = _ahora()
+        (
+            self.db.query(TareaPendiente)
+            .filter(
+                TareaPendiente.estado == ESTADO_EN_PROCESO,
+                TareaPendiente.proximo_intento <= ahora,
+                TareaPendiente.intentos >= TareaPendiente.max_intentos,
+            )
+            .update(
+                {
+                    TareaPendiente.estado: ESTADO_FALLIDA,
+                    TareaPendiente.ultimo_error: "Lease vencido tras agotar los intentos (worker caído)",
+                },
+                synchronize_session=False,
+            )
+        )
+        tarea = (
+            self.db.query(TareaPendiente)
+            .filter(
+                TareaPendiente.estado.in_([ESTADO_PENDIENTE, ESTADO_EN_PROCESO]),
+                TareaPendiente.proximo_intento <= ahora,
+                TareaPendiente.intentos < TareaPendiente.max_intentos,
+            )
+            .order_by(TareaPendiente.proximo_intento.asc(), TareaPendiente.id.asc())
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not tarea:
+            self.db.commit()
+            return None
+
+        tarea.estado = ESTADO_EN_PROCESO
+        tarea.intentos += 1
+        tarea.proximo_intento = ahora + timedelta(seconds=settings.outbox_lease_segundos)
+        self.db.commit()
+        self.db.refresh(tarea)
+        return tarea
+
+    def completar(
+        self,
+        tarea_id: int,
+        resultado: Optional[Dict[str, Any]] = None,
+        siguientes: Optional[List[Tuple[str, Dict[str, Any]]]] = None,
+    ) -> Optional[TareaPendiente]:
+        """
+        Marca la tarea como completada y encola sus tareas siguientes
+        en la misma transacción (con commit).
+        """
+        tarea = self.db.query(TareaPendiente).filter(TareaPendiente.id == tarea_id).first()
+        if not tarea:
+            return None
+
+        tarea.estado = ESTADO_COMPLETADA
+        tarea.resultado = resultado
+        tarea.ultimo_error = None
+        tarea.fecha_completada = _ahora()
+        for tipo, payload in siguientes or []:
+            self.encolar(tipo, payload, visita_id=tarea.visita_id)
+        self.db.commit()
+        self.db.refresh(tarea)
+        return tarea
+
+    def fallar(self, tarea_id: int, error: str) -> Optional[TareaPendiente]:
+        """
+        Registra un intento fallido. Reprograma con backoff exponencial
+        o marca la tarea como "fallida" si agotó sus intentos (con commit).
+        """
+        tarea = self.db.query(TareaPendiente).filter(TareaPendiente.id == tarea_id).first()
+        if not tarea:
+            return None
+
+        tarea.ultimo_error = error[:2000]
+        if tarea.intentos >= tarea.max_intentos:
+            tarea.estado = ESTADO_FALLIDA
+        else:
+            espera = min(
+                settings.outbox_backoff_base * (2 ** max(tarea.intentos - 1, 0)),
+                settings.outbox_backoff_max,
+            )
+            tarea.estado = ESTADO_PENDIENTE
+            tarea.proximo_intento = _ahora() + timedelta(seconds=espera)
+        self.db.commit()
+        self.db.refresh(tarea)
+        return tarea
+
+    def reintentar(self, tarea_id: int) -> Optional[TareaPendiente]:
+        """
+        Vuelve a poner en cola una tarea fallida (reinicia sus intentos).
+        """
+        tarea = self.db.query(TareaPendiente).filter(TareaPendiente.id == tarea_id).first()
+        if not tarea:
+            return None
+
+        tarea.estado = ESTADO_PENDIENTE
+        tarea.intentos = 0
+        tarea.proximo_intento = _ahora()
+        self.db.commit()
+        self.db.refresh(tarea)
+        return tarea
+
+    def get(self, tarea_id: int) -> Optional[TareaPendiente]:
+        return self.db.query(TareaPendiente).filter(TareaPendiente.id == tarea_id).first()
+
+    def listar(
+        self,
+        filters: Dict[str, Any],
+        skip: int = 0,
+        limit: int = 50,
+    ) -> Tuple[List[TareaPendiente], int]:
+        """
+        Lista tareas filtradas por estado, tipo y/o visita_id (más recientes primero).
+        """
+        query = self.db.query(TareaPendiente)
+        if filters.get("estado"):
+            query = query.filter(TareaPendiente.estado == filters["estado"])
+        if filters.get("tipo"):
+            query = query.filter(TareaPendiente.tipo == filters["tipo"])
+        if filters.get("visita_id"):
+            query = query.filter(TareaPendiente.visita_id == filters["visita_id"])
+
+        total = query.count()
+        tareas = query.order_by(TareaPendiente.id.desc()).offset(skip).limit(limit).all()
+        return tareas, total
+
+    def resumen(self) -> Dict[str, int]:
+        """
+        Conteo de tareas por estado.
+        """
+        filas = (
+            self.db.query(TareaPendiente.estado, func.count(TareaPendiente.id))
+            .group_by(TareaPendiente.estado)
+            .all()
+        )
+        return {estado: total for estado, total in filas}
@@ -11,9 +11,17 @@ from datetime import datetime
 from app.models.models import Usuario, RolUsuario
 from app.schemas.esquema_usuario import UsuarioCreate, UsuarioUpdate
 from app.services.base import BaseService
+from app.config import settings
 
-# Contexto para hashing de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Contexto para hashing de contraseñas (el costo sale de BCRYPT_ROUNDS;
+# los hashes con otro costo se regeneran al iniciar sesión)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+def invalidar_principal(user_id: int) -> None:
+    """Descarta el usuario de la caché de autenticación tras modificarlo."""
+    # Import diferido: app.auth depende de este módulo
+    from app.auth.principal_cache import principal_cache
+    principal_cache.invalidar(user_id)
 
 class UsuarioService(BaseService[Usuario, UsuarioCreate, UsuarioUpdate]):
     
@@ -181,7 +189,16 @@ class UsuarioService(BaseService[Usuario, UsuarioCreate, UsuarioUpdate]):
             return None
         
         # Actualizar último acceso
+        return self.registrar_acceso(user)
+    
+    def registrar_acceso(self, user: Usuario, nuevo_hash: Optional[str] = None) -> Usuario:
+        """
+        Actualiza el último acceso tras un login exitoso y, si se indica,
+        reemplaza el hash de la contraseña (rehash por cambio de costo).
+        """
         user.ultimo_acceso = datetime.now()
+        if nuevo_hash:
+            user.hashed_password = nuevo_hash
         self.db.commit()
         self.db.refresh(user)
         
@@ -246,7 +263,9 @@ class UsuarioService(BaseService[Usuario, UsuarioCreate, UsuarioUpdate]):
                 raise ValueError("El email ya está registrado")
             user_data.email = user_data.email.lower()
         
-        return self.update(user, user_data)
+        user = self.update(user, user_data)
+        invalidar_principal(user_id)
+        return user
     
     def reset_password(self, user_id: int, new_password: str) -> Optional[Usuario]:
         """
@@ -266,6 +285,7 @@ class UsuarioService(BaseService[Usuario, UsuarioCreate, UsuarioUpdate]):
         user.hashed_password = self.get_password_hash(new_password)
         self.db.commit()
         self.db.refresh(user)
+        invalidar_principal(user_id)
         
         return user
     
@@ -286,6 +306,7 @@ class UsuarioService(BaseService[Usuario, UsuarioCreate, UsuarioUpdate]):
         user.activo = False
         self.db.commit()
         self.db.refresh(user)
+        invalidar_principal(user_id)
         return user
     
     def get_user_stats(self) -> Dict[str, Any]:
@@ -0,0 +1,215 @@
+# app/utils/audit_writer.py - Escritura de la auditoría (tabla control) en lotes
+"""
+log_action deja cada registro en una cola en memoria acotada y un hilo
+dedicado los inserta en bloque (INSERT multi-fila) al llegar a
+settings.audit_batch_size registros o cada settings.audit_flush_interval
+segundos, lo que ocurra primero.
+
+Cuando la cola está llena se aplica settings.audit_backpressure:
+- "bloquear": espera hasta audit_block_timeout segundos por un hueco
+  (fuera del event loop) y descarta el registro si no lo consigue.
+- "descartar": descarta el registro de inmediato.
+- "sincrono": el registro se escribe directamente en la BD.
+
+stop() vacía la cola antes de terminar (se llama en el lifespan de app.main).
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.Control_service import ControlService
+from app.utils.metricas import medir_etapa
+
+logger = logging.getLogger(__name__)
+
+POLITICAS = ("bloquear", "descartar", "sincrono")
+
+# Marca que stop() deja en la cola para despertar al hilo bloqueado en get()
+_FIN = object()
+
+
+class AuditWriter:
+    def __init__(
+        self,
+        max_cola: int,
+        tam_lote: int,
+        intervalo: float,
+        politica: str = "bloquear",
+        timeout_bloqueo: float = 0.5,
+    ):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de backpressure inválida: {politica}")
+        self.tam_lote = max(1, tam_lote)
+        self.intervalo = intervalo
+        self.politica = politica
+        self.timeout_bloqueo = timeout_bloqueo
+        self._cola: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_cola)
+        self._hilo: Optional[threading.Thread] = None
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self.encolados = 0
+        self.escritos = 0
+        self.descartados = 0
+        self.sincronos = 0
+        self.lotes = 0
+        self.errores = 0
+
+    @property
+    def activo(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def start(self) -> None:
+        if self.activo:
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="audit-writer", daemon=True)
+        self._hilo.start()
+        logger.info("Escritor de auditoría iniciado")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Detiene el hilo después de escribir todo lo que quede en la cola."""
+        if not self._hilo:
+            return
+        self._detener.set()
+        try:
+            # Con la cola llena el hilo está escribiendo y verá _detener al terminar el lote
+            self._cola.put(_FIN, timeout=timeout)
+        except queue.Full:
+            pass
+        self._hilo.join(timeout)
+        self._hilo = None
+        # Por si el hilo no alcanzó a vaciar la cola dentro del timeout
+        self._vaciar()
+        logger.info("Escritor de auditoría detenido")
+
+    async def registrar(self, registro: Dict[str, Any]) -> None:
+        """Encola un registro aplicando la política de backpressure."""
+        try:
+            self._cola.put_nowait(registro)
+            self._contar("encolados")
+            return
+        except queue.Full:
+            pass
+
+        if self.politica == "sincrono":
+            await asyncio.to_thread(self._escribir, [registro])
+            self._contar("sincronos")
+            return
+
+        if self.politica == "bloquear":
+            try:
+                await asyncio.to_thread(self._cola.put, registro, True, self.timeout_bloqueo)
+                self._contar("encolados")
+                return
+            except queue.Full:
+                pass
+
+        self._contar("descartados")
+        logger.warning(f"Cola de auditoría llena: se descartó '{registro.get('realizado')}'")
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "activo": self.activo,
+                "politica": self.politica,
+                "pendientes": self._cola.qsize(),
+                "capacidad": self._cola.maxsize,
+                "encolados": self.encolados,
+                "escritos": self.escritos,
+                "descartados": self.descartados,
+                "sincronos": self.sincronos,
+                "lotes": self.lotes,
+                "errores": self.errores,
+            }
+
+    # ------------------------------------------------------------------
+    # Hilo escritor
+    # ------------------------------------------------------------------
+
+    def _contar(self, campo: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + n)
+
+    def _bucle(self) -> None:
+        while not self._detener.is_set():
+            lote = self._tomar_lote()
+            if lote:
+                self._escribir(lote)
+        self._vaciar()
+
+    def _tomar_lote(self) -> List[Dict[str, Any]]:
+        """
+        Espera hasta completar un lote o hasta que venza el intervalo. Al
+        detener retorna el lote parcial: _bucle lo escribe antes de salir.
+        """
+        lote: List[Dict[str, Any]] = []
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.tam_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0 or self._detener.is_set():
+                break
+            try:
+                registro = self._cola.get(timeout=restante)
+            except queue.Empty:
+                break
+            if registro is _FIN:
+                break
+            lote.append(registro)
+        return lote
+
+    def _vaciar(self) -> None:
+        vacia = False
+        while not vacia:
+            lote: List[Dict[str, Any]] = []
+            while len(lote) < self.tam_lote:
+                try:
+                    registro = self._cola.get_nowait()
+                except queue.Empty:
+                    vacia = True
+                    break
+                if registro is not _FIN:
+                    lote.append(registro)
+            if lote:
+                self._escribir(lote)
+
+    @medir_etapa("auditoria_lote")
+    def _escribir(self, lote: List[Dict[str, Any]]) -> None:
+        db = SessionLocal()
+        try:
+            ControlService(db).bulk_create_control_logs(lote)
+            self._contar("escritos", len(lote))
+            self._contar("lotes")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error escribiendo lote de auditoría ({len(lote)} registros): {e}")
+            # Un registro inválido no debe hacer perder el lote completo
+            self._escribir_uno_a_uno(db, lote)
+        finally:
+            db.close()
+
+    def _escribir_uno_a_uno(self, db, lote: List[Dict[str, Any]]) -> None:
+        service = ControlService(db)
+        for registro in lote:
+            try:
+                service.bulk_create_control_logs([registro])
+                self._contar("escritos")
+            except Exception as e:
+                db.rollback()
+                self._contar("errores")
+                logger.error(f"Registro de auditoría descartado '{registro.get('realizado')}': {e}")
+
+
+# Instancia global (arranca/para en el lifespan de app.main)
+audit_writer = AuditWriter(
+    max_cola=settings.audit_queue_max,
+    tam_lote=settings.audit_batch_size,
+    intervalo=settings.audit_flush_interval,
+    politica=settings.audit_backpressure,
+    timeout_bloqueo=settings.audit_block_timeout,
+)
@@ -0,0 +1,153 @@
+# app/utils/condicional.py - GET condicional (ETag / Last-Modified)
+"""
+Peticiones condicionales para los endpoints de lectura.
+
+Cada endpoint calcula un validador barato antes de serializar la respuesta:
+las fechas de la fila en un recurso individual y, en un listado, la versión
+de la página ya cargada (version_pagina) sin consultas adicionales:
+
+    cond: PeticionCondicional = Depends(peticion_condicional)
+    ...
+    respuesta_304 = cond.evaluar("visitas", partes, ultima_modificacion)
+    if respuesta_304:
+        return respuesta_304
+
+- ETag débil: hash del recurso y de `partes` (filtros, paginación, total,
+  id y fechas de cada fila de la página, firma de catálogos...).
+- Last-Modified: solo en recursos individuales. En un listado un borrado
+  no mueve la fecha máxima, así que If-Modified-Since daría un 304 falso;
+  ahí los ids de la página y el total del ETag detectan el cambio.
+
+If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110 §13.2.2).
+Si la petición no es condicional o no coincide, las cabeceras se agregan a
+la respuesta normal para que el cliente pueda revalidar en la siguiente.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import Request, Response, status
+
+# Obliga a revalidar en cada uso: los listados cambian con frecuencia
+CACHE_CONTROL = "private, no-cache"
+
+
+@dataclass(frozen=True)
+class Validador:
+    etag: str
+    ultima_modificacion: Optional[datetime] = None
+
+    def cabeceras(self) -> Dict[str, str]:
+        cabeceras = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        if self.ultima_modificacion is not None:
+            cabeceras["Last-Modified"] = format_datetime(_utc(self.ultima_modificacion), usegmt=True)
+        return cabeceras
+
+
+def _utc(valor: datetime) -> datetime:
+    # Las columnas sin zona (SQLite) se interpretan como UTC
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return valor.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def ultima_de(*fechas: Optional[datetime]) -> Optional[datetime]:
+    """La más reciente de las fechas no nulas (None si no hay ninguna)."""
+    presentes = [f for f in fechas if f is not None]
+    return max(presentes, key=_utc) if presentes else None
+
+
+def crear_validador(recurso: str, partes: Iterable[Any], ultima_modificacion: Optional[datetime] = None) -> Validador:
+    contenido = json.dumps([recurso, *partes], default=str, sort_keys=True, ensure_ascii=False)
+    firma = hashlib.sha1(contenido.encode("utf-8")).hexdigest()[:20]
+    return Validador(etag=f'W/"{recurso}-{firma}"', ultima_modificacion=ultima_modificacion)
+
+
+def _sin_debil(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def no_modificado(request: Request, validador: Validador) -> bool:
+    """True si el cliente ya tiene la representación vigente."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Comparación débil: los ETag de este módulo son todos W/
+        if if_none_match.strip() == "*":
+            return True
+        propio = _sin_debil(validador.etag)
+        return any(_sin_debil(e) == propio for e in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validador.ultima_modificacion is not None:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if desde.tzinfo is None:
+            desde = desde.replace(tzinfo=timezone.utc)
+        return _utc(validador.ultima_modificacion) <= desde
+    return False
+
+
+class PeticionCondicional:
+    """Dependencia por petición: evalúa el validador y deja las cabeceras en la respuesta."""
+
+    def __init__(self, request: Request, response: Response):
+        self.request = request
+        self.response = response
+        self.validador: Optional[Validador] = None
+
+    def evaluar(
+        self,
+        recurso: str,
+        partes: Iterable[Any],
+        ultima_modificacion: Optional[datetime] = None,
+    ) -> Optional[Response]:
+        """
+        Retorna un 304 sin cuerpo si el cliente tiene la versión vigente;
+        si no, None y la respuesta normal lleva ETag/Last-Modified.
+        """
+        self.validador = crear_validador(recurso, partes, ultima_modificacion)
+        cabeceras = self.validador.cabeceras()
+        if no_modificado(self.request, self.validador):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+        self.response.headers.update(cabeceras)
+        return None
+
+    def cabeceras(self) -> Dict[str, str]:
+        """Cabeceras del último validador evaluado (para respuestas construidas a mano)."""
+        return self.validador.cabeceras() if self.validador is not None else {}
+
+
+def peticion_condicional(request: Request, response: Response) -> PeticionCondicional:
+    return PeticionCondicional(request, response)
+
+
+def version_pagina(
+    items: Iterable[Any],
+    columnas_fecha: Iterable[str],
+    relaciones: Iterable[str] = (),
+) -> List[Any]:
+    """
+    Versión de una página ya cargada: id y fechas (`columnas_fecha`, p. ej.
+    "fecha_actualizacion") de cada fila, en el orden de la respuesta.
+
+    `relaciones` son los atributos cargados con joinedload que se anidan en
+    la respuesta (p. ej. la persona de cada visita): se agrega su
+    fecha_actualizacion. Junto con el total de la respuesta (si se contó)
+    cubre todo lo que cambia el contenido de la página.
+    """
+    columnas_fecha = tuple(columnas_fecha)
+    relaciones = tuple(relaciones)
+    version = []
+    for item in items:
+        fila = [item.id] + [getattr(item, c) for c in columnas_fecha]
+        for nombre in relaciones:
+            fila.append(getattr(getattr(item, nombre, None), "fecha_actualizacion", None))
+        version.append(fila)
+    return version
@@ -6,7 +6,10 @@ from fastapi import Request
 from sqlalchemy.orm import Session
 from app.database import get_db  # No usado aquí (pasa db explícito)
 from app.services.Control_service import ControlService  # Lowercase (crea control_service.py si no)
+from app.utils.audit_writer import audit_writer
+from app.utils.metricas import medir_etapa
 from app.models import Usuario  # Para type hints y checks
+from app.auth.principal_cache import Principal  # Lo que retornan require_role/require_*
 from datetime import datetime, date  # Para hora/fecha si necesitas override
 
 # AGREGADO: Logger simple (opcional, para debug si no DB)
@@ -17,7 +20,7 @@ async def log_action(
     tabla_afectada: Optional[str] = None,
     registro_id: Optional[int] = None,
     detalles: Optional[Dict[str, Any]] = None,
-    db: Session = None,  # CORREGIDO: = None (opcional) + manejo si None
+    db: Session = None,  # CORREGIDO: = None (opcional) + manejo si None; o sesión de get_async_db
     request: Optional[Request] = None,  # Opcional
     current_user: Optional[Usuario] = None  # Asume Usuario object (ajusta si dict)
 ) -> None:
@@ -30,6 +33,10 @@ async def log_action(
     
     Auditors (rol 4) skip en acciones "consultar_*" para evitar spam en vistas.
     Si db is None, skip logging (e.g., tests o llamadas sin DB).
+
+    Con el escritor de auditoría activo el registro se encola y se inserta
+    en lote fuera de la request; si no está activo se escribe en la sesión
+    recibida como antes.
     """
     # AGREGADO: Skip si no hay DB (evita crash en llamadas sin session)
     if db is None:
@@ -40,7 +47,7 @@ async def log_action(
     usuario_id = None
     rol_id = None
     if current_user is not None:
-        if isinstance(current_user, Usuario):  # Objeto Usuario (de dependencies)
+        if isinstance(current_user, (Usuario, Principal)):  # Objeto Usuario / Principal (de dependencies)
             rol_id = current_user.rol.id_rol if current_user.rol else None  # user.rol.id_rol
             usuario_id = current_user.id
         elif isinstance(current_user, dict):  # Dict de JWT (si usas sin modelo)
@@ -63,14 +70,12 @@ async def log_action(
     if rol_id == 4 and accion.startswith("consultar_"):
         return
 
-    # Crea log con ControlService
-    control_service = ControlService(db)
     ip = request.client.host if request else "unknown"
     user_agent = request.headers.get("User-Agent") if request else "unknown"  # Case-sensitive
 
     detalles_final = detalles or {}
     # Enriquecir con info user (segura, excluye sensibles)
-    if isinstance(current_user, Usuario):
+    if isinstance(current_user, (Usuario, Principal)):
         # Usa dict sin sensibles (implementa to_dict en Usuario si no tienes)
         user_info = {
             "id": current_user.id,
@@ -88,17 +93,44 @@ async def log_action(
     detalles_final['ip_address'] = ip  # Enriquecido
     detalles_final['user_agent'] = user_agent
 
-    # JSON stringify para detalles (Text/JSON en modelo)
-    detalles_json = json.dumps(detalles_final, default=str, ensure_ascii=False)  # Maneja dates/non-serializables
+    # detalles es JSONB: ida y vuelta por json para convertir dates/no serializables a str
+    detalles_json = json.loads(json.dumps(detalles_final, default=str, ensure_ascii=False))
+
+    # Encolar o insertar el registro: etapa "auditoria" de /metrics
+    with medir_etapa("auditoria"):
+        # Con el escritor activo: fecha/hora se fijan ahora, el INSERT va en lote
+        if audit_writer.activo:
+            ahora = datetime.now().astimezone()
+            await audit_writer.registrar({
+                "realizado": accion,
+                "fecha_hora": ahora,
+                "fecha": ahora.date(),
+                "hora": ahora.strftime("%H:%M:%S"),
+                "usuario_id": usuario_id,
+                "tabla_afectada": tabla_afectada,
+                "registro_id": registro_id,
+                "detalles": detalles_json,
+                "ip_address": ip,
+                "user_agent": user_agent,
+            })
+            return
+
+        registro = dict(
+            realizado=accion,  # accion → realizado
+            usuario_id=usuario_id,
+            tabla_afectada=tabla_afectada,
+            registro_id=registro_id,
+            detalles=detalles_json,  # dict (JSONB)
+            ip_address=ip,
+            user_agent=user_agent
+            # fecha=date.today() y hora=datetime.now().strftime("%H:%M:%S") – auto en service
+        )
+
+        # Sesión de app.database_async (AsyncSession / SesionEnHilo): el INSERT va por run_sync
+        if not isinstance(db, Session) and hasattr(db, "run_sync"):
+            await db.run_sync(lambda sesion: ControlService(sesion).create_control_log(**registro))
+            return
 
-    # Crea log (service sets fecha/hora auto; override si necesitas)
-    control_service.create_control_log(
-        realizado=accion,  # accion → realizado
-        usuario_id=usuario_id,
-        tabla_afectada=tabla_afectada,
-        registro_id=registro_id,
-        detalles=detalles_json,  # JSON str
-        ip_address=ip,
-        user_agent=user_agent
-        # fecha=date.today() y hora=datetime.now().strftime("%H:%M:%S") – auto en service
-    )
+        # Crea log con ControlService (service sets fecha/hora auto)
+        control_service = ControlService(db)
+        control_service.create_control_log(**registro)
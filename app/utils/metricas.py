@@ -0,0 +1,300 @@
+# app/utils/metricas.py - Métricas de rendimiento en formato Prometheus
+"""
+Registro en memoria de histogramas y contadores que /metrics expone en el
+formato de texto de Prometheus (version 0.0.4):
+
+- http_request_duration_seconds{method,route,status}: latencia por ruta
+  (plantilla de la ruta, p. ej. /api/v1/visitas/{visita_id}).
+- http_request_db_queries{method,route} y
+  http_request_db_duration_seconds{method,route}: consultas SQL y tiempo en
+  la BD de cada request (eventos de SQLAlchemy + contextvar).
+- db_query_duration_seconds: todas las consultas, también las de workers.
+- stage_duration_seconds{stage,result}: etapas lentas (render de PDF,
+  Telegram, SMTP, auditoría) con medir_etapa() y pasos de un endpoint
+  (crear_visita.validacion, .foto, .insercion, .auditoria) con Cronometro.
+
+MetricasMiddleware (app.middleware.metricas) abre la medición de cada
+request. Con varios workers de gunicorn cada proceso tiene su propio
+registro: cada scrape refleja el worker que lo atendió.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+BUCKETS_CONSULTA_SQL = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor: float) -> str:
+    valor = float(valor)
+    if valor == float("inf"):
+        return "+Inf"
+    return str(int(valor)) if valor.is_integer() and abs(valor) < 1e15 else repr(valor)
+
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(str(v))}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class Histograma:
+    """Histograma con buckets fijos por combinación de etiquetas."""
+
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_LATENCIA):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # valores de etiquetas -> [conteos por bucket (+Inf al final), suma]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *etiquetas: str) -> None:
+        i = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][i] += 1
+            serie[1] += valor
+
+    def resumen(self, *etiquetas: str) -> Optional[Tuple[int, float]]:
+        """(observaciones, suma) de una serie; None si no tiene datos."""
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            return (sum(serie[0]), serie[1]) if serie is not None else None
+
+    def exportar(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        with self._lock:
+            series = [(clave, list(conteos), suma) for clave, (conteos, suma) in sorted(self._series.items())]
+        for clave, conteos, suma in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float("inf"),), conteos):
+                acumulado += conteo
+                le = _etiquetas(self.etiquetas, clave, f'le="{_numero(limite)}"')
+                lineas.append(f"{self.nombre}_bucket{le} {acumulado}")
+            etiquetas = _etiquetas(self.etiquetas, clave)
+            lineas.append(f"{self.nombre}_sum{etiquetas} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{etiquetas} {acumulado}")
+        return lineas
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Contador:
+    """Contador monótono por combinación de etiquetas."""
+
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *etiquetas: str, cantidad: float = 1) -> None:
+        with self._lock:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + cantidad
+
+    def valor(self, *etiquetas: str) -> float:
+        with self._lock:
+            return self._valores.get(etiquetas, 0)
+
+    def exportar(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        with self._lock:
+            valores = sorted(self._valores.items())
+        for clave, valor in valores:
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}")
+        return lineas
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._valores.clear()
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._metricas: List = []
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_LATENCIA) -> Histograma:
+        metrica = Histograma(nombre, ayuda, etiquetas, buckets)
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+        metrica = Contador(nombre, ayuda, etiquetas)
+        self._metricas.append(metrica)
+        return metrica
+
+    def exportar(self) -> str:
+        lineas: List[str] = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exportar())
+        return "\n".join(lineas) + "\n"
+
+    def limpiar(self) -> None:
+        for metrica in self._metricas:
+            metrica.limpiar()
+
+
+# Registro global y métricas de la aplicación
+registro = RegistroMetricas()
+
+latencia_http = registro.histograma(
+    "http_request_duration_seconds", "Duración de los requests HTTP por ruta.",
+    ("method", "route", "status"),
+)
+consultas_http = registro.histograma(
+    "http_request_db_queries", "Consultas SQL ejecutadas por request.",
+    ("method", "route"), BUCKETS_CONSULTAS,
+)
+tiempo_db_http = registro.histograma(
+    "http_request_db_duration_seconds", "Tiempo total en la BD por request.",
+    ("method", "route"),
+)
+duracion_consultas = registro.histograma(
+    "db_query_duration_seconds", "Duración de cada consulta SQL (requests y workers).",
+    (), BUCKETS_CONSULTA_SQL,
+)
+duracion_etapas = registro.histograma(
+    "stage_duration_seconds", "Duración de etapas: PDF, Telegram, SMTP, auditoría y pasos de crear_visita.",
+    ("stage", "result"),
+)
+errores_http = registro.contador(
+    "http_requests_exceptions_total", "Requests que terminaron con una excepción no manejada.",
+    ("method", "route"),
+)
+
+
+# ---------------------------------------------------------------------------
+# Medición por request (contextvar)
+# ---------------------------------------------------------------------------
+
+@dataclass
+class MedicionPeticion:
+    consultas: int = 0
+    tiempo_db: float = 0.0
+
+
+_medicion: ContextVar[Optional[MedicionPeticion]] = ContextVar("medicion_peticion", default=None)
+
+
+def medicion_actual() -> Optional[MedicionPeticion]:
+    return _medicion.get()
+
+
+@contextmanager
+def medir_peticion() -> Iterator[MedicionPeticion]:
+    """
+    Abre la medición de un request. El objeto es mutable y compartido: los
+    hilos de run_in_threadpool / asyncio.to_thread copian el contexto y
+    suman sobre la misma medición.
+    """
+    medicion = MedicionPeticion()
+    token = _medicion.set(medicion)
+    try:
+        yield medicion
+    finally:
+        _medicion.reset(token)
+
+
+@contextmanager
+def medir_etapa(etapa: str) -> Iterator[None]:
+    """
+    Registra la duración de una etapa en stage_duration_seconds, con
+    result="error" si sale por una excepción. Sirve también como decorador
+    de funciones síncronas; en código async usar `with` alrededor del await.
+    """
+    inicio = time.perf_counter()
+    resultado = "error"
+    try:
+        yield
+        resultado = "ok"
+    finally:
+        duracion_etapas.observar(time.perf_counter() - inicio, etapa, resultado)
+
+
+class Cronometro:
+    """
+    Pasos consecutivos de un endpoint sin anidar bloques `with`:
+    marcar("paso") registra el tiempo desde la marca anterior como la etapa
+    "<prefijo>.<paso>". Si el endpoint falla a mitad, el paso en curso no
+    se registra.
+    """
+
+    def __init__(self, prefijo: str):
+        self.prefijo = prefijo
+        self._ultima = time.perf_counter()
+
+    def marcar(self, paso: str) -> float:
+        ahora = time.perf_counter()
+        duracion = ahora - self._ultima
+        self._ultima = ahora
+        duracion_etapas.observar(duracion, f"{self.prefijo}.{paso}", "ok")
+        return duracion
+
+
+# ---------------------------------------------------------------------------
+# Eventos de SQLAlchemy
+# ---------------------------------------------------------------------------
+
+_INICIOS = "metricas_inicios"
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault(_INICIOS, []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany) -> None:
+    inicios = conn.info.get(_INICIOS)
+    if not inicios:
+        return
+    duracion = time.perf_counter() - inicios.pop()
+    duracion_consultas.observar(duracion)
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion.consultas += 1
+        medicion.tiempo_db += duracion
+
+
+def _error_al_ejecutar(contexto) -> None:
+    # after_cursor_execute no se emite si la consulta falla: descartar su inicio
+    conn = contexto.connection
+    if conn is not None and conn.info.get(_INICIOS):
+        conn.info[_INICIOS].pop()
+
+
+def instrumentar_engines(objetivo=Engine) -> None:
+    """
+    Escucha la ejecución de consultas de `objetivo` (por defecto todos los
+    Engine, incluido el sync_engine del motor async). Idempotente.
+    """
+    for nombre, funcion in (
+        ("before_cursor_execute", _antes_de_ejecutar),
+        ("after_cursor_execute", _despues_de_ejecutar),
+        ("handle_error", _error_al_ejecutar),
+    ):
+        if not event.contains(objetivo, nombre, funcion):
+            event.listen(objetivo, nombre, funcion)
@@ -0,0 +1,248 @@
+# app/utils/paginacion.py - Paginación por cursor (keyset) y conteo opcional
+"""
+Paginación keyset para listados grandes (visitas, personas, auditoría).
+
+En lugar de OFFSET (que recorre y descarta todas las filas anteriores) se
+filtra por la tupla de orden de la última fila entregada:
+
+    WHERE (fecha_programada, id) < (:ultima_fecha, :ultimo_id)
+    ORDER BY fecha_programada DESC, id DESC
+
+El cursor que recibe el cliente es opaco: JSON en base64-url con el recurso
+y los valores de la última fila. El conteo total es opcional:
+
+- exacto: SELECT count(*) sobre el filtro (comportamiento anterior).
+- estimado: pg_class.reltuples si no hay filtros; si no, un count cacheado.
+- ninguno: no se cuenta (total = None).
+"""
+
+import base64
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import literal, text, tuple_
+from sqlalchemy.orm import Query
+
+from app.config import settings
+
+CONTEO_EXACTO = "exacto"
+CONTEO_ESTIMADO = "estimado"
+CONTEO_NINGUNO = "ninguno"
+MODOS_CONTEO = (CONTEO_EXACTO, CONTEO_ESTIMADO, CONTEO_NINGUNO)
+PATRON_CONTEO = "^(exacto|estimado|ninguno)$"
+
+
+@dataclass
+class Pagina:
+    """Resultado de una página: filas, total (opcional) y cursor siguiente."""
+    items: List[Any]
+    total: Optional[int]
+    next_cursor: Optional[str]
+    total_estimado: bool = False
+    puntajes: Optional[Dict[int, float]] = None  # relevancia por id (búsquedas)
+
+    @property
+    def tiene_siguiente(self) -> bool:
+        return self.next_cursor is not None
+
+
+# ---------------------------------------------------------------------------
+# Cursores opacos
+# ---------------------------------------------------------------------------
+
+def _serializar(valor: Any) -> Any:
+    # datetime antes que date: datetime es subclase de date
+    if isinstance(valor, datetime):
+        return {"dt": valor.isoformat()}
+    if isinstance(valor, date):
+        return {"d": valor.isoformat()}
+    return valor
+
+
+def _deserializar(valor: Any) -> Any:
+    if isinstance(valor, dict):
+        if "dt" in valor:
+            return datetime.fromisoformat(valor["dt"])
+        if "d" in valor:
+            return date.fromisoformat(valor["d"])
+        raise ValueError("valor de cursor desconocido")
+    return valor
+
+
+def codificar_cursor(recurso: str, valores: Sequence[Any]) -> str:
+    """Codifica los valores de orden de la última fila como token opaco."""
+    crudo = json.dumps(
+        {"r": recurso, "v": [_serializar(v) for v in valores]},
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(recurso: str, cursor: str, columnas: int) -> List[Any]:
+    """
+    Decodifica un cursor generado por codificar_cursor.
+
+    Raises:
+        HTTPException 400: si el token está corrupto o pertenece a otro listado
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if datos.get("r") != recurso or len(datos.get("v", [])) != columnas:
+            raise ValueError("cursor de otro recurso")
+        return [_deserializar(v) for v in datos["v"]]
+    except (ValueError, TypeError, AttributeError, json.JSONDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido",
+        )
+
+
+# ---------------------------------------------------------------------------
+# Keyset
+# ---------------------------------------------------------------------------
+
+def paginar_keyset(
+    query: Query,
+    recurso: str,
+    columnas: Sequence[Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    descendente: bool = True,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Ordena la query por `columnas` (la última debe ser única, p. ej. id) y
+    retorna (filas, next_cursor).
+
+    Con cursor se filtra por la tupla de orden y `skip` se ignora; sin cursor
+    se aplica `skip` (compatibilidad con la paginación por página). En ambos
+    casos se pide una fila extra para saber si hay página siguiente.
+    """
+    if cursor:
+        valores = decodificar_cursor(recurso, cursor, len(columnas))
+        clave = tuple_(*columnas)
+        limite = tuple_(*[literal(v, c.type) for c, v in zip(columnas, valores)])
+        query = query.filter(clave < limite if descendente else clave > limite)
+        # Condición redundante sobre la primera columna: PostgreSQL no poda
+        # particiones (control por fecha_hora) a partir de una comparación de filas
+        primera = literal(valores[0], columnas[0].type)
+        query = query.filter(columnas[0] <= primera if descendente else columnas[0] >= primera)
+        skip = 0
+
+    orden = [c.desc() if descendente else c.asc() for c in columnas]
+    filas = query.order_by(*orden).offset(skip).limit(limit + 1).all()
+
+    if len(filas) <= limit:
+        return filas, None
+    filas = filas[:limit]
+    ultima = filas[-1]
+    next_cursor = codificar_cursor(recurso, [getattr(ultima, c.key) for c in columnas])
+    return filas, next_cursor
+
+
+# ---------------------------------------------------------------------------
+# Conteo opcional
+# ---------------------------------------------------------------------------
+
+class CacheConteos:
+    """
+    Conteos recientes por (tabla, filtros) con TTL.
+
+    Para el modo "estimado" con filtros: un listado que se pagina repite el
+    mismo count(*) en cada página; así se hace una vez cada `ttl` segundos.
+    """
+
+    def __init__(self, ttl: float, max_entradas: int = 1024):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._datos: Dict[Hashable, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obtener(self, clave: Hashable) -> Optional[int]:
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada and entrada[1] > ahora:
+                self.hits += 1
+                return entrada[0]
+            self.misses += 1
+            return None
+
+    def guardar(self, clave: Hashable, valor: int) -> None:
+        with self._lock:
+            if len(self._datos) >= self.max_entradas:
+                ahora = time.monotonic()
+                self._datos = {k: v for k, v in self._datos.items() if v[1] > ahora}
+                if len(self._datos) >= self.max_entradas:
+                    self._datos.pop(next(iter(self._datos)))
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "ttl_segundos": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+cache_conteos = CacheConteos(ttl=settings.conteo_cache_ttl)
+
+
+def _reltuples(db, tabla: str) -> Optional[int]:
+    """Filas estimadas por el planner (solo PostgreSQL; None si no hay estadística)."""
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    valor = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:tabla)"),
+        {"tabla": tabla},
+    ).scalar()
+    # reltuples = -1 en tablas nunca analizadas (PostgreSQL 14+)
+    if valor is None or valor < 0:
+        return None
+    return int(valor)
+
+
+def contar(
+    db,
+    query: Query,
+    modo: str,
+    tabla: str,
+    filtros: Optional[Dict[str, Any]] = None,
+) -> Tuple[Optional[int], bool]:
+    """
+    Cuenta las filas de `query` según el modo; retorna (total, es_estimado).
+
+    `tabla` es el nombre calificado (esquema.tabla) para pg_class y `filtros`
+    identifica la consulta en la caché de conteos.
+    """
+    if modo == CONTEO_NINGUNO:
+        return None, False
+    if modo == CONTEO_EXACTO:
+        return query.order_by(None).count(), False
+
+    filtros_activos = {k: v for k, v in (filtros or {}).items() if v not in (None, "")}
+    if not filtros_activos:
+        estimado = _reltuples(db, tabla)
+        if estimado is not None:
+            return estimado, True
+
+    clave = (tabla, tuple(sorted((k, str(v)) for k, v in filtros_activos.items())))
+    total = cache_conteos.obtener(clave)
+    if total is None:
+        total = query.order_by(None).count()
+        cache_conteos.guardar(clave, total)
+    return total, True
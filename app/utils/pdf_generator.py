@@ -4,216 +4,299 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
 from reportlab.lib.units import inch
 from reportlab.pdfgen import canvas
+from xml.sax.saxutils import escape
+from collections import OrderedDict
+from functools import lru_cache
 from io import BytesIO
 from datetime import datetime
-import base64
+from typing import Callable, Hashable, Optional
+import threading
 
+from app.config import settings
+
+
+# =========================================================================
+# PLANTILLA: estilos y layout estático (se construyen una vez por proceso)
+# =========================================================================
+
+class _Plantilla:
+    """
+    Estilos de párrafo, estilos de tabla y medidas de la constancia.
+    Solo contiene objetos de solo lectura, por lo que se comparte entre hilos;
+    los flowables (Paragraph, Table...) se crean en cada render.
+    """
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+
+        self.fecha = ParagraphStyle(
+            'FechaStyle',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.black,
+            alignment=2,  # Derecha
+            spaceAfter=5
+        )
+        self.titulo_acceso = ParagraphStyle(
+            'TituloAcceso',
+            parent=styles['Heading1'],
+            fontSize=16,
+            textColor=colors.black,
+            alignment=1,  # Centrado
+            spaceAfter=10,
+            fontName='Helvetica-Bold'
+        )
+        self.texto_cordial = ParagraphStyle(
+            'TextoCordial',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.black,
+            alignment=4,  # Justificado
+            spaceAfter=12,
+            leading=14
+        )
+        self.seccion_titulo = ParagraphStyle(
+            'SeccionTitulo',
+            parent=styles['Heading2'],
+            fontSize=11,
+            textColor=colors.HexColor('#1a5f7a'),
+            fontName='Helvetica-Bold',
+            spaceAfter=8,
+            alignment=0
+        )
+        self.footer = ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.grey,
+            alignment=1,
+            spaceAfter=0
+        )
+
+        self.foto_tabla = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ])
+        self.tabla_datos = self._estilo_tabla(valign='MIDDLE', font_size=10)
+        self.tabla_bitacora = self._estilo_tabla(valign='TOP', font_size=9)
+
+        self.col_widths = [2.5*inch, 4.5*inch]
+        self.foto_col_widths = [7*inch]
+        self.foto_width = 2*inch
+        self.foto_height = 2.5*inch
+        self.margen = 0.5*inch
+
+    @staticmethod
+    def _estilo_tabla(valign: str, font_size: int) -> TableStyle:
+        return TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0e6d2')),  # Fondo beige para etiquetas
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), valign),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), font_size),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cccccc')),
+            ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
+        ])
+
+
+@lru_cache(maxsize=1)
+def _plantilla() -> _Plantilla:
+    return _Plantilla()
+
+
+TEXTO_CORDIAL = """
+    Tengo al honor de dirigirme a usted, en la oportunidad de extenderle un cordial saludo Bolivariano, 
+    Revolucionario e institucional, en nombre del personal que labora en esta Gerencia, y a su vez hacer constancia 
+    que el personal de la "UNIDAD O EMPRESA" <b>{centro_nombre}</b>, 
+    Titular de la cédula venezolana: <b>{persona_cedula}</b>, la cual se concede acceso 
+    al área para ejecutar: <b>{descripcion_actividad}</b>, correspondiente al área 
+    estipulada por la empresa o unidad antes mencionada.
+    """
+
+
+def _texto(visita_data: dict, clave: str) -> str:
+    """Valor del campo escapado para el markup de Paragraph."""
+    valor = visita_data.get(clave)
+    return escape(str(valor)) if valor not in (None, '') else 'N/A'
+
+
+# =========================================================================
+# RENDER
+# =========================================================================
 
 def generar_pdf_visita(visita_data: dict) -> bytes:
-    """Genera PDF de visita con diseño profesional SENIAT"""
-    
+    """
+    Genera PDF de visita con diseño profesional SENIAT.
+    La foto llega como bytes en visita_data['foto_bytes'] (ver foto_store).
+    Solo se construyen los elementos variables; estilos y medidas vienen
+    de la plantilla compartida.
+
+    La fecha impresa es visita_data['fecha_registro'] (la última
+    modificación de la visita), no la hora del render: el PDF queda en
+    pdf_cache y debe ser el mismo, byte a byte, para la misma versión de
+    la visita.
+    """
+    p = _plantilla()
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(
         buffer,
         pagesize=letter,
-        rightMargin=0.5*inch,
-        leftMargin=0.5*inch,
-        topMargin=0.5*inch,
-        bottomMargin=0.5*inch
+        rightMargin=p.margen,
+        leftMargin=p.margen,
+        topMargin=p.margen,
+        bottomMargin=p.margen,
+        invariant=True,  # sin fecha de creación ni ID aleatorio en los metadatos
     )
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    
-    # =========================================================================
-    # ESTILOS PERSONALIZADOS
-    # =========================================================================
-    fecha_style = ParagraphStyle(
-        'FechaStyle',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.black,
-        alignment=2,  # Derecha
-        spaceAfter=5
-    )
-    
-    titulo_acceso_style = ParagraphStyle(
-        'TituloAcceso',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.black,
-        alignment=1,  # Centrado
-        spaceAfter=10,
-        fontName='Helvetica-Bold'
-    )
-    
-    texto_cordial_style = ParagraphStyle(
-        'TextoCordial',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.black,
-        alignment=4,  # Justificado
-        spaceAfter=12,
-        leading=14
-    )
-    
-    datos_visitante_label_style = ParagraphStyle(
-        'DatosLabel',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.black,
-        fontName='Helvetica-Bold',
-        alignment=0  # Izquierda
-    )
-    
-    datos_visitante_value_style = ParagraphStyle(
-        'DatosValue',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.black,
-        alignment=0
-    )
-    
-    seccion_titulo_style = ParagraphStyle(
-        'SeccionTitulo',
-        parent=styles['Heading2'],
-        fontSize=11,
-        textColor=colors.HexColor('#1a5f7a'),
-        fontName='Helvetica-Bold',
-        spaceAfter=8,
-        alignment=0
-    )
-    
-    # =========================================================================
-    # CONTENIDO
-    # =========================================================================
+
+    fecha = visita_data.get('fecha_registro') or datetime.now().strftime('%d/%m/%Y %H:%M:%S')
     elements = []
-    
+
     # ===== 1. FECHA Y HORA (DERECHA) =====
-    fecha_texto = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-    elements.append(Paragraph(f"FECHA: {fecha_texto}", fecha_style))
+    elements.append(Paragraph(f"FECHA: {escape(str(fecha))}", p.fecha))
     elements.append(Spacer(1, 0.1*inch))
-    
+
     # ===== 2. TÍTULO CENTRADO =====
-    elements.append(Paragraph("ACCESO REGISTRADO", titulo_acceso_style))
+    elements.append(Paragraph("ACCESO REGISTRADO", p.titulo_acceso))
     elements.append(Spacer(1, 0.15*inch))
-    
+
     # ===== 3. TEXTO CORDIAL (JUSTIFICADO) =====
-    texto_cordial = f"""
-    Tengo al honor de dirigirme a usted, en la oportunidad de extenderle un cordial saludo Bolivariano, 
-    Revolucionario e institucional, en nombre del personal que labora en esta Gerencia, y a su vez hacer constancia 
-    que el personal de la "UNIDAD O EMPRESA" <b>{visita_data.get('centro_nombre', 'N/A')}</b>, 
-    Titular de la cédula venezolana: <b>{visita_data.get('persona_cedula', 'N/A')}</b>, la cual se concede acceso 
-    al área para ejecutar: <b>{visita_data.get('descripcion_actividad', 'N/A')}</b>, correspondiente al área 
-    estipulada por la empresa o unidad antes mencionada.
-    """
-    
-    elements.append(Paragraph(texto_cordial, texto_cordial_style))
+    texto_cordial = TEXTO_CORDIAL.format(
+        centro_nombre=_texto(visita_data, 'centro_nombre'),
+        persona_cedula=_texto(visita_data, 'persona_cedula'),
+        descripcion_actividad=_texto(visita_data, 'descripcion_actividad'),
+    )
+    elements.append(Paragraph(texto_cordial, p.texto_cordial))
     elements.append(Spacer(1, 0.2*inch))
-    
+
     # ===== 4. FOTO EN GRANDE =====
-    if visita_data.get('foto_data'):
+    if visita_data.get('foto_bytes'):
         try:
-            foto_bytes = base64.b64decode(visita_data['foto_data'])
-            foto_buffer = BytesIO(foto_bytes)
-            
-            # Foto más grande, centrada (3" x 3.5")
-            foto_img = Image(foto_buffer, width=2*inch, height=2.5*inch)
-            
-            # Tabla para centrar la foto
-            foto_table = Table([[foto_img]], colWidths=[7*inch])
-            foto_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-            
+            foto_img = Image(BytesIO(visita_data['foto_bytes']), width=p.foto_width, height=p.foto_height)
+            foto_table = Table([[foto_img]], colWidths=p.foto_col_widths)
+            foto_table.setStyle(p.foto_tabla)
+
             elements.append(foto_table)
             elements.append(Spacer(1, 0.2*inch))
-            
+
         except Exception as e:
             print(f"⚠️ Error procesando foto: {e}")
-    
+
     # ===== 5. DATOS DEL VISITANTE (CUADRO) =====
-    elements.append(Paragraph("Datos del visitante", seccion_titulo_style))
-    
-    # Tabla con datos del visitante
+    elements.append(Paragraph("Datos del visitante", p.seccion_titulo))
+
     datos_visitante = [
         ["CÉDULA", visita_data.get('persona_cedula', 'N/A')],
         ["NOMBRE Y APELLIDO", visita_data.get('persona_nombre', 'N/A')],
         ["UNIDAD O EMPRESA", visita_data.get('persona_empresa', 'N/A')],
         ["EMAIL", visita_data.get('persona_email', 'N/A')],
     ]
-    
-    tabla_datos = Table(datos_visitante, colWidths=[2.5*inch, 4.5*inch])
-    tabla_datos.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0e6d2')),  # Fondo beige para etiquetas
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cccccc')),
-        ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
-    ]))
-    
+    tabla_datos = Table(datos_visitante, colWidths=p.col_widths)
+    tabla_datos.setStyle(p.tabla_datos)
+
     elements.append(tabla_datos)
     elements.append(Spacer(1, 0.2*inch))
-    
+
     # ===== 6. BITÁCORA DE ACCIÓN =====
-    elements.append(Paragraph("BITÁCORA DE ACCIÓN", seccion_titulo_style))
-    
+    elements.append(Paragraph("BITÁCORA DE ACCIÓN", p.seccion_titulo))
+
     bitacora_data = [
         ["ACTIVIDAD", visita_data.get('descripcion_actividad', 'N/A')],
-        ["ÁREAS", ', '.join(visita_data.get('areas_nombres', ['N/A']))],
+        ["ÁREAS", ', '.join(visita_data.get('areas_nombres') or ['N/A'])],
         ["TIPO DE ACTIVIDAD", visita_data.get('tipo_actividad', 'N/A')],
         ["EQUIPOS INGRESADOS", visita_data.get('equipos_ingresados', 'N/A')],
         ["EQUIPOS RETIRADOS", visita_data.get('equipos_retirados', 'N/A')],
         ["OBSERVACIONES", visita_data.get('observaciones', 'N/A')],
     ]
-    
-    tabla_bitacora = Table(bitacora_data, colWidths=[2.5*inch, 4.5*inch])
-    tabla_bitacora.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0e6d2')),  # Fondo beige para etiquetas
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cccccc')),
-        ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
-    ]))
-    
+    tabla_bitacora = Table(bitacora_data, colWidths=p.col_widths)
+    tabla_bitacora.setStyle(p.tabla_bitacora)
+
     elements.append(tabla_bitacora)
     elements.append(Spacer(1, 0.3*inch))
-    
+
     # ===== 7. PIE DE PÁGINA =====
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.grey,
-        alignment=1,
-        spaceAfter=0
-    )
-    
     elements.append(Paragraph(
-        f"Sistema de Gestión de Accesos - SENIAT<br/>Generado: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}",
-        footer_style
+        "Sistema de Gestión de Accesos - SENIAT",
+        p.footer
     ))
-    
+
     # =========================================================================
     # GENERAR PDF
     # =========================================================================
     doc.build(elements)
     pdf_bytes = buffer.getvalue()
     buffer.close()
-    
+
     return pdf_bytes
+
+
+# =========================================================================
+# CACHÉ DE PDFs TERMINADOS
+# =========================================================================
+
+class CachePdf:
+    """
+    LRU de PDFs ya generados, acotado por tamaño total en bytes.
+    La clave debe cambiar cuando cambia algo de lo que se imprime
+    (p. ej. (visita_id, fecha_actualizacion, ...)), así que nunca se
+    sirve una constancia desactualizada.
+    """
+
+    def __init__(self, max_mb: float):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._datos: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obtener(self, clave: Hashable, generar: Callable[[], bytes]) -> bytes:
+        """Retorna el PDF en caché o lo genera con generar() y lo guarda."""
+        pdf = self.buscar(clave)
+        if pdf is not None:
+            return pdf
+        pdf = generar()
+        self.guardar(clave, pdf)
+        return pdf
+
+    def buscar(self, clave: Hashable) -> Optional[bytes]:
+        with self._lock:
+            pdf = self._datos.get(clave)
+            if pdf is None:
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return pdf
+
+    def guardar(self, clave: Hashable, pdf: bytes) -> None:
+        if len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._datos.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._datos[clave] = pdf
+            self._bytes += len(pdf)
+            while self._bytes > self.max_bytes:
+                _, viejo = self._datos.popitem(last=False)
+                self._bytes -= len(viejo)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "mb_en_cache": round(self._bytes / (1024 * 1024), 2),
+                "mb_max": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Instancia global
+pdf_cache = CachePdf(max_mb=settings.pdf_cache_mb)
@@ -0,0 +1,61 @@
+# app/utils/respuestas.py - Serialización JSON rápida
+"""
+Clase de respuesta JSON por defecto de la app y atajo para los listados.
+
+- RespuestaJSON.render usa orjson si está instalado (si no, json compacto).
+- Si el contenido es un modelo Pydantic se serializa con model_dump_json
+  (serializador de pydantic-core) sin pasar por dicts intermedios.
+
+Los listados grandes (visitas, personas, centros) retornan
+respuesta_json(ListResponse(...)): el modelo ya validó las filas al
+construirse, así FastAPI no vuelve a validarlo contra response_model ni
+lo convierte con jsonable_encoder.
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+
+def _por_defecto(valor: Any) -> Any:
+    # Tipos que orjson no serializa solo (Decimal, set...)
+    if isinstance(valor, BaseModel):
+        return valor.model_dump(mode="json")
+    if isinstance(valor, (set, frozenset)):
+        return list(valor)
+    return str(valor)
+
+
+def dumps(contenido: Any) -> bytes:
+    if isinstance(contenido, BaseModel):
+        return contenido.model_dump_json().encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(contenido, default=_por_defecto, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        contenido, default=_por_defecto, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class RespuestaJSON(JSONResponse):
+    """JSONResponse con orjson / model_dump_json."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def respuesta_json(modelo: BaseModel, cond=None, headers: Optional[Dict[str, str]] = None) -> RespuestaJSON:
+    """
+    Respuesta directa de un modelo ya construido. `cond` (PeticionCondicional)
+    agrega ETag/Last-Modified: al retornar una Response, FastAPI no copia las
+    cabeceras de la respuesta inyectada en la dependencia.
+    """
+    cabeceras = dict(cond.cabeceras()) if cond is not None else {}
+    cabeceras.update(headers or {})
+    return RespuestaJSON(modelo, headers=cabeceras)
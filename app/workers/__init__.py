@@ -0,0 +1,11 @@
+# Workers en segundo plano (cola de tareas post-commit, mantenimiento de auditoría)
+
+from .tareas import pool_tareas, PoolTareas
+from .mantenimiento import mantenimiento_auditoria, MantenimientoAuditoria
+
+__all__ = [
+    "pool_tareas",
+    "PoolTareas",
+    "mantenimiento_auditoria",
+    "MantenimientoAuditoria",
+]
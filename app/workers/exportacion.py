@@ -0,0 +1,244 @@
+# app/workers/exportacion.py - Exportación masiva de constancias PDF
+"""
+Renderiza constancias en un pool de procesos (ReportLab es CPU puro y no
+libera el GIL) y las entrega como un ZIP que se va enviando al cliente a
+medida que se generan: en memoria solo están los PDFs de la ventana en curso.
+
+El progreso de cada exportación queda en `progreso_exportaciones` para
+consultarlo mientras el ZIP se descarga. Con estado compartido en Redis se
+publica también allí: la consulta puede llegar a otro worker.
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Hashable, List, Optional
+
+from app.config import settings
+from app.services.estado_compartido import estado_compartido, guardar_json, obtener_json
+from app.services.foto_store import foto_store
+from app.utils.metricas import medir_etapa
+from app.utils.pdf_generator import generar_pdf_visita, pdf_cache
+
+logger = logging.getLogger(__name__)
+
+# Segundos mínimos entre publicaciones del progreso durante la generación
+PUBLICAR_CADA = 1.0
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def pool_exportacion() -> ProcessPoolExecutor:
+    """
+    Pool de procesos compartido (se crea en la primera exportación).
+
+    No usa fork: el proceso de uvicorn tiene hilos (to_thread, pool de
+    conexiones) y un fork podría heredar un lock tomado. Con forkserver, o
+    spawn donde no existe, los procesos de render arrancan limpios.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.export_workers,
+                mp_context=multiprocessing.get_context(metodo),
+            )
+        return _pool
+
+
+def cerrar_pool_exportacion() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# ---------------------------------------------------------------------------
+# Progreso
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ProgresoExportacion:
+    id: str
+    usuario_id: int
+    total: int
+    completados: int = 0
+    errores: List[str] = field(default_factory=list)
+    estado: str = "en_proceso"  # en_proceso | completada | cancelada | error
+    inicio: float = field(default_factory=time.time)
+    fin: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "total": self.total,
+            "completados": self.completados,
+            "porcentaje": round(self.completados * 100 / self.total, 1) if self.total else 100.0,
+            "errores": self.errores,
+            "segundos": round((self.fin or time.time()) - self.inicio, 1),
+        }
+
+    def to_estado(self) -> Dict[str, Any]:
+        """Campos para reconstruirlo en otro worker (ProgresoExportacion(**datos))."""
+        return {
+            "id": self.id,
+            "usuario_id": self.usuario_id,
+            "total": self.total,
+            "completados": self.completados,
+            "errores": self.errores,
+            "estado": self.estado,
+            "inicio": self.inicio,
+            "fin": self.fin,
+        }
+
+
+class RegistroProgreso:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._datos: Dict[str, ProgresoExportacion] = {}
+        self._lock = threading.Lock()
+
+    def crear(self, usuario_id: int, total: int) -> ProgresoExportacion:
+        progreso = ProgresoExportacion(id=uuid.uuid4().hex, usuario_id=usuario_id, total=total)
+        with self._lock:
+            self._purgar()
+            self._datos[progreso.id] = progreso
+        self.publicar(progreso)
+        return progreso
+
+    def publicar(self, progreso: ProgresoExportacion) -> None:
+        """Copia el progreso al estado compartido (no-op con un solo proceso)."""
+        if estado_compartido.nombre == "memoria":
+            return
+        guardar_json(f"export:{progreso.id}", progreso.to_estado(), ttl=self.ttl)
+
+    def get(self, export_id: str) -> Optional[ProgresoExportacion]:
+        with self._lock:
+            progreso = self._datos.get(export_id)
+        if progreso is None and estado_compartido.nombre != "memoria":
+            datos = obtener_json(f"export:{export_id}")
+            progreso = ProgresoExportacion(**datos) if datos else None
+        return progreso
+
+    def _purgar(self) -> None:
+        limite = time.time() - self.ttl
+        for export_id in [k for k, p in self._datos.items() if p.fin and p.fin < limite]:
+            del self._datos[export_id]
+
+
+progreso_exportaciones = RegistroProgreso(ttl=settings.export_progreso_ttl)
+
+
+# ---------------------------------------------------------------------------
+# ZIP en streaming
+# ---------------------------------------------------------------------------
+
+class _SalidaZip(io.RawIOBase):
+    """
+    Destino no "seekable" para ZipFile: acumula lo escrito hasta que se
+    retira con vaciar(). ZipFile detecta que no puede hacer seek y escribe
+    cada entrada de forma secuencial.
+    """
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+@dataclass
+class ItemExportacion:
+    clave: Hashable  # clave de pdf_cache
+    nombre_archivo: str
+    datos: Dict[str, Any]  # datos de generar_pdf_visita (sin foto_bytes)
+
+
+async def _render(item: ItemExportacion) -> bytes:
+    pdf = pdf_cache.buscar(item.clave)
+    if pdf is not None:
+        return pdf
+    datos = dict(item.datos)
+    datos["foto_bytes"] = await asyncio.to_thread(foto_store.obtener_para_pdf, datos.get("foto_nombre"))
+    loop = asyncio.get_running_loop()
+    # Incluye la espera por un proceso libre del pool
+    with medir_etapa("pdf_exportacion"):
+        pdf = await loop.run_in_executor(pool_exportacion(), generar_pdf_visita, datos)
+    # Igual que la descarga individual: la próxima exportación o descarga la reutiliza
+    pdf_cache.guardar(item.clave, pdf)
+    return pdf
+
+
+async def generar_zip(items: List[ItemExportacion], progreso: ProgresoExportacion) -> AsyncIterator[bytes]:
+    """
+    Genera el ZIP por partes. Mantiene en vuelo como máximo
+    settings.export_ventana renders y escribe los PDFs en el orden de items.
+
+    publicar() es un SET síncrono en Redis: durante la generación se hace
+    como máximo una vez por PUBLICAR_CADA segundos, y siempre al terminar.
+    """
+    salida = _SalidaZip()
+    zf = zipfile.ZipFile(salida, mode="w", compression=zipfile.ZIP_STORED)
+    pendientes: deque = deque()
+    siguiente = 0
+    ultima_publicacion = time.monotonic()
+    try:
+        while siguiente < len(items) or pendientes:
+            while siguiente < len(items) and len(pendientes) < settings.export_ventana:
+                item = items[siguiente]
+                pendientes.append((item, asyncio.ensure_future(_render(item))))
+                siguiente += 1
+
+            item, tarea = pendientes.popleft()
+            try:
+                zf.writestr(item.nombre_archivo, await tarea)
+            except Exception as e:
+                logger.warning(f"Exportación {progreso.id}: error en {item.nombre_archivo}: {e}")
+                progreso.errores.append(f"{item.nombre_archivo}: {e}")
+            progreso.completados += 1
+            if time.monotonic() - ultima_publicacion >= PUBLICAR_CADA:
+                progreso_exportaciones.publicar(progreso)
+                ultima_publicacion = time.monotonic()
+
+            datos = salida.vaciar()
+            if datos:
+                yield datos
+
+        if progreso.errores:
+            zf.writestr("ERRORES.txt", "\n".join(progreso.errores))
+        zf.close()
+        yield salida.vaciar()
+        progreso.estado = "completada"
+    except asyncio.CancelledError:
+        # Cliente desconectado
+        progreso.estado = "cancelada"
+        raise
+    except Exception:
+        progreso.estado = "error"
+        raise
+    finally:
+        for _, tarea in pendientes:
+            tarea.cancel()
+        progreso.fin = time.time()
+        progreso_exportaciones.publicar(progreso)
@@ -0,0 +1,106 @@
+# app/workers/mantenimiento.py - Mantenimiento periódico de la auditoría
+"""
+Tarea asyncio que cada settings.control_mantenimiento_intervalo segundos
+crea las particiones futuras de control, aplica la retención
+(app.services.particiones_control) y recalcula los últimos días cerrados de
+control_resumen_diario. El trabajo de BD y de disco corre en un hilo
+(asyncio.to_thread).
+"""
+
+import asyncio
+import logging
+import time
+from datetime import date, timedelta
+from functools import partial
+from typing import Any, Dict, Optional
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.services.Control_service import ControlService
+from app.services.particiones_control import ejecutar_mantenimiento
+
+logger = logging.getLogger(__name__)
+
+
+def reconciliar_resumen_reciente(conn: Connection, dias: int) -> Dict[str, Any]:
+    """
+    Recalcula el resumen diario de los `dias` anteriores a hoy (bloqueante).
+    Usa la conexión de ejecutar_mantenimiento, que tiene el advisory lock.
+    """
+    if dias <= 0:
+        return {"dias": 0}
+    hasta = date.today() - timedelta(days=1)
+    desde = hasta - timedelta(days=dias - 1)
+    with Session(bind=conn) as db:
+        filas = ControlService(db).reconciliar_resumen(desde, hasta)
+    conn.commit()
+    return {"desde": desde.isoformat(), "hasta": hasta.isoformat(), "filas": filas}
+
+
+class MantenimientoAuditoria:
+    """Ejecuta el mantenimiento al iniciar y luego cada `intervalo` segundos."""
+
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self._task: Optional[asyncio.Task] = None
+        self.ultimo_resultado: Optional[Dict[str, Any]] = None
+        self.ultima_ejecucion: Optional[float] = None
+        self.ejecuciones = 0
+        self.errores = 0
+
+    @property
+    def activo(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task or self.intervalo <= 0:
+            return
+        self._task = asyncio.create_task(self._ciclo(), name="mantenimiento-auditoria")
+        logger.info(f"Mantenimiento de auditoría cada {self.intervalo:.0f}s")
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _ciclo(self) -> None:
+        while True:
+            await self.ejecutar()
+            await asyncio.sleep(self.intervalo)
+
+    async def ejecutar(self) -> Dict[str, Any]:
+        """Una corrida de mantenimiento; los errores se registran y no detienen el ciclo."""
+        try:
+            resumen = partial(reconciliar_resumen_reciente, dias=settings.control_resumen_reconciliar_dias)
+            resultado = await asyncio.to_thread(ejecutar_mantenimiento, None, resumen)
+        except Exception as e:
+            self.errores += 1
+            logger.error(f"Mantenimiento de auditoría falló: {e}")
+            resultado = {"error": f"{type(e).__name__}: {e}"}
+        self.ejecuciones += 1
+        self.ultima_ejecucion = time.time()
+        self.ultimo_resultado = resultado
+        return resultado
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "activo": self.activo,
+            "intervalo_segundos": self.intervalo,
+            "ejecuciones": self.ejecuciones,
+            "errores": self.errores,
+            "ultima_ejecucion": self.ultima_ejecucion,
+            "ultimo_resultado": self.ultimo_resultado,
+        }
+
+
+# Instancia global (arranca/para en el lifespan de app.main)
+mantenimiento_auditoria = MantenimientoAuditoria(
+    intervalo=settings.control_mantenimiento_intervalo,
+)
@@ -0,0 +1,245 @@
+# app/workers/tareas.py - Pool de workers para la cola de tareas post-commit
+"""
+Procesa las tareas de tareas_pendientes fuera del ciclo request/response:
+
+- generar_pdf: renderiza la constancia y la guarda en settings.constancias_path;
+  al completarse encola "telegram" y "email".
+- telegram: envía el mensaje y el PDF al chat configurado.
+- email: envía la constancia al correo de la persona.
+
+Las operaciones de BD, el render de ReportLab y la lectura de archivos se
+ejecutan en hilos (asyncio.to_thread) para no bloquear el event loop.
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.tarea_service import TareaService
+from app.utils.metricas import medir_etapa
+
+logger = logging.getLogger(__name__)
+
+Siguientes = List[Tuple[str, Dict[str, Any]]]
+Manejador = Callable[[Dict[str, Any]], Awaitable[Tuple[Optional[Dict[str, Any]], Siguientes]]]
+
+
+def _directorio_constancias() -> Path:
+    ruta = Path(settings.constancias_path)
+    if not ruta.is_absolute():
+        ruta = Path(__file__).parent.parent.parent / ruta
+    ruta.mkdir(parents=True, exist_ok=True)
+    return ruta
+
+
+def _render_pdf(payload: Dict[str, Any]) -> str:
+    """Genera el PDF (bloqueante) y retorna la ruta donde se guardó."""
+    from app.services.foto_store import foto_store
+    from app.utils.pdf_generator import generar_pdf_visita
+
+    datos = dict(payload["visita"])
+    foto_path = payload.get("foto_path")
+    if payload.get("foto") and foto_path and Path(foto_path).exists():
+        foto_store.registrar(payload["foto"], Path(foto_path))
+    datos["foto_bytes"] = foto_store.obtener_para_pdf(payload.get("foto"))
+
+    with medir_etapa("pdf"):
+        pdf_bytes = generar_pdf_visita(datos)
+    destino = _directorio_constancias() / f"constancia_{datos['codigo_visita']}.pdf"
+    destino.write_bytes(pdf_bytes)
+    return str(destino)
+
+
+async def _manejar_generar_pdf(payload: Dict[str, Any]):
+    pdf_path = await asyncio.to_thread(_render_pdf, payload)
+    visita = payload["visita"]
+    siguientes: Siguientes = [("telegram", {"visita": visita, "pdf_path": pdf_path})]
+    if visita.get("persona_email"):
+        siguientes.append(("email", {"visita": visita, "pdf_path": pdf_path}))
+    return {"pdf_path": pdf_path}, siguientes
+
+
+def _leer_pdf(payload: Dict[str, Any]) -> Optional[bytes]:
+    ruta = payload.get("pdf_path")
+    if ruta and Path(ruta).exists():
+        return Path(ruta).read_bytes()
+    return None
+
+
+async def _manejar_telegram(payload: Dict[str, Any]):
+    from app.utils.telegram import enviar_notificacion_telegram
+
+    if not settings.telegram_bot_token or not settings.telegram_chat_id:
+        return {"omitida": "Telegram no configurado"}, []
+
+    visita = payload["visita"]
+    pdf_bytes = await asyncio.to_thread(_leer_pdf, payload)
+    with medir_etapa("telegram"):
+        respuesta = await enviar_notificacion_telegram(
+            visita_data=visita,
+            persona_nombre=visita.get("persona_nombre", "N/A"),
+            pdf_bytes=pdf_bytes,
+        )
+        if respuesta is None:
+            raise RuntimeError("Telegram no confirmó el envío")
+    return {"enviado": True}, []
+
+
+async def _manejar_email(payload: Dict[str, Any]):
+    from app.services.email_service import email_service
+
+    if not email_service.email_enabled:
+        return {"omitida": "Email no configurado"}, []
+
+    visita = payload["visita"]
+    pdf_bytes = await asyncio.to_thread(_leer_pdf, payload)
+    cuerpo_email = f"""
+            Estimado/a {visita.get('persona_nombre', '')},
+            ✅ Visita registrada: {visita.get('codigo_visita')}
+            Centro: {visita.get('centro_nombre')}
+            Fecha: {visita.get('fecha_programada')}
+            """
+    with medir_etapa("smtp"):
+        enviado = await email_service.send_email(
+            email=visita["persona_email"],
+            subject=f"Constancia Visita - {visita.get('codigo_visita')}",
+            body=cuerpo_email,
+            attachment_bytes=pdf_bytes,
+            attachment_name=f"constancia_{visita.get('codigo_visita')}.pdf",
+        )
+        if not enviado:
+            raise RuntimeError("El servidor SMTP rechazó el envío")
+    return {"enviado": True}, []
+
+
+MANEJADORES: Dict[str, Manejador] = {
+    "generar_pdf": _manejar_generar_pdf,
+    "telegram": _manejar_telegram,
+    "email": _manejar_email,
+}
+
+
+# ---------------------------------------------------------------------------
+# Operaciones de BD (se ejecutan en hilos, cada una con su propia sesión)
+# ---------------------------------------------------------------------------
+
+def _reclamar() -> Optional[Tuple[int, str, Dict[str, Any]]]:
+    db = SessionLocal()
+    try:
+        tarea = TareaService(db).reclamar()
+        if tarea is None:
+            return None
+        return tarea.id, tarea.tipo, dict(tarea.payload or {})
+    finally:
+        db.close()
+
+
+def _completar(tarea_id: int, resultado: Optional[Dict[str, Any]], siguientes: Siguientes) -> bool:
+    db = SessionLocal()
+    try:
+        TareaService(db).completar(tarea_id, resultado=resultado, siguientes=siguientes)
+        return bool(siguientes)
+    finally:
+        db.close()
+
+
+def _fallar(tarea_id: int, error: str) -> None:
+    db = SessionLocal()
+    try:
+        TareaService(db).fallar(tarea_id, error)
+    finally:
+        db.close()
+
+
+class PoolTareas:
+    """
+    Pool de N workers asyncio que consumen la cola de tareas.
+
+    Los workers esperan un aviso (notificar()) o, como máximo,
+    settings.outbox_poll_interval segundos antes de volver a consultar la tabla.
+    """
+
+    def __init__(self, workers: int, poll_interval: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._aviso: Optional[asyncio.Event] = None
+        self._detener = False
+
+    @property
+    def activo(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        if self._tasks or self.workers <= 0:
+            return
+        self._detener = False
+        self._aviso = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"tareas-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Pool de tareas iniciado con {self.workers} workers")
+
+    async def stop(self) -> None:
+        """Detiene los workers; la tarea en curso termina antes de salir."""
+        self._detener = True
+        if self._aviso:
+            self._aviso.set()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Pool de tareas detenido")
+
+    def notificar(self) -> None:
+        """Despierta a los workers (llamar después del commit que encola)."""
+        if self._aviso:
+            self._aviso.set()
+
+    async def _esperar_aviso(self) -> None:
+        try:
+            await asyncio.wait_for(self._aviso.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._aviso.clear()
+
+    async def _worker(self, numero: int) -> None:
+        while not self._detener:
+            try:
+                procesada = await self.procesar_siguiente()
+            except Exception as e:
+                logger.error(f"Worker {numero}: error consultando la cola: {e}")
+                procesada = False
+            if not procesada and not self._detener:
+                await self._esperar_aviso()
+
+    async def procesar_siguiente(self) -> bool:
+        """Procesa una tarea; retorna False si la cola estaba vacía."""
+        reclamada = await asyncio.to_thread(_reclamar)
+        if reclamada is None:
+            return False
+
+        tarea_id, tipo, payload = reclamada
+        manejador = MANEJADORES.get(tipo)
+        try:
+            if manejador is None:
+                raise ValueError(f"Tipo de tarea desconocido: {tipo}")
+            resultado, siguientes = await manejador(payload)
+        except Exception as e:
+            logger.warning(f"Tarea {tarea_id} ({tipo}) falló: {e}")
+            await asyncio.to_thread(_fallar, tarea_id, f"{type(e).__name__}: {e}")
+            return True
+
+        if await asyncio.to_thread(_completar, tarea_id, resultado, siguientes):
+            self.notificar()
+        return True
+
+
+# Instancia global (arranca/para en el lifespan de app.main)
+pool_tareas = PoolTareas(
+    workers=settings.outbox_workers,
+    poll_interval=settings.outbox_poll_interval,
+)
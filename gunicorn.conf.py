@@ -0,0 +1,46 @@
+# gunicorn.conf.py - Modo multi-worker (gunicorn + workers uvicorn)
+"""
+Uso:  gunicorn -c gunicorn.conf.py app.main:app
+
+- Un worker uvicorn por núcleo (WEB_CONCURRENCY para fijarlo).
+- Cada worker tiene su propio pool de BD: workers * (DATABASE_POOL_SIZE +
+  DATABASE_MAX_OVERFLOW + DATABASE_ASYNC_POOL_SIZE + DATABASE_ASYNC_MAX_OVERFLOW)
+  debe quedar por debajo de max_connections de PostgreSQL.
+- Con más de un worker usar ESTADO_BACKEND=redis: rate limiting, invalidación
+  de cachés y progreso de exportaciones se comparten por Redis.
+- Sin preload: cada worker crea su engine, sus hilos y su pool de procesos
+  después del fork. Los workers en segundo plano ya toleran varias instancias
+  (cola de tareas con SKIP LOCKED, mantenimiento con advisory lock).
+"""
+
+import multiprocessing
+import os
+
+
+def _entero(nombre: str, defecto: int) -> int:
+    valor = os.getenv(nombre)
+    return int(valor) if valor else defecto
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5050")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = max(_entero("WEB_CONCURRENCY", multiprocessing.cpu_count()), 1)
+
+# Reinicio periódico de workers (fragmentación de memoria); el jitter evita que se reinicien todos a la vez
+max_requests = _entero("GUNICORN_MAX_REQUESTS", 10000)
+max_requests_jitter = _entero("GUNICORN_MAX_REQUESTS_JITTER", 1000)
+
+# Las exportaciones de PDFs en streaming pueden tardar: timeout holgado
+timeout = _entero("GUNICORN_TIMEOUT", 120)
+graceful_timeout = _entero("GUNICORN_GRACEFUL_TIMEOUT", 30)  # lifespan vacía la cola de auditoría
+keepalive = _entero("GUNICORN_KEEPALIVE", 5)
+
+preload_app = False
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "*")  # detrás de nginx
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+
+def when_ready(server):
+    server.log.info(f"gunicorn listo: {workers} workers uvicorn en {bind}")
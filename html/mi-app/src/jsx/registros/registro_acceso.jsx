@@ -129,14 +129,14 @@ export default function RegistroAcceso() {
 
 
   async function fetchCedulas() {
-    const r = await apiFetch(`${API_PERSONAS}/cedulas`);
+    const r = await apiFetch(`${API_PERSONAS}/cedulas?limit=100`);
     const items = await r.json();
     return Array.isArray(items) ? items : (items.items ?? items.data ?? []);
   }
 
 
   async function searchCedulas(prefix) {
-    const r = await apiFetch(`${API_PERSONAS}/search?q=${encodeURIComponent(prefix)}`);
+    const r = await apiFetch(`${API_PERSONAS}/autocompletar?prefijo=${encodeURIComponent(prefix)}&limit=50`);
     const items = await r.json();
     return Array.isArray(items) ? items : (items.items ?? items.data ?? []);
   }
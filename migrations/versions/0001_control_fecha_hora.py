@@ -0,0 +1,92 @@
+"""control: columna fecha_hora (timestamptz) e índices compuestos de auditoría
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 10:00:00
+
+La tabla control guardaba la fecha (Date) y la hora (String "HH:MM:SS") por
+separado y se ordenaba por desc(fecha), desc(cast(hora)): ningún índice podía
+servir ese orden. Además el modelo reasignaba __table_args__, por lo que
+idx_control_fecha_usuario no coincidía con los filtros reales.
+
+- Agrega fecha_hora timestamptz y la rellena desde fecha + hora en lotes.
+- Crea índices (fecha_hora, id), (usuario_id, fecha_hora, id),
+  (realizado, fecha_hora) y (tabla_afectada, fecha_hora).
+- Elimina idx_control_fecha_usuario.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+SCHEMA = "sistema_gestiones"
+LOTE_BACKFILL = 50000
+
+INDICES = [
+    ("idx_control_fecha_hora", ["fecha_hora", "id"]),
+    ("idx_control_usuario_fecha_hora", ["usuario_id", "fecha_hora", "id"]),
+    ("idx_control_realizado_fecha_hora", ["realizado", "fecha_hora"]),
+    ("idx_control_tabla_fecha_hora", ["tabla_afectada", "fecha_hora"]),
+]
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    # Las bases creadas por create_tables() con el modelo nuevo ya tienen la columna
+    columnas = {c["name"] for c in sa.inspect(conn).get_columns("control", schema=SCHEMA)}
+    if "fecha_hora" not in columnas:
+        op.add_column(
+            "control",
+            sa.Column("fecha_hora", sa.DateTime(timezone=True), nullable=True),
+            schema=SCHEMA,
+        )
+
+    # Backfill por rangos de id para no generar una sola actualización gigante.
+    # fecha/hora se escribían con la hora local del servidor: se interpretan
+    # en la zona horaria de la sesión. Una hora mal formada cae a medianoche.
+    limites = conn.execute(sa.text(f"SELECT min(id), max(id) FROM {SCHEMA}.control")).first()
+    if limites and limites[0] is not None:
+        desde, hasta = limites
+        while desde <= hasta:
+            conn.execute(
+                sa.text(f"""
+                    UPDATE {SCHEMA}.control
+                    SET fecha_hora = CASE
+                        WHEN hora ~ '^[0-9]{{2}}:[0-9]{{2}}:[0-9]{{2}}$'
+                            THEN (fecha + hora::time)::timestamptz
+                        ELSE fecha::timestamptz
+                    END
+                    WHERE id >= :desde AND id < :hasta AND fecha_hora IS NULL
+                """),
+                {"desde": desde, "hasta": desde + LOTE_BACKFILL},
+            )
+            desde += LOTE_BACKFILL
+
+    op.alter_column(
+        "control",
+        "fecha_hora",
+        nullable=False,
+        server_default=sa.text("now()"),
+        schema=SCHEMA,
+    )
+
+    op.execute(f"DROP INDEX IF EXISTS {SCHEMA}.idx_control_fecha_usuario")
+    for nombre, columnas in INDICES:
+        op.create_index(nombre, "control", columnas, schema=SCHEMA, if_not_exists=True)
+
+    op.execute(f"ANALYZE {SCHEMA}.control")
+
+
+def downgrade() -> None:
+    for nombre, _ in reversed(INDICES):
+        op.drop_index(nombre, table_name="control", schema=SCHEMA, if_exists=True)
+    op.create_index(
+        "idx_control_fecha_usuario", "control", ["fecha", "usuario_id"],
+        schema=SCHEMA, if_not_exists=True,
+    )
+    op.drop_column("control", "fecha_hora", schema=SCHEMA)
@@ -0,0 +1,174 @@
+"""control: particionado mensual por RANGE (fecha_hora)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 11:00:00
+
+Convierte sistema_gestiones.control en una tabla particionada por mes:
+
+1. Renombra la tabla actual a control_legacy (sus índices se eliminan y su
+   PK se renombra para liberar los nombres).
+2. Crea control PARTITION BY RANGE (fecha_hora) con PK (id, fecha_hora),
+   reutilizando la secuencia de id, y los mismos índices del modelo.
+3. Crea una partición por mes desde el registro más antiguo hasta
+   settings.control_particiones_adelante meses después del actual, más
+   control_default para filas fuera de rango.
+4. Copia las filas y elimina control_legacy.
+
+Las particiones siguientes las crea app.services.particiones_control.
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "sistema_gestiones"
+
+COLUMNAS = (
+    "id, realizado, fecha_hora, fecha, hora, usuario_id, detalles, "
+    "ip_address, user_agent, tabla_afectada, registro_id"
+)
+
+INDICES = [
+    ("ix_sistema_gestiones_control_id", ["id"]),
+    ("ix_sistema_gestiones_control_fecha", ["fecha"]),
+    ("ix_sistema_gestiones_control_usuario_id", ["usuario_id"]),
+    ("idx_control_fecha_hora", ["fecha_hora", "id"]),
+    ("idx_control_usuario_fecha_hora", ["usuario_id", "fecha_hora", "id"]),
+    ("idx_control_realizado_fecha_hora", ["realizado", "fecha_hora"]),
+    ("idx_control_tabla_fecha_hora", ["tabla_afectada", "fecha_hora"]),
+]
+
+
+def _sumar_meses(mes: date, n: int) -> date:
+    total = mes.year * 12 + (mes.month - 1) + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _relkind(conn, tabla: str):
+    return conn.execute(
+        sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"),
+        {"t": f"{SCHEMA}.{tabla}"},
+    ).scalar()
+
+
+def _eliminar_indices(conn, tabla: str) -> None:
+    """Elimina los índices (salvo la PK) de una tabla para liberar sus nombres."""
+    nombres = conn.execute(
+        sa.text("""
+            SELECT i.relname
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = to_regclass(:t) AND NOT x.indisprimary
+        """),
+        {"t": f"{SCHEMA}.{tabla}"},
+    ).scalars().all()
+    for nombre in nombres:
+        op.execute(f'DROP INDEX {SCHEMA}."{nombre}"')
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if _relkind(conn, "control") == "p":
+        return
+
+    secuencia = conn.execute(
+        sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": f"{SCHEMA}.control"}
+    ).scalar()
+    if secuencia is None:
+        # id sin secuencia propia (tabla creada a mano): se crea una a partir del máximo
+        secuencia = f"{SCHEMA}.control_id_seq"
+        op.execute(f"CREATE SEQUENCE IF NOT EXISTS {secuencia}")
+        op.execute(f"SELECT setval('{secuencia}', coalesce((SELECT max(id) FROM {SCHEMA}.control), 0) + 1, false)")
+
+    op.execute(f"ALTER TABLE {SCHEMA}.control RENAME TO control_legacy")
+    _eliminar_indices(conn, "control_legacy")
+    op.execute(f"ALTER TABLE {SCHEMA}.control_legacy RENAME CONSTRAINT control_pkey TO control_legacy_pkey")
+
+    op.execute(f"""
+        CREATE TABLE {SCHEMA}.control (
+            id integer NOT NULL DEFAULT nextval('{secuencia}'::regclass),
+            realizado varchar(100) NOT NULL,
+            fecha_hora timestamptz NOT NULL DEFAULT now(),
+            fecha date NOT NULL,
+            hora varchar(8) NOT NULL,
+            usuario_id integer NOT NULL REFERENCES {SCHEMA}.usuario(id),
+            detalles text,
+            ip_address varchar(45),
+            user_agent text,
+            tabla_afectada varchar(50),
+            registro_id integer,
+            CONSTRAINT control_pkey PRIMARY KEY (id, fecha_hora)
+        ) PARTITION BY RANGE (fecha_hora)
+    """)
+    # La secuencia pasa a la tabla nueva antes de eliminar la anterior
+    op.execute(f"ALTER SEQUENCE {secuencia} OWNED BY {SCHEMA}.control.id")
+
+    for nombre, columnas in INDICES:
+        op.create_index(nombre, "control", columnas, schema=SCHEMA)
+
+    minimo = conn.execute(sa.text(f"SELECT min(fecha_hora) FROM {SCHEMA}.control_legacy")).scalar()
+    mes_actual = date.today().replace(day=1)
+    mes = minimo.date().replace(day=1) if minimo else mes_actual
+    ultimo = _sumar_meses(mes_actual, settings.control_particiones_adelante)
+    while mes <= ultimo:
+        siguiente = _sumar_meses(mes, 1)
+        op.execute(
+            f"CREATE TABLE {SCHEMA}.control_p{mes:%Y_%m} PARTITION OF {SCHEMA}.control "
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{siguiente.isoformat()}')"
+        )
+        mes = siguiente
+    op.execute(f"CREATE TABLE {SCHEMA}.control_default PARTITION OF {SCHEMA}.control DEFAULT")
+
+    op.execute(f"INSERT INTO {SCHEMA}.control ({COLUMNAS}) SELECT {COLUMNAS} FROM {SCHEMA}.control_legacy")
+    op.execute(f"DROP TABLE {SCHEMA}.control_legacy")
+    op.execute(f"ANALYZE {SCHEMA}.control")
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if _relkind(conn, "control") != "p":
+        return
+
+    secuencia = conn.execute(
+        sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": f"{SCHEMA}.control"}
+    ).scalar()
+
+    op.execute(f"ALTER TABLE {SCHEMA}.control RENAME TO control_particionada")
+    _eliminar_indices(conn, "control_particionada")
+    op.execute(
+        f"ALTER TABLE {SCHEMA}.control_particionada RENAME CONSTRAINT control_pkey TO control_particionada_pkey"
+    )
+
+    op.execute(f"""
+        CREATE TABLE {SCHEMA}.control (
+            id integer NOT NULL DEFAULT nextval('{secuencia}'::regclass),
+            realizado varchar(100) NOT NULL,
+            fecha_hora timestamptz NOT NULL DEFAULT now(),
+            fecha date NOT NULL,
+            hora varchar(8) NOT NULL,
+            usuario_id integer NOT NULL REFERENCES {SCHEMA}.usuario(id),
+            detalles text,
+            ip_address varchar(45),
+            user_agent text,
+            tabla_afectada varchar(50),
+            registro_id integer,
+            CONSTRAINT control_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute(f"ALTER SEQUENCE {secuencia} OWNED BY {SCHEMA}.control.id")
+    op.execute(f"INSERT INTO {SCHEMA}.control ({COLUMNAS}) SELECT {COLUMNAS} FROM {SCHEMA}.control_particionada")
+    # Elimina la tabla particionada junto con todas sus particiones
+    op.execute(f"DROP TABLE {SCHEMA}.control_particionada")
+
+    for nombre, columnas in INDICES:
+        op.create_index(nombre, "control", columnas, schema=SCHEMA)
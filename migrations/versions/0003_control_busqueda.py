@@ -0,0 +1,101 @@
+"""control: búsqueda de texto (tsvector + trigger) e índices pg_trgm
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 12:00:00
+
+- Columna control.busqueda (tsvector) calculada por la función
+  control_busqueda_vector(realizado, tabla_afectada, detalles) y mantenida
+  por el trigger control_busqueda_trg al insertar o modificar esas columnas.
+  El trigger está en la tabla particionada (requiere PostgreSQL 13+).
+- Índice GIN sobre busqueda.
+- Extensión pg_trgm e índices GIN trigram en control.realizado,
+  control.tabla_afectada, usuario.username y usuario.nombre para los
+  ILIKE '%termino%' de /audit/search.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "sistema_gestiones"
+LOTE_BACKFILL = 50000
+
+INDICES_TRGM = [
+    ("idx_control_realizado_trgm", "control", "realizado"),
+    ("idx_control_tabla_trgm", "control", "tabla_afectada"),
+    ("idx_usuario_username_trgm", "usuario", "username"),
+    ("idx_usuario_nombre_trgm", "usuario", "nombre"),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION {SCHEMA}.control_busqueda_vector(
+            realizado text, tabla_afectada text, detalles text
+        ) RETURNS tsvector
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT
+                setweight(to_tsvector('spanish'::regconfig, coalesce(realizado, '')), 'A') ||
+                setweight(to_tsvector('spanish'::regconfig, coalesce(tabla_afectada, '')), 'B') ||
+                setweight(to_tsvector('spanish'::regconfig, coalesce(detalles, '')), 'C')
+        $$
+    """)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION {SCHEMA}.control_busqueda_actualizar()
+        RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.busqueda := {SCHEMA}.control_busqueda_vector(
+                NEW.realizado, NEW.tabla_afectada, NEW.detalles::text
+            );
+            RETURN NEW;
+        END
+        $$
+    """)
+
+    op.add_column("control", sa.Column("busqueda", sa.dialects.postgresql.TSVECTOR()), schema=SCHEMA)
+    op.execute(f"""
+        CREATE TRIGGER control_busqueda_trg
+        BEFORE INSERT OR UPDATE OF realizado, tabla_afectada, detalles
+        ON {SCHEMA}.control
+        FOR EACH ROW EXECUTE FUNCTION {SCHEMA}.control_busqueda_actualizar()
+    """)
+
+    # Backfill por rangos de id
+    conn = op.get_bind()
+    limites = conn.execute(sa.text(f"SELECT min(id), max(id) FROM {SCHEMA}.control")).first()
+    if limites and limites[0] is not None:
+        desde, hasta = limites
+        while desde <= hasta:
+            conn.execute(
+                sa.text(f"""
+                    UPDATE {SCHEMA}.control
+                    SET busqueda = {SCHEMA}.control_busqueda_vector(realizado, tabla_afectada, detalles::text)
+                    WHERE id >= :desde AND id < :hasta
+                """),
+                {"desde": desde, "hasta": desde + LOTE_BACKFILL},
+            )
+            desde += LOTE_BACKFILL
+
+    op.execute(f"CREATE INDEX idx_control_busqueda ON {SCHEMA}.control USING gin (busqueda)")
+    for nombre, tabla, columna in INDICES_TRGM:
+        op.execute(f"CREATE INDEX {nombre} ON {SCHEMA}.{tabla} USING gin ({columna} gin_trgm_ops)")
+
+    op.execute(f"ANALYZE {SCHEMA}.control")
+
+
+def downgrade() -> None:
+    for nombre, _, _ in reversed(INDICES_TRGM):
+        op.execute(f"DROP INDEX IF EXISTS {SCHEMA}.{nombre}")
+    op.execute(f"DROP INDEX IF EXISTS {SCHEMA}.idx_control_busqueda")
+    op.execute(f"DROP TRIGGER IF EXISTS control_busqueda_trg ON {SCHEMA}.control")
+    op.drop_column("control", "busqueda", schema=SCHEMA)
+    op.execute(f"DROP FUNCTION IF EXISTS {SCHEMA}.control_busqueda_actualizar()")
+    op.execute(f"DROP FUNCTION IF EXISTS {SCHEMA}.control_busqueda_vector(text, text, text)")
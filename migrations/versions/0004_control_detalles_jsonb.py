@@ -0,0 +1,67 @@
+"""control: detalles como JSONB con índice GIN
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 13:00:00
+
+log_action guardaba detalles como texto (json.dumps). Se convierte la
+columna a JSONB; un texto que no sea JSON válido queda como
+{"texto": "..."}. El índice GIN (jsonb_path_ops) resuelve los filtros
+detalle=clave=valor de /audit/logs por contención (@>).
+
+El trigger de búsqueda (0003) depende de la columna, así que se elimina
+durante el cambio de tipo y se vuelve a crear.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "sistema_gestiones"
+
+CREAR_TRIGGER = f"""
+    CREATE TRIGGER control_busqueda_trg
+    BEFORE INSERT OR UPDATE OF realizado, tabla_afectada, detalles
+    ON {SCHEMA}.control
+    FOR EACH ROW EXECUTE FUNCTION {SCHEMA}.control_busqueda_actualizar()
+"""
+
+
+def upgrade() -> None:
+    op.execute(f"""
+        CREATE FUNCTION {SCHEMA}.control_texto_a_jsonb(t text) RETURNS jsonb
+        LANGUAGE plpgsql IMMUTABLE AS $$
+        BEGIN
+            IF t IS NULL THEN
+                RETURN NULL;
+            END IF;
+            RETURN t::jsonb;
+        EXCEPTION WHEN others THEN
+            RETURN jsonb_build_object('texto', t);
+        END
+        $$
+    """)
+
+    op.execute(f"DROP TRIGGER IF EXISTS control_busqueda_trg ON {SCHEMA}.control")
+    op.execute(f"""
+        ALTER TABLE {SCHEMA}.control
+        ALTER COLUMN detalles TYPE jsonb USING {SCHEMA}.control_texto_a_jsonb(detalles)
+    """)
+    op.execute(CREAR_TRIGGER)
+    op.execute(f"DROP FUNCTION {SCHEMA}.control_texto_a_jsonb(text)")
+
+    op.execute(
+        f"CREATE INDEX idx_control_detalles ON {SCHEMA}.control USING gin (detalles jsonb_path_ops)"
+    )
+    op.execute(f"ANALYZE {SCHEMA}.control")
+
+
+def downgrade() -> None:
+    op.execute(f"DROP INDEX IF EXISTS {SCHEMA}.idx_control_detalles")
+    op.execute(f"DROP TRIGGER IF EXISTS control_busqueda_trg ON {SCHEMA}.control")
+    op.execute(f"ALTER TABLE {SCHEMA}.control ALTER COLUMN detalles TYPE text USING detalles::text")
+    op.execute(CREAR_TRIGGER)
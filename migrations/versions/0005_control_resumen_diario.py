@@ -0,0 +1,56 @@
+"""control_resumen_diario: conteos diarios de auditoría
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 14:00:00
+
+/audit/stats agrupaba toda la tabla control en cada llamada. Esta tabla
+guarda el conteo por (fecha, realizado, tabla_afectada, usuario_id); el
+servicio la actualiza en la misma transacción del INSERT en control y las
+estadísticas solo cuentan en vivo el día actual. tabla_afectada NULL se
+guarda como '' porque forma parte de la clave primaria.
+
+create_tables() puede haber creado ya la tabla vacía, así que se crea solo
+si falta y el relleno inicial reemplaza lo que hubiera.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "sistema_gestiones"
+
+
+def upgrade() -> None:
+    op.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA}.control_resumen_diario (
+            fecha date NOT NULL,
+            realizado varchar(100) NOT NULL,
+            tabla_afectada varchar(50) NOT NULL DEFAULT '',
+            usuario_id integer NOT NULL,
+            total integer NOT NULL DEFAULT 0,
+            PRIMARY KEY (fecha, realizado, tabla_afectada, usuario_id)
+        )
+    """)
+    op.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_control_resumen_realizado
+        ON {SCHEMA}.control_resumen_diario (realizado, tabla_afectada)
+    """)
+
+    op.execute(f"TRUNCATE {SCHEMA}.control_resumen_diario")
+    op.execute(f"""
+        INSERT INTO {SCHEMA}.control_resumen_diario
+            (fecha, realizado, tabla_afectada, usuario_id, total)
+        SELECT fecha, realizado, coalesce(tabla_afectada, ''), usuario_id, count(*)
+        FROM {SCHEMA}.control
+        GROUP BY fecha, realizado, coalesce(tabla_afectada, ''), usuario_id
+    """)
+    op.execute(f"ANALYZE {SCHEMA}.control_resumen_diario")
+
+
+def downgrade() -> None:
+    op.execute(f"DROP TABLE IF EXISTS {SCHEMA}.control_resumen_diario")
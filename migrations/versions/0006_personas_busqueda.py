@@ -0,0 +1,60 @@
+"""personas: búsqueda trigram sin acentos
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 15:00:00
+
+list_personas filtraba con ILIKE '%...%' sobre columnas con índice btree,
+que no sirve para comodines al inicio. persona_texto_busqueda() une
+nombre, apellido, cédula, email y empresa en minúsculas y sin acentos; un
+índice GIN pg_trgm sobre esa expresión resuelve los LIKE de
+app.services.busqueda_personas.
+
+unaccent() no es IMMUTABLE (depende del search_path para el diccionario),
+por eso la función lo llama con el esquema de la extensión explícito.
+"""
+from alembic import op
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "sistema_gestiones"
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    esquema_ext = op.get_bind().execute(text("""
+        SELECT n.nspname FROM pg_extension e
+        JOIN pg_namespace n ON n.oid = e.extnamespace
+        WHERE e.extname = 'unaccent'
+    """)).scalar()
+
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION {SCHEMA}.persona_texto_busqueda(
+            nombre text, apellido text, documento text, email text, empresa text
+        ) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT lower({esquema_ext}.unaccent(
+                '{esquema_ext}.unaccent'::regdictionary,
+                concat_ws(' ', nombre, apellido, documento, email, empresa)
+            ))
+        $$
+    """)
+    op.execute(f"""
+        CREATE INDEX idx_personas_busqueda_trgm ON {SCHEMA}.personas
+        USING gin ({SCHEMA}.persona_texto_busqueda(
+            nombre, apellido, documento_identidad, email, empresa
+        ) gin_trgm_ops)
+    """)
+    op.execute(f"ANALYZE {SCHEMA}.personas")
+
+
+def downgrade() -> None:
+    op.execute(f"DROP INDEX IF EXISTS {SCHEMA}.idx_personas_busqueda_trgm")
+    op.execute(f"DROP FUNCTION IF EXISTS {SCHEMA}.persona_texto_busqueda(text, text, text, text, text)")
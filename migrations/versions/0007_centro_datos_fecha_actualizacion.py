@@ -0,0 +1,32 @@
+"""centro_datos: fecha_actualizacion
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 16:00:00
+
+CentroDatosResponse ya declaraba fecha_actualizacion pero la tabla no la
+tenía. Los ETag/Last-Modified de /centros-datos (app.utils.condicional) la
+usan para detectar ediciones. create_tables() puede haber agregado la tabla
+con la columna, por eso se agrega solo si falta.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+SCHEMA = "sistema_gestiones"
+
+
+def upgrade() -> None:
+    op.execute(f"""
+        ALTER TABLE {SCHEMA}.centro_datos
+        ADD COLUMN IF NOT EXISTS fecha_actualizacion timestamptz
+    """)
+
+
+def downgrade() -> None:
+    op.execute(f"ALTER TABLE {SCHEMA}.centro_datos DROP COLUMN IF EXISTS fecha_actualizacion")
@@ -0,0 +1,117 @@
+"""
+Benchmark de throughput concurrente: consulta síncrona dentro de un handler
+`async def` (como estaban list_visitas/list_personas/get_control_logs)
+frente a la sesión de app.database_async (asyncpg + run_sync).
+
+Cada petición ejecuta una consulta con pg_sleep(LATENCIA) que modela la
+latencia de red/IO de una lectura real. Con la Session síncrona el loop
+queda bloqueado y las peticiones se atienden de a una; con AsyncSession se
+solapan hasta el tamaño del pool.
+
+Lento, con PostgreSQL y asyncpg: se ejecuta con TEST_POSTGRES_URL definida
+y `pytest -m slow tests/benchmarks`.
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database_async import url_async
+
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+pytestmark = [
+    pytest.mark.slow,
+    pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL no definida"),
+]
+
+asyncpg = pytest.importorskip("asyncpg")
+httpx = pytest.importorskip("httpx")
+
+PETICIONES = 200
+CONCURRENCIA = 50
+POOL = 10
+LATENCIA = 0.01
+MEJORA_MINIMA = 3.0
+
+CONSULTA = text("SELECT pg_sleep(:latencia), count(*) FROM generate_series(1, 1000)")
+
+
+def _crear_app():
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    engine = create_engine(POSTGRES_URL, pool_size=POOL, max_overflow=0)
+    sesiones = sessionmaker(bind=engine)
+    engine_async = create_async_engine(url_async(POSTGRES_URL), pool_size=POOL, max_overflow=0)
+    sesiones_async = async_sessionmaker(engine_async, expire_on_commit=False)
+
+    def get_db():
+        db = sesiones()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with sesiones_async() as sesion:
+            yield sesion
+
+    app = FastAPI()
+
+    @app.get("/antes")
+    async def antes(db: Session = Depends(get_db)):
+        # Patrón anterior: psycopg2 bloquea el event loop
+        return {"total": db.execute(CONSULTA, {"latencia": LATENCIA}).one()[1]}
+
+    @app.get("/despues")
+    async def despues(adb=Depends(get_async_db)):
+        total = await adb.run_sync(lambda db: db.execute(CONSULTA, {"latencia": LATENCIA}).one()[1])
+        return {"total": total}
+
+    return app, engine, engine_async
+
+
+async def _throughput(cliente, ruta: str) -> float:
+    semaforo = asyncio.Semaphore(CONCURRENCIA)
+
+    async def una():
+        async with semaforo:
+            respuesta = await cliente.get(ruta)
+            assert respuesta.status_code == 200
+
+    await cliente.get(ruta)  # calienta el pool
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una() for _ in range(PETICIONES)))
+    return PETICIONES / (time.perf_counter() - inicio)
+
+
+class TestBenchmarkAsync:
+    """Peticiones por segundo con CONCURRENCIA clientes simultáneos."""
+
+    def test_throughput_concurrente(self):
+        """
+        Prueba que la sesión async multiplica el throughput frente a la síncrona en el loop.
+        """
+        app, engine, engine_async = _crear_app()
+
+        async def medir():
+            transporte = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+                resultado = (await _throughput(cliente, "/antes"), await _throughput(cliente, "/despues"))
+            await engine_async.dispose()
+            return resultado
+
+        try:
+            antes, despues = asyncio.run(medir())
+        finally:
+            engine.dispose()
+
+        print(f"\nsync en el loop: {antes:.0f} req/s  async: {despues:.0f} req/s  ({despues / antes:.1f}x)")
+        # Sin solapamiento el techo es ~1/LATENCIA; con el pool async, ~POOL/LATENCIA
+        assert antes < 1.2 / LATENCIA
+        assert despues >= antes * MEJORA_MINIMA
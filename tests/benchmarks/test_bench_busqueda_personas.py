@@ -0,0 +1,112 @@
+"""
+Benchmark de la búsqueda de personas (q) sobre PostgreSQL con el índice
+trigram de la migración 0006.
+
+Lento y con PostgreSQL: se ejecuta con TEST_POSTGRES_URL definida y
+`pytest -m slow tests/benchmarks`. Todo corre en una transacción que se
+revierte al final.
+"""
+
+import os
+import statistics
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models import Persona
+from app.services import busqueda_personas
+from app.services.busqueda_personas import BusquedaPersonas
+
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+pytestmark = [
+    pytest.mark.slow,
+    pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL no definida"),
+]
+
+FILAS = 200_000
+REPETICIONES = 50
+P95_MAXIMO_MS = 50.0
+
+CONSULTAS = ["perez", "maria gonzalez", "1234", "cantv", "jose@", "peña ramirez", "empresa 17"]
+
+
+@pytest.fixture(scope="module")
+def pg_personas():
+    """
+    Sesión sobre PostgreSQL con FILAS personas, la función de búsqueda y su índice.
+    """
+    engine = create_engine(POSTGRES_URL)
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    conexion.execute(text("CREATE SCHEMA IF NOT EXISTS sistema_gestiones"))
+    conexion.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conexion.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+    Base.metadata.create_all(conexion, tables=[Persona.__table__])
+    # Misma definición que la migración 0006 (extensión en el esquema public)
+    conexion.execute(text("""
+        CREATE OR REPLACE FUNCTION sistema_gestiones.persona_texto_busqueda(
+            nombre text, apellido text, documento text, email text, empresa text
+        ) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT lower(public.unaccent('public.unaccent'::regdictionary,
+                concat_ws(' ', nombre, apellido, documento, email, empresa)))
+        $$
+    """))
+    conexion.execute(
+        text("""
+            INSERT INTO sistema_gestiones.personas
+                (nombre, apellido, documento_identidad, email, empresa, direccion, foto)
+            SELECT
+                (ARRAY['José','María','Luis','Ana','Pedro','Josefina'])[1 + g % 6],
+                (ARRAY['Pérez','González','Peña','Ramírez','Rodríguez','Díaz'])[1 + (g / 6) % 6] || ' ' || g,
+                (10000000 + g)::text,
+                'persona' || g || '@correo' || (g % 50) || '.com',
+                (ARRAY['CANTV','Empresa','Banco Central','Ñandú C.A.'])[1 + g % 4] || ' ' || (g % 100),
+                'Caracas', 'sin_foto.png'
+            FROM generate_series(1, :filas) AS g
+        """),
+        {"filas": FILAS},
+    )
+    conexion.execute(text("""
+        CREATE INDEX idx_personas_busqueda_trgm ON sistema_gestiones.personas
+        USING gin (sistema_gestiones.persona_texto_busqueda(
+            nombre, apellido, documento_identidad, email, empresa
+        ) gin_trgm_ops)
+    """))
+    conexion.execute(text("ANALYZE sistema_gestiones.personas"))
+    busqueda_personas._tiene_funcion = None
+    session = Session(bind=conexion)
+
+    yield session
+
+    session.close()
+    transaccion.rollback()
+    conexion.close()
+    engine.dispose()
+    busqueda_personas._tiene_funcion = None
+
+
+class TestBenchBusquedaPersonas:
+    """Latencia de BusquedaPersonas.buscar con conteo "ninguno" (ruta del autocompletado)."""
+
+    @pytest.mark.parametrize("consulta", CONSULTAS)
+    def test_p95(self, pg_personas, consulta):
+        """
+        Prueba que el p95 de cada consulta queda bajo P95_MAXIMO_MS.
+        """
+        service = BusquedaPersonas(pg_personas)
+        service.buscar(consulta, limit=20, conteo="ninguno")  # calienta caché
+
+        tiempos = []
+        for _ in range(REPETICIONES):
+            inicio = time.perf_counter()
+            service.buscar(consulta, limit=20, conteo="ninguno")
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+        p95 = statistics.quantiles(tiempos, n=20)[-1]
+        print(f"\n{consulta!r}: p50={statistics.median(tiempos):.1f}ms p95={p95:.1f}ms")
+        assert p95 < P95_MAXIMO_MS
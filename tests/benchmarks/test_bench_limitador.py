@@ -0,0 +1,94 @@
+"""
+Microbenchmark del limitador de tasa con 100k IPs distintas.
+
+Compara el contador de ventana deslizante (app.services.limitador) con el
+algoritmo anterior de RateLimitMiddleware (lista de timestamps por IP que
+se reconstruye en cada request) y verifica memoria y purga de claves.
+
+Se ejecuta con `pytest -m slow tests/benchmarks`.
+"""
+
+import time
+import tracemalloc
+
+import pytest
+
+from app.services.limitador import Regla, VentanaDeslizante
+
+pytestmark = pytest.mark.slow
+
+IPS = 100_000
+RONDAS = 10
+LIMITE = 100
+MAXIMO_US_POR_REQUEST = 20.0
+MAXIMO_MB = 64.0
+
+
+def _ips():
+    return [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(IPS)]
+
+
+def _lista_por_ip(requests, ip, ahora, limite):
+    # Algoritmo original de RateLimitMiddleware.dispatch
+    requests[ip] = [t for t in requests.get(ip, []) if ahora - t < 60]
+    if len(requests[ip]) >= limite:
+        return False
+    requests[ip].append(ahora)
+    return True
+
+
+class TestBenchmarkLimitador:
+    """Costo por request, memoria y purga con 100k claves."""
+
+    def test_100k_ips(self):
+        """
+        Prueba costo por request y memoria con 100k IPs y su purga posterior.
+        """
+        regla = Regla("general", LIMITE, 60.0)
+        ventana = VentanaDeslizante(intervalo_purga=60.0)
+        ips = _ips()
+
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        for ip in ips:
+            ventana.consumir(regla, ip, ahora=0.0)
+        memoria_mb = (tracemalloc.get_traced_memory()[0] - base) / 1e6
+        tracemalloc.stop()
+
+        inicio = time.perf_counter()
+        for ronda in range(RONDAS):
+            for ip in ips:
+                ventana.consumir(regla, ip, ahora=1.0 + ronda)
+        us_por_request = (time.perf_counter() - inicio) / (IPS * RONDAS) * 1e6
+
+        print(f"\n{IPS} IPs: {us_por_request:.2f} us/request, {memoria_mb:.1f} MB")
+        assert ventana.claves() == IPS
+        assert us_por_request < MAXIMO_US_POR_REQUEST
+        assert memoria_mb < MAXIMO_MB
+
+        # Dos ventanas sin actividad: la purga deja solo la clave nueva
+        ventana.consumir(regla, "nueva", ahora=181.0)
+        assert ventana.claves() == 1
+
+    def test_ip_caliente_frente_a_lista(self):
+        """
+        Prueba que el costo no crece con los requests en la ventana (la lista sí).
+        """
+        limite = 5000
+        regla = Regla("general", limite, 60.0)
+        ventana = VentanaDeslizante()
+        requests = {}
+        n = limite
+
+        inicio = time.perf_counter()
+        for i in range(n):
+            _lista_por_ip(requests, "1.1.1.1", i * 0.001, limite)
+        lista = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for i in range(n):
+            ventana.consumir(regla, "1.1.1.1", ahora=i * 0.001)
+        deslizante = time.perf_counter() - inicio
+
+        print(f"\nIP con {n} requests/min: lista {lista * 1e3:.1f} ms, ventana deslizante {deslizante * 1e3:.1f} ms")
+        assert deslizante * 10 < lista
@@ -0,0 +1,129 @@
+"""
+Microbenchmark del costo por request de la pila de middlewares.
+
+Mide el tiempo por request de una app ASGI mínima envuelta en 0, 1, 3 y 5
+capas de los middlewares de app.middleware.security (ASGI puros) y de la
+misma cantidad de capas BaseHTTPMiddleware que solo agregan un header, que
+es el piso de costo de la implementación anterior.
+
+Ejecutar con `pytest -m slow tests/benchmarks -s` para ver la tabla.
+"""
+
+import asyncio
+import time
+
+import pytest
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.middleware import security
+from app.services.estado_compartido import EstadoMemoria
+from app.services.limitador import Limitador, Regla
+
+pytestmark = pytest.mark.slow
+
+REQUESTS = 2000
+CAPAS = [0, 1, 3, 5]
+
+SCOPE = {
+    "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+    "path": "/api/v1/visitas/", "raw_path": b"/api/v1/visitas/", "root_path": "",
+    "query_string": b"page=1&size=20",
+    "headers": [(b"host", b"testserver"), (b"user-agent", b"bench"), (b"origin", b"https://gestion.local")],
+    "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+}
+
+
+async def _endpoint(scope, receive, send):
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", b"11")],
+    })
+    await send({"type": "http.response.body", "body": b'{"ok":true}'})
+
+
+class _CapaBase(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["X-Capa"] = "1"
+        return response
+
+
+def _pila_asgi(capas: int):
+    limitador = Limitador([Regla("general", 10**9, 60.0)], estado=EstadoMemoria())
+    fabricas = [
+        security.SecurityHeadersMiddleware,
+        security.RequestLoggingMiddleware,
+        security.ErrorHandlingMiddleware,
+        lambda app: security.RateLimitMiddleware(app, limitador=limitador),
+        lambda app: security.CORSCustomMiddleware(app, allowed_origins=["https://gestion.local"]),
+    ]
+    app = _endpoint
+    for fabrica in fabricas[:capas]:
+        app = fabrica(app)
+    return app
+
+
+def _pila_base(capas: int):
+    app = _endpoint
+    for _ in range(capas):
+        app = _CapaBase(app)
+    return app
+
+
+def _receive():
+    """receive de un request: el cuerpo una vez y luego bloquea como un cliente conectado."""
+    mensajes = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if mensajes:
+            return mensajes.pop()
+        await asyncio.Event().wait()
+
+    return receive
+
+
+def _us_por_request(app) -> float:
+    async def send(mensaje):
+        pass
+
+    async def ejecutar():
+        for _ in range(50):
+            await app(dict(SCOPE), _receive(), send)
+        inicio = time.perf_counter()
+        for _ in range(REQUESTS):
+            await app(dict(SCOPE), _receive(), send)
+        return (time.perf_counter() - inicio) / REQUESTS * 1e6
+
+    return asyncio.run(ejecutar())
+
+
+class _SinLog:
+    def info(self, *args, **kwargs):
+        pass
+
+    warning = error = info
+
+
+class TestBenchmarkMiddleware:
+    """Costo por request según la cantidad de capas."""
+
+    def test_costo_por_capa(self, monkeypatch):
+        """
+        Prueba que la pila ASGI completa cuesta menos que la mitad de la misma
+        cantidad de capas BaseHTTPMiddleware vacías.
+        """
+        # Se mide el middleware, no el handler de logging
+        monkeypatch.setattr(security, "logger", _SinLog())
+
+        filas = []
+        for capas in CAPAS:
+            filas.append((capas, _us_por_request(_pila_asgi(capas)), _us_por_request(_pila_base(capas))))
+
+        print("\ncapas  asgi (µs/req)  BaseHTTPMiddleware (µs/req)")
+        for capas, asgi, base in filas:
+            print(f"{capas:5d}  {asgi:13.1f}  {base:27.1f}")
+
+        _, asgi_5, base_5 = filas[-1]
+        _, asgi_0, _ = filas[0]
+        assert asgi_5 - asgi_0 < (base_5 - asgi_0) / 2
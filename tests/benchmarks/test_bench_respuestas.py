@@ -0,0 +1,101 @@
+"""
+Benchmark de serialización y compresión de páginas de visitas (100 y 1000
+items con persona y centro anidados).
+
+Compara la ruta anterior (validación contra response_model + jsonable_encoder
++ json.dumps) con model_dump_json / orjson, y el tamaño con gzip y brotli.
+Ejecutar con `pytest -m slow tests/benchmarks -s` para ver la tabla.
+"""
+
+import gzip
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from app.middleware import compresion
+from app.schemas import VisitaListResponse
+from app.utils.respuestas import dumps
+
+pytestmark = pytest.mark.slow
+
+REPETICIONES = 20
+
+
+def _pagina(n: int) -> VisitaListResponse:
+    inicio = datetime(2024, 6, 1, 8, 0)
+    items = []
+    for i in range(n):
+        items.append({
+            "id": i + 1,
+            "codigo_visita": f"{i:09d}",
+            "persona_id": i % 300 + 1,
+            "centro_datos_id": i % 5 + 1,
+            "estado_id": i % 3 + 1,
+            "tipo_actividad_id": i % 4 + 1,
+            "descripcion_actividad": "Mantenimiento preventivo de equipos en el rack " + str(i % 40),
+            "fecha_programada": inicio + timedelta(minutes=15 * i),
+            "activo": True,
+            "fecha_creacion": inicio,
+            "areas_nombres": ["Sala de servidores", "Cuarto eléctrico"],
+            "persona": {
+                "id": i % 300 + 1, "nombre": "José", "apellido": f"Pérez {i % 300}",
+                "documento_identidad": str(10000000 + i % 300), "email": f"persona{i % 300}@empresa.com",
+                "empresa": "Telecomunicaciones C.A.", "cargo": "Técnico", "foto": f"{10000000 + i % 300}.jpg",
+            },
+            "centro_datos": {
+                "id": i % 5 + 1, "nombre": f"Centro {i % 5}", "codigo": f"CD{i % 5:03d}",
+                "direccion": "Av. Principal, Caracas", "ciudad": "Caracas", "pais": "Venezuela", "activo": True,
+            },
+            "estado": {"id_estado": i % 3 + 1, "nombre_estado": "Programada"},
+            "actividad": {"id_tipo_actividad": i % 4 + 1, "nombre_actividad": "Mantenimiento"},
+        })
+    return VisitaListResponse(items=items, total=n, page=1, size=n, pages=1)
+
+
+def _medir(funcion) -> float:
+    funcion()
+    inicio = time.perf_counter()
+    for _ in range(REPETICIONES):
+        funcion()
+    return (time.perf_counter() - inicio) / REPETICIONES * 1000
+
+
+def _ruta_anterior(pagina: VisitaListResponse) -> bytes:
+    # FastAPI: revalida contra response_model, jsonable_encoder y json.dumps de JSONResponse
+    validado = VisitaListResponse.model_validate(pagina.model_dump())
+    return json.dumps(
+        jsonable_encoder(validado), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class TestBenchRespuestas:
+    """Tiempo de serialización y tamaño comprimido por tamaño de página."""
+
+    @pytest.mark.parametrize("n", [100, 1000])
+    def test_serializacion_y_tamano(self, n):
+        """
+        Prueba que la ruta nueva no es más lenta que la anterior y reporta tamaños.
+        """
+        pagina = _pagina(n)
+        cuerpo = dumps(pagina)
+        assert json.loads(cuerpo) == json.loads(_ruta_anterior(pagina))
+
+        ms_anterior = _medir(lambda: _ruta_anterior(pagina))
+        ms_nueva = _medir(lambda: dumps(pagina))
+        ms_dict = _medir(lambda: dumps(pagina.model_dump(mode="json")))
+
+        gz = gzip.compress(cuerpo, compresslevel=6)
+        filas = [
+            f"n={n}: anterior {ms_anterior:.2f}ms | model_dump_json {ms_nueva:.2f}ms | dict+orjson/json {ms_dict:.2f}ms",
+            f"  bytes: sin comprimir {len(cuerpo)} | gzip-6 {len(gz)} ({len(gz) / len(cuerpo):.1%})",
+        ]
+        if compresion.brotli is not None:
+            br = compresion.brotli.compress(cuerpo, quality=4)
+            filas.append(f"  brotli-4 {len(br)} ({len(br) / len(cuerpo):.1%})")
+        print("\n" + "\n".join(filas))
+
+        assert ms_nueva < ms_anterior
+        assert len(gz) < len(cuerpo) / 4
@@ -3,17 +3,27 @@ Configuración de pytest para las pruebas.
 Proporciona fixtures comunes para todas las pruebas.
 """
 
+from datetime import datetime
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
 from app.database import get_db, Base
+from app.database_async import SesionDirecta, get_async_db
 from app.auth.jwt_handler import jwt_handler
-from app.models.model_usuario import Usuario, RolUsuario
+from app.models import Usuario, RolUsuario
+from app.schemas.esquema_usuario import UsuarioCreate
 from app.services.usuario_service import UsuarioService
+from app.auth.principal_cache import principal_cache
+from app.services.catalogo_cache import catalogo_cache
+from app.utils.paginacion import cache_conteos
+from app.services.autocompletar_personas import indice_personas
+from app.services.limitador import limitador
+from app.middleware.security import limpiar_tokens
 
 # Base de datos de prueba en memoria
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -25,6 +35,18 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Los modelos usan el schema "sistema_gestiones": en SQLite es una base adjunta
+SCHEMA = "sistema_gestiones"
+
+
+@event.listens_for(engine, "connect")
+def _adjuntar_schema(conexion_dbapi, _registro):
+    conexion_dbapi.execute(f"ATTACH DATABASE ':memory:' AS {SCHEMA}")
+
+
+# Roles del sistema (jerarquía por id: bajo id = más privilegio, ver app.auth.api_permisos)
+ROLES = {1: "ADMINISTRADOR", 2: "SUPERVISOR", 3: "OPERADOR", 4: "AUDITOR"}
+
 
 @pytest.fixture(scope="session")
 def db_engine():
@@ -32,6 +54,9 @@ def db_engine():
     Fixture para el motor de base de datos de prueba.
     """
     Base.metadata.create_all(bind=engine)
+    with TestingSessionLocal() as session:
+        session.add_all(RolUsuario(id_rol=id_rol, nombre_rol=nombre) for id_rol, nombre in ROLES.items())
+        session.commit()
     yield engine
     Base.metadata.drop_all(bind=engine)
 
@@ -64,8 +89,25 @@ def client(db_session):
             pass
     
     app.dependency_overrides[get_db] = override_get_db
+    # Lecturas asíncronas sobre la misma sesión (y transacción) de la prueba
+    app.dependency_overrides[get_async_db] = lambda: SesionDirecta(db_session)
+    # Los IDs se reutilizan entre pruebas (rollback): la caché no debe sobrevivir
+    principal_cache.invalidar()
+    catalogo_cache.invalidar()
+    cache_conteos.invalidar()
+    indice_personas.invalidar()
+    # Todas las pruebas llegan desde la IP "testclient": cada una empieza sin
+    # consumo en el rate limit, y los tokens verificados no pasan de una a otra
+    limitador.local.limpiar()
+    limpiar_tokens()
     yield TestClient(app)
     app.dependency_overrides.clear()
+    principal_cache.invalidar()
+    catalogo_cache.invalidar()
+    cache_conteos.invalidar()
+    indice_personas.invalidar()
+    limitador.local.limpiar()
+    limpiar_tokens()
 
 
 @pytest.fixture(scope="function")
@@ -75,13 +117,15 @@ def admin_user(db_session):
     """
     usuario_service = UsuarioService(db_session)
     
-    user_data = {
-        "username": "admin_test",
-        "email": "admin@test.com",
-        "nombre_completo": "Administrador Test",
-        "password": "TestPassword123!",
-        "rol": RolUsuario.ADMINISTRADOR
-    }
+    user_data = UsuarioCreate(
+        username="admin_test",
+        email="admin@test.com",
+        cedula="10000001",
+        nombre="Administrador",
+        apellidos="Test",
+        password="TestPassword123!",
+        rol_id=1,
+    )
     
     user = usuario_service.create_user(user_data)
     return user
@@ -94,13 +138,15 @@ def operator_user(db_session):
     """
     usuario_service = UsuarioService(db_session)
     
-    user_data = {
-        "username": "operator_test",
-        "email": "operator@test.com",
-        "nombre_completo": "Operador Test",
-        "password": "TestPassword123!",
-        "rol": RolUsuario.OPERADOR
-    }
+    user_data = UsuarioCreate(
+        username="operator_test",
+        email="operator@test.com",
+        cedula="10000003",
+        nombre="Operador",
+        apellidos="Test",
+        password="TestPassword123!",
+        rol_id=3,
+    )
     
     user = usuario_service.create_user(user_data)
     return user
@@ -161,7 +207,8 @@ def sample_persona_data():
         "email": "juan.perez@test.com",
         "telefono": "3001234567",
         "empresa": "Empresa Test",
-        "cargo": "Técnico"
+        "cargo": "Técnico",
+        "direccion": "Calle 1 #2-3"
     }
 
 
@@ -214,3 +261,62 @@ def sample_visita_data():
         "fecha_programada": "2024-01-15T10:00:00",
         "duracion_estimada": 120
     }
+
+
+@pytest.fixture(scope="function")
+def logs_auditoria(db_session):
+    """
+    Fixture con un usuario y cuatro registros de auditoría.
+    """
+    from app.models import Control, RolUsuario as Rol, Usuario as UsuarioModelo
+
+    rol = Rol(nombre_rol="Auditor prueba")
+    db_session.add(rol)
+    db_session.flush()
+    usuario = UsuarioModelo(
+        cedula="V999", username="maria.lopez", email="maria@test.com",
+        nombre="María", apellidos="López", hashed_password="x", rol_id=rol.id_rol,
+    )
+    db_session.add(usuario)
+    db_session.flush()
+
+    registros = [
+        ("crear_visita", "visitas", {"codigo": "000123", "centro": "Centro Caracas"}),
+        ("consultar_visitas", "visitas", {"search": "Pérez"}),
+        ("borrar_persona", "personas", {"documento": "12345678", "usuario_info": {"rol_id": 2}}),
+        ("login", "usuario", {"resultado": "exitoso"}),
+    ]
+    logs = []
+    for i, (realizado, tabla, detalles) in enumerate(registros):
+        ahora = datetime(2024, 6, 1, 8, i)
+        logs.append(Control(
+            realizado=realizado, tabla_afectada=tabla, detalles=detalles,
+            usuario_id=usuario.id, fecha_hora=ahora, fecha=ahora.date(), hora=ahora.strftime("%H:%M:%S"),
+        ))
+    db_session.add_all(logs)
+    db_session.commit()
+    return logs
+
+
+@pytest.fixture(scope="function")
+def personas_busqueda(db_session):
+    """
+    Fixture con tres personas con acentos y datos parecidos.
+    """
+    from app.models import Persona
+
+    datos = [
+        ("José", "Pérez", "12345678", "jose.perez@test.com", "Telecomunicaciones Ñandú"),
+        ("María", "Peña", "87654321", "maria@cantv.com", "CANTV"),
+        ("Josefina", "Ramírez", "11222333", "jramirez@test.com", "Banco Central"),
+    ]
+    personas = [
+        Persona(
+            nombre=n, apellido=a, documento_identidad=d, email=e, empresa=emp,
+            direccion="Caracas", foto="sin_foto.png",
+        )
+        for n, a, d, e, emp in datos
+    ]
+    db_session.add_all(personas)
+    db_session.commit()
+    return personas
@@ -0,0 +1,164 @@
+"""
+Pruebas para el escritor de auditoría en lotes.
+"""
+
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.services.Control_service import ControlService, normalizar_detalles, parsear_filtro_detalle
+from app.utils.audit_writer import AuditWriter
+
+
+class EscritorEnMemoria(AuditWriter):
+    """AuditWriter que guarda los lotes en una lista en lugar de la BD."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lotes_escritos = []
+
+    def _escribir(self, lote):
+        self.lotes_escritos.append(list(lote))
+        self._contar("escritos", len(lote))
+        self._contar("lotes")
+
+
+def _registro(n):
+    return {"realizado": f"accion_{n}", "usuario_id": 1}
+
+
+class TestAuditWriter:
+    """Pruebas para lotes, backpressure y vaciado al detener."""
+
+    def test_stop_escribe_pendientes_en_lotes(self):
+        """
+        Prueba que stop() escribe todo lo encolado respetando el tamaño de lote.
+        """
+        writer = EscritorEnMemoria(max_cola=100, tam_lote=10, intervalo=60)
+        writer.start()
+        for n in range(25):
+            asyncio.run(writer.registrar(_registro(n)))
+        writer.stop()
+
+        assert sum(len(lote) for lote in writer.lotes_escritos) == 25
+        assert all(len(lote) <= 10 for lote in writer.lotes_escritos)
+        assert writer.estadisticas()["pendientes"] == 0
+
+    def test_politica_descartar(self):
+        """
+        Prueba que con la cola llena y política "descartar" se cuentan los descartes.
+        """
+        writer = EscritorEnMemoria(max_cola=3, tam_lote=10, intervalo=60, politica="descartar")
+        for n in range(5):
+            asyncio.run(writer.registrar(_registro(n)))
+
+        stats = writer.estadisticas()
+        assert stats["encolados"] == 3
+        assert stats["descartados"] == 2
+
+    def test_politica_sincrono(self):
+        """
+        Prueba que con la cola llena y política "sincrono" el registro se escribe directo.
+        """
+        writer = EscritorEnMemoria(max_cola=1, tam_lote=10, intervalo=60, politica="sincrono")
+        asyncio.run(writer.registrar(_registro(1)))
+        asyncio.run(writer.registrar(_registro(2)))
+
+        assert writer.estadisticas()["sincronos"] == 1
+        assert writer.lotes_escritos == [[_registro(2)]]
+
+
+class TestDetallesJsonb:
+    """Pruebas de detalles estructurados y filtros clave=valor."""
+
+    def test_parsear_filtro(self):
+        """
+        Prueba rutas anidadas y tipos de valor.
+        """
+        assert parsear_filtro_detalle("usuario_info.rol_id=2") == (["usuario_info", "rol_id"], 2)
+        assert parsear_filtro_detalle("codigo=000123") == (["codigo"], "000123")
+        assert parsear_filtro_detalle("activo=true") == (["activo"], True)
+        assert parsear_filtro_detalle("nombre=Juan Pérez") == (["nombre"], "Juan Pérez")
+
+    @pytest.mark.parametrize("texto", ["sin_igual", "=valor", "a..b=1", "a b=1"])
+    def test_parsear_filtro_invalido(self, texto):
+        """
+        Prueba que los filtros mal formados se rechazan.
+        """
+        with pytest.raises(ValueError):
+            parsear_filtro_detalle(texto)
+
+    def test_normalizar_detalles(self):
+        """
+        Prueba que el texto JSON heredado se decodifica.
+        """
+        assert normalizar_detalles('{"a": 1}') == {"a": 1}
+        assert normalizar_detalles("texto libre") == {"texto": "texto libre"}
+        assert normalizar_detalles({"a": 1}) == {"a": 1}
+        assert normalizar_detalles(None) is None
+
+    def test_filtra_por_clave_anidada(self, db_session, logs_auditoria):
+        """
+        Prueba filtros sobre detalles en la consulta de logs.
+        """
+        service = ControlService(db_session)
+
+        logs, total = service.get_control_logs({"detalles": [parsear_filtro_detalle("usuario_info.rol_id=2")]})
+        assert total == 1
+        assert logs[0].realizado == "borrar_persona"
+        assert logs[0].detalles["usuario_info"] == {"rol_id": 2}
+
+        logs, total = service.get_control_logs({"detalles": [parsear_filtro_detalle("codigo=000123")]})
+        assert [log.realizado for log in logs] == ["crear_visita"]
+
+
+class TestResumenDiario:
+    """
+    Pruebas del resumen diario usado por /audit/stats.
+    """
+
+    def test_insercion_acumula_resumen(self, db_session, logs_auditoria):
+        """
+        Prueba que los lotes suman al resumen y que las estadísticas combinan
+        el resumen de días anteriores con los registros de hoy.
+        """
+        from app.models import ControlResumenDiario
+
+        usuario_id = logs_auditoria[0].usuario_id
+        ayer = datetime.now().astimezone() - timedelta(days=1)
+        service = ControlService(db_session)
+        service.bulk_create_control_logs([
+            {"realizado": "crear_visita", "tabla_afectada": "visitas", "usuario_id": usuario_id, "fecha_hora": ayer},
+            {"realizado": "crear_visita", "tabla_afectada": "visitas", "usuario_id": usuario_id, "fecha_hora": ayer},
+            {"realizado": "login", "tabla_afectada": None, "usuario_id": usuario_id, "fecha_hora": ayer},
+        ])
+        service.create_control_log("crear_visita", usuario_id, "visitas")
+
+        fila = db_session.get(ControlResumenDiario, (ayer.date(), "crear_visita", "visitas", usuario_id))
+        assert fila.total == 2
+        assert db_session.get(ControlResumenDiario, (ayer.date(), "login", "", usuario_id)).total == 1
+
+        stats = service.get_control_stats(fecha_desde=ayer.date())["stats"]
+        assert stats[0] == {"realizado": "crear_visita", "tabla_afectada": "visitas", "count": 3}
+        assert {"realizado": "login", "tabla_afectada": None, "count": 1} in stats
+
+        solo_ayer = service.get_control_stats(fecha_desde=ayer.date(), fecha_hasta=ayer.date())["stats"]
+        assert solo_ayer[0]["count"] == 2
+
+    def test_reconciliar_resumen(self, db_session, logs_auditoria):
+        """
+        Prueba que la reconciliación incluye filas insertadas sin pasar por el servicio.
+        """
+        service = ControlService(db_session)
+        dia = date(2024, 6, 1)
+        assert service.get_control_stats(dia, dia)["stats"] == []
+
+        assert service.reconciliar_resumen(dia, dia) == 4
+        stats = service.get_control_stats(dia, dia)["stats"]
+        assert len(stats) == 4
+        assert all(s["count"] == 1 for s in stats)
+
+        # Idempotente
+        service.reconciliar_resumen(dia, dia)
+        assert sum(s["count"] for s in service.get_control_stats(dia, dia)["stats"]) == 4
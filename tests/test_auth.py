@@ -2,9 +2,13 @@
 Pruebas unitarias para el módulo de autenticación.
 """
 
+import asyncio
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
-from app.models.model_usuario import RolUsuario
+from app.auth.password_hasher import PasswordHasher
+from app.auth.principal_cache import Principal, PrincipalCache, RolPrincipal
+from app.services.usuario_service import pwd_context
 
 
 class TestAuth:
@@ -41,9 +45,8 @@ class TestAuth:
         )
         
         assert response.status_code == 401
-        data = response.json()
-        assert "detail" in data
-        assert "incorrectos" in data["detail"]
+        error = response.json()["error"]
+        assert "incorrectas" in error["detail"]
     
     def test_login_json_success(self, client: TestClient, operator_user):
         """
@@ -75,7 +78,7 @@ class TestAuth:
         data = response.json()
         assert data["username"] == "operator_test"
         assert data["email"] == "operator@test.com"
-        assert data["rol"] == RolUsuario.OPERADOR.value
+        assert data["rol"]["nombre_rol"] == "OPERADOR"
     
     def test_get_current_user_invalid_token(self, client: TestClient):
         """
@@ -119,10 +122,11 @@ class TestAuth:
     def test_protected_endpoint_without_auth(self, client: TestClient):
         """
         Prueba acceder a un endpoint protegido sin autenticación.
+        HTTPBearer de FastAPI responde 403 si falta la cabecera Authorization.
         """
         response = client.get("/api/v1/personas/")
         
-        assert response.status_code == 401
+        assert response.status_code == 403
     
     def test_protected_endpoint_with_auth(self, client: TestClient, auth_headers_operator):
         """
@@ -170,3 +174,104 @@ class TestAuth:
         )
         
         assert response.status_code == 201
+
+
+class TestPasswordHasher:
+    """Pruebas para el pool de bcrypt."""
+
+    def test_rehash_si_cambia_el_costo(self):
+        """
+        Prueba que un hash con costo distinto al configurado se regenera al verificar.
+        """
+        hasher = PasswordHasher(workers=1, max_pendientes=4)
+        hash_viejo = pwd_context.hash("secreto123", rounds=4)
+
+        valida, nuevo_hash = asyncio.run(hasher.verificar("secreto123", hash_viejo))
+
+        assert valida is True
+        assert nuevo_hash is not None
+        assert pwd_context.verify("secreto123", nuevo_hash)
+        assert hasher.estadisticas()["rehashes"] == 1
+
+    def test_contrasena_incorrecta(self):
+        """
+        Prueba que una contraseña incorrecta no produce rehash.
+        """
+        hasher = PasswordHasher(workers=1, max_pendientes=4)
+        hash_viejo = pwd_context.hash("secreto123", rounds=4)
+
+        valida, nuevo_hash = asyncio.run(hasher.verificar("otra", hash_viejo))
+
+        assert valida is False
+        assert nuevo_hash is None
+
+    def test_saturado_responde_503(self):
+        """
+        Prueba que sin cupo en la cola se rechaza con 503 en lugar de esperar.
+        """
+        hasher = PasswordHasher(workers=1, max_pendientes=0)
+
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(hasher.hash("secreto123"))
+
+        assert exc.value.status_code == 503
+        assert hasher.estadisticas()["rechazadas"] == 1
+
+
+def _principal(user_id=1, rol_id=3):
+    return Principal(
+        id=user_id, username="operator_test", email="op@test.com", nombre="Op",
+        apellidos="Test", rol_id=rol_id, activo=True, rol=RolPrincipal(rol_id, "OPERADOR"),
+    )
+
+
+class TestPrincipalCache:
+    """Pruebas para la caché del usuario autenticado."""
+
+    def test_hit_evita_recargar(self):
+        """
+        Prueba que la segunda consulta del mismo usuario no llama al cargador.
+        """
+        cache = PrincipalCache(ttl=60, max_entradas=10)
+        cargas = []
+
+        def cargar():
+            cargas.append(1)
+            return _principal()
+
+        assert cache.obtener(1, cargar).id == 1
+        assert cache.obtener(1, cargar).id == 1
+        assert len(cargas) == 1
+        stats = cache.estadisticas()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_invalidar_fuerza_recarga(self):
+        """
+        Prueba que tras invalidar se vuelve a cargar (p. ej. cambio de rol).
+        """
+        cache = PrincipalCache(ttl=60, max_entradas=10)
+        cache.obtener(1, lambda: _principal(rol_id=3))
+        cache.invalidar(1)
+
+        principal = cache.obtener(1, lambda: _principal(rol_id=2))
+
+        assert principal.rol_id == 2
+
+    def test_usuario_inexistente_no_se_guarda(self):
+        """
+        Prueba que un resultado None no queda en caché.
+        """
+        cache = PrincipalCache(ttl=60, max_entradas=10)
+        assert cache.obtener(99, lambda: None) is None
+        assert cache.estadisticas()["entradas"] == 0
+
+    def test_principal_to_dict(self):
+        """
+        Prueba que el principal produce el dict que retorna get_current_user.
+        """
+        datos = _principal().to_dict()
+        assert datos["rol"] == "OPERADOR"
+        assert datos["rol_id"] == 3
+        assert datos["nombre_completo"] == "Op Test"
+
@@ -0,0 +1,90 @@
+"""
+Pruebas para el autocompletado de personas y la exportación NDJSON de cédulas.
+"""
+
+import json
+
+from fastapi.testclient import TestClient
+
+from app.services.autocompletar_personas import IndicePrefijos
+
+
+class TestIndicePrefijos:
+    """Pruebas del índice de prefijos en memoria."""
+
+    def test_prefijo_cedula_y_nombre(self, db_session, personas_busqueda):
+        """
+        Prueba búsqueda por cédula, por palabra sin acentos y con varios términos.
+        """
+        indice = IndicePrefijos(ttl=60)
+
+        assert [p["documento_identidad"] for p in indice.buscar(db_session, "1")] == ["11222333", "12345678"]
+        assert [p["nombre"] for p in indice.buscar(db_session, "pen")] == ["María"]
+        assert [p["nombre"] for p in indice.buscar(db_session, "jos")] == ["José", "Josefina"]
+        assert [p["nombre"] for p in indice.buscar(db_session, "jos ram")] == ["Josefina"]
+        assert indice.buscar(db_session, "1", limite=1)[0]["documento_identidad"] == "11222333"
+        assert indice.buscar(db_session, "") == []
+        assert indice.cargas == 1
+
+    def test_actualizar_y_quitar(self, db_session, personas_busqueda):
+        """
+        Prueba que las escrituras se reflejan sin recargar el índice.
+        """
+        indice = IndicePrefijos(ttl=60)
+        indice.buscar(db_session, "1")
+
+        persona = personas_busqueda[0]
+        persona.apellido = "Gómez"
+        persona.documento_identidad = "99000111"
+        indice.actualizar(persona)
+        assert indice.buscar(db_session, "perez") == []
+        assert [p["id"] for p in indice.buscar(db_session, "gom")] == [persona.id]
+        assert [p["id"] for p in indice.buscar(db_session, "990")] == [persona.id]
+        assert indice.buscar(db_session, "1234") == []
+
+        indice.quitar(persona.id)
+        assert indice.buscar(db_session, "gom") == []
+        assert indice.cargas == 1
+
+
+class TestEndpointsAutocompletar:
+    """Pruebas de /personas/autocompletar y /personas/cedulas?formato=ndjson."""
+
+    def test_autocompletar(self, client: TestClient, auth_headers_operator, personas_busqueda):
+        """
+        Prueba el endpoint de prefijos.
+        """
+        response = client.get(
+            "/api/v1/personas/autocompletar",
+            params={"prefijo": "Peñ", "limit": 5},
+            headers=auth_headers_operator,
+        )
+        assert response.status_code == 200
+        assert [p["documento_identidad"] for p in response.json()] == ["87654321"]
+
+    def test_cedulas_ndjson(self, client: TestClient, auth_headers_operator, personas_busqueda):
+        """
+        Prueba la exportación en streaming, una persona por línea.
+        """
+        response = client.get(
+            "/api/v1/personas/cedulas",
+            params={"formato": "ndjson"},
+            headers=auth_headers_operator,
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        filas = [json.loads(linea) for linea in response.text.splitlines()]
+        assert [f["documento_identidad"] for f in filas] == ["11222333", "12345678", "87654321"]
+        assert filas[0]["nombre"] == "Josefina"
+
+    def test_cedulas_json_limitado(self, client: TestClient, auth_headers_operator, personas_busqueda):
+        """
+        Prueba que el formato json rechaza límites que deben pedirse como NDJSON.
+        """
+        response = client.get(
+            "/api/v1/personas/cedulas",
+            params={"limit": 5001},
+            headers=auth_headers_operator,
+        )
+        assert response.status_code == 400
+        assert "formato=ndjson" in response.json()["error"]["detail"]
@@ -0,0 +1,90 @@
+"""
+Pruebas para la búsqueda de texto en la auditoría.
+"""
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import busqueda_auditoria
+from app.services.busqueda_auditoria import BusquedaAuditoria
+
+
+def _sql(query) -> str:
+    return str(query.statement.compile(dialect=postgresql.dialect()))
+
+
+class TestConstruccionConsulta:
+    """Pruebas del SQL que se genera para PostgreSQL."""
+
+    def test_usuarios_resueltos_antes(self, db_session, logs_auditoria):
+        """
+        Prueba que el filtro sobre control usa usuario_id IN (...) y no ILIKE sobre usuario.
+        """
+        query, rank = BusquedaAuditoria(db_session)._query_busqueda("maria")
+        sql = _sql(query)
+
+        assert "control.usuario_id IN" in sql
+        assert "usuario.username ILIKE" not in sql
+        assert "usuario.nombre ILIKE" not in sql
+        assert rank is None
+
+    def test_sin_usuarios_coincidentes(self, db_session, logs_auditoria):
+        """
+        Prueba que sin usuarios que coincidan no se agrega el IN.
+        """
+        query, _ = BusquedaAuditoria(db_session)._query_busqueda("caracas")
+
+        assert "usuario_id IN" not in _sql(query)
+
+    def test_tsvector_y_rank(self, db_session, logs_auditoria, monkeypatch):
+        """
+        Prueba que con la columna busqueda se usa @@ y ts_rank_cd en lugar de ILIKE sobre detalles.
+        """
+        monkeypatch.setattr(busqueda_auditoria, "_columna_busqueda_disponible", lambda db: True)
+
+        query, rank = BusquedaAuditoria(db_session)._query_busqueda("visitas")
+        sql = _sql(query)
+
+        assert "busqueda @@ websearch_to_tsquery" in sql
+        assert "CAST(sistema_gestiones.control.detalles AS TEXT)" not in sql
+        assert rank is not None
+
+
+class TestBusquedaSQLite:
+    """Sin la columna busqueda la consulta usa ILIKE también sobre detalles."""
+
+    def test_busca_en_detalles_y_usuario(self, db_session, logs_auditoria):
+        """
+        Prueba que se encuentran términos de detalles (JSON), de la acción y del usuario.
+        """
+        busqueda = BusquedaAuditoria(db_session)
+
+        pagina = busqueda.buscar("caracas")
+        assert [c.realizado for c in pagina.items] == ["crear_visita"]
+
+        pagina = busqueda.buscar("consultar")
+        assert [c.realizado for c in pagina.items] == ["consultar_visitas"]
+
+        pagina = busqueda.buscar("maria")
+        assert pagina.total == 4
+
+    def test_orden_relevancia_sin_tsvector(self, db_session, logs_auditoria):
+        """
+        Prueba que sin tsvector el orden por relevancia cae al orden por fecha.
+        """
+        pagina = BusquedaAuditoria(db_session).buscar("visitas", orden="relevancia")
+
+        assert [c.realizado for c in pagina.items] == ["consultar_visitas", "crear_visita"]
+        assert pagina.puntajes is None
+
+    def test_cursor_por_fecha(self, db_session, logs_auditoria):
+        """
+        Prueba la paginación por cursor de los resultados.
+        """
+        busqueda = BusquedaAuditoria(db_session)
+
+        primera = busqueda.buscar("maria", limit=3)
+        segunda = busqueda.buscar("maria", limit=3, cursor=primera.next_cursor)
+
+        assert [c.realizado for c in primera.items] == ["login", "borrar_persona", "consultar_visitas"]
+        assert [c.realizado for c in segunda.items] == ["crear_visita"]
+        assert segunda.next_cursor is None
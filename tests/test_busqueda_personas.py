@@ -0,0 +1,83 @@
+"""
+Pruebas para la búsqueda de personas por término único (q).
+"""
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.services.busqueda_personas import BusquedaPersonas, normalizar, puntaje, terminos
+
+
+class TestBusquedaPersonas:
+    """Pruebas del motor de búsqueda de personas."""
+
+    def test_normalizar(self):
+        """
+        Prueba minúsculas y eliminación de acentos (incluida la ñ).
+        """
+        assert normalizar("José PEÑA") == "jose pena"
+        assert terminos("  María   Pérez ") == ["maria", "perez"]
+        assert terminos("") == []
+
+    def test_puntaje_prefiere_palabra_exacta(self):
+        """
+        Prueba el orden exacta > prefijo > subcadena y que faltar un término excluye.
+        """
+        campos = ("José", "Pérez", "12345678", "jose.perez@test.com", "Empresa")
+        assert puntaje(campos, ["jose"], "") > puntaje(campos, ["jos"], "") > puntaje(campos, ["ose"], "")
+        assert puntaje(campos, ["jose", "gomez"], "") is None
+        assert puntaje(campos, ["1234"], "1234") > puntaje(campos, ["4567"], "4567")
+
+    def test_busca_sin_acentos_en_todos_los_campos(self, db_session, personas_busqueda):
+        """
+        Prueba coincidencias por nombre, empresa, email y cédula.
+        """
+        service = BusquedaPersonas(db_session)
+
+        assert [p.nombre for p in service.buscar("perez").items] == ["José"]
+        assert [p.nombre for p in service.buscar("nandu").items] == ["José"]
+        assert [p.nombre for p in service.buscar("cantv").items] == ["María"]
+        assert [p.nombre for p in service.buscar("8765").items] == ["María"]
+
+        resultado = service.buscar("jose")
+        assert [p.nombre for p in resultado.items] == ["José", "Josefina"]
+        assert resultado.total == 2
+
+        assert service.buscar("jose ramirez").total == 1
+        assert service.buscar("   ").items == []
+
+    def test_funciones_sqlite(self, db_session):
+        """
+        Prueba las funciones registradas en la conexión SQLite para filtrar y ordenar en la base.
+        """
+        fila = db_session.execute(text(
+            "SELECT persona_texto_busqueda('José', 'Peña', '123', NULL, 'Ñandú'), "
+            "persona_puntaje('jose', '', 'José', 'Peña', '123', NULL, 'Ñandú'), "
+            "persona_puntaje('gomez', '', 'José', 'Peña', '123', NULL, 'Ñandú')"
+        )).one()
+        assert fila[0] == "jose pena 123 nandu"
+        assert fila[1] == 3
+        assert fila[2] is None
+
+    def test_paginacion(self, db_session, personas_busqueda):
+        """
+        Prueba skip/limit y conteo "ninguno".
+        """
+        service = BusquedaPersonas(db_session)
+        pagina = service.buscar("test", limit=1, skip=1, conteo="ninguno")
+        assert len(pagina.items) == 1
+        assert pagina.total is None
+
+    def test_endpoint_q(self, client: TestClient, auth_headers_operator, personas_busqueda):
+        """
+        Prueba el parámetro q de GET /personas/.
+        """
+        response = client.get(
+            "/api/v1/personas/",
+            params={"q": "Pérez", "size": 10},
+            headers=auth_headers_operator,
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        assert data["items"][0]["documento_identidad"] == "12345678"
@@ -0,0 +1,113 @@
+"""
+Pruebas para la compresión de respuestas y la serialización JSON.
+"""
+
+import json
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from app.middleware.compresion import CompresionMiddleware, elegir_codificacion
+from app.utils.respuestas import RespuestaJSON, dumps
+
+
+def _app() -> FastAPI:
+    app = FastAPI(default_response_class=RespuestaJSON)
+
+    @app.get("/grande")
+    def grande():
+        return {"items": [{"id": i, "nombre": "Visitante"} for i in range(500)]}
+
+    @app.get("/pequeno")
+    def pequeno():
+        return {"ok": True}
+
+    @app.get("/imagen")
+    def imagen():
+        return Response(b"\xff" * 5000, media_type="image/jpeg")
+
+    @app.get("/etag")
+    def con_etag():
+        cuerpo = json.dumps({"items": list(range(500))})
+        return Response(cuerpo, media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(
+            (f'{{"n": {i}}}\n'.encode() for i in range(1000)), media_type="application/x-ndjson"
+        )
+
+    app.add_middleware(CompresionMiddleware, minimo=500)
+    return app
+
+
+class TestCompresion:
+    """Pruebas del middleware de compresión."""
+
+    def test_elegir_codificacion(self):
+        """
+        Prueba la negociación de Accept-Encoding sin brotli.
+        """
+        assert elegir_codificacion("gzip, deflate", brotli_habilitado=False) == "gzip"
+        assert elegir_codificacion("gzip;q=0, deflate", brotli_habilitado=False) is None
+        assert elegir_codificacion("", brotli_habilitado=False) is None
+        assert elegir_codificacion("br", brotli_habilitado=False) is None
+
+    def test_comprime_json_grande(self):
+        """
+        Prueba que una respuesta grande sale en gzip con Vary y Content-Length correcto.
+        """
+        client = TestClient(_app())
+        response = client.get("/grande", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert len(response.json()["items"]) == 500
+
+    def test_no_comprime_pequeno_ni_imagenes(self):
+        """
+        Prueba el umbral de tamaño y los tipos no comprimibles.
+        """
+        client = TestClient(_app())
+        assert "content-encoding" not in client.get("/pequeno", headers={"Accept-Encoding": "gzip"}).headers
+        assert "content-encoding" not in client.get("/imagen", headers={"Accept-Encoding": "gzip"}).headers
+        assert "content-encoding" not in client.get("/grande", headers={"Accept-Encoding": "identity"}).headers
+
+    def test_etag_debil_al_comprimir(self):
+        """
+        Prueba que un ETag fuerte pasa a W/ solo si la respuesta se comprime.
+        """
+        client = TestClient(_app())
+        assert client.get("/etag", headers={"Accept-Encoding": "gzip"}).headers["etag"] == 'W/"v1"'
+        assert client.get("/etag", headers={"Accept-Encoding": "identity"}).headers["etag"] == '"v1"'
+
+    def test_streaming(self):
+        """
+        Prueba la compresión bloque a bloque de una respuesta en streaming.
+        """
+        client = TestClient(_app())
+        response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        lineas = response.text.splitlines()
+        assert len(lineas) == 1000
+        assert json.loads(lineas[-1]) == {"n": 999}
+
+
+class TestRespuestaJSON:
+    """Pruebas de la serialización de RespuestaJSON."""
+
+    def test_dumps(self):
+        """
+        Prueba dicts con tipos no JSON y modelos Pydantic.
+        """
+        class Modelo(BaseModel):
+            nombre: str
+            fecha: datetime
+
+        datos = json.loads(dumps({"a": {1, 2}, "b": "ñ", "c": Modelo(nombre="x", fecha=datetime(2024, 1, 1))}))
+        assert sorted(datos["a"]) == [1, 2]
+        assert datos["b"] == "ñ"
+        assert datos["c"]["fecha"].startswith("2024-01-01T00:00:00")
+        assert json.loads(dumps(Modelo(nombre="x", fecha=datetime(2024, 1, 1))))["nombre"] == "x"
@@ -0,0 +1,145 @@
+"""
+Pruebas para el GET condicional (ETag / Last-Modified).
+"""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.utils.condicional import crear_validador, no_modificado, ultima_de, version_pagina
+
+
+def _request(**cabeceras) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in cabeceras.items()],
+    })
+
+
+class TestValidador:
+    """Pruebas de la evaluación de If-None-Match / If-Modified-Since."""
+
+    def test_etag_estable_y_debil(self):
+        """
+        Prueba que el ETag depende solo del recurso y las partes.
+        """
+        a = crear_validador("visitas", [{"x": 1}, 10])
+        assert a.etag == crear_validador("visitas", [{"x": 1}, 10]).etag
+        assert a.etag != crear_validador("visitas", [{"x": 2}, 10]).etag
+        assert a.etag.startswith('W/"visitas-')
+
+    def test_if_none_match(self):
+        """
+        Prueba coincidencia débil, listas de ETag y comodín.
+        """
+        validador = crear_validador("persona", [1])
+        fuerte = validador.etag[2:]
+        assert no_modificado(_request(if_none_match=validador.etag), validador)
+        assert no_modificado(_request(if_none_match=f'"otro", {fuerte}'), validador)
+        assert no_modificado(_request(if_none_match="*"), validador)
+        assert not no_modificado(_request(if_none_match='"otro"'), validador)
+        assert not no_modificado(_request(), validador)
+
+    def test_if_modified_since(self):
+        """
+        Prueba Last-Modified con resolución de segundos y prioridad de If-None-Match.
+        """
+        modificado = datetime(2024, 6, 1, 8, 30, 15, 500000, tzinfo=timezone.utc)
+        validador = crear_validador("persona", [1], modificado)
+        assert validador.cabeceras()["Last-Modified"] == "Sat, 01 Jun 2024 08:30:15 GMT"
+
+        assert no_modificado(_request(if_modified_since="Sat, 01 Jun 2024 08:30:15 GMT"), validador)
+        assert not no_modificado(_request(if_modified_since="Sat, 01 Jun 2024 08:30:14 GMT"), validador)
+        assert not no_modificado(_request(if_modified_since="no es una fecha"), validador)
+        assert not no_modificado(
+            _request(if_none_match='"otro"', if_modified_since="Sat, 01 Jun 2024 09:00:00 GMT"), validador
+        )
+
+    def test_ultima_de(self):
+        """
+        Prueba que se ignoran las fechas nulas.
+        """
+        assert ultima_de(None, None) is None
+        assert ultima_de(datetime(2024, 1, 1), None, datetime(2024, 2, 1)) == datetime(2024, 2, 1)
+
+    def test_version_pagina(self):
+        """
+        Prueba que la versión de la página cambia con las filas, su orden y las relaciones anidadas.
+        """
+        persona = SimpleNamespace(fecha_actualizacion=datetime(2024, 1, 1))
+        filas = [
+            SimpleNamespace(id=1, fecha_actualizacion=datetime(2024, 1, 1), persona=persona),
+            SimpleNamespace(id=2, fecha_actualizacion=None, persona=None),
+        ]
+        version = version_pagina(filas, ("fecha_actualizacion",), ("persona",))
+        assert version == [[1, datetime(2024, 1, 1), datetime(2024, 1, 1)], [2, None, None]]
+        assert version_pagina(filas[::-1], ("fecha_actualizacion",), ("persona",)) != version
+
+        persona.fecha_actualizacion = datetime(2024, 2, 1)
+        assert version_pagina(filas, ("fecha_actualizacion",), ("persona",)) != version
+
+
+class TestEndpointsCondicionales:
+    """Pruebas de 304 en los endpoints de lectura."""
+
+    def test_persona_304_y_cambio(self, client: TestClient, auth_headers_operator, db_session, personas_busqueda):
+        """
+        Prueba que GET /personas/{id} responde 304 hasta que la persona cambia.
+        """
+        persona = personas_busqueda[0]
+        url = f"/api/v1/personas/{persona.id}"
+        response = client.get(url, headers=auth_headers_operator)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        assert "last-modified" in response.headers
+
+        response = client.get(url, headers={**auth_headers_operator, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+        persona.fecha_actualizacion = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        db_session.commit()
+        response = client.get(url, headers={**auth_headers_operator, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    def test_lista_personas_304(self, client: TestClient, auth_headers_operator, personas_busqueda):
+        """
+        Prueba el ETag del listado: cambia con los filtros y se revalida con 304.
+        """
+        response = client.get("/api/v1/personas/", headers=auth_headers_operator)
+        etag = response.headers["etag"]
+        assert "last-modified" not in response.headers
+
+        response = client.get("/api/v1/personas/", headers={**auth_headers_operator, "If-None-Match": etag})
+        assert response.status_code == 304
+
+        response = client.get(
+            "/api/v1/personas/", params={"nombre": "José"},
+            headers={**auth_headers_operator, "If-None-Match": etag},
+        )
+        assert response.status_code == 200
+
+    def test_centro_datos_304(self, client: TestClient, auth_headers_operator, db_session, sample_centro_datos_data):
+        """
+        Prueba If-Modified-Since en GET /centros-datos/{id}.
+        """
+        from app.models import CentroDatos
+
+        datos = {k: v for k, v in sample_centro_datos_data.items() if hasattr(CentroDatos, k)}
+        centro = CentroDatos(**datos)
+        db_session.add(centro)
+        db_session.commit()
+
+        url = f"/api/v1/centros-datos/{centro.id}"
+        response = client.get(url, headers=auth_headers_operator)
+        assert response.status_code == 200
+        ultima = response.headers["last-modified"]
+
+        response = client.get(url, headers={**auth_headers_operator, "If-Modified-Since": ultima})
+        assert response.status_code == 304
@@ -0,0 +1,84 @@
+"""
+Pruebas para el pool de conexiones y sus estadísticas.
+"""
+
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+from app.database import EstadisticasPool, QueuePoolMedido, get_pool_status, pool_stats
+
+
+class TestEstadisticasPool:
+    """Pruebas del acumulado de tiempos de espera."""
+
+    def test_snapshot(self):
+        """
+        Prueba promedio, máximo y timeouts en milisegundos.
+        """
+        estadisticas = EstadisticasPool()
+        assert estadisticas.snapshot()["espera_promedio_ms"] == 0.0
+
+        estadisticas.registrar_espera(0.001)
+        estadisticas.registrar_espera(0.003, timeout=True)
+
+        assert estadisticas.snapshot() == {
+            "checkouts": 2,
+            "espera_total_ms": 4.0,
+            "espera_promedio_ms": 2.0,
+            "espera_maxima_ms": 3.0,
+            "timeouts": 1,
+        }
+
+
+class TestQueuePoolMedido:
+    """Pruebas del QueuePool que mide los checkouts."""
+
+    def test_registra_checkouts_y_timeouts(self):
+        """
+        Prueba que cada checkout queda registrado y que agotar el pool cuenta un timeout.
+        """
+        pool = QueuePoolMedido(lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=0, timeout=0.05)
+        antes = pool_stats.snapshot()
+
+        conexion = pool.connect()
+        with pytest.raises(PoolTimeout):
+            pool.connect()
+        conexion.close()
+        pool.connect().close()
+
+        despues = pool_stats.snapshot()
+        assert despues["checkouts"] - antes["checkouts"] == 3
+        assert despues["timeouts"] - antes["timeouts"] == 1
+        assert despues["espera_maxima_ms"] >= 50
+        pool.dispose()
+
+    def test_error_de_conexion_no_es_timeout(self):
+        """
+        Prueba que un error al conectar se propaga sin registrarse como timeout.
+        """
+        def conectar():
+            raise sqlite3.OperationalError("servidor caído")
+
+        pool = QueuePoolMedido(conectar, pool_size=1, max_overflow=0, timeout=0.05)
+        antes = pool_stats.snapshot()
+
+        with pytest.raises(sqlite3.OperationalError):
+            pool.connect()
+
+        despues = pool_stats.snapshot()
+        assert despues["checkouts"] == antes["checkouts"]
+        assert despues["timeouts"] == antes["timeouts"]
+        pool.dispose()
+
+    def test_estado_del_pool(self):
+        """
+        Prueba que el estado expone el modo, la clase del pool y las esperas.
+        """
+        estado = get_pool_status()
+
+        assert estado["modo"] in ("queue", "null")
+        assert set(estado["espera"]) >= {"checkouts", "timeouts", "espera_promedio_ms"}
+        if estado["clase"] == "QueuePoolMedido":
+            assert estado["checked_out"] >= 0
@@ -0,0 +1,84 @@
+"""
+Pruebas para la capa de sesiones asíncronas (app.database_async).
+"""
+
+import asyncio
+import threading
+
+from app.database_async import SesionDirecta, SesionEnHilo, url_async
+from app.models import Control
+from app.utils.log_utils import log_action
+
+
+class _SesionFalsa:
+    def __init__(self):
+        self.cerrada = False
+        self.hilos = []
+
+    def close(self):
+        self.cerrada = True
+
+
+class TestUrlAsync:
+    """Pruebas de la conversión de la URL al driver async."""
+
+    def test_postgres_y_sqlite(self):
+        """
+        Prueba que psycopg2 pasa a asyncpg y SQLite a aiosqlite.
+        """
+        assert url_async("postgresql://u:p@h:5432/db") == "postgresql+asyncpg://u:p@h:5432/db"
+        assert url_async("postgresql+psycopg2://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+        assert url_async("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+
+    def test_dialecto_desconocido(self):
+        """
+        Prueba que un dialecto sin driver async conocido retorna None.
+        """
+        assert url_async("mysql+pymysql://u:p@h/db") is None
+        assert url_async("no es una url") is None
+
+
+class TestSesiones:
+    """Pruebas de los respaldos con la interfaz run_sync."""
+
+    def test_sesion_en_hilo(self):
+        """
+        Prueba que run_sync corre fuera del hilo del loop, reutiliza la sesión y la cierra.
+        """
+        falsa = _SesionFalsa()
+        creadas = []
+
+        def fabrica():
+            creadas.append(falsa)
+            return falsa
+
+        def consulta(sesion, valor):
+            sesion.hilos.append(threading.get_ident())
+            return valor * 2
+
+        async def ejecutar():
+            sesion = SesionEnHilo(fabrica)
+            resultados = [await sesion.run_sync(consulta, 1), await sesion.run_sync(consulta, valor=2)]
+            await sesion.close()
+            return resultados
+
+        assert asyncio.run(ejecutar()) == [2, 4]
+        assert len(creadas) == 1
+        assert falsa.cerrada
+        assert threading.get_ident() not in falsa.hilos
+
+    def test_log_action_con_run_sync(self, db_session, logs_auditoria):
+        """
+        Prueba que log_action escribe la auditoría a través de run_sync.
+        """
+        usuario_id = logs_auditoria[0].usuario_id
+        asyncio.run(log_action(
+            accion="buscar_personas",
+            tabla_afectada="personas",
+            detalles={"q": "perez"},
+            db=SesionDirecta(db_session),
+            current_user={"id": usuario_id, "rol_id": 3},
+        ))
+        registro = db_session.query(Control).filter(Control.realizado == "buscar_personas").one()
+        assert registro.usuario_id == usuario_id
+        assert registro.detalles["q"] == "perez"
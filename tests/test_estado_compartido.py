@@ -0,0 +1,109 @@
+"""
+Pruebas para el estado compartido entre workers (backend en memoria).
+"""
+
+import asyncio
+
+from app.auth.principal_cache import PrincipalCache
+from app.services import estado_compartido as modulo
+from app.services.estado_compartido import EstadoMemoria, VersionCompartida
+
+
+class TestEstadoMemoria:
+    """Pruebas de los contadores y claves con vencimiento."""
+
+    def test_incrementar_y_vencer(self, monkeypatch):
+        """
+        Prueba que el contador se reinicia al vencer su TTL.
+        """
+        reloj = [100.0]
+        monkeypatch.setattr(modulo.time, "monotonic", lambda: reloj[0])
+        estado = EstadoMemoria()
+
+        assert estado.incrementar("rl:1.2.3.4", ttl=60) == 1
+        assert asyncio.run(estado.incrementar_async("rl:1.2.3.4", ttl=60)) == 2
+        assert estado.obtener("rl:1.2.3.4") == "2"
+
+        reloj[0] += 61
+        assert estado.obtener("rl:1.2.3.4") is None
+        assert estado.incrementar("rl:1.2.3.4", ttl=60) == 1
+
+    def test_purga_claves_vencidas(self, monkeypatch):
+        """
+        Prueba que las claves inactivas se eliminan sin volver a consultarlas.
+        """
+        reloj = [0.0]
+        monkeypatch.setattr(modulo.time, "monotonic", lambda: reloj[0])
+        estado = EstadoMemoria(intervalo_purga=10)
+        for i in range(100):
+            estado.incrementar(f"rl:{i}", ttl=5)
+        estado.guardar("permanente", "x")
+
+        reloj[0] = 11
+        estado.incrementar("rl:nueva", ttl=5)
+        assert estado.estadisticas()["claves"] == 2
+
+
+class TestVersionCompartida:
+    """Pruebas de la invalidación entre workers."""
+
+    def test_invalidacion_de_otro_worker(self):
+        """
+        Prueba que invalidar en un worker vacía la caché de principal del otro.
+        """
+        estado = EstadoMemoria()
+        worker_a, worker_b = PrincipalCache(ttl=60, max_entradas=10), PrincipalCache(ttl=60, max_entradas=10)
+        for cache in (worker_a, worker_b):
+            cache._version = VersionCompartida("principales", estado, intervalo=0)
+
+        cargas = []
+
+        def cargar():
+            cargas.append(1)
+            return object()
+
+        worker_b.obtener(7, cargar)
+        worker_b.obtener(7, cargar)
+        assert len(cargas) == 1
+
+        worker_a.invalidar(7)
+        worker_b.obtener(7, cargar)
+        assert len(cargas) == 2
+
+    def test_intervalo_de_relectura(self):
+        """
+        Prueba que la versión se relee del backend solo cada `intervalo` segundos.
+        """
+        estado = EstadoMemoria()
+        lectora = VersionCompartida("catalogos", estado, intervalo=3600)
+        assert lectora.actual() == 0
+        VersionCompartida("catalogos", estado).avanzar()
+        assert lectora.actual() == 0
+        lectora.intervalo = 0
+        assert lectora.actual() == 1
+
+    def test_relectura_en_el_loop_no_bloquea(self):
+        """
+        Prueba que dentro del event loop la versión se relee en una tarea
+        con obtener_async, sin la lectura síncrona.
+        """
+
+        class EstadoRemoto(EstadoMemoria):
+            nombre = "prueba"
+
+            def obtener(self, clave):
+                raise AssertionError("lectura síncrona en el event loop")
+
+            async def obtener_async(self, clave):
+                return EstadoMemoria.obtener(self, clave)
+
+        estado = EstadoRemoto()
+        estado.incrementar("version:catalogos")
+        lectora = VersionCompartida("catalogos", estado, intervalo=3600)
+
+        async def ejecutar():
+            antes = lectora.actual()
+            await asyncio.sleep(0)
+            return antes, lectora.actual()
+
+        assert asyncio.run(ejecutar()) == (0, 1)
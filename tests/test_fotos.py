@@ -0,0 +1,109 @@
+"""
+Pruebas para el almacén de fotos usado en las constancias PDF.
+"""
+
+import io
+
+import pytest
+
+from app.services.foto_store import FotoStore
+
+
+@pytest.fixture
+def directorio_fotos(tmp_path):
+    """
+    Fixture con dos directorios de fotos; "a.jpg" existe en ambos.
+    """
+    principal = tmp_path / "principal"
+    respaldo = tmp_path / "respaldo"
+    principal.mkdir()
+    respaldo.mkdir()
+    (principal / "a.jpg").write_bytes(b"A" * 1000)
+    (respaldo / "a.jpg").write_bytes(b"X" * 1000)
+    (respaldo / "b.jpg").write_bytes(b"B" * 1000)
+    return principal, respaldo
+
+
+class TestFotoStore:
+    """Pruebas del índice y el LRU de fotos."""
+
+    def test_directorio_prioritario(self, directorio_fotos):
+        """
+        Prueba que con nombres repetidos gana el primer directorio.
+        """
+        store = FotoStore(list(directorio_fotos), max_mb=1, lado_pdf_px=600)
+        assert store.obtener_bytes("a.jpg") == b"A" * 1000
+        assert store.obtener_bytes("rutas/b.jpg") == b"B" * 1000
+        assert store.obtener_bytes("no_existe.jpg") is None
+
+    def test_segunda_lectura_desde_cache(self, directorio_fotos):
+        """
+        Prueba que la segunda lectura de la misma foto es un hit.
+        """
+        store = FotoStore(list(directorio_fotos), max_mb=1, lado_pdf_px=600)
+        store.obtener_bytes("a.jpg")
+        store.obtener_bytes("a.jpg")
+        stats = store.estadisticas()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_lru_acotado_por_tamano(self, directorio_fotos):
+        """
+        Prueba que el LRU no supera el tamaño máximo configurado.
+        """
+        store = FotoStore(list(directorio_fotos), max_mb=1500 / (1024 * 1024), lado_pdf_px=600)
+        store.obtener_bytes("a.jpg")
+        store.obtener_bytes("b.jpg")
+        stats = store.estadisticas()
+        assert stats["entradas"] == 1
+        assert stats["mb_en_cache"] <= stats["mb_max"]
+
+    def test_registrar_invalida_version_anterior(self, directorio_fotos):
+        """
+        Prueba que al registrar una foto nueva con el mismo nombre no se sirve la anterior.
+        """
+        principal, _ = directorio_fotos
+        store = FotoStore(list(directorio_fotos), max_mb=1, lado_pdf_px=600)
+        store.obtener_bytes("a.jpg")
+
+        (principal / "a.jpg").write_bytes(b"N" * 10)
+        store.registrar("a.jpg", principal / "a.jpg")
+
+        assert store.obtener_bytes("a.jpg") == b"N" * 10
+
+    def test_ausentes_en_cache(self, directorio_fotos):
+        """
+        Prueba que una foto ausente no se vuelve a buscar en disco hasta que
+        se registra o se reindexa.
+        """
+        principal, _ = directorio_fotos
+        store = FotoStore(list(directorio_fotos), max_mb=1, lado_pdf_px=600, ttl_ausentes=60)
+        assert store.ruta("c.jpg") is None
+
+        (principal / "c.jpg").write_bytes(b"C" * 10)
+        assert store.ruta("c.jpg") is None
+        assert store.estadisticas()["ausentes"] == 1
+
+        store.reindexar()
+        assert store.obtener_bytes("c.jpg") == b"C" * 10
+
+        assert store.ruta("d.jpg") is None
+        store.registrar("d.jpg", principal / "c.jpg")
+        assert store.ruta("d.jpg") is not None
+        assert store.estadisticas()["ausentes"] == 0
+
+    def test_version_pdf_reducida(self, tmp_path):
+        """
+        Prueba que la versión para PDF es un JPEG no mayor al lado configurado.
+        """
+        Image = pytest.importorskip("PIL.Image")
+        buffer = io.BytesIO()
+        Image.new("RGB", (3000, 4000), "red").save(buffer, format="PNG")
+        (tmp_path / "grande.png").write_bytes(buffer.getvalue())
+
+        store = FotoStore([tmp_path], max_mb=10, lado_pdf_px=600)
+        datos = store.obtener_para_pdf("grande.png")
+
+        with Image.open(io.BytesIO(datos)) as reducida:
+            assert reducida.format == "JPEG"
+            assert max(reducida.size) == 600
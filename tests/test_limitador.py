@@ -0,0 +1,183 @@
+"""
+Pruebas para el limitador de tasa por ventana deslizante.
+"""
+
+import asyncio
+
+from app.services.estado_compartido import EstadoMemoria
+from app.services.limitador import POR_USUARIO, Limitador, Regla, VentanaDeslizante
+
+
+class EstadoCompartidoPrueba(EstadoMemoria):
+    """EstadoMemoria que el limitador trata como compartido (camino de Redis)."""
+
+    nombre = "prueba"
+
+
+class TestVentanaDeslizante:
+    """Pruebas del contador de ventana deslizante en memoria."""
+
+    def test_limite_en_la_ventana(self):
+        """
+        Prueba que se aceptan `limite` requests y los rechazados no consumen cupo.
+        """
+        regla = Regla("prueba", 10, 60.0)
+        ventana = VentanaDeslizante()
+        permitidos = [ventana.consumir(regla, "1.1.1.1", ahora=0.5).permitido for _ in range(15)]
+        assert permitidos.count(True) == 10
+        assert ventana.consumir(regla, "2.2.2.2", ahora=0.5).permitido
+
+    def test_peso_de_la_ventana_anterior(self):
+        """
+        Prueba que la ventana anterior pesa según el tiempo transcurrido de la actual.
+        """
+        regla = Regla("prueba", 10, 60.0)
+        ventana = VentanaDeslizante()
+        for _ in range(10):
+            ventana.consumir(regla, "ip", ahora=59.0)
+
+        # Inicio de la ventana siguiente: las 10 anteriores pesan completas
+        rechazo = ventana.consumir(regla, "ip", ahora=60.0)
+        assert not rechazo.permitido
+        assert rechazo.reintentar_en == 6.0
+
+        # A mitad de la ventana pesan 5: quedan 5 de cupo
+        permitidos = [ventana.consumir(regla, "ip", ahora=90.0).permitido for _ in range(6)]
+        assert permitidos == [True] * 5 + [False]
+
+        # Dos ventanas después ya no queda rastro
+        assert ventana.consumir(regla, "ip", ahora=181.0).restantes == 9
+
+    def test_purga_de_claves_inactivas(self):
+        """
+        Prueba que las claves sin actividad en dos ventanas se eliminan.
+        """
+        regla = Regla("prueba", 100, 60.0)
+        ventana = VentanaDeslizante(intervalo_purga=60.0)
+        for i in range(1000):
+            ventana.consumir(regla, f"10.0.{i // 256}.{i % 256}", ahora=1.0)
+        assert ventana.claves() == 1000
+
+        ventana.consumir(regla, "activa", ahora=100.0)
+        assert ventana.claves() == 1001  # las primeras siguen en la ventana anterior
+        ventana.consumir(regla, "nueva", ahora=181.0)
+        assert ventana.claves() == 1
+        assert ventana.purgadas == 1001
+
+
+class TestLimitador:
+    """Pruebas de las reglas por ruta y por usuario."""
+
+    def _limitador(self):
+        return Limitador(
+            [
+                Regla("login", 2, 60.0, prefijo="/api/v1/auth/login", metodos=frozenset({"POST"})),
+                Regla("lecturas", 3, 60.0, prefijo="/api/v1/", metodos=frozenset({"GET"}), por=POR_USUARIO),
+            ],
+            estado=EstadoMemoria(),
+        )
+
+    def test_login_por_ip(self):
+        """
+        Prueba que el login tiene su propio límite por IP y no afecta las lecturas.
+        """
+        limitador = self._limitador()
+
+        async def ejecutar():
+            login = [await limitador.verificar("POST", "/api/v1/auth/login", "1.1.1.1") for _ in range(3)]
+            lectura = await limitador.verificar("GET", "/api/v1/personas/", "1.1.1.1", "7")
+            return login, lectura
+
+        login, lectura = asyncio.run(ejecutar())
+        assert login[:2] == [None, None]
+        assert login[2].regla.nombre == "login"
+        assert lectura is None
+
+    def test_lecturas_por_usuario(self):
+        """
+        Prueba que las lecturas se cuentan por usuario aunque compartan IP.
+        """
+        limitador = self._limitador()
+
+        async def ejecutar():
+            usuario_a = [await limitador.verificar("GET", "/api/v1/visitas/", "10.0.0.1", "1") for _ in range(4)]
+            usuario_b = await limitador.verificar("GET", "/api/v1/visitas/", "10.0.0.1", "2")
+            escritura = await limitador.verificar("POST", "/api/v1/visitas/", "10.0.0.1", "1")
+            return usuario_a, usuario_b, escritura
+
+        usuario_a, usuario_b, escritura = asyncio.run(ejecutar())
+        assert [r is None for r in usuario_a] == [True, True, True, False]
+        assert usuario_b is None
+        assert escritura is None
+        assert limitador.estadisticas()["rechazados"] == 1
+
+    def test_general_solo_como_respaldo(self):
+        """
+        Prueba que el límite general por IP no cuenta las lecturas autenticadas
+        ni las carpetas estáticas, pero sí los requests anónimos.
+        """
+        limitador = Limitador(
+            [
+                Regla("lecturas", 3, 60.0, prefijo="/api/v1/", metodos=frozenset({"GET"}), por=POR_USUARIO),
+                Regla("general", 2, 60.0, excluidos=("/imagenes/",), respaldo=True),
+            ],
+            estado=EstadoMemoria(),
+        )
+
+        async def ejecutar():
+            lecturas = [await limitador.verificar("GET", "/api/v1/visitas/", "10.0.0.1", "1") for _ in range(3)]
+            fotos = [await limitador.verificar("GET", "/imagenes/personas/1.jpg", "10.0.0.1") for _ in range(3)]
+            anonimos = [await limitador.verificar("GET", "/api/v1/visitas/", "10.0.0.1") for _ in range(3)]
+            return lecturas, fotos, anonimos
+
+        lecturas, fotos, anonimos = asyncio.run(ejecutar())
+        assert lecturas == [None, None, None]
+        assert fotos == [None, None, None]
+        assert anonimos[:2] == [None, None]
+        assert anonimos[2].regla.nombre == "general"
+
+    def _reglas_encadenadas(self):
+        return [
+            Regla("lecturas", 10, 3600.0, prefijo="/api/v1/", metodos=frozenset({"GET"}), por=POR_USUARIO),
+            Regla("visitas", 1, 3600.0, prefijo="/api/v1/visitas/"),
+        ]
+
+    def test_rechazo_devuelve_reglas_anteriores(self):
+        """
+        Prueba que si una regla posterior rechaza, las anteriores no cuentan el request.
+        """
+        reglas = self._reglas_encadenadas()
+        limitador = Limitador(reglas, estado=EstadoMemoria())
+
+        async def ejecutar():
+            return [await limitador.verificar("GET", "/api/v1/visitas/", "10.0.0.1", "1") for _ in range(4)]
+
+        resultados = asyncio.run(ejecutar())
+        assert resultados[0] is None
+        assert all(r.regla.nombre == "visitas" for r in resultados[1:])
+        # Solo el primer request quedó contado en "lecturas"
+        assert limitador.local.consumir(reglas[0], "u:1").restantes == 8
+
+    def test_estado_compartido_cuenta_igual_que_memoria(self):
+        """
+        Prueba que con estado compartido los rechazados tampoco consumen cupo
+        ni alargan el bloqueo.
+        """
+        estado = EstadoCompartidoPrueba()
+        limitador = Limitador(self._reglas_encadenadas(), estado=estado)
+
+        async def ejecutar():
+            return [await limitador.verificar("GET", "/api/v1/visitas/", "10.0.0.1", "1") for _ in range(4)]
+
+        resultados = asyncio.run(ejecutar())
+        assert resultados[0] is None
+        assert all(r.regla.nombre == "visitas" for r in resultados[1:])
+        contadores = {clave.split(":")[1]: int(valor) for clave, (valor, _) in estado._datos.items()}
+        assert contadores == {"lecturas": 1, "visitas": 1}
+
+    def test_regla_desde_texto(self):
+        """
+        Prueba el formato "limite/segundos" de la configuración.
+        """
+        regla = Regla.desde_texto("login", "10/300")
+        assert (regla.limite, regla.ventana) == (10, 300.0)
@@ -0,0 +1,75 @@
+"""
+Pruebas de la instrumentación de rendimiento y del endpoint /metrics.
+"""
+
+import pytest
+from sqlalchemy import text
+
+from app.utils import metricas
+from app.utils.metricas import Cronometro, Histograma, medir_etapa, medir_peticion
+
+
+class TestMetricas:
+    """Pruebas del registro de métricas y su formato Prometheus."""
+
+    def test_histograma_acumulado(self):
+        """
+        Prueba que los buckets se exportan acumulados con _sum y _count.
+        """
+        histograma = Histograma("prueba_seconds", "Prueba.", ("route",), buckets=(0.1, 1.0))
+        histograma.observar(0.05, "/a")
+        histograma.observar(0.5, "/a")
+        histograma.observar(3.0, "/a")
+        lineas = histograma.exportar()
+        assert 'prueba_seconds_bucket{route="/a",le="0.1"} 1' in lineas
+        assert 'prueba_seconds_bucket{route="/a",le="1"} 2' in lineas
+        assert 'prueba_seconds_bucket{route="/a",le="+Inf"} 3' in lineas
+        assert 'prueba_seconds_count{route="/a"} 3' in lineas
+        assert histograma.resumen("/a") == (3, pytest.approx(3.55))
+
+    def test_etapas(self):
+        """
+        Prueba medir_etapa (ok / error, también como decorador) y Cronometro.
+        """
+        antes = metricas.duracion_etapas.resumen("prueba.etapa", "error")
+        with pytest.raises(ValueError):
+            with medir_etapa("prueba.etapa"):
+                raise ValueError("falla")
+
+        @medir_etapa("prueba.etapa")
+        def trabajo():
+            return 1
+
+        trabajo()
+        trabajo()
+        assert metricas.duracion_etapas.resumen("prueba.etapa", "ok")[0] >= 2
+        assert metricas.duracion_etapas.resumen("prueba.etapa", "error")[0] == (antes[0] if antes else 0) + 1
+
+        Cronometro("prueba").marcar("paso")
+        assert metricas.duracion_etapas.resumen("prueba.paso", "ok") is not None
+
+    def test_consultas_por_peticion(self, db_session):
+        """
+        Prueba que los eventos de SQLAlchemy cuentan las consultas de la medición abierta.
+        """
+        metricas.instrumentar_engines()
+        with medir_peticion() as medicion:
+            db_session.execute(text("SELECT 1"))
+            db_session.execute(text("SELECT 2"))
+        db_session.execute(text("SELECT 3"))
+        assert medicion.consultas == 2
+        assert medicion.tiempo_db > 0
+
+    def test_endpoint_metrics(self, client, admin_token):
+        """
+        Prueba que /metrics expone la latencia por plantilla de ruta y las consultas del request.
+        """
+        client.get("/health")
+        client.get("/api/v1/personas/", headers={"Authorization": f"Bearer {admin_token}"})
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        cuerpo = response.text
+        assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in cuerpo
+        assert 'http_request_db_queries_count{method="GET",route="/api/v1/personas/"}' in cuerpo
+        assert "# TYPE stage_duration_seconds histogram" in cuerpo
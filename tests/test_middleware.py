@@ -0,0 +1,136 @@
+"""
+Pruebas de los middlewares ASGI de app.middleware.security.
+"""
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.security import (
+    CORSCustomMiddleware,
+    ErrorHandlingMiddleware,
+    RateLimitMiddleware,
+    RequestLoggingMiddleware,
+    SecurityHeadersMiddleware,
+)
+from app.services.estado_compartido import EstadoMemoria
+from app.services.limitador import Limitador, Regla
+
+
+def _app(limite: int = 100) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ok")
+    def ok():
+        return {"ok": True}
+
+    @app.get("/falla")
+    def falla():
+        raise RuntimeError("falla")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"{i}\n".encode() for i in range(3)), media_type="text/plain")
+
+    limitador = Limitador([Regla("general", limite, 60.0)], estado=EstadoMemoria())
+    app.add_middleware(RateLimitMiddleware, limitador=limitador)
+    app.add_middleware(ErrorHandlingMiddleware)
+    app.add_middleware(RequestLoggingMiddleware)
+    app.add_middleware(SecurityHeadersMiddleware)
+    return app
+
+
+def _mensajes(app, path: str):
+    """Ejecuta la app ASGI directamente y retorna los mensajes enviados."""
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"testserver")], "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    enviados = []
+    recibidos = []
+
+    async def receive():
+        # Primero el cuerpo (vacío); después, como un cliente que sigue
+        # conectado, no llega nada hasta que termina la respuesta
+        if not recibidos:
+            recibidos.append(1)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(mensaje):
+        enviados.append(mensaje)
+
+    asyncio.run(app(scope, receive, send))
+    return enviados
+
+
+class TestMiddlewares:
+    """Pruebas de la pila de middlewares de seguridad."""
+
+    def test_headers_de_seguridad_y_tiempo(self):
+        """
+        Prueba que la respuesta lleva los headers de seguridad y X-Process-Time.
+        """
+        response = TestClient(_app()).get("/ok")
+        assert response.status_code == 200
+        assert response.headers["x-frame-options"] == "DENY"
+        assert response.headers["x-content-type-options"] == "nosniff"
+        assert float(response.headers["x-process-time"]) >= 0
+
+    def test_streaming_bloque_a_bloque(self):
+        """
+        Prueba que una respuesta en streaming atraviesa la pila sin acumularse.
+        """
+        enviados = _mensajes(_app(), "/stream")
+        cuerpos = [m["body"] for m in enviados if m["type"] == "http.response.body" and m.get("body")]
+        assert cuerpos == [b"0\n", b"1\n", b"2\n"]
+        inicio = dict(enviados[0]["headers"])
+        assert inicio[b"x-frame-options"] == b"DENY"
+
+    def test_error_no_manejado(self):
+        """
+        Prueba que una excepción de la ruta se convierte en un 500 JSON con headers de seguridad.
+        """
+        response = TestClient(_app()).get("/falla")
+        assert response.status_code == 500
+        assert response.json()["error"]["detail"] == "Error interno del servidor"
+        assert response.headers["x-frame-options"] == "DENY"
+
+    def test_rate_limit(self):
+        """
+        Prueba el 429 con Retry-After al superar el límite.
+        """
+        client = TestClient(_app(limite=2))
+        assert [client.get("/ok").status_code for _ in range(3)] == [200, 200, 429]
+        response = client.get("/ok")
+        assert int(response.headers["retry-after"]) >= 1
+        assert response.json()["error"]["status_code"] == 429
+
+    def test_cors_personalizado(self):
+        """
+        Prueba que CORSCustomMiddleware rechaza orígenes no permitidos y refleja el permitido.
+        """
+        app = FastAPI()
+
+        @app.get("/ok")
+        def ok():
+            return {"ok": True}
+
+        app.add_middleware(CORSCustomMiddleware, allowed_origins=["https://gestion.local"])
+        client = TestClient(app)
+
+        response = client.get("/ok", headers={"Origin": "https://gestion.local"})
+        assert response.headers["access-control-allow-origin"] == "https://gestion.local"
+        assert response.headers["access-control-allow-credentials"] == "true"
+        assert client.get("/ok", headers={"Origin": "https://otro.com"}).status_code == 403
+
+    def test_app_principal(self, client):
+        """
+        Prueba que la aplicación principal tiene la pila montada.
+        """
+        response = client.get("/health")
+        assert response.headers["strict-transport-security"].startswith("max-age=")
+        assert "x-process-time" in response.headers
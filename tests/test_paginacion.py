@@ -0,0 +1,186 @@
+"""
+Pruebas para la paginación por cursor (keyset) y el conteo opcional.
+"""
+
+import pytest
+from datetime import date, datetime, timedelta
+from fastapi import HTTPException
+
+from app.models import EstadoVisita, Persona, TipoActividad, CentroDatos, Visita
+from app.utils.paginacion import (
+    CacheConteos,
+    cache_conteos,
+    codificar_cursor,
+    contar,
+    decodificar_cursor,
+    paginar_keyset,
+)
+
+
+@pytest.fixture(scope="function")
+def visitas_mismas_fechas(db_session):
+    """
+    Fixture con 12 visitas en 3 fechas distintas (4 por fecha): el id
+    desempata el orden dentro de cada fecha.
+    """
+    centro = CentroDatos(nombre="Centro P", codigo="CDP01", direccion="Calle 1", ciudad="Caracas")
+    estado = EstadoVisita(nombre_estado="Programada")
+    tipo = TipoActividad(nombre_actividad="Mantenimiento")
+    persona = Persona(
+        nombre="Ana", apellido="Gómez", documento_identidad="87654321",
+        email="ana@test.com", empresa="Empresa Test", direccion="Calle 2", foto=""
+    )
+    db_session.add_all([centro, estado, tipo, persona])
+    db_session.flush()
+
+    base = datetime(2024, 3, 1, 9, 0)
+    visitas = [
+        Visita(
+            codigo_visita=f"P{i:08d}",
+            persona_id=persona.id,
+            centro_datos_id=centro.id,
+            estado_id=estado.id_estado,
+            tipo_actividad_id=tipo.id_tipo_actividad,
+            descripcion_actividad="Revisión",
+            fecha_programada=base + timedelta(days=i % 3),
+        )
+        for i in range(12)
+    ]
+    db_session.add_all(visitas)
+    db_session.commit()
+    return visitas
+
+
+class TestCursor:
+    """Pruebas de codificación de cursores opacos."""
+
+    def test_ida_y_vuelta_con_fechas(self):
+        """
+        Prueba que date y datetime sobreviven la codificación.
+        """
+        valores = [date(2024, 5, 1), "10:15:00", datetime(2024, 5, 1, 10, 15), 42]
+        token = codificar_cursor("control", valores)
+
+        assert "=" not in token
+        assert decodificar_cursor("control", token, 4) == valores
+
+    def test_cursor_de_otro_recurso(self):
+        """
+        Prueba que un cursor de visitas no se acepta en auditoría.
+        """
+        token = codificar_cursor("visitas", [datetime(2024, 1, 1), 1])
+        with pytest.raises(HTTPException) as exc:
+            decodificar_cursor("control", token, 2)
+        assert exc.value.status_code == 400
+
+    def test_cursor_corrupto(self):
+        """
+        Prueba que un token inválido retorna 400 y no un error interno.
+        """
+        with pytest.raises(HTTPException) as exc:
+            decodificar_cursor("visitas", "no-es-un-cursor", 2)
+        assert exc.value.status_code == 400
+
+
+class TestKeyset:
+    """Pruebas de paginar_keyset sobre la base de datos de prueba."""
+
+    def test_recorre_todo_sin_repetir(self, db_session, visitas_mismas_fechas):
+        """
+        Prueba que siguiendo next_cursor se obtienen todas las visitas una
+        sola vez y en orden (fecha_programada, id) DESC.
+        """
+        columnas = (Visita.fecha_programada, Visita.id)
+        vistos = []
+        cursor = None
+        while True:
+            filas, cursor = paginar_keyset(
+                db_session.query(Visita), "visitas", columnas, 5, cursor=cursor
+            )
+            vistos.extend(filas)
+            if cursor is None:
+                break
+
+        esperado = sorted(visitas_mismas_fechas, key=lambda v: (v.fecha_programada, v.id), reverse=True)
+        assert [v.id for v in vistos] == [v.id for v in esperado]
+
+    def test_ultima_pagina_sin_cursor(self, db_session, visitas_mismas_fechas):
+        """
+        Prueba que una página que alcanza el final no retorna next_cursor.
+        """
+        filas, cursor = paginar_keyset(
+            db_session.query(Visita), "visitas", (Visita.fecha_programada, Visita.id), 12
+        )
+        assert len(filas) == 12
+        assert cursor is None
+
+
+class TestConteo:
+    """Pruebas de los modos de conteo."""
+
+    def test_modos(self, db_session, visitas_mismas_fechas):
+        """
+        Prueba exacto, ninguno y estimado (en SQLite usa la caché de conteos).
+        """
+        cache_conteos.invalidar()
+        query = db_session.query(Visita)
+        tabla = Visita.__table__.fullname
+
+        assert contar(db_session, query, "exacto", tabla) == (12, False)
+        assert contar(db_session, query, "ninguno", tabla) == (None, False)
+        assert contar(db_session, query, "estimado", tabla) == (12, True)
+
+    def test_cache_expira(self):
+        """
+        Prueba que un conteo vencido no se reutiliza.
+        """
+        cache = CacheConteos(ttl=0)
+        cache.guardar(("t", ()), 10)
+        assert cache.obtener(("t", ())) is None
+
+        cache = CacheConteos(ttl=60)
+        cache.guardar(("t", ()), 10)
+        assert cache.obtener(("t", ())) == 10
+
+
+class TestEndpoints:
+    """Pruebas de cursor y conteo en los endpoints de listado."""
+
+    def test_personas_por_cursor(self, client, auth_headers_operator, db_session):
+        """
+        Prueba recorrer /personas/ con next_cursor y conteo=ninguno.
+        """
+        db_session.add_all([
+            Persona(
+                nombre=f"Persona{i}", apellido="Test", documento_identidad=f"V{i:07d}",
+                email=f"p{i}@test.com", empresa="Empresa", direccion="Calle", foto=""
+            )
+            for i in range(7)
+        ])
+        db_session.commit()
+
+        ids = []
+        params = {"size": 3, "conteo": "ninguno"}
+        while True:
+            response = client.get("/api/v1/personas/", params=params, headers=auth_headers_operator)
+            assert response.status_code == 200
+            data = response.json()
+            assert data["total"] is None
+            ids.extend(p["id"] for p in data["items"])
+            if not data["next_cursor"]:
+                break
+            params = {"size": 3, "conteo": "ninguno", "cursor": data["next_cursor"]}
+
+        assert len(ids) == 7
+        assert ids == sorted(ids)
+
+    def test_cursor_invalido_400(self, client, auth_headers_operator):
+        """
+        Prueba que un cursor manipulado retorna 400.
+        """
+        response = client.get(
+            "/api/v1/personas/",
+            params={"cursor": "xyz"},
+            headers=auth_headers_operator,
+        )
+        assert response.status_code == 400
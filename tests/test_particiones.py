@@ -0,0 +1,117 @@
+"""
+Pruebas para el particionado mensual y la retención de la tabla control.
+"""
+
+import gzip
+from datetime import date
+
+from app.services import particiones_control
+from app.services.particiones_control import (
+    aplicar_retencion,
+    ejecutar_mantenimiento,
+    es_particionada,
+    nombre_particion,
+    particiones_vencidas,
+    rango_particion,
+    sumar_meses,
+)
+
+
+class TestMeses:
+    """Pruebas de aritmética de meses y nombres de partición."""
+
+    def test_sumar_meses_cruza_anios(self):
+        """
+        Prueba sumar y restar meses a través del cambio de año.
+        """
+        assert sumar_meses(date(2024, 11, 1), 3) == date(2025, 2, 1)
+        assert sumar_meses(date(2024, 1, 1), -1) == date(2023, 12, 1)
+        assert sumar_meses(date(2024, 1, 1), -13) == date(2022, 12, 1)
+
+    def test_nombre_y_rango(self):
+        """
+        Prueba que el rango se deduce del nombre de la partición.
+        """
+        nombre = nombre_particion(date(2024, 12, 1))
+        assert nombre == "control_p2024_12"
+        assert rango_particion(nombre) == (date(2024, 12, 1), date(2025, 1, 1))
+        assert rango_particion("control_default") is None
+
+
+class TestRetencion:
+    """Pruebas de selección de particiones vencidas."""
+
+    def test_vencidas_segun_retencion(self, monkeypatch):
+        """
+        Prueba que solo vencen los meses completos anteriores a la ventana
+        (la ventana de 2 meses incluye el mes en curso).
+        """
+        particiones = [
+            {"nombre": n} for n in
+            ["control_p2023_12", "control_p2024_01", "control_p2024_02", "control_p2024_03", "control_default"]
+        ]
+        monkeypatch.setattr(particiones_control, "listar_particiones", lambda conn: particiones)
+
+        vencidas = particiones_vencidas(None, meses_retencion=2, hoy=date(2024, 3, 20))
+
+        assert vencidas == ["control_p2023_12", "control_p2024_01"]
+
+    def test_retencion_desactivada(self, tmp_path):
+        """
+        Prueba que meses_retencion=0 no toca la base de datos.
+        """
+        assert aplicar_retencion(None, 0, tmp_path) == []
+
+
+class TestSinParticionar:
+    """En SQLite (o antes de migrar) el mantenimiento es no-op."""
+
+    def test_sqlite_no_particionada(self, db_engine):
+        """
+        Prueba que SQLite se reporta como no particionada.
+        """
+        with db_engine.connect() as conn:
+            assert es_particionada(conn) is False
+        assert ejecutar_mantenimiento(db_engine) == {"particionada": False}
+
+    def test_resumen_sin_particionar(self, db_engine):
+        """
+        Prueba que el resumen corre en la conexión del mantenimiento aunque
+        la tabla no esté particionada.
+        """
+        conexiones = []
+
+        def resumen(conn):
+            conexiones.append(conn)
+            return {"filas": 0}
+
+        assert ejecutar_mantenimiento(db_engine, resumen) == {"particionada": False, "resumen": {"filas": 0}}
+        assert len(conexiones) == 1
+
+
+class TestArchivo:
+    """Pruebas de la exportación a CSV comprimido."""
+
+    def test_archivar_escribe_gzip(self, tmp_path):
+        """
+        Prueba que COPY se escribe comprimido y sin dejar el temporal.
+        """
+        class CursorFalso:
+            def copy_expert(self, sql, salida):
+                assert "COPY sistema_gestiones.control_p2024_01 TO STDOUT" in sql
+                salida.write(b"id,realizado\n1,login\n")
+
+            def close(self):
+                pass
+
+        class ConexionFalsa:
+            class connection:
+                @staticmethod
+                def cursor():
+                    return CursorFalso()
+
+        ruta = particiones_control.archivar_particion(ConexionFalsa(), "control_p2024_01", tmp_path)
+
+        assert ruta.name == "control_p2024_01.csv.gz"
+        assert gzip.decompress(ruta.read_bytes()) == b"id,realizado\n1,login\n"
+        assert not list(tmp_path.glob("*.tmp"))
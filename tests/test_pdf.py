@@ -0,0 +1,176 @@
+"""
+Pruebas para el generador de constancias PDF y su caché.
+"""
+
+import asyncio
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.pdf_generator import CachePdf, _plantilla, generar_pdf_visita, pdf_cache
+from app.workers import exportacion
+from app.workers.exportacion import ItemExportacion, RegistroProgreso, generar_zip
+
+
+DATOS_VISITA = {
+    'codigo_visita': '000000001',
+    'persona_nombre': 'Juan Pérez',
+    'persona_cedula': '12345678',
+    'persona_email': 'juan@test.com',
+    'persona_empresa': 'Empresa & Asociados',
+    'centro_nombre': 'Centro <Principal>',
+    'descripcion_actividad': 'Mantenimiento preventivo',
+    'areas_nombres': ['Área 1', 'Área 2'],
+    'tipo_actividad': 'Mantenimiento',
+}
+
+
+class TestGeneradorPdf:
+    """Pruebas del render de la constancia."""
+
+    def test_plantilla_se_construye_una_vez(self):
+        """
+        Prueba que los estilos se comparten entre renders.
+        """
+        assert _plantilla() is _plantilla()
+
+    def test_genera_pdf_con_caracteres_especiales(self):
+        """
+        Prueba que "&" y "<" en los datos no rompen el markup de los párrafos.
+        """
+        pdf = generar_pdf_visita(DATOS_VISITA)
+        assert pdf.startswith(b"%PDF")
+
+    def test_mismo_pdf_para_la_misma_version(self, monkeypatch):
+        """
+        Prueba que el PDF no depende de la hora del render, solo de fecha_registro.
+        """
+        from app.utils import pdf_generator
+
+        datos = dict(DATOS_VISITA, fecha_registro="15/01/2024 10:00:00")
+        primero = generar_pdf_visita(datos)
+
+        class RelojAdelantado(pdf_generator.datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return pdf_generator.datetime(2030, 1, 1, tzinfo=tz)
+
+        monkeypatch.setattr(pdf_generator, "datetime", RelojAdelantado)
+        assert generar_pdf_visita(datos) == primero
+
+
+class TestCachePdf:
+    """Pruebas del LRU de constancias generadas."""
+
+    def test_hit_no_vuelve_a_generar(self):
+        """
+        Prueba que con la misma clave el PDF se genera una sola vez.
+        """
+        cache = CachePdf(max_mb=1)
+        renders = []
+
+        def generar():
+            renders.append(1)
+            return b"%PDF-1"
+
+        clave = (1, "2024-01-15T10:00:00")
+        assert cache.obtener(clave, generar) == b"%PDF-1"
+        assert cache.obtener(clave, generar) == b"%PDF-1"
+        assert len(renders) == 1
+
+    def test_clave_nueva_tras_actualizar(self):
+        """
+        Prueba que una fecha_actualizacion distinta produce un render nuevo.
+        """
+        cache = CachePdf(max_mb=1)
+        cache.guardar((1, "v1"), b"viejo")
+        assert cache.obtener((1, "v2"), lambda: b"nuevo") == b"nuevo"
+
+    def test_lru_acotado_por_tamano(self):
+        """
+        Prueba que se descartan las constancias más antiguas al superar el máximo.
+        """
+        cache = CachePdf(max_mb=2500 / (1024 * 1024))
+        for i in range(3):
+            cache.guardar(i, b"x" * 1000)
+
+        assert cache.buscar(0) is None
+        assert cache.buscar(2) is not None
+        assert cache.estadisticas()["entradas"] == 2
+
+
+class TestExportacionZip:
+    """Pruebas del ZIP de exportación masiva."""
+
+    def _consumir(self, items, progreso):
+        async def consumir():
+            return b"".join([parte async for parte in generar_zip(items, progreso)])
+        return asyncio.run(consumir())
+
+    def test_zip_valido_y_progreso(self):
+        """
+        Prueba que el ZIP generado por partes es válido y respeta el orden.
+        """
+        items = []
+        for i in range(5):
+            clave = ("test-export", i)
+            pdf_cache.guardar(clave, b"%PDF-" + str(i).encode())
+            items.append(ItemExportacion(clave=clave, nombre_archivo=f"constancia_{i}.pdf", datos={}))
+        progreso = RegistroProgreso(ttl=60).crear(usuario_id=1, total=len(items))
+
+        contenido = self._consumir(items, progreso)
+
+        zf = zipfile.ZipFile(io.BytesIO(contenido))
+        assert zf.namelist() == [f"constancia_{i}.pdf" for i in range(5)]
+        assert zf.read("constancia_3.pdf") == b"%PDF-3"
+        assert progreso.to_dict()["porcentaje"] == 100.0
+        assert progreso.estado == "completada"
+
+    def test_progreso_publicado_con_limite(self, monkeypatch):
+        """
+        Prueba que el progreso no se publica por cada PDF, pero sí al terminar.
+        """
+        items = []
+        for i in range(20):
+            clave = ("test-export-publicar", i)
+            pdf_cache.guardar(clave, b"%PDF-" + str(i).encode())
+            items.append(ItemExportacion(clave=clave, nombre_archivo=f"constancia_{i}.pdf", datos={}))
+        progreso = RegistroProgreso(ttl=60).crear(usuario_id=1, total=len(items))
+
+        publicados = []
+        monkeypatch.setattr(
+            exportacion.progreso_exportaciones, "publicar",
+            lambda p: publicados.append((p.completados, p.estado)),
+        )
+        self._consumir(items, progreso)
+
+        assert len(publicados) < len(items)
+        assert publicados[-1] == (20, "completada")
+
+    def test_render_guarda_en_cache(self, monkeypatch):
+        """
+        Prueba que un PDF renderizado por falta en la caché queda guardado para la siguiente exportación.
+        """
+        renders = []
+
+        def generar(datos):
+            renders.append(datos["codigo"])
+            return b"%PDF-" + datos["codigo"].encode()
+
+        hilos = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(exportacion, "pool_exportacion", lambda: hilos)
+        monkeypatch.setattr(exportacion, "generar_pdf_visita", generar)
+        monkeypatch.setattr(exportacion.foto_store, "obtener_para_pdf", lambda nombre: None)
+
+        clave = ("test-export-render", 1)
+        item = ItemExportacion(clave=clave, nombre_archivo="constancia.pdf", datos={"codigo": "000001"})
+        registro = RegistroProgreso(ttl=60)
+        try:
+            self._consumir([item], registro.crear(usuario_id=1, total=1))
+            contenido = self._consumir([item], registro.crear(usuario_id=1, total=1))
+        finally:
+            hilos.shutdown()
+
+        assert renders == ["000001"]
+        assert pdf_cache.buscar(clave) == b"%PDF-000001"
+        assert zipfile.ZipFile(io.BytesIO(contenido)).read("constancia.pdf") == b"%PDF-000001"
@@ -15,7 +15,7 @@ class TestPersonas:
         """
         response = client.post(
             "/api/v1/personas/",
-            json=sample_persona_data,
+            data=sample_persona_data,
             headers=auth_headers_operator
         )
         
@@ -24,7 +24,7 @@ class TestPersonas:
         assert data["nombre"] == sample_persona_data["nombre"]
         assert data["apellido"] == sample_persona_data["apellido"]
         assert data["documento_identidad"] == sample_persona_data["documento_identidad"]
-        assert data["activo"] is True
+        assert data["id"] > 0
     
     def test_create_persona_duplicate_document(self, client: TestClient, auth_headers_operator, sample_persona_data):
         """
@@ -33,20 +33,20 @@ class TestPersonas:
         # Crear primera persona
         client.post(
             "/api/v1/personas/",
-            json=sample_persona_data,
+            data=sample_persona_data,
             headers=auth_headers_operator
         )
         
         # Intentar crear segunda persona con mismo documento
         response = client.post(
             "/api/v1/personas/",
-            json=sample_persona_data,
+            data=sample_persona_data,
             headers=auth_headers_operator
         )
         
-        assert response.status_code == 400
-        data = response.json()
-        assert "Ya existe una persona con este número de documento" in data["detail"]
+        assert response.status_code == 409
+        error = response.json()["error"]
+        assert "ya está registrada" in error["detail"]
     
     def test_create_persona_invalid_data(self, client: TestClient, auth_headers_operator):
         """
@@ -74,7 +74,7 @@ class TestPersonas:
         # Crear una persona
         client.post(
             "/api/v1/personas/",
-            json=sample_persona_data,
+            data=sample_persona_data,
             headers=auth_headers_operator
         )
         
@@ -100,7 +100,7 @@ class TestPersonas:
         # Crear una persona
         create_response = client.post(
             "/api/v1/personas/",
-            json=sample_persona_data,
+            data=sample_persona_data,
             headers=auth_headers_operator
         )
         persona_id = create_response.json()["id"]
@@ -126,8 +126,8 @@ class TestPersonas:
         )
         
         assert response.status_code == 404
-        data = response.json()
-        assert "no encontrada" in data["detail"]
+        error = response.json()["error"]
+        assert "no encontrada" in error["detail"]
     
     def test_update_persona(self, client: TestClient, auth_headers_operator, sample_persona_data):
         """
@@ -136,7 +136,7 @@ class TestPersonas:
         # Crear una persona
         create_response = client.post(
             "/api/v1/personas/",
-            json=sample_persona_data,
+            data=sample_persona_data,
             headers=auth_headers_operator
         )
         persona_id = create_response.json()["id"]
@@ -144,28 +144,28 @@ class TestPersonas:
         # Actualizar la persona
         update_data = {
             "nombre": "Juan Carlos",
-            "telefono": "3009876543"
+            "cargo": "Supervisor"
         }
         
         response = client.put(
             f"/api/v1/personas/{persona_id}",
-            json=update_data,
+            data=update_data,
             headers=auth_headers_operator
         )
         
         assert response.status_code == 200
         data = response.json()
         assert data["nombre"] == "Juan Carlos"
-        assert data["telefono"] == "3009876543"
+        assert data["cargo"] == "Supervisor"
     
-    def test_delete_persona(self, client: TestClient, auth_headers_operator, sample_persona_data):
+    def test_delete_persona(self, client: TestClient, auth_headers_operator, auth_headers_admin, sample_persona_data):
         """
-        Prueba la eliminación (soft delete) de una persona.
+        Prueba la eliminación de una persona (requiere supervisor o superior).
         """
         # Crear una persona
         create_response = client.post(
             "/api/v1/personas/",
-            json=sample_persona_data,
+            data=sample_persona_data,
             headers=auth_headers_operator
         )
         persona_id = create_response.json()["id"]
@@ -173,12 +173,12 @@ class TestPersonas:
         # Eliminar la persona
         response = client.delete(
             f"/api/v1/personas/{persona_id}",
-            headers=auth_headers_operator
+            headers=auth_headers_admin
         )
         
         assert response.status_code == 200
         data = response.json()
-        assert "eliminada exitosamente" in data["message"]
+        assert "eliminada correctamente" in data["detail"]
         
         # Verificar que la persona ya no se puede obtener
         get_response = client.get(
@@ -186,71 +186,3 @@ class TestPersonas:
             headers=auth_headers_operator
         )
         assert get_response.status_code == 404
-    
-    def test_get_persona_by_document(self, client: TestClient, auth_headers_operator, sample_persona_data):
-        """
-        Prueba buscar una persona por documento.
-        """
-        # Crear una persona
-        client.post(
-            "/api/v1/personas/",
-            json=sample_persona_data,
-            headers=auth_headers_operator
-        )
-        
-        # Buscar por documento
-        response = client.get(
-            f"/api/v1/personas/documento/{sample_persona_data['documento_identidad']}",
-            headers=auth_headers_operator
-        )
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert data["documento_identidad"] == sample_persona_data["documento_identidad"]
-    
-    def test_get_personas_by_empresa(self, client: TestClient, auth_headers_operator, sample_persona_data):
-        """
-        Prueba buscar personas por empresa.
-        """
-        # Crear una persona
-        client.post(
-            "/api/v1/personas/",
-            json=sample_persona_data,
-            headers=auth_headers_operator
-        )
-        
-        # Buscar por empresa
-        response = client.get(
-            f"/api/v1/personas/empresa/{sample_persona_data['empresa']}",
-            headers=auth_headers_operator
-        )
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 1
-        assert data[0]["empresa"] == sample_persona_data["empresa"]
-    
-    def test_persona_stats(self, client: TestClient, auth_headers_operator, sample_persona_data):
-        """
-        Prueba obtener estadísticas de personas.
-        """
-        # Crear una persona
-        client.post(
-            "/api/v1/personas/",
-            json=sample_persona_data,
-            headers=auth_headers_operator
-        )
-        
-        # Obtener estadísticas
-        response = client.get(
-            "/api/v1/personas/stats/estadisticas",
-            headers=auth_headers_operator
-        )
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert "total_personas" in data
-        assert "personas_activas" in data
-        assert "personas_inactivas" in data
-        assert data["total_personas"] == 1
-        assert data["personas_activas"] == 1
@@ -0,0 +1,93 @@
+"""
+Pruebas para la cola de tareas post-commit (PDF, Telegram, Email).
+"""
+
+from app.models import TareaPendiente
+from app.services.tarea_service import (
+    TareaService,
+    ESTADO_PENDIENTE,
+    ESTADO_EN_PROCESO,
+    ESTADO_COMPLETADA,
+    ESTADO_FALLIDA,
+)
+
+
+class TestTareaService:
+    """Pruebas para el ciclo de vida de una tarea."""
+
+    def test_reclamar_marca_en_proceso(self, db_session):
+        """
+        Prueba que reclamar() toma la tarea pendiente e incrementa sus intentos.
+        """
+        service = TareaService(db_session)
+        service.encolar("generar_pdf", {"visita": {"codigo_visita": "000000001"}})
+        db_session.commit()
+
+        tarea = service.reclamar()
+        assert tarea is not None
+        assert tarea.estado == ESTADO_EN_PROCESO
+        assert tarea.intentos == 1
+        # Mientras dura el lease ningún otro worker la vuelve a tomar
+        assert service.reclamar() is None
+
+    def test_lease_vencido_sin_intentos_pasa_a_fallida(self, db_session):
+        """
+        Prueba que una tarea con el lease vencido y sin intentos restantes
+        no se vuelve a reclamar y queda "fallida".
+        """
+        service = TareaService(db_session)
+        service.encolar("telegram", {}, max_intentos=1)
+        db_session.commit()
+
+        tarea = service.reclamar()
+        # El worker se cae: el lease vence sin completar ni fallar
+        tarea.proximo_intento = tarea.fecha_creacion
+        db_session.commit()
+
+        assert service.reclamar() is None
+        tarea = service.get(tarea.id)
+        db_session.refresh(tarea)
+        assert tarea.estado == ESTADO_FALLIDA
+        assert tarea.intentos == 1
+        assert "Lease vencido" in tarea.ultimo_error
+
+    def test_completar_encola_siguientes(self, db_session):
+        """
+        Prueba que completar() encola las tareas siguientes en la misma transacción.
+        """
+        service = TareaService(db_session)
+        tarea = service.encolar("generar_pdf", {"visita": {}}, max_intentos=3)
+        db_session.commit()
+
+        service.completar(
+            tarea.id,
+            resultado={"pdf_path": "/tmp/constancia.pdf"},
+            siguientes=[("telegram", {"pdf_path": "/tmp/constancia.pdf"}), ("email", {})],
+        )
+
+        assert service.get(tarea.id).estado == ESTADO_COMPLETADA
+        tipos = {t.tipo for t in db_session.query(TareaPendiente).filter(TareaPendiente.estado == ESTADO_PENDIENTE)}
+        assert tipos == {"telegram", "email"}
+
+    def test_fallar_reprograma_y_agota_intentos(self, db_session):
+        """
+        Prueba el backoff exponencial y el paso a "fallida" al agotar los intentos.
+        """
+        service = TareaService(db_session)
+        tarea = service.encolar("email", {}, max_intentos=2)
+        db_session.commit()
+
+        tarea = service.reclamar()
+        tarea = service.fallar(tarea.id, "SMTP caído")
+        assert tarea.estado == ESTADO_PENDIENTE
+        assert tarea.ultimo_error == "SMTP caído"
+
+        tarea.proximo_intento = tarea.fecha_creacion
+        db_session.commit()
+        tarea = service.reclamar()
+        tarea = service.fallar(tarea.id, "SMTP caído")
+        assert tarea.estado == ESTADO_FALLIDA
+
+        tarea = service.reintentar(tarea.id)
+        assert tarea.estado == ESTADO_PENDIENTE
+        assert tarea.intentos == 0
@@ -0,0 +1,167 @@
+"""
+Pruebas para el módulo de visitas.
+"""
+
+import pytest
+from datetime import datetime
+from sqlalchemy import event
+
+from app.api.api_visitas import _resolver_nombres_areas_centros
+from app.services.catalogo_cache import CatalogoCache
+from app.models import Area, CentroDatos, EstadoVisita, Persona, TipoActividad, Visita
+
+
+class ContadorConsultas:
+    """Cuenta las sentencias SQL ejecutadas sobre una conexión."""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.total = 0
+
+    def _contar(self, *args, **kwargs):
+        self.total += 1
+
+    def __enter__(self):
+        event.listen(self.conexion, "before_cursor_execute", self._contar)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.conexion, "before_cursor_execute", self._contar)
+
+
+@pytest.fixture(scope="function")
+def visitas_con_areas(db_session):
+    """
+    Fixture que crea 2 centros, 3 áreas y 25 visitas que referencian
+    áreas y centros mediante los arrays JSON areas_ids / centros_datos_ids.
+    """
+    centros = [
+        CentroDatos(nombre=f"Centro {i}", codigo=f"CD{i:03d}", direccion="Calle 1", ciudad="Caracas")
+        for i in range(2)
+    ]
+    db_session.add_all(centros)
+    db_session.flush()
+
+    areas = [Area(nombre=f"Área {i}", id_centro_datos=centros[i % 2].id) for i in range(3)]
+    estado = EstadoVisita(nombre_estado="Programada")
+    tipo = TipoActividad(nombre_actividad="Mantenimiento")
+    persona = Persona(
+        nombre="Juan", apellido="Pérez", documento_identidad="12345678",
+        email="juan@test.com", empresa="Empresa Test", direccion="Calle 2", foto=""
+    )
+    db_session.add_all(areas + [estado, tipo, persona])
+    db_session.flush()
+
+    visitas = []
+    for i in range(25):
+        visitas.append(Visita(
+            codigo_visita=f"{i:09d}",
+            persona_id=persona.id,
+            centro_datos_id=centros[0].id,
+            estado_id=estado.id_estado,
+            tipo_actividad_id=tipo.id_tipo_actividad,
+            descripcion_actividad="Mantenimiento preventivo",
+            fecha_programada=datetime(2024, 1, 15, 10, 0),
+            areas_ids=[areas[i % 3].id, areas[(i + 1) % 3].id],
+            centros_datos_ids=[c.id for c in centros],
+        ))
+    db_session.add_all(visitas)
+    db_session.commit()
+    # El commit expira los objetos: recargarlos para que las pruebas que
+    # cuentan consultas no incluyan la carga perezosa de sus atributos
+    for objeto in visitas + areas + centros:
+        db_session.refresh(objeto)
+    return visitas, areas, centros
+
+
+class TestResolverNombres:
+    """Pruebas del resolvedor en lote de nombres de áreas/centros."""
+
+    def test_numero_fijo_de_consultas(self, db_session, visitas_con_areas):
+        """
+        Sin importar cuántas visitas tenga la página, se hacen exactamente
+        dos consultas: una a area y otra a centro_datos.
+        """
+        visitas, _, _ = visitas_con_areas
+
+        with ContadorConsultas(db_session.connection()) as contador:
+            _resolver_nombres_areas_centros(db_session, visitas)
+
+        assert contador.total == 2
+
+    def test_nombres_en_orden_de_ids(self, db_session, visitas_con_areas):
+        """
+        Los nombres se devuelven en el mismo orden que los IDs de la visita.
+        """
+        visitas, areas, centros = visitas_con_areas
+        _resolver_nombres_areas_centros(db_session, visitas)
+
+        assert visitas[0].areas_nombres == [areas[0].nombre, areas[1].nombre]
+        assert visitas[2].areas_nombres == [areas[2].nombre, areas[0].nombre]
+        assert visitas[0].centros_nombres == [c.nombre for c in centros]
+
+    def test_visitas_sin_ids(self, db_session):
+        """
+        Visitas sin arrays de IDs no generan consultas y quedan con listas vacías.
+        """
+        visita = Visita(codigo_visita="000000001", areas_ids=None, centros_datos_ids=[])
+
+        with ContadorConsultas(db_session.connection()) as contador:
+            _resolver_nombres_areas_centros(db_session, [visita])
+
+        assert contador.total == 0
+        assert visita.areas_nombres == []
+        assert visita.centros_nombres == []
+
+
+class TestCatalogoCache:
+    """Pruebas de la caché de catálogos."""
+
+    def test_consultas_solo_en_la_primera_carga(self, db_session, visitas_con_areas):
+        """
+        La primera consulta carga los catálogos; las siguientes no tocan la BD.
+        """
+        _, areas, centros = visitas_con_areas
+        ids_areas = [a.id for a in areas]
+        nombres_areas = [a.nombre for a in areas]
+        id_centro = centros[1].id
+        cache = CatalogoCache(ttl=300)
+        cache.obtener(db_session)
+
+        with ContadorConsultas(db_session.connection()) as contador:
+            assert cache.existe(db_session, "areas", ids_areas[0])
+            assert not cache.existe(db_session, "centros", 999999)
+            assert cache.nombres_areas(db_session, [ids_areas[1], ids_areas[0]]) == [nombres_areas[1], nombres_areas[0]]
+            assert [a["id"] for a in cache.areas_por_centro(db_session, id_centro)] == [ids_areas[1]]
+
+        assert contador.total == 0
+
+    def test_invalidar_recarga_y_cambia_etag(self, db_session, visitas_con_areas):
+        """
+        Tras invalidar, un centro nuevo aparece y el ETag cambia.
+        """
+        cache = CatalogoCache(ttl=300)
+        etag_antes = cache.etag(db_session, "centros")
+
+        nuevo = CentroDatos(nombre="Centro Nuevo", codigo="CD999", direccion="Calle 9", ciudad="Valencia")
+        db_session.add(nuevo)
+        db_session.commit()
+        assert cache.centro(db_session, nuevo.id) is None
+
+        cache.invalidar()
+        assert cache.centro(db_session, nuevo.id)["nombre"] == "Centro Nuevo"
+        assert cache.etag(db_session, "centros") != etag_antes
+
+    def test_endpoint_responde_304_con_etag(self, client, visitas_con_areas):
+        """
+        /visitas/tipo_actividad devuelve ETag y 304 cuando If-None-Match coincide.
+        """
+        respuesta = client.get("/api/v1/visitas/tipo_actividad")
+        assert respuesta.status_code == 200
+        assert "max-age" in respuesta.headers["cache-control"]
+
+        etag = respuesta.headers["etag"]
+        respuesta = client.get("/api/v1/visitas/tipo_actividad", headers={"If-None-Match": etag})
+        assert respuesta.status_code == 304
+        assert respuesta.content == b""
+